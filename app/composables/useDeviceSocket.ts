@@ -0,0 +1,210 @@
+import { onUnmounted } from 'vue';
+import { io, Socket } from 'socket.io-client';
+
+// ----------------------------
+//  Shared Socket.IO connection with the backend's device state store
+// ----------------------------
+//
+// One socket for the whole app. On connect the backend answers with
+// state_snapshot (or state_delta when we pass auth {state_version} and the
+// events we missed are still in its log); after that, tracked events carry
+// state_version / state_session. This keeps a mirror of the latest payload of
+// every tracked event in the current session of its device, so:
+//   - a page that mounts (or reloads) mid-measurement gets the current state
+//     replayed to its handlers with `replayed = true`
+//   - events at or below the mirror's version are dropped as stale
+//   - a version gap triggers a state_sync instead of a half-updated UI
+//
+// Handlers should only update what they show when `replayed` is true, and
+// leave side effects (navigation, starting devices) to live events.
+
+const BACKEND = 'http://localhost:5000';
+
+// event -> device, as in backend/device_state.py TRACKED_EVENTS
+const TRACKED: Record<string, string> = {
+  irt_update: 'irt',
+  irt_data: 'irt',
+  irt_result: 'irt',
+  bp_update: 'bp',
+  bp_result: 'bp',
+  mhr_status: 'drawer',
+  visit_update: 'visit',
+  res_collect_face: 'face',
+  res_collect_face_img: 'face',
+  res_collect_face_preview: 'face',
+};
+
+type Payload = Record<string, any>;
+type Handler = (payload: any, replayed: boolean) => void;
+
+interface Mirror {
+  session: number;
+  events: Record<string, Payload>;
+}
+
+let socket: Socket | null = null;
+let version = 0;
+let synced = false;                     // a snapshot / delta has been applied
+let syncing = false;                    // waiting for a state_sync answer
+let buffered: [string, Payload][] = [];
+let devices: Record<string, Mirror> = {};
+const handlers = new Map<string, Set<Handler>>();
+const pendingReplay = new Set<[string, Handler]>();
+
+function dispatch(event: string, payload: Payload, replayed: boolean) {
+  handlers.get(event)?.forEach((handler) => handler(payload, replayed));
+}
+
+function fold(device: string, session: number, event: string, payload: Payload) {
+  if (devices[device]?.session !== session) {
+    devices[device] = { session, events: {} };
+  }
+  devices[device].events[event] = payload;
+}
+
+function latestEvents(): [string, Payload][] {
+  const out: [string, Payload][] = [];
+  for (const mirror of Object.values(devices)) {
+    for (const [event, payload] of Object.entries(mirror.events)) out.push([event, payload]);
+  }
+  return out.sort((a, b) => a[1].state_version - b[1].state_version);
+}
+
+function applySnapshot(snapshot: { version: number; devices: Record<string, Payload> }) {
+  const before = synced ? version : null;
+  devices = {};
+  for (const [device, session] of Object.entries(snapshot.devices)) {
+    devices[device] = { session: session.session, events: { ...session.events } };
+  }
+  version = snapshot.version;
+  synced = true;
+  // Events newer than what this client had seen are news to it; the rest is a replay
+  for (const [event, payload] of latestEvents()) {
+    dispatch(event, payload, before === null || payload.state_version <= before);
+  }
+}
+
+function applyDelta(delta: { from: number; version: number; deltas: Payload[] }) {
+  if (delta.from > version) {
+    resync();
+    return;
+  }
+  for (const d of delta.deltas) {
+    if (d.version <= version) continue;
+    const payload = { ...d.payload, state_version: d.version, state_session: d.session };
+    fold(d.device, d.session, d.event, payload);
+    version = d.version;
+    dispatch(d.event, payload, false);
+  }
+  version = Math.max(version, delta.version);
+  synced = true;
+}
+
+function applySync(answer: { event: string; payload: any }) {
+  if (answer.event === 'state_delta') applyDelta(answer.payload);
+  else applySnapshot(answer.payload);
+}
+
+function resync() {
+  if (!socket || syncing) return;
+  syncing = true;
+  socket.emit('state_sync', { state_version: synced ? version : null }, (answer: { event: string; payload: any }) => {
+    syncing = false;
+    applySync(answer);
+    const queued = buffered;
+    buffered = [];
+    queued.forEach(([event, payload]) => live(event, payload));
+  });
+}
+
+function live(event: string, payload: Payload) {
+  const stamped = payload?.state_version;
+  if (stamped === undefined) {
+    dispatch(event, payload, false);    // targeted emits are not versioned
+    return;
+  }
+  if (syncing) {
+    buffered.push([event, payload]);
+    return;
+  }
+  if (stamped <= version) return;       // already in the snapshot / delta
+  if (synced && stamped > version + 1) {
+    // Missed a broadcast: let the server fill the gap, this event included
+    buffered.push([event, payload]);
+    resync();
+    return;
+  }
+  fold(TRACKED[event], payload.state_session, event, payload);
+  version = stamped;
+  dispatch(event, payload, false);
+}
+
+function connect(): Socket {
+  if (socket) return socket;
+  socket = io(BACKEND, {
+    // Re-evaluated on every reconnect, so the server can answer with a delta
+    auth: (cb) => cb(synced ? { state_version: version } : {}),
+  });
+  socket.on('state_snapshot', applySnapshot);
+  socket.on('state_delta', applyDelta);
+  for (const event of Object.keys(TRACKED)) {
+    socket.on(event, (payload: Payload) => live(event, payload));
+  }
+  return socket;
+}
+
+function flushReplay() {
+  const wanted = new Map<string, Handler[]>();
+  pendingReplay.forEach(([event, handler]) => {
+    wanted.set(event, [...(wanted.get(event) ?? []), handler]);
+  });
+  pendingReplay.clear();
+  // In version order across events, e.g. irt_data before the irt_update that completes it
+  for (const [event, payload] of latestEvents()) {
+    wanted.get(event)?.forEach((handler) => handler(payload, true));
+  }
+}
+
+/**
+ * The app's Socket.IO connection. Call from a page's setup; handlers added with
+ * `on` are removed when the page unmounts, the socket itself stays open.
+ */
+export function useDeviceSocket() {
+  const sock = connect();
+  const owned: [string, Handler | ((...args: any[]) => void)][] = [];
+
+  const on = (event: string, handler: Handler) => {
+    if (!(event in TRACKED)) {
+      sock.on(event, handler);
+      owned.push([event, handler]);
+      return;
+    }
+    if (!handlers.has(event)) handlers.set(event, new Set());
+    handlers.get(event)!.add(handler);
+    owned.push([event, handler]);
+    // Bring the page up to the current state once all its handlers are in
+    if (pendingReplay.size === 0) queueMicrotask(flushReplay);
+    pendingReplay.add([event, handler]);
+  };
+
+  /** Run `fn` once the socket is connected (right away if it already is). */
+  const whenConnected = (fn: () => void) => {
+    if (sock.connected) fn();
+    else {
+      sock.once('connect', fn);
+      owned.push(['connect', fn]);
+    }
+  };
+
+  onUnmounted(() => {
+    for (const [event, handler] of owned) {
+      if (event in TRACKED) handlers.get(event)?.delete(handler as Handler);
+      else sock.off(event, handler);
+    }
+    pendingReplay.forEach((entry) => {
+      if (owned.some(([, handler]) => handler === entry[1])) pendingReplay.delete(entry);
+    });
+  });
+
+  return { socket: sock, on, whenConnected };
+}
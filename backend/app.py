@@ -1,25 +1,46 @@
 from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from flask_socketio import SocketIO
-from module.ir_thermal.irt_module import irt_detect_cam
-from module.blood_pressure.bp_module import bp_controller
-from module.drawer_control.drawer_module import drawer_controller
+from module.sync.sync_module import start_sync
+from device_registry import DeviceRegistry, DeviceUnavailable
+from module.session.orchestrator import Step, VisitOrchestrator
+from module.snapshots.snapshot_module import snapshot_response, prune_snapshots
+from module.analytics.rollup_module import MeasurementRollups
+from module.streaming.frame_stream import FrameStream
+from module.camera.dual_stream import parse_size
+from log_pipeline import setup_logging
+from sampling_profiler import SamplingProfiler
+from device_state import DeviceStateStore
+from serial_discovery import SerialDiscovery
 
 import time
+import atexit
+import logging
+import threading
 from logging import info, error
-from coloredlogs import install
 import os
 import csv
 from datetime import datetime
-# from module.face_recognition.face_verify import stream_face_collection  # adjust import path
 
-log_format = "%(asctime)s - %(hostname)s:%(username)s:%(programname)s - %(levelname)s: %(message)s"
-install(level="info", format=log_format)
+# Console logging runs on a background thread; MHR_LOG_MODE=full|sampled|off
+log_pipeline = setup_logging()
 
+# Fallback ports; the real ones are found by serial_ports (set MHR_SERIAL_DISCOVERY=0 to pin these)
 USB_PORT = "/dev/ttyUSB1"
 BP_PORT = "/dev/ttyUSB0"   # ✅ fixed: added leading slash
+DRAWER_PORT = "/dev/ttyACM0"
+DRAWER_BAUDRATE = 115200
 FACE_CAM = 0
 OCR_CAM = 1
+IRT_MATRIX_HZ = float(os.environ.get("MHR_IRT_MATRIX_HZ", "8"))   # irt_matrix events per second, 0 = off
+IRT_LORES_SIZE = parse_size(os.environ.get("MHR_IRT_LORES"))      # detection stream, "off" = main only
+IRT_IDLE_FPS = float(os.environ.get("MHR_IRT_IDLE_FPS", "2"))     # camera rate with nobody in view, 0 = never idle
+IRT_VISIT_TIMEOUT_S = float(os.environ.get("MHR_IRT_VISIT_TIMEOUT_S", "90"))   # headless IRT step gives up after this
+
+# With debug the reloader runs app.py twice; the watcher parent serves nothing,
+# so it must not start background workers or touch devices
+DEBUG = os.environ.get("MHR_DEBUG", "1") == "1"
+RELOADER_WATCHER = __name__ == "__main__" and DEBUG and os.environ.get("WERKZEUG_RUN_MAIN") != "true"
 
 # --------------- APP SETUP -------------- #
 app = Flask(__name__, static_folder="static")
@@ -31,71 +52,305 @@ socketio = SocketIO(
     async_mode="threading"
 )
 
-# -------- IRT MJPEG STREAM -------- #
-@app.get("/video_feed")
-def video_feed():
+# -------- DEVICE STATE (latest per device, snapshot on connect) -------- #
+device_state = DeviceStateStore().attach(socketio)
+
+# -------- MEASUREMENT SYNC (set MHR_SYNC_URL to enable uploads) -------- #
+sync_outbox, sync_worker = start_sync(start_worker=not RELOADER_WATCHER)
+
+def queue_sync(kind, record):
+    """Queue a record for the central collector; never fails the request."""
+    try:
+        sync_outbox.enqueue(kind, record)
+        if sync_worker is not None:
+            sync_worker.notify()
+    except Exception as e:
+        error(f"Failed to queue {kind} record for sync: {e}")
+
+# -------- SERIAL PORTS (probed by protocol, cached by /dev/serial/by-id) -------- #
+serial_ports = SerialDiscovery(defaults={"irt": USB_PORT, "bp": BP_PORT, "drawer": DRAWER_PORT})
+# Probing writes to the ports: only the serving process may do it
+if os.environ.get("MHR_SERIAL_DISCOVERY", "1") != "0" and not RELOADER_WATCHER:
+    serial_ports.start()
+
+def serial_port(name, wait=0.5):
+    """Current port of a serial device; briefly waits for one that is being replugged."""
+    return serial_ports.resolve(name, wait)
+
+# -------- DEVICE PLUGINS (heavy imports deferred to first use) -------- #
+devices = DeviceRegistry()
+
+def device_unavailable(e):
+    return jsonify({"error": str(e)}), 503
+
+@devices.device("irt", "module.ir_thermal.irt_module")
+def register_irt(app, socketio, dev):
+    # -------- IRT MJPEG STREAM -------- #
+    @app.get("/video_feed")
+    def video_feed():
+        """
+        MJPEG stream endpoint.
+        Frontend (HTML) example:
+          <img src="http://localhost:5000/video_feed">
+        """
+        try:
+            irt = dev.load()
+        except DeviceUnavailable as e:
+            return device_unavailable(e)
+
+        return Response(
+            irt.irt_detect_cam(
+                socketio=socketio,
+                face_cam=FACE_CAM,
+                usb_port=serial_port("irt"),
+                temp_offset=2.0,
+                matrix_hz=IRT_MATRIX_HZ,
+                lores_size=IRT_LORES_SIZE,
+                idle_fps=IRT_IDLE_FPS
+            ),
+            mimetype="multipart/x-mixed-replace; boundary=frame"
+        )
+
+    # -------- IRT BINARY STREAM (Socket.IO, credit-based flow control) -------- #
+    stream = FrameStream(socketio).register()
+    stream_state = {"running": False}
+
+    @socketio.on("stream_start")
+    def stream_start(data=None):
+        """
+        Run an IRT session whose frames go to stream_subscribe'd clients as
+        binary stream_frame events instead of /video_feed.
+        """
+        if stream_state["running"]:
+            return {"ok": False, "error": "IRT stream already running"}
+        try:
+            irt = dev.load()
+        except DeviceUnavailable as e:
+            return {"ok": False, "error": str(e)}
+
+        def run():
+            try:
+                for _ in irt.irt_detect_cam(socketio=socketio, face_cam=FACE_CAM, usb_port=serial_port("irt"),
+                                            temp_offset=2.0, frame_sink=stream.publish,
+                                            matrix_hz=IRT_MATRIX_HZ, lores_size=IRT_LORES_SIZE,
+                                            idle_fps=IRT_IDLE_FPS):
+                    pass
+            except Exception as e:
+                error(f"IRT stream failed: {e}")
+            finally:
+                stream_state["running"] = False
+
+        stream_state["running"] = True
+        socketio.start_background_task(run)
+        return {"ok": True}
+
+    @app.get("/api/stream_report")
+    def stream_report():
+        return jsonify({**stream.report(), "running": stream_state["running"]})
+
+@devices.device("drawer", "module.drawer_control.drawer_module")
+def register_drawer(app, socketio, dev):
+    drawer_controller = dev.lazy("drawer_controller")
+
+    # -------- DRAWER CONTROL (used by bp_measurement.vue) -------- #
+    def trigger_drawer(data, value=None):
+        port = serial_port("drawer")
+        baudrate = DRAWER_BAUDRATE
+        info(data["data"])
+
+        if data["data"] == "med_1DrawerOpen":
+            d_status = 0
+            d_number = 1
+            drawer_controller(port, baudrate, d_status, d_number)
+            time.sleep(10)
+            socketio.emit("mhr_status", {"status": "1DrawerOpen"})
+
+        elif data["data"] == "med_1DrawerClose":
+            d_status = 1
+            d_number = 1
+            time.sleep(1)      # small delay before closing
+            drawer_controller(port, baudrate, d_status, d_number)
+            time.sleep(1)
+            socketio.emit("mhr_status", {"status": "1DrawerClose"})
+
+        else:
+            error(f"Unknown drawer command: {data['data']}")
+
+    @socketio.on("drawer_control")
+    def handle_drawer_control(data):
+        """Receive drawer commands from frontend."""
+        try:
+            trigger_drawer(data)
+        except DeviceUnavailable as e:
+            error(f"Drawer command ignored: {e}")
+
+# One cuff and one OCR camera: held by /api/bp_measurement and by a whole visit
+bp_lock = threading.Lock()
+
+@devices.device("bp", "module.blood_pressure.bp_module")
+def register_bp(app, socketio, dev):
+    # -------- BP MEASUREMENT API (called when user clicks Measurement) -------- #
+    @app.post("/api/bp_measurement")
+    def api_bp_measurement():
+        """
+        Trigger one blood pressure measurement.
+        Frontend: POST http://localhost:5000/api/bp_measurement
+        409 while a measurement is running (e.g. a reloaded page asking again).
+        """
+        measure_time = "1"
+
+        try:
+            bp = dev.load()
+        except DeviceUnavailable as e:
+            return device_unavailable(e)
+
+        if not bp_lock.acquire(blocking=False):
+            return jsonify({"error": "a BP measurement is already running"}), 409
+        try:
+            bp_data = bp.bp_controller(
+                socketio=socketio,
+                measure_time=measure_time,
+                ocr_cam=OCR_CAM,
+                usb_port=serial_port("bp"),
+            )
+        except Exception:
+            # Pages restored from the state store wait for bp_result
+            socketio.emit("bp_result", {"success": False, "msg": "Measurement Error"})
+            raise
+        finally:
+            bp_lock.release()
+
+        # bp_data already includes systolic/diastolic (and msg if you added earlier)
+        socketio.emit("bp_result", bp_data)
+        return jsonify(bp_data)
+
+@devices.device("face", "module.face_recognition.enrolment")
+def register_face(app, socketio, dev):
+    @app.get("/face_collect_feed")
+    def face_collect_feed():
+        """Quality-selected face enrolment for ?id=<id from /api/register_information>."""
+        person_id = request.args.get("id", "UNKNOWN")
+        try:
+            face = dev.load()
+        except DeviceUnavailable as e:
+            return device_unavailable(e)
+
+        return Response(
+            face.stream_face_enrolment(
+                socketio=socketio,
+                face_cam=FACE_CAM,
+                person_name=person_id,
+                lores_size=IRT_LORES_SIZE
+            ),
+            mimetype="multipart/x-mixed-replace; boundary=frame"
+        )
+
+devices.init_app(app, socketio)
+
+# -------- RESULT SNAPSHOTS (content-hash names, cached forever) -------- #
+@app.get("/snapshots/<name>")
+def snapshot(name):
     """
-    MJPEG stream endpoint.
-    Frontend (HTML) example:
-      <img src="http://localhost:5000/video_feed">
+    Serve a result image by its hashed name; `?w=160` returns the precomputed thumbnail.
+    Supports If-None-Match / If-Modified-Since (304).
     """
-    return Response(
-        irt_detect_cam(
-            socketio=socketio,
-            face_cam=FACE_CAM,
-            usb_port=USB_PORT,
-            temp_offset=2.0
-        ),
-        mimetype="multipart/x-mixed-replace; boundary=frame"
-    )
-
-# -------- DRAWER CONTROL (used by bp_measurement.vue) -------- #
-def trigger_drawer(data, value=None):
-    port = "/dev/ttyACM0"
-    baudrate = 115200
-    info(data["data"])
-
-    if data["data"] == "med_1DrawerOpen":
-        d_status = 0
-        d_number = 1
-        drawer_controller(port, baudrate, d_status, d_number)
-        time.sleep(10)
-        socketio.emit("mhr_status", {"status": "1DrawerOpen"})
-
-    elif data["data"] == "med_1DrawerClose":
-        d_status = 1
-        d_number = 1
-        time.sleep(1)      # small delay before closing
-        drawer_controller(port, baudrate, d_status, d_number)
-        time.sleep(1)
-        socketio.emit("mhr_status", {"status": "1DrawerClose"})
-
-    else:
-        error(f"Unknown drawer command: {data['data']}")
-
-@socketio.on("drawer_control")
-def handle_drawer_control(data):
-    """Receive drawer commands from frontend."""
-    trigger_drawer(data)
-
-# -------- BP MEASUREMENT API (called when user clicks Measurement) -------- #
-@app.post("/api/bp_measurement")
-def api_bp_measurement():
+    return snapshot_response(name, request.args.get("w"))
+
+prune_snapshots()
+
+@app.get("/api/startup_report")
+def startup_report():
+    """Route-registration and device import times, per module."""
+    return jsonify(devices.report())
+
+@app.get("/api/workers")
+def api_workers():
+    """Device worker processes: pid, restarts, jobs, frame ring stats (null: the device runs in this process)."""
+    return jsonify({
+        "enabled": any(plugin.worker is not None for plugin in devices.devices.values()),
+        "workers": {name: plugin.report()["worker"] for name, plugin in devices.devices.items()},
+    })
+
+@app.get("/api/serial_ports")
+def api_serial_ports():
+    """Discovered serial devices: current port, cached by-id key, ports present."""
+    return jsonify(serial_ports.report())
+
+@app.get("/api/state")
+def api_state():
     """
-    Trigger one blood pressure measurement.
-    Frontend: POST http://localhost:5000/api/bp_measurement
+    Latest state per device (what a Socket.IO client gets as state_snapshot).
+    Query: ?device=irt&history=1 for one device with its finished sessions.
     """
-    measure_time = "1"
-
-    bp_data = bp_controller(
-        socketio=socketio,
-        measure_time=measure_time,
-        ocr_cam=OCR_CAM,
-        usb_port=BP_PORT,
-    )
-
-    # bp_data already includes systolic/diastolic (and msg if you added earlier)
-    return jsonify(bp_data)
+    name = request.args.get("device")
+    if name is None:
+        return jsonify(device_state.snapshot())
+    return jsonify(device_state.device(name, history=request.args.get("history") == "1"))
+
+def admin_request():
+    """From the kiosk itself, or with X-Admin-Token = $MHR_ADMIN_TOKEN."""
+    token = os.environ.get("MHR_ADMIN_TOKEN")
+    local = request.remote_addr in ("127.0.0.1", "::1")
+    return local or bool(token and request.headers.get("X-Admin-Token") == token)
+
+@app.get("/api/debug/events")
+def debug_events():
+    """
+    Recent log records from the in-memory ring (warnings and errors only in "off" mode).
+    Query: ?limit=200&level=DEBUG|INFO|WARNING|ERROR
+    Only from the kiosk itself, or with X-Admin-Token = $MHR_ADMIN_TOKEN.
+    """
+    if not admin_request():
+        return jsonify({"error": "forbidden"}), 403
+    level = request.args.get("level", "DEBUG").upper()
+    if not isinstance(logging.getLevelName(level), int):
+        return jsonify({"error": f"unknown level {level}"}), 400
+    events = log_pipeline.ring.dump(limit=request.args.get("limit", 200, type=int),
+                                    level=logging.getLevelName(level))
+    return jsonify({**log_pipeline.report(), "events": events})
+
+profile_lock = threading.Lock()
+
+@app.get("/api/debug/profile")
+def debug_profile():
+    """
+    Sample every backend thread for a while and return where the time went.
+    Only the server process: device worker processes are listed, not sampled
+    (MHR_WORKERS=0 to profile device code).
+    Query: ?seconds=10&hz=100&mode=cpu|wall&format=summary|collapsed|speedscope
+    Only from the kiosk itself, or with X-Admin-Token = $MHR_ADMIN_TOKEN.
+    """
+    if not admin_request():
+        return jsonify({"error": "forbidden"}), 403
+    fmt = request.args.get("format", "summary")
+    if fmt not in ("summary", "collapsed", "speedscope"):
+        return jsonify({"error": f"unknown format {fmt}"}), 400
+    try:
+        profiler = SamplingProfiler(hz=request.args.get("hz", 100, type=int), mode=request.args.get("mode"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not profile_lock.acquire(blocking=False):
+        return jsonify({"error": "a profile is already running"}), 409
+    try:
+        profile = profiler.run(request.args.get("seconds", 10, type=float))
+    finally:
+        profile_lock.release()
+
+    info(f"Profiled {profile.wall:.1f}s: overhead {profile.report()['overhead_pct']}% of one core")
+    unsampled = {name: plugin.worker.process.pid for name, plugin in devices.devices.items()
+                 if plugin.worker is not None and plugin.worker.process is not None}
+    if fmt == "collapsed":
+        response = Response(profile.collapsed(), mimetype="text/plain")
+    elif fmt == "speedscope":
+        response = jsonify(profile.speedscope())
+        response.headers["Content-Disposition"] = "attachment; filename=mhr-profile.speedscope.json"
+    else:
+        top = profile.collapsed().splitlines()[:20]
+        response = jsonify({**profile.report(), "pid": os.getpid(), "unsampled_workers": unsampled,
+                            "top_stacks": top})
+    if unsampled:
+        response.headers["X-Unsampled-Workers"] = ",".join(f"{name}={pid}" for name, pid in unsampled.items())
+    return response
 
 INFO_DIR = os.path.join("static", "information")
 INFO_CSV = os.path.join(INFO_DIR, "information.csv")
@@ -157,26 +412,44 @@ def register_information():
             writer.writerow(["id"])
         writer.writerow([user_id])
 
-    return jsonify({"id": user_id})
+    queue_sync("registration", {
+        "id": user_id,
+        "title": title,
+        "first_name": first_name,
+        "last_name": last_name,
+        "additional_info": additional_info,
+        "created_at": created_at,
+    })
 
-# @app.get("/face_collect_feed")
-# def face_collect_feed():
-#     person_id = request.args.get("id", "UNKNOWN")
-#     return Response(
-#         stream_face_collection(
-#             socketio=socketio,
-#             device_id=0,
-#             img_capture=10,
-#             person_name=person_id
-#         ),
-#         mimetype="multipart/x-mixed-replace; boundary=frame"
-#     )
+    return jsonify({"id": user_id})
 
 # ✅ Add this block for measurement logging
 MEASUREMENT_DIR = os.path.join("static", "measurement")
 MEASUREMENT_CSV = os.path.join(MEASUREMENT_DIR, "value.csv")
+MEASUREMENT_HEADER = ["timestamp", "temp", "systolic", "diastolic", "pulse", "indicator", "user_id"]
 os.makedirs(MEASUREMENT_DIR, exist_ok=True)
 
+def migrate_measurement_csv(path=MEASUREMENT_CSV):
+    """Rewrite a value.csv from before the user_id column: new header, old rows padded (anonymous)."""
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f), None)
+    except FileNotFoundError:
+        return
+    if header is None or header == MEASUREMENT_HEADER:
+        return
+    tmp = path + ".tmp"
+    with open(path, newline="", encoding="utf-8") as src, open(tmp, "w", newline="", encoding="utf-8") as dst:
+        reader, writer = csv.reader(src), csv.writer(dst)
+        next(reader)
+        writer.writerow(MEASUREMENT_HEADER)
+        for row in reader:
+            writer.writerow(row + [""] * (len(MEASUREMENT_HEADER) - len(row)))
+    os.replace(tmp, path)
+    info(f"Migrated {path} to the {len(MEASUREMENT_HEADER)}-column header (added user_id)")
+
+migrate_measurement_csv()
+
 @app.post("/api/save_measurement")
 def save_measurement():
     """
@@ -187,36 +460,218 @@ def save_measurement():
         "systolic": number | null,
         "diastolic": number | null,
         "pulse": number | null,
-        "indicator": "c" | "m" | "e" | ""
+        "indicator": "c" | "m" | "e" | "",
+        "user_id": string (optional, id from /api/register_information)
     }
     """
     data = request.get_json(force=True) or {}
 
-    temp = data.get("temp")
-    systolic = data.get("systolic")
-    diastolic = data.get("diastolic")
-    pulse = data.get("pulse")
-    indicator = data.get("indicator", "")
+    append_measurement(
+        data.get("temp"),
+        data.get("systolic"),
+        data.get("diastolic"),
+        data.get("pulse"),
+        data.get("indicator", ""),
+        data.get("user_id", ""),
+    )
+    return jsonify({"status": "ok"})
 
+def append_measurement(temp, systolic, diastolic, pulse, indicator="", user_id=""):
+    """Append one row to value.csv, update the rollups and queue it for sync."""
     timestamp = datetime.now().isoformat(timespec="seconds")
 
     file_exists = os.path.exists(MEASUREMENT_CSV)
     with open(MEASUREMENT_CSV, "a", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         if not file_exists:
-            writer.writerow(
-                ["timestamp", "temp", "systolic", "diastolic", "pulse", "indicator"]
-            )
-        writer.writerow([timestamp, temp, systolic, diastolic, pulse, indicator])
+            writer.writerow(MEASUREMENT_HEADER)
+        writer.writerow([timestamp, temp, systolic, diastolic, pulse, indicator, user_id])
+
+    try:
+        rollups.add(timestamp, user_id, temp, systolic, diastolic, pulse)
+    except Exception as e:
+        error(f"Failed to update measurement rollups: {e}")
+
+    queue_sync("measurement", {
+        "timestamp": timestamp,
+        "temp": temp,
+        "systolic": systolic,
+        "diastolic": diastolic,
+        "pulse": pulse,
+        "indicator": indicator,
+        "user_id": user_id,
+    })
+    return timestamp
+
+# -------- ANALYTICS (rollups over value.csv) -------- #
+rollups = MeasurementRollups().load_csv(MEASUREMENT_CSV)
+
+@app.get("/api/analytics/summary")
+def analytics_summary():
+    """
+    Count / mean / min / max / p50 / p90 / p95 per metric.
+    Query: ?user=<id> and/or ?day=YYYY-MM-DD
+    """
+    user = request.args.get("user")
+    day = request.args.get("day")
+    if not user and not day:
+        return jsonify({"error": "user or day is required"}), 400
+    stats = rollups.summary(user=user, day=day)
+    if stats is None:
+        return jsonify({"error": "no measurements"}), 404
+    return jsonify({"user": user, "day": day, "stats": stats})
+
+@app.get("/api/analytics/trend")
+def analytics_trend():
+    """Per-day series of one metric for a user. Query: ?user=<id>&metric=systolic"""
+    try:
+        series = rollups.trend(request.args.get("user", ""), request.args.get("metric", "temp"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"series": series})
+
+@app.get("/api/analytics/exceedance")
+def analytics_exceedance():
+    """
+    Readings above a threshold per bucket.
+    Query: ?metric=systolic&threshold=140[&by=day|user][&user=<id>]
+    """
+    try:
+        counts = rollups.exceedance(
+            request.args.get("metric", "temp"),
+            float(request.args.get("threshold", "37.5")),
+            by=request.args.get("by", "day"),
+            user=request.args.get("user"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"counts": counts})
+
+# -------- ORCHESTRATED VISIT (IRT during the BP cuff cycle) -------- #
+def run_irt_headless(timeout=IRT_VISIT_TIMEOUT_S):
+    """
+    Drive the IRT generator to completion without a browser attached. With
+    nobody in front of the camera it never completes, so after `timeout`
+    seconds the generator is closed (camera, serial port and worker released)
+    and the step fails.
+    """
+    deadline = time.monotonic() + timeout
+    stream = devices["irt"].load().irt_detect_cam(
+        socketio=socketio,
+        face_cam=FACE_CAM,
+        usb_port=serial_port("irt"),
+        temp_offset=2.0,
+        matrix_hz=IRT_MATRIX_HZ,
+        lores_size=IRT_LORES_SIZE,
+        idle_fps=IRT_IDLE_FPS
+    )
+    try:
+        while time.monotonic() < deadline:
+            next(stream)
+    except StopIteration as done:
+        if done.value is None:
+            raise RuntimeError("IRT measurement did not complete")
+        return done.value
+    finally:
+        stream.close()
+    raise TimeoutError(f"IRT measurement did not complete within {timeout:g}s")
+
+def build_visit_steps(open_drawer=False):
+    """
+    irt ──┐
+          ├── save ── drawer (optional)
+    bp  ──┘
+    IRT and BP use separate cameras and serial ports, so they run side by side.
+    """
+    bp_warm = lambda: devices["bp"].load().bp_gpio_setup(socketio, 17, 18)
 
-    return jsonify({"status": "ok"})
+    def run_bp(results):
+        bp_data = devices["bp"].load().bp_controller(
+            socketio=socketio,
+            measure_time="1",
+            ocr_cam=OCR_CAM,
+            usb_port=serial_port("bp"),
+        )
+        if not bp_data.get("success"):
+            raise RuntimeError(f"BP measurement {bp_data.get('msg', 'failed')}")
+        return bp_data
+
+    def save(results):
+        bp_data = results["bp"]
+        return append_measurement(results["irt"], bp_data.get("systolic"), bp_data.get("diastolic"),
+                                  bp_data.get("pulse"), "c")
+
+    steps = [
+        Step("irt", lambda results: run_irt_headless(), warm_up=devices["irt"].load),
+        Step("bp", run_bp, warm_up=bp_warm),
+        Step("save", save, deps=("irt", "bp")),
+    ]
+
+    if open_drawer:
+        arduino = {}
+
+        def drawer_warm():
+            # Opened where the drawer runs (its worker process, if any)
+            arduino["port"] = devices["drawer"].load().open_controller(serial_port("drawer"), DRAWER_BAUDRATE)
+
+        def drawer_open(results):
+            devices["drawer"].load().drawer_controller(arduino["port"], DRAWER_BAUDRATE, 0, 1)
+            socketio.emit("mhr_status", {"status": "1DrawerOpen"})
+            return "1DrawerOpen"
+
+        steps.append(Step("drawer", drawer_open, deps=("save",), warm_up=drawer_warm, optional=True))
+    return steps
+
+@app.post("/api/visit")
+def api_visit():
+    """
+    Run a whole kiosk visit (temperature + BP, then save, then optional drawer).
+    Expected JSON body: { "open_drawer": false }
+    409 while a BP measurement or another visit is running.
+    """
+    data = request.get_json(silent=True) or {}
+    # Held for the whole visit: the BP warm-up already drives the relays
+    if not bp_lock.acquire(blocking=False):
+        return jsonify({"error": "a BP measurement is already running"}), 409
+    try:
+        socketio.emit("visit_update", {"event": "visit_started"})
+        orchestrator = VisitOrchestrator(
+            build_visit_steps(bool(data.get("open_drawer"))),
+            on_event=lambda event, payload: socketio.emit("visit_update", {"event": event, **payload}),
+        )
+        results, errors = orchestrator.run()
+    finally:
+        bp_lock.release()
+    bp_data = results.get("bp") or {}
+    return jsonify({
+        "temp": results.get("irt"),
+        "systolic": bp_data.get("systolic"),
+        "diastolic": bp_data.get("diastolic"),
+        "pulse": bp_data.get("pulse"),
+        "saved_at": results.get("save"),
+        "errors": errors,
+        "report": orchestrator.report(),
+    }), (200 if not errors else 500)
 
 # -------- MAIN -------- #
 if __name__ == "__main__":
+    # Device subsystems in their own processes (device_workers); MHR_WORKERS=0 keeps them in this one.
+    if not RELOADER_WATCHER:
+        if os.environ.get("MHR_WORKERS", "1") == "1":
+            devices.use_workers(socketio, streams={"irt": ("irt_detect_cam",), "face": ("stream_face_enrolment",)})
+            atexit.register(devices.stop_workers)
+            info("Device workers on")
+        else:
+            info("Device workers off (MHR_WORKERS=0): device code runs in the server process")
+
+    # Import device modules in the background so the first measurement does not pay for it
+    if os.environ.get("MHR_DEVICE_WARMUP", "1") == "1":
+        devices.warm_up(background=True)
+
     socketio.run(
         app,
         host="0.0.0.0",
         port=5000,
-        debug=True,
+        debug=DEBUG,
         allow_unsafe_werkzeug=True,
     )
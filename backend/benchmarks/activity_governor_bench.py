@@ -0,0 +1,204 @@
+"""
+CPU use and wake-up latency of the IRT camera loop with and without the
+activity governor (module/camera/activity.ActivityGovernor).
+
+The loop is irt_detect_cam's camera path without the serial side: capture
+(DualStreamCamera on benchmarks.emulators.FakePicamera2 at --fps), motion
+check, face detection on the lores ROI, drawing, JPEG encoding. Scenarios:
+
+    idle    empty kiosk (static scene + sensor noise) for --seconds, measured
+            once the governor has gone idle
+    active  a face drifting through the view for --seconds
+    wake    governor idle, a face appears at a random moment: time until the
+            loop has detected it (--trials times)
+
+CPU is process time / wall time of the loop, i.e. share of one core; it
+includes the emulated camera's rendering, which the ISP does on a Pi, so the
+real savings are a little smaller in absolute terms. --spec picks the face
+detector; without a working cascade / model in this OpenCV build a
+template-matching stand-in on the synthetic face is used (reported).
+
+Run from backend/:
+    python -m benchmarks.activity_governor_bench
+    python -m benchmarks.activity_governor_bench --spec yunet --idle-fps 1 --trials 10
+"""
+import argparse
+import logging
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.emulators import FakePicamera2
+from module.camera.activity import ActivityGovernor, DEFAULT_GOVERNOR_CONFIG
+from module.camera.dual_stream import DualStreamCamera
+from module.face_detection.detectors import FaceDetector, create_detector
+from utils import calculate_centered_roi
+
+MAIN_SIZE = (640, 480)
+LORES_SIZE = (320, 240)
+ROI = calculate_centered_roi(*MAIN_SIZE)
+
+
+class TemplateDetector(FaceDetector):
+    """Stand-in for the synthetic FakePicamera2 face: normalized template matching at 3 scales."""
+    backend = "template"
+
+    def __init__(self, threshold=0.6):
+        super().__init__(1.0)
+        camera = FakePicamera2(fps=0)
+        camera.configure({"main": {"size": MAIN_SIZE}})
+        face = cv2.cvtColor(cv2.flip(camera._render(), 0), cv2.COLOR_BGR2GRAY)
+        w, h = MAIN_SIZE
+        self.template = face[h // 2 - h // 5:h // 2 + h // 5, w // 2 - w // 8:w // 2 + w // 8]
+        self.threshold = threshold
+
+    def _detect(self, image, scale):
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        best = None
+        for s in (0.9, 1.0, 1.1):
+            t = cv2.resize(self.template, None, fx=scale * s, fy=scale * s, interpolation=cv2.INTER_AREA)
+            if t.shape[0] > gray.shape[0] or t.shape[1] > gray.shape[1]:
+                continue
+            _, score, _, (x, y) = cv2.minMaxLoc(cv2.matchTemplate(gray, t, cv2.TM_CCOEFF_NORMED))
+            if score >= self.threshold and (best is None or score > best[0]):
+                best = (score, (x, y, t.shape[1], t.shape[0]))
+        return [best[1]] if best else []
+
+
+def empty_scene(seed=0):
+    rng = np.random.default_rng(seed)
+    scene = np.full((MAIN_SIZE[1], MAIN_SIZE[0], 3), 95, np.uint8)
+    for _ in range(12):         # some static furniture
+        x, y = int(rng.integers(0, 600)), int(rng.integers(0, 440))
+        cv2.rectangle(scene, (x, y), (x + int(rng.integers(20, 120)), y + int(rng.integers(20, 90))),
+                      tuple(int(c) for c in rng.integers(60, 140, 3)), -1)
+    return cv2.flip(scene, 0)   # the camera delivers it upside down
+
+
+class CameraLoop:
+    """irt_detect_cam's per-frame camera work; `governor` None = always full rate."""
+
+    def __init__(self, detector, governor, fps, scene):
+        self.picam2 = FakePicamera2(scene=scene, fps=fps)
+        self.camera = DualStreamCamera(0, MAIN_SIZE, LORES_SIZE, picam2=self.picam2)
+        self.camera.start()
+        self.detector = detector
+        self.governor = governor
+        self.counts = {"frames": 0, "detections": 0, "encodes": 0}
+        self.last_jpeg = None
+
+    def step(self):
+        """One frame; returns True when a face was detected."""
+        governor = self.governor
+        if governor is not None:
+            governor.throttle()
+        captured = self.camera.capture()
+        frame = captured.main
+        self.counts["frames"] += 1
+        x, y, w, h = ROI
+        if governor is not None and not governor.observe(captured.luma):
+            if self.last_jpeg is None or not governor.reuse_jpeg():
+                cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 255, 255), 2)
+                self.last_jpeg = cv2.imencode(".jpg", frame)[1].tobytes()
+                self.counts["encodes"] += 1
+            return False
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 255, 255), 2)
+        faces = self.detector.detect(*captured.detection_view(ROI))
+        self.counts["detections"] += 1
+        if governor is not None:
+            governor.activity(len(faces) > 0)
+        roi_frame = frame[y:y + h, x:x + w]
+        for (fx, fy, fw, fh) in faces:
+            cv2.rectangle(roi_frame, (fx, fy), (fx + fw, fy + fh), (0, 0, 255), 2)
+        self.last_jpeg = cv2.imencode(".jpg", frame)[1].tobytes()
+        self.counts["encodes"] += 1
+        return len(faces) > 0
+
+    def run_for(self, seconds):
+        """(cpu share, counts per second) over `seconds` of wall time."""
+        self.counts = dict.fromkeys(self.counts, 0)
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        while time.perf_counter() - wall0 < seconds:
+            self.step()
+        wall = time.perf_counter() - wall0
+        return (time.process_time() - cpu0) / wall, {k: v / wall for k, v in self.counts.items()}
+
+    def settle(self, timeout):
+        """Run until the governor has gone idle."""
+        deadline = time.perf_counter() + timeout
+        while self.governor is not None and not self.governor.idle and time.perf_counter() < deadline:
+            self.step()
+
+    def close(self):
+        self.camera.close()
+
+
+def wake_latency(make_loop, rng, timeout):
+    loop = make_loop(empty_scene())
+    try:
+        loop.settle(timeout)
+        t_switch = {}
+
+        def arrive():
+            t_switch["t"] = time.perf_counter()
+            loop.picam2.scene = None            # the default scene: a face
+
+        timer = threading.Timer(float(rng.uniform(0.1, 1.0)), arrive)
+        timer.start()
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if loop.step() and "t" in t_switch:
+                return (time.perf_counter() - t_switch["t"]) * 1000
+        return None
+    finally:
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spec", default="haar", help="face detector spec (falls back to a template stand-in)")
+    parser.add_argument("--fps", type=float, default=30.0, help="camera frame rate")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--idle-fps", type=float, default=DEFAULT_GOVERNOR_CONFIG["idle_fps"])
+    parser.add_argument("--idle-after", type=float, default=DEFAULT_GOVERNOR_CONFIG["idle_after_s"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    cv2.setNumThreads(1)
+
+    try:
+        detector = create_detector(args.spec)
+    except Exception as e:
+        print(f"detector {args.spec} unavailable ({e}); using the template stand-in\n")
+        detector = TemplateDetector()
+    config = {"idle_fps": args.idle_fps, "idle_after_s": args.idle_after}
+    rng = np.random.default_rng(args.seed)
+
+    print(f"camera {args.fps:g} fps, idle {args.idle_fps:g} fps after {args.idle_after:g} s, "
+          f"detector {detector.backend}\n")
+    print(f"{'mode':<9} {'scenario':<8} {'cpu %':>6} {'fps':>6} {'det/s':>6} {'enc/s':>6}   wake ms")
+    for mode in ("baseline", "governor"):
+        make_loop = lambda scene: CameraLoop(detector, ActivityGovernor(config) if mode == "governor" else None,
+                                             args.fps, scene)
+        for scenario, scene in (("idle", empty_scene()), ("active", None)):
+            loop = make_loop(scene)
+            try:
+                if scenario == "idle":
+                    loop.settle(args.idle_after + 5)
+                cpu, rates = loop.run_for(args.seconds)
+            finally:
+                loop.close()
+            print(f"{mode:<9} {scenario:<8} {cpu * 100:>6.1f} {rates['frames']:>6.1f} "
+                  f"{rates['detections']:>6.1f} {rates['encodes']:>6.1f}")
+        latencies = [wake_latency(make_loop, rng, args.idle_after + 5) for _ in range(args.trials)]
+        found = [ms for ms in latencies if ms is not None]
+        print(f"{mode:<9} {'wake':<8} {'':>6} {'':>6} {'':>6} {'':>6}   "
+              + (f"median {np.median(found):.0f}, max {max(found):.0f} ({len(found)}/{len(latencies)})"
+                 if found else "never"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Rollup queries vs recomputing from raw rows, at 10^6 measurements.
+
+Run from backend/:
+    python -m benchmarks.analytics_rollup_bench --rows 1000000
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from module.analytics.rollup_module import MeasurementRollups, METRICS
+
+
+def synthetic_rows(n, users=2000, days=365, seed=0):
+    rng = np.random.default_rng(seed)
+    start = date(2025, 1, 1)
+    day_names = [(start + timedelta(d)).isoformat() for d in range(days)]
+    day_idx = rng.integers(0, days, n)
+    user_idx = rng.integers(0, users, n)
+    values = np.column_stack([
+        np.round(rng.normal(36.7, 0.4, n), 1),
+        np.round(rng.normal(122, 15, n)),
+        np.round(rng.normal(79, 10, n)),
+        np.round(rng.normal(74, 12, n)),
+    ])
+    rows = [(f"{day_names[d]}T10:00:00", f"U{u:05d}", *v) for d, u, v in zip(day_idx, user_idx, values.tolist())]
+    return rows, day_names, values, day_idx, user_idx
+
+
+def timeit(fn, repeat=20):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - t0) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rows, day_names, values, day_idx, user_idx = synthetic_rows(args.rows)
+
+    rollups = MeasurementRollups()
+    t0 = time.perf_counter()
+    for i in range(0, len(rows), 50_000):
+        rollups.add_many(rows[i:i + 50_000])
+    build_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for r in rows[:2000]:
+        rollups.add(*r)
+    incr_us = (time.perf_counter() - t0) / 2000 * 1e6
+    print(f"build: {args.rows:,} rows in {build_s:.2f}s   incremental add: {incr_us:.1f} us/row")
+
+    user, day = "U00042", day_names[100]
+    sys_col = METRICS.index("systolic")
+
+    def raw_summary_user():
+        # What an endpoint without rollups does: scan all parsed rows
+        sel = [r for r in rows if r[1] == user]
+        v = np.array([r[2:6] for r in sel])
+        return v.mean(axis=0), np.percentile(v, [50, 90, 95], axis=0)
+
+    def raw_summary_day_numpy():
+        # Best case for raw rows: already columnar in NumPy
+        v = values[day_idx == 100]
+        return v.mean(axis=0), np.percentile(v, [50, 90, 95], axis=0)
+
+    def raw_exceedance_by_day():
+        mask = values[:, sys_col] > 140
+        return np.bincount(day_idx[mask], minlength=len(day_names))
+
+    def raw_trend():
+        sel = user_idx == 42
+        return [values[sel & (day_idx == d), sys_col].mean() for d in np.unique(day_idx[sel])]
+
+    cases = [
+        ("summary user", raw_summary_user, lambda: rollups.summary(user=user)),
+        ("summary day (numpy raw)", raw_summary_day_numpy, lambda: rollups.summary(day=day)),
+        ("exceedance sys>140 by day", raw_exceedance_by_day, lambda: rollups.exceedance("systolic", 140)),
+        ("trend user systolic", raw_trend, lambda: rollups.trend(user, "systolic")),
+    ]
+    print(f"{'query':<28}{'raw ms':>10}{'rollup ms':>12}{'speed-up':>10}")
+    for name, raw, rolled in cases:
+        raw_ms, _ = timeit(raw, repeat=3)
+        roll_ms, _ = timeit(rolled)
+        print(f"{name:<28}{raw_ms:>10.2f}{roll_ms:>12.3f}{raw_ms / roll_ms:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+BP display localization under simulated monitor offsets and rotations.
+
+Renders synthetic LCD frames (benchmarks.emulators.synthetic_bp_display), moves
+the monitor by a grid of shifts / rotations (plus small scale and brightness
+changes) and compares the fixed ROI tuples with DisplayLocalizer crops.
+
+A crop is OCR-ready when it contains >= 99% of its field's digit ink, i.e. no
+segment is cut off (the dominant failure of the fixed ROIs). A frame counts as
+a success when systolic and diastolic are OCR-ready, which is what ends the
+live reader; pulse sits on the bottom edge of the frame and is reported apart.
+With --tesseract the crops are also OCR'd and compared with the rendered digits.
+
+Run from backend/:
+    python -m benchmarks.bp_localizer_bench
+    python -m benchmarks.bp_localizer_bench --trials 50 --tesseract
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.emulators import BP_FIELDS, perturb_frame, synthetic_bp_display
+from module.blood_pressure.display_localizer import DisplayLocalizer
+from module.blood_pressure.ocr_pipeline import merge_config, read_roi, scale_config
+
+OFFSETS = (0, 5, 10, 20, 30)        # px
+ROTATIONS = (0, 2, 5, 8)           # degrees
+INK_RECALL = 0.99
+
+
+def random_values(rng):
+    return {"sys": str(rng.integers(95, 190)), "dia": str(rng.integers(50, 110)), "pulse": str(rng.integers(50, 130))}
+
+
+def ink_points(mask, limit=3000, rng=None):
+    ys, xs = np.nonzero(mask)
+    pts = np.stack([xs, ys], axis=1).astype(np.float32)
+    if len(pts) > limit:
+        pts = pts[rng.choice(len(pts), limit, replace=False)]
+    return pts
+
+
+def transform(pts, M):
+    return cv2.perspectiveTransform(pts.reshape(-1, 1, 2), M).reshape(-1, 2)
+
+
+def in_box(pts, box):
+    x1, x2, y1, y2 = box
+    return (pts[:, 0] >= x1) & (pts[:, 0] < x2) & (pts[:, 1] >= y1) & (pts[:, 1] < y2)
+
+
+def run(trials, use_tesseract, seed):
+    rng = np.random.default_rng(seed)
+    reference, _ = synthetic_bp_display({"sys": "120", "dia": "80", "pulse": "72"}, rng)
+    localizer = DisplayLocalizer.calibrate(reference, BP_FIELDS, save=False)
+    config = merge_config({"rois": BP_FIELDS})
+    canonical_config = scale_config(config, localizer.scale)
+
+    fixed_px = sum((x2 - x1) * (min(y2, 480) - y1) for x1, x2, y1, y2 in BP_FIELDS.values())
+    canonical_px = sum((x2 - x1) * (y2 - y1) for x1, x2, y1, y2 in localizer.fields.values())
+    print(f"reference panel: {localizer.panel_box}   canonical image: {localizer.canonical_size}")
+    print(f"OCR input per frame: fixed ROIs {fixed_px} px, canonical fields {canonical_px} px "
+          f"({canonical_px / fixed_px:.0%})\n")
+
+    header = (f"{'offset':>6} {'rot':>4}  {'fixed ok':>8} {'local ok':>8} {'pulse fx':>8} {'pulse lc':>8} "
+              f"{'locked':>7} {'corner px':>9} {'loc ms p50':>10}")
+    if use_tesseract:
+        header += f" {'fixed ocr':>9} {'local ocr':>9}"
+    print(header)
+    print("-" * len(header))
+
+    loc_ms, warp_ms = [], []
+    totals = {"fixed": 0, "local": 0, "n": 0}
+    for offset in OFFSETS:
+        for rotation in ROTATIONS:
+            fixed_ok = local_ok = fixed_pulse = local_pulse = locked = n = 0
+            fixed_ocr = local_ocr = 0
+            corner_err, cell_ms = [], []
+            for _ in range(trials):
+                values = random_values(rng)
+                frame, masks = synthetic_bp_display(values, rng)
+                direction = rng.uniform(0, 2 * np.pi)
+                moved, _, A = perturb_frame(
+                    frame, dx=offset * np.cos(direction), dy=offset * np.sin(direction),
+                    angle=rotation * rng.choice([-1, 1]), scale=rng.uniform(0.97, 1.03),
+                    gain=rng.uniform(0.8, 1.2))
+                n += 1
+
+                localizer.reset()
+                gray = cv2.cvtColor(moved, cv2.COLOR_BGR2GRAY)
+                t0 = time.perf_counter()
+                ok = localizer.localize(gray)
+                cell_ms.append((time.perf_counter() - t0) * 1000)
+                locked += ok
+                if ok:
+                    t0 = time.perf_counter()
+                    fields = localizer.crop_fields(localizer.canonical(moved))
+                    warp_ms.append((time.perf_counter() - t0) * 1000)
+                    quads = localizer.field_quads()
+
+                ready_fixed, ready_local = {}, {}
+                for name, box in BP_FIELDS.items():
+                    pts = transform(ink_points(masks[name], rng=rng), A)
+                    # Ink moved out of the camera frame is lost for both methods
+                    visible = in_box(pts, (0, 640, 0, 480))
+                    ready_fixed[name] = (visible & in_box(pts, box)).mean() >= INK_RECALL
+                    ready_local[name] = False
+                    if ok:
+                        inside = in_box(transform(pts, localizer.M), localizer.fields[name])
+                        ready_local[name] = (visible & inside).mean() >= INK_RECALL
+                        x1, x2, y1, y2 = localizer.fields[name]
+                        true_rect = np.float32([[BP_FIELDS[name][0], BP_FIELDS[name][2]], [BP_FIELDS[name][1], BP_FIELDS[name][2]]])
+                        est = quads[name][:2]
+                        corner_err.append(float(np.abs(transform(true_rect, A) - est).max()))
+                    if use_tesseract:
+                        x1, x2, y1, y2 = box
+                        fixed_ocr += read_roi(moved[max(0, y1):y2, max(0, x1):x2], config)[0] == values[name]
+                        if ok:
+                            local_ocr += read_roi(fields[name], canonical_config)[0] == values[name]
+
+                fixed_ok += ready_fixed["sys"] and ready_fixed["dia"]
+                local_ok += ready_local["sys"] and ready_local["dia"]
+                fixed_pulse += ready_fixed["pulse"]
+                local_pulse += ready_local["pulse"]
+
+            loc_ms += cell_ms
+            totals["fixed"] += fixed_ok
+            totals["local"] += local_ok
+            totals["n"] += n
+            line = (f"{offset:>6} {rotation:>4}  {fixed_ok / n:8.0%} {local_ok / n:8.0%} "
+                    f"{fixed_pulse / n:8.0%} {local_pulse / n:8.0%} {locked / n:7.0%} "
+                    f"{np.median(corner_err) if corner_err else float('nan'):9.2f} {np.median(cell_ms):10.2f}")
+            if use_tesseract:
+                line += f" {fixed_ocr / (3 * n):9.0%} {local_ocr / (3 * n):9.0%}"
+            print(line)
+
+    print(f"\noverall OCR-ready frames (sys + dia): fixed {totals['fixed'] / totals['n']:.1%}, "
+          f"localized {totals['local'] / totals['n']:.1%}")
+    print(f"localization (once per session): p50 {np.percentile(loc_ms, 50):.2f} ms, "
+          f"p95 {np.percentile(loc_ms, 95):.2f} ms")
+    if warp_ms:
+        print(f"per-frame warp + crop: p50 {np.percentile(warp_ms, 50):.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=20, help="frames per offset / rotation cell")
+    parser.add_argument("--tesseract", action="store_true", help="also OCR the crops (needs tesseract + ssd model)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.trials, args.tesseract, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Cold-start time to the first served request, eager vs lazy device loading.
+
+Each run spawns a fresh interpreter, imports app.py and serves one request
+through the Flask test client. "eager" imports every device module before the
+first request, as the old top-level imports did; "lazy" is the registry default.
+On a machine without the Pi libraries the eager imports fail fast, so run
+this on the kiosk for representative numbers.
+
+Run from backend/:
+    python -m benchmarks.cold_start_bench --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+CHILD = r"""
+import json, sys, time
+t0 = float(sys.argv[1])
+import app
+if sys.argv[2] == "eager":
+    app.devices.warm_up(background=False)
+resp = app.app.test_client().get("/api/startup_report")
+t1 = time.time()
+print(json.dumps({"first_request_s": t1 - t0, "report": resp.get_json()}))
+"""
+
+
+def run_once(mode):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, repr(time.time()), mode],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    for mode in ("eager", "lazy"):
+        results = [run_once(mode) for _ in range(args.runs)]
+        times = [r["first_request_s"] * 1000 for r in results]
+        print(f"{mode:<6} first request: median {statistics.median(times):7.1f} ms  "
+              f"min {min(times):7.1f} ms  max {max(times):7.1f} ms")
+        for name, dev in results[-1]["report"]["devices"].items():
+            status = "ok" if dev["loaded"] else (dev["error"] or "not loaded")
+            print(f"    {name:<7} register {dev['register_ms']} ms  import {dev['import_ms']} ms  {status}")
+
+
+if __name__ == "__main__":
+    main()
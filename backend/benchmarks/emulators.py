@@ -0,0 +1,431 @@
+"""
+Hardware emulators for running the device code paths without a kiosk.
+"""
+import os
+import random
+import select
+import threading
+import time
+import tty
+from collections import deque
+
+import cv2
+import numpy as np
+
+from module.ir_thermal.thermal_protocol import RESP_HEAD, RESP_TAIL, NUM_CELLS
+
+
+def synthetic_ir_frame(ambient=28.0, face_temp=34.5, center=(8, 8), radius=4.0, rng=None):
+    """16x16 degC matrix with a warm blob standing in for a face."""
+    rng = rng or np.random.default_rng()
+    yy, xx = np.mgrid[0:16, 0:16]
+    dist = np.hypot(yy - center[0], xx - center[1])
+    frame = ambient + (face_temp - ambient) * np.clip(1.2 - dist / radius, 0, 1)
+    frame += rng.normal(0, 0.1, frame.shape)
+    return np.round(frame, 1)
+
+
+class ThermalSensorEmulator:
+    """
+    Serial-port stand-in for the IR array.
+
+    Implements the subset of the pyserial API used by the backend. Requests are
+    served FIFO; response bytes become readable at the pace of `baudrate` after
+    `latency` seconds, so pipelined requests overlap just like on the wire.
+    `garbage_rate` / `drop_rate` inject line noise before a response and
+    truncated responses respectively.
+    """
+
+    def __init__(self, baudrate=115200, latency=0.002, timeout=1.0,
+                 garbage_rate=0.0, drop_rate=0.0, seed=0):
+        self.baudrate = baudrate
+        self.latency = latency
+        self.timeout = timeout
+        self.garbage_rate = garbage_rate
+        self.drop_rate = drop_rate
+        self.is_open = True
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+        self.frame = synthetic_ir_frame(rng=self.np_rng)
+
+        self._segments = deque()   # [start_time, byte_time, data, consumed]
+        self._line_free_at = 0.0
+        self.requests = 0
+
+    @property
+    def byte_time(self):
+        return 10.0 / self.baudrate   # 8N1
+
+    def _registers(self):
+        # flat index k of the matrix is register k
+        regs = np.zeros(NUM_CELLS + 4, dtype='>u2')
+        regs[:NUM_CELLS] = np.round(self.frame.flatten() * 10).astype(np.uint16)
+        return regs
+
+    def write(self, data):
+        data = bytes(data)
+        now = time.perf_counter()
+        if len(data) != 6 or data[0] != 0x11 or data[-1] != 0x98:
+            return len(data)
+        start_address = (data[1] << 8) | data[2]
+        num_registers = (data[3] << 8) | data[4]
+        self.requests += 1
+
+        payload = self._registers()[start_address:start_address + num_registers].tobytes()
+        response = RESP_HEAD + payload + RESP_TAIL
+        if self.rng.random() < self.garbage_rate:
+            response = bytes(self.rng.randrange(256) for _ in range(self.rng.randrange(1, 24))) + response
+        if self.rng.random() < self.drop_rate:
+            cut = self.rng.randrange(1, len(response))
+            response = response[:cut]
+
+        request_done = now + len(data) * self.byte_time
+        start = max(request_done + self.latency, self._line_free_at)
+        self._segments.append([start, self.byte_time, response, 0])
+        self._line_free_at = start + len(response) * self.byte_time
+        return len(data)
+
+    def _ready(self, now):
+        ready = 0
+        for start, byte_time, data, consumed in self._segments:
+            arrived = min(len(data), int((now - start) / byte_time)) if now > start else 0
+            ready += max(0, arrived - consumed)
+            if arrived < len(data):
+                break
+        return ready
+
+    def _when(self, count):
+        """Time at which `count` more bytes are readable."""
+        for start, byte_time, data, consumed in self._segments:
+            left = len(data) - consumed
+            if count <= left:
+                return start + (consumed + count) * byte_time
+            count -= left
+        return None
+
+    @property
+    def in_waiting(self):
+        return self._ready(time.perf_counter())
+
+    def read(self, size=1):
+        deadline = time.perf_counter() + self.timeout
+        when = self._when(size)
+        if when is None or when > deadline:
+            wait_until = deadline
+        else:
+            wait_until = when
+        delay = wait_until - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        take = min(size, self._ready(time.perf_counter()))
+        out = bytearray()
+        while take and self._segments:
+            seg = self._segments[0]
+            n = min(take, len(seg[2]) - seg[3])
+            out += seg[2][seg[3]:seg[3] + n]
+            seg[3] += n
+            take -= n
+            if seg[3] >= len(seg[2]):
+                self._segments.popleft()
+        return bytes(out)
+
+    def reset_input_buffer(self):
+        now = time.perf_counter()
+        ready = self._ready(now)
+        # Everything already on the wire is discarded, later responses stay queued
+        while ready and self._segments:
+            seg = self._segments[0]
+            n = min(ready, len(seg[2]) - seg[3])
+            seg[3] += n
+            ready -= n
+            if seg[3] >= len(seg[2]):
+                self._segments.popleft()
+
+    def close(self):
+        self.is_open = False
+
+
+# Segments a..g of a seven-segment digit
+SEVEN_SEGMENTS = {
+    "0": "abcdef", "1": "bc", "2": "abdeg", "3": "abcdg", "4": "bcfg",
+    "5": "acdfg", "6": "acdefg", "7": "abc", "8": "abcdefg", "9": "abcdfg",
+}
+
+# Field boxes of the synthetic monitor, x1, x2, y1, y2 on the 640x480 frame
+BP_FIELDS = {"sys": (210, 450, 110, 270), "dia": (230, 450, 270, 440), "pulse": (230, 400, 440, 540)}
+
+
+def _draw_digit(img, digit, x, y, w, h, thickness, color):
+    # Segment endpoints relative to the digit box
+    half = h // 2
+    ends = {
+        "a": ((0, 0), (w, 0)), "b": ((w, 0), (w, half)), "c": ((w, half), (w, h)),
+        "d": ((0, h), (w, h)), "e": ((0, half), (0, h)), "f": ((0, 0), (0, half)),
+        "g": ((0, half), (w, half)),
+    }
+    for seg in SEVEN_SEGMENTS[digit]:
+        (ax, ay), (bx, by) = ends[seg]
+        cv2.line(img, (x + ax, y + ay), (x + bx, y + by), color, thickness)
+
+
+def synthetic_bp_display(values=None, rng=None):
+    """
+    640x480 BGR frame of a BP monitor LCD in the camera's (flipped) orientation,
+    laid out like the kiosk camera sees it, plus one uint8 ink mask per field.
+    """
+    rng = rng or np.random.default_rng()
+    values = values or {"sys": "135", "dia": "83", "pulse": "96"}
+
+    frame = np.full((480, 640, 3), (170, 235, 170), dtype=np.uint8)
+    # Housing: bezel, buttons and mounting hardware around the panel
+    cv2.rectangle(frame, (110, 80), (570, 479), (215, 250, 215), -1)
+    cv2.rectangle(frame, (120, 90), (560, 479), (40, 70, 40), 3)
+    cv2.circle(frame, (30, 130), 28, (40, 40, 200), -1)
+    cv2.rectangle(frame, (60, 60), (95, 479), (40, 60, 40), -1)
+    cv2.rectangle(frame, (585, 40), (625, 200), (120, 160, 120), -1)
+
+    # LCD panel and fixed icons
+    cv2.rectangle(frame, (135, 100), (545, 479), (150, 200, 150), -1)
+    cv2.fillPoly(frame, [np.int32([[478, 122], [478, 140], [505, 131]])], (30, 50, 30))
+    cv2.circle(frame, (480, 205), 12, (30, 50, 30), 3)
+    cv2.circle(frame, (500, 205), 12, (30, 50, 30), 3)
+    cv2.putText(frame, "AM", (410, 470), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (30, 50, 30), 2)
+    cv2.putText(frame, "SYS", (150, 130), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (30, 50, 30), 1)
+    cv2.putText(frame, "DIA", (150, 290), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (30, 50, 30), 1)
+    cv2.putText(frame, "mmHg", (460, 400), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (30, 50, 30), 1)
+
+    masks = {}
+    for name, (x1, x2, y1, y2) in BP_FIELDS.items():
+        mask = np.zeros(frame.shape[:2], dtype=np.uint8)
+        text = values[name]
+        y2 = min(y2, 480)
+        # Digits sit ~15 px inside the field box, like on the real monitor
+        h = int((y2 - y1) * 0.65)
+        step = (x2 - x1 - 30) // 3
+        w = min(int(h * 0.5), step - 16)
+        top = y1 + (y2 - y1 - h) // 2
+        x1 += 15
+        for i, digit in enumerate(text.rjust(3)):
+            if digit != " ":
+                _draw_digit(mask, digit, x1 + i * step + (step - w) // 2, top, w, h, max(4, h // 9), 255)
+        frame[mask > 0] = (35, 60, 35)
+        masks[name] = mask
+
+    noise = rng.normal(0, 4, frame.shape)
+    frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+    return frame, masks
+
+
+def perturb_frame(frame, dx=0.0, dy=0.0, angle=0.0, scale=1.0, gain=1.0, masks=None):
+    """Move the monitor in front of the camera: rotate about the frame centre, scale and shift."""
+    h, w = frame.shape[:2]
+    A = cv2.getRotationMatrix2D((w / 2, h / 2), angle, scale)
+    A[:, 2] += (dx, dy)
+    moved = cv2.warpAffine(frame, A, (w, h), borderMode=cv2.BORDER_REPLICATE)
+    moved = np.clip(moved.astype(np.float32) * gain, 0, 255).astype(np.uint8)
+    moved_masks = {name: cv2.warpAffine(m, A, (w, h), flags=cv2.INTER_NEAREST)
+                   for name, m in (masks or {}).items()}
+    return moved, moved_masks, np.vstack([A, [0, 0, 1]])
+
+
+class FakeCaptureRequest:
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.released = False
+
+    def make_array(self, name):
+        return self.arrays[name]
+
+    def release(self):
+        self.released = True
+
+
+class FakePicamera2:
+    """
+    Picamera2 stand-in with a main RGB888 (BGR in memory) and an optional lores
+    YUV420 stream, for module.camera.dual_stream.DualStreamCamera. Frames are
+    rendered from `scene` (default: a synthetic face-like blob drifting across
+    the view), delivered upside down like the kiosk camera; the lores image is
+    the ISP scaling done with cv2.resize, in I420 layout with `stride` padding.
+    """
+
+    def __init__(self, scene=None, fps=30.0, stride_align=64, seed=0):
+        self.scene = scene
+        self.frame_time = 1.0 / fps if fps else 0.0
+        self.stride_align = stride_align
+        self.rng = np.random.default_rng(seed)
+        self.config = None
+        self.frames = 0
+        self.running = False
+        self.closed = False
+        self._next = 0.0
+
+    def create_preview_configuration(self, main=None, lores=None, **kwargs):
+        config = {"main": dict(main or {"format": "RGB888", "size": (640, 480)})}
+        if lores is not None:
+            config["lores"] = dict(lores)
+        return config
+
+    def align_configuration(self, config):
+        if "lores" in config:
+            w, h = config["lores"]["size"]
+            config["lores"]["size"] = (w - w % 2, h - h % 2)
+
+    def configure(self, config):
+        self.config = config
+
+    def start(self):
+        self.running = True
+        self._next = time.perf_counter()
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        self.closed = True
+
+    def _render(self):
+        w, h = self.config["main"]["size"]
+        if self.scene is not None:
+            frame = cv2.resize(self.scene, (w, h))
+        else:
+            frame = np.full((h, w, 3), 95, np.uint8)
+            cx = int(w / 2 + w / 6 * np.sin(self.frames / 15.0))
+            cv2.ellipse(frame, (cx, h // 2), (w // 8, h // 5), 0, 0, 360, (150, 170, 205), -1)
+            cv2.circle(frame, (cx - w // 24, h // 2 + h // 20), 6, (40, 40, 40), -1)
+            cv2.circle(frame, (cx + w // 24, h // 2 + h // 20), 6, (40, 40, 40), -1)
+        frame = cv2.add(frame, self.rng.integers(0, 6, frame.shape, dtype=np.uint8))
+        return cv2.flip(frame, 0)
+
+    def _lores(self, main):
+        w, h = self.config["lores"]["size"]
+        small = cv2.resize(main, (w, h), interpolation=cv2.INTER_AREA)
+        i420 = cv2.cvtColor(small, cv2.COLOR_BGR2YUV_I420)        # (h * 3 / 2, w)
+        stride = -(-w // self.stride_align) * self.stride_align
+        if stride == w:
+            return i420
+        padded = np.zeros((i420.shape[0], stride), np.uint8)
+        padded[:, :w] = i420
+        return padded
+
+    def _wait_frame(self):
+        if self.frame_time:
+            delay = self._next - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self._next = max(self._next + self.frame_time, time.perf_counter())
+        self.frames += 1
+
+    def capture_array(self, name="main"):
+        self._wait_frame()
+        main = self._render()
+        return main if name == "main" else self._lores(main)
+
+    def capture_request(self):
+        self._wait_frame()
+        main = self._render()
+        arrays = {"main": main}
+        if "lores" in self.config:
+            arrays["lores"] = self._lores(main)
+        return FakeCaptureRequest(arrays)
+
+
+class PtySerialDevice:
+    """
+    A serial device on a pseudo-terminal, for code that opens real port paths
+    (serial_discovery). The slave is published as `alias` (a ttyUSBn-style
+    symlink) and, if `by_id_dir` is given, as by_id_dir/`by_id` like udev does.
+    unplug() removes both links and the pty; plug(alias) brings the same device
+    back on a new pty, possibly under another ttyUSBn name.
+
+    kind: "irt"     answers register reads like ThermalSensorEmulator
+          "bp"      sends a state token every `token_every` s (None: silent)
+          "drawer"  answers CHECK_DISTANCE with "No Object Detected"
+    """
+
+    def __init__(self, kind, alias, by_id=None, by_id_dir=None, token_every=0.3):
+        self.kind = kind
+        self.by_id = by_id
+        self.by_id_dir = by_id_dir
+        self.token_every = token_every
+        self.sensor = ThermalSensorEmulator() if kind == "irt" else None
+        self.alias = None
+        self.master = self.slave = None
+        self._stop = None
+        self._thread = None
+        self.plug(alias)
+
+    @property
+    def links(self):
+        links = [self.alias]
+        if self.by_id and self.by_id_dir:
+            links.append(os.path.join(self.by_id_dir, self.by_id))
+        return links
+
+    def plug(self, alias=None):
+        self.alias = alias or self.alias
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        os.set_blocking(self.master, False)
+        self.slave = os.ttyname(slave)
+        # Like a USB adapter, the device does not hold its own port open (serial_discovery skips held ports)
+        os.close(slave)
+        for link in self.links:
+            os.makedirs(os.path.dirname(link), exist_ok=True)
+            if os.path.lexists(link):
+                os.remove(link)
+            os.symlink(self.slave, link)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, args=(self.master, self._stop), daemon=True)
+        self._thread.start()
+
+    def unplug(self):
+        for link in self.links:
+            if os.path.lexists(link):
+                os.remove(link)
+        self._stop.set()
+        self._thread.join()
+        try:
+            os.close(self.master)
+        except OSError:
+            pass
+
+    def _send(self, fd, data):
+        try:
+            os.write(fd, data)
+        except (BlockingIOError, OSError):
+            pass        # nobody reading: the pty buffer is full, like bytes lost on a cable
+
+    def _serve(self, fd, stop):
+        tokens = [b"OFF..", b"ON ..", b"CHK..", b"WAI..", b"FIT..", b"INF.."]
+        next_token = time.monotonic()
+        line = b""
+        while not stop.is_set():
+            readable, _, _ = select.select([fd], [], [], 0.02)
+            data = b""
+            if readable:
+                try:
+                    data = os.read(fd, 1024)
+                except BlockingIOError:
+                    data = b""
+                except OSError:
+                    data = b""
+                    stop.wait(0.02)     # EIO: nobody has the port open
+            if self.kind == "irt" and data:
+                for i in range(0, len(data) - 5):
+                    req = data[i:i + 6]
+                    if req[0] == 0x11 and req[5] == 0x98:
+                        start, count = (req[1] << 8) | req[2], (req[3] << 8) | req[4]
+                        payload = self.sensor._registers()[start:start + count].tobytes()
+                        self._send(fd, RESP_HEAD + payload + RESP_TAIL)
+                        break
+            elif self.kind == "drawer" and data:
+                line += data
+                if b"\n" in line:
+                    if b"CHECK_DISTANCE" in line:
+                        self._send(fd, b"No Object Detected\r\n")
+                    line = b""
+            elif self.kind == "bp" and self.token_every and time.monotonic() >= next_token:
+                self._send(fd, random.choice(tokens))
+                next_token = time.monotonic() + self.token_every
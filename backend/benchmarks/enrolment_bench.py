@@ -0,0 +1,214 @@
+"""
+Enrolment duration and verification accuracy: quality-selected in-memory
+enrolment (module/face_recognition/enrolment) against the former
+stream_face_collection schedule (a crop every 1 s cooldown until 10 crops,
+each written to PNG and read back before embedding).
+
+Both consume the same frame sequence, played at --fps:
+
+    new     CropSelector over every detected face, stops once K good crops are kept
+    old     the first detected face after each 1 s cooldown, 10 crops, PNG round trip
+
+Dataset mode (--dataset DIR): DIR/<person_id>/*.jpg, frames of one person in
+capture order. The first --enrol-frames frames are the enrolment stream, the
+rest are probes. Faces are found with the "enrol" detector (or --detector).
+Accuracy is reported with the available embedder (SFace / Facenet) at its
+threshold: genuine accept rate (own probes) and false accept rate (every
+other person's probes).
+
+--synthetic runs on generated frames with a known face box and random
+defocus and motion blur. It reports duration and the sharpness of the chosen
+crops. Accuracy is n/a because the frames contain no identities.
+
+Run from backend/:
+    python -m benchmarks.enrolment_bench --synthetic
+    python -m benchmarks.enrolment_bench --dataset /path/to/people --fps 15
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from module.face_detection.detectors import create_detector, load_detector_config
+from module.face_recognition.enrolment import CropSelector, crop_quality, DEFAULT_ENROL_CONFIG
+from module.face_recognition.face_store import FaceStore, create_embedder
+from utils import calculate_centered_roi
+
+OLD_CROPS = 10
+OLD_COOLDOWN = 1.0
+OLD_CROP_SIZE = (140, 180)
+ROI = calculate_centered_roi(640, 480)
+
+
+def synthetic_sequence(n, seed=0):
+    """[(roi_bgr, box)] of a face-like pattern with random blur, ROI-sized."""
+    rng = np.random.default_rng(seed)
+    w, h = ROI[2], ROI[3]
+    frames = []
+    for i in range(n):
+        roi = np.full((h, w, 3), 90, np.uint8)
+        cx, cy = w // 2 + int(30 * np.sin(i / 10.0)), h // 2
+        yaw = int(12 * np.sin(i / 23.0))            # features drift sideways as the head turns
+        fw, fh = 170, 210
+        cv2.ellipse(roi, (cx, cy), (fw // 2, fh // 2), 0, 0, 360, (150, 170, 205), -1)
+        for dx in (-35, 35):
+            cv2.ellipse(roi, (cx + dx + yaw, cy - 25), (18, 9), 0, 0, 360, (40, 40, 40), -1)
+            cv2.line(roi, (cx + dx + yaw - 22, cy - 45), (cx + dx + yaw + 22, cy - 45), (60, 60, 70), 4)
+        cv2.line(roi, (cx + yaw, cy - 10), (cx + yaw - 6, cy + 25), (110, 120, 160), 3)
+        cv2.ellipse(roi, (cx + yaw, cy + 55), (35, 10 + i % 5), 0, 0, 180, (70, 60, 140), 4)
+        roi = cv2.add(roi, rng.integers(0, 8, roi.shape, dtype=np.uint8))
+        blur = rng.choice(["sharp", "defocus", "motion"], p=[0.35, 0.35, 0.3])
+        if blur == "defocus":
+            roi = cv2.GaussianBlur(roi, (0, 0), float(rng.uniform(1.5, 4)))
+        elif blur == "motion":
+            k = int(rng.integers(7, 17))
+            kernel = np.zeros((k, k), np.float32)
+            kernel[k // 2, :] = 1.0 / k
+            roi = cv2.filter2D(roi, -1, kernel)
+        frames.append((roi, (cx - fw // 2, cy - fh // 2, fw, fh)))
+    return frames
+
+
+def detected_sequence(paths, detector):
+    frames = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        if image.shape[:2] == (480, 640):
+            x, y, w, h = ROI
+            image = image[y:y + h, x:x + w]
+        faces = detector.detect(image)
+        frames.append((image, tuple(int(v) for v in faces[0]) if len(faces) else None))
+    return frames
+
+
+def _crop(roi, box):
+    x, y, w, h = box
+    x, y = max(0, x), max(0, y)
+    return roi[y:y + h, x:x + w]
+
+
+def enrol_new(frames, fps, k):
+    """(crops, qualities, simulated seconds, frames used)"""
+    selector = CropSelector({"k": k})
+    period = 1.0 / fps
+    elapsed = 0.0
+    for i, (roi, box) in enumerate(frames):
+        t0 = time.perf_counter()
+        if box is not None:
+            crop = _crop(roi, box)
+            selector.offer(crop, cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), box, roi.shape[1])
+        elapsed += max(period, time.perf_counter() - t0)
+        if selector.done():
+            return selector.crops(), selector.qualities(), elapsed, i + 1
+    return selector.crops(), selector.qualities(), elapsed, len(frames)
+
+
+def enrol_old(frames, fps, folder):
+    """Cooldown schedule with the PNG round trip; same return shape as enrol_new."""
+    period = 1.0 / fps
+    elapsed, last, crops, paths = 0.0, None, [], []
+    for i, (roi, box) in enumerate(frames):
+        t0 = time.perf_counter()
+        if box is not None and (last is None or elapsed - last >= OLD_COOLDOWN):
+            crop = cv2.resize(_crop(roi, box), OLD_CROP_SIZE)
+            path = os.path.join(folder, f"collect_face_{len(paths) + 1}.png")
+            cv2.imwrite(path, crop)
+            paths.append(path)
+            last = elapsed
+        elapsed += max(period, time.perf_counter() - t0)
+        if len(paths) >= OLD_CROPS:
+            break
+    t0 = time.perf_counter()
+    crops = [cv2.imread(path) for path in paths]
+    elapsed += time.perf_counter() - t0
+    qualities = [crop_quality(cv2.cvtColor(c, cv2.COLOR_BGR2GRAY), (0, 0, c.shape[1], c.shape[0]), ROI[2])
+                 for c in crops]
+    return crops, qualities, elapsed, i + 1
+
+
+def accuracy(store, embedder, probes):
+    """probes: {person_id: [crop]} -> (genuine accept rate, false accept rate)"""
+    genuine = impostor = accepted = false_accepts = 0
+    for person_id, crops in probes.items():
+        if not crops:
+            continue
+        for embedding in embedder.embed(crops):
+            ok, matched, _ = store.verify(embedding, embedder.threshold)
+            if person_id in store.ids:
+                genuine += 1
+                accepted += ok and matched == person_id
+            # every other enrolled person is an impostor claim for this probe
+            for other in set(store.ids.tolist()) - {person_id}:
+                impostor += 1
+                mask = store.ids == other
+                false_accepts += float(np.max(store.embeddings[mask] @ embedding)) >= embedder.threshold
+    return accepted / max(1, genuine), false_accepts / max(1, impostor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset")
+    parser.add_argument("--synthetic", type=int, nargs="?", const=5, default=None, help="N synthetic people")
+    parser.add_argument("--frames", type=int, default=300, help="synthetic frames per person")
+    parser.add_argument("--enrol-frames", type=int, default=0, help="dataset frames used for enrolment (default half)")
+    parser.add_argument("--fps", type=float, default=15.0)
+    parser.add_argument("--k", type=int, default=DEFAULT_ENROL_CONFIG["k"])
+    parser.add_argument("--detector", help="detector spec (default: the 'enrol' pipeline config)")
+    args = parser.parse_args()
+    if not args.dataset and args.synthetic is None:
+        parser.error("give --dataset DIR or --synthetic [N]")
+    cv2.setNumThreads(1)
+
+    people, probes = {}, {}
+    if args.dataset:
+        detector = create_detector(args.detector or load_detector_config()["enrol"])
+        for person in sorted(os.listdir(args.dataset)):
+            folder = os.path.join(args.dataset, person)
+            if not os.path.isdir(folder):
+                continue
+            paths = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith((".jpg", ".png")))
+            split = args.enrol_frames or len(paths) // 2
+            people[person] = detected_sequence(paths[:split], detector)
+            probes[person] = [_crop(roi, box) for roi, box in detected_sequence(paths[split:], detector) if box]
+    else:
+        for p in range(args.synthetic):
+            people[f"synthetic_{p}"] = synthetic_sequence(args.frames, seed=p)
+
+    embedder = None
+    try:
+        embedder = create_embedder()
+    except Exception as e:
+        print(f"accuracy n/a: {e}\n")
+
+    print(f"{len(people)} people, {args.fps:.0f} fps, K={args.k} (new) vs {OLD_CROPS} crops / {OLD_COOLDOWN:.0f}s cooldown (old)\n")
+    print(f"{'method':<6} {'duration s':>10} {'frames':>7} {'crops':>6} {'sharpness':>10} {'score':>6} {'GAR':>6} {'FAR':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for method in ("old", "new"):
+            store = FaceStore(os.path.join(tmp, f"{method}.npz"))
+            durations, used, counts, sharp, scores = [], [], [], [], []
+            for person, frames in people.items():
+                if method == "new":
+                    crops, qualities, seconds, n = enrol_new(frames, args.fps, args.k)
+                else:
+                    crops, qualities, seconds, n = enrol_old(frames, args.fps, tmp)
+                durations.append(seconds)
+                used.append(n)
+                counts.append(len(crops))
+                sharp += [q["sharpness"] for q in qualities]
+                scores += [q["score"] for q in qualities]
+                if embedder is not None and crops:
+                    store.add(person, embedder.embed(crops), model=embedder.name)
+            gar, far = accuracy(store, embedder, probes) if embedder is not None and probes else (None, None)
+            fmt = lambda v: "n/a" if v is None else f"{v:.3f}"
+            print(f"{method:<6} {np.median(durations):>10.2f} {np.median(used):>7.0f} {np.median(counts):>6.0f} "
+                  f"{np.mean(sharp) if sharp else 0:>10.1f} {np.mean(scores) if scores else 0:>6.3f} "
+                  f"{fmt(gar):>6} {fmt(far):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Latency and accuracy of the face detector backends (module/face_detection)
+over a labelled frame set, to pick the fastest detector that is good enough.
+
+Dataset: a directory with images and a labels.csv of `file,x,y,w,h` rows, one
+row per face; a file listed with empty x,y,w,h has no face (negative frame).
+Record frames at the kiosk (the IRT ROI crops, 448x336) and label them, or
+point it at any labelled face set.
+
+A detection matches a labelled face at IoU >= --iou (greedy, largest first).
+Reported per backend:
+
+    p50/p95 ms   detect() wall time per frame, single OpenCV thread
+    recall       matched faces / labelled faces
+    precision    matched detections / detections
+    fp/frame     unmatched detections per frame
+
+Backends whose model is not installed (see detectors.MODEL_SOURCES) are
+skipped. --synthetic runs on generated face-free frames only (latency and
+false positives; recall n/a).
+
+Run from backend/:
+    python -m benchmarks.face_detector_bench --dataset /path/to/frames
+    python -m benchmarks.face_detector_bench --synthetic --specs haar lbp haar@0.5
+"""
+import argparse
+import csv
+import os
+import time
+
+import cv2
+import numpy as np
+
+from module.face_detection.detectors import create_detector
+
+DEFAULT_SPECS = ["haar", "haar@0.5", "lbp", "lbp@0.5", "yunet", "yunet@0.5", "ssd"]
+ROI_SIZE = (448, 336)
+
+
+def load_dataset(path):
+    """[(image, [(x, y, w, h), ...]), ...] from `path`/labels.csv."""
+    boxes = {}
+    with open(os.path.join(path, "labels.csv"), newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0] in ("file", "") or row[0].startswith("#"):
+                continue
+            faces = boxes.setdefault(row[0], [])
+            if len(row) >= 5 and all(v.strip() for v in row[1:5]):
+                faces.append(tuple(int(float(v)) for v in row[1:5]))
+    frames = []
+    for name, faces in boxes.items():
+        image = cv2.imread(os.path.join(path, name))
+        if image is None:
+            print(f"skipping unreadable {name}")
+            continue
+        frames.append((image, faces))
+    return frames
+
+
+def synthetic_frames(n, seed=0):
+    """Face-free ROI-sized frames: gradients, blobs and text-like edges."""
+    rng = np.random.default_rng(seed)
+    w, h = ROI_SIZE
+    frames = []
+    for _ in range(n):
+        image = np.tile(np.linspace(40, 200, w, dtype=np.uint8), (h, 1))
+        image = cv2.merge([image, np.flipud(image), image])
+        for _ in range(6):
+            center = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+            color = tuple(int(c) for c in rng.integers(0, 255, 3))
+            cv2.ellipse(image, center, (int(rng.integers(10, 80)), int(rng.integers(10, 80))),
+                        float(rng.integers(0, 180)), 0, 360, color, -1)
+        cv2.putText(image, "120/80", (20, h - 30), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 3)
+        image = cv2.add(image, rng.integers(0, 12, image.shape, dtype=np.uint8))
+        frames.append((image, []))
+    return frames
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+def match(detections, faces, threshold):
+    """Number of labelled faces matched by a distinct detection."""
+    free = list(faces)
+    matched = 0
+    for det in detections:
+        best = max(free, key=lambda face: iou(det, face), default=None)
+        if best is not None and iou(det, best) >= threshold:
+            free.remove(best)
+            matched += 1
+    return matched
+
+
+def bench(detector, frames, threshold, warmup=3):
+    for image, _ in frames[:warmup]:
+        detector.detect(image)
+    times, n_faces, n_det, n_match = [], 0, 0, 0
+    for image, faces in frames:
+        t0 = time.perf_counter()
+        detections = detector.detect(image)
+        times.append(time.perf_counter() - t0)
+        n_faces += len(faces)
+        n_det += len(detections)
+        n_match += match([tuple(d) for d in detections], faces, threshold)
+    ms = np.array(times) * 1000
+    return {
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+        "recall": n_match / n_faces if n_faces else None,
+        "precision": n_match / n_det if n_det else None,
+        "fp_per_frame": (n_det - n_match) / len(frames),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", help="directory with labels.csv")
+    parser.add_argument("--synthetic", type=int, nargs="?", const=200, default=None,
+                        help="use N generated face-free frames instead of a dataset")
+    parser.add_argument("--specs", nargs="+", default=DEFAULT_SPECS, help="backend[@scale] per run")
+    parser.add_argument("--iou", type=float, default=0.5)
+    args = parser.parse_args()
+    if not args.dataset and args.synthetic is None:
+        parser.error("give --dataset DIR or --synthetic [N]")
+    cv2.setNumThreads(1)
+
+    frames = load_dataset(args.dataset) if args.dataset else synthetic_frames(args.synthetic)
+    n_faces = sum(len(faces) for _, faces in frames)
+    print(f"{len(frames)} frames, {n_faces} labelled faces, IoU >= {args.iou}\n")
+    print(f"{'detector':<12} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7} {'precision':>9} {'fp/frame':>9}")
+
+    fmt = lambda v: "n/a" if v is None else f"{v:.3f}"
+    for spec in args.specs:
+        try:
+            detector = create_detector(spec)
+        except Exception as e:
+            print(f"{spec:<12} skipped: {e}")
+            continue
+        r = bench(detector, frames, args.iou)
+        print(f"{spec:<12} {r['p50']:>8.2f} {r['p95']:>8.2f} {fmt(r['recall']):>7} {fmt(r['precision']):>9} "
+              f"{r['fp_per_frame']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
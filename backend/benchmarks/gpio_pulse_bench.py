@@ -0,0 +1,90 @@
+"""
+Relay pulse timing accuracy and BP state-loop latency on the in-memory GPIO backend.
+
+- pulse timing: every recorded edge is compared with its planned time
+- state loop: time spent inside the relay call per "OFF.." / "WAI.." state,
+  for the old blocking HIGH-sleep-LOW-sleep-HIGH sequence and for GPIOService
+
+Run from backend/:
+    python -m benchmarks.gpio_pulse_bench
+"""
+import argparse
+import time
+
+import numpy as np
+
+from module.blood_pressure.gpio_service import GPIOService, MemoryGPIOBackend, HIGH, RELAY_PRESS
+
+
+def scaled(steps, scale):
+    return [(level, hold * scale) for level, hold in steps]
+
+
+def blocking_relay(backend, pin, steps):
+    """What relay_control used to do inside the state loop."""
+    for level, hold in steps:
+        backend.output(pin, level)
+        if hold:
+            time.sleep(hold)
+
+
+def timing_accuracy(pulses, scale):
+    backend = MemoryGPIOBackend()
+    service = GPIOService(backend)
+    service.setup_output(17, HIGH)
+    steps = scaled(RELAY_PRESS, scale)
+
+    handles = [service.pulse(17, steps) for _ in range(pulses)]
+    handles[-1].wait()
+
+    # Expected edges: pulses run back to back, each edge at start + cumulative hold
+    edges = [t for t, pin, _ in backend.events[1:] if pin == 17]
+    start = handles[0].started_at
+    expected, t = [], start
+    for _ in range(pulses):
+        for _, hold in steps:
+            expected.append(t)
+            t += hold
+    errors = (np.asarray(edges) - np.asarray(expected)) * 1000
+    return errors
+
+
+def state_loop_latency(states, scale, scheduled):
+    backend = MemoryGPIOBackend()
+    service = GPIOService(backend)
+    for pin in (17, 18):
+        service.setup_output(pin, HIGH)
+    steps = scaled(RELAY_PRESS, scale)
+
+    costs = []
+    for i in range(states):
+        pin = 17 if i % 2 == 0 else 18
+        t0 = time.perf_counter()
+        if scheduled:
+            service.pulse(pin, steps)
+        else:
+            blocking_relay(backend, pin, steps)
+        costs.append((time.perf_counter() - t0) * 1000)
+    service.wait_idle()
+    return np.asarray(costs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pulses", type=int, default=20)
+    parser.add_argument("--scale", type=float, default=0.1,
+                        help="shrink the 0.5 s holds to keep the run short")
+    args = parser.parse_args()
+
+    errors = timing_accuracy(args.pulses, args.scale)
+    print(f"pulse edges: {len(errors)}  error mean={errors.mean():.3f} ms  "
+          f"p99={np.percentile(np.abs(errors), 99):.3f} ms  max={np.abs(errors).max():.3f} ms")
+
+    for name, scheduled in (("blocking relay_control", False), ("GPIOService.pulse", True)):
+        costs = state_loop_latency(args.pulses, args.scale, scheduled)
+        print(f"{name:<24} state-loop stall per relay state: p50={np.percentile(costs, 50):8.3f} ms  "
+              f"max={costs.max():8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Replay evaluation of IRT session stopping rules.
+
+Compares the original fixed-15 mean against StreamingTempEstimator on replayed
+sessions of calibrated readings and reports session duration and estimate error.
+
+Run from backend/:
+    python -m benchmarks.irt_stopping_eval
+    python -m benchmarks.irt_stopping_eval --replay sessions.csv   # columns: session,value[,true_temp]
+"""
+import argparse
+import csv
+from collections import OrderedDict
+
+import numpy as np
+
+from module.ir_thermal.temp_estimator import StreamingTempEstimator
+
+
+def synthetic_sessions(n_sessions=500, length=60, seed=0):
+    """Steady, noisy and outlier-heavy sessions around a known true temperature."""
+    rng = np.random.default_rng(seed)
+    sessions = []
+    for i in range(n_sessions):
+        true_temp = rng.uniform(36.0, 38.0)
+        kind = i % 3
+        if kind == 0:      # steady subject
+            noise = rng.normal(0, 0.08, length)
+        elif kind == 1:    # fidgeting subject
+            noise = rng.normal(0, 0.35, length)
+        else:              # occasional hair / hand / background in the patch
+            noise = rng.normal(0, 0.15, length)
+            spikes = rng.random(length) < 0.12
+            noise[spikes] += rng.choice([-2.5, 1.5], spikes.sum())
+        readings = np.round(true_temp + noise, 1)
+        sessions.append((true_temp, readings.tolist()))
+    return sessions
+
+
+def load_replay(path):
+    """Read session,value[,true_temp] rows. Without true_temp the mean of all readings is used."""
+    grouped = OrderedDict()
+    truth = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            grouped.setdefault(row["session"], []).append(float(row["value"]))
+            if row.get("true_temp"):
+                truth[row["session"]] = float(row["true_temp"])
+    return [(truth.get(k, float(np.mean(v))), v) for k, v in grouped.items()]
+
+
+def run_fixed(readings, n=15):
+    used = readings[:n]
+    return round(sum(used) / len(used), 1), len(used)
+
+
+def run_adaptive(readings, **kwargs):
+    estimator = StreamingTempEstimator(**kwargs)
+    for value in readings:
+        estimator.update(value)
+        if estimator.is_done():
+            break
+    return estimator.result(), estimator.observed
+
+
+def summarize(name, errors, counts, frame_period):
+    errors = np.abs(np.asarray(errors))
+    counts = np.asarray(counts)
+    print(f"{name:<10} samples mean={counts.mean():5.1f}  duration mean={counts.mean() * frame_period:5.2f}s "
+          f"p95={np.percentile(counts, 95) * frame_period:5.2f}s  "
+          f"|err| mean={errors.mean():.3f}  p95={np.percentile(errors, 95):.3f}  max={errors.max():.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replay", help="CSV of recorded calibrated readings")
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--frame-period", type=float, default=0.25,
+                        help="seconds per IRT reading in irt_detect_cam")
+    parser.add_argument("--min-samples", type=int, default=5)
+    parser.add_argument("--max-samples", type=int, default=30)
+    parser.add_argument("--ci-tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    sessions = load_replay(args.replay) if args.replay else synthetic_sessions(args.sessions)
+
+    fixed_err, fixed_n, adapt_err, adapt_n = [], [], [], []
+    for true_temp, readings in sessions:
+        result, n = run_fixed(readings)
+        fixed_err.append(result - true_temp)
+        fixed_n.append(n)
+
+        result, n = run_adaptive(
+            readings,
+            min_samples=args.min_samples,
+            max_samples=args.max_samples,
+            ci_tolerance=args.ci_tolerance
+        )
+        adapt_err.append(result - true_temp)
+        adapt_n.append(n)
+
+    print(f"{len(sessions)} sessions, frame period {args.frame_period}s")
+    summarize("fixed-15", fixed_err, fixed_n, args.frame_period)
+    summarize("adaptive", adapt_err, adapt_n, args.frame_period)
+
+
+if __name__ == "__main__":
+    main()
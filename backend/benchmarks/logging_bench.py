@@ -0,0 +1,137 @@
+"""
+Logging overhead in a CPU-bound device loop (thermal request encode, register
+decode, face temperature, estimator update) with four log lines per iteration,
+the way irt_detect_cam / read_temperature log.
+
+    sync/eager      coloredlogs handler on the root logger, f-string messages
+                    formatted and written on the calling thread (the old setup)
+    queued/full     log_pipeline, every record formatted on the listener thread
+    queued/sampled  log_pipeline default: debug lines rate limited per call site
+    queued/off      log_pipeline warnings-only mode
+
+Console output goes to /dev/null with isatty=True, so ANSI formatting is still
+paid for. Reports loop throughput, per-iteration p50 / p99 and how many records
+reached the console.
+
+Run from backend/:
+    python -m benchmarks.logging_bench
+    python -m benchmarks.logging_bench --iterations 50000
+"""
+import argparse
+import logging
+import os
+import time
+from logging import debug, info
+
+import coloredlogs
+import numpy as np
+
+from benchmarks.emulators import synthetic_ir_frame
+from log_pipeline import LOG_FORMAT, setup_logging
+from module.ir_thermal.temp_estimator import StreamingTempEstimator
+from module.ir_thermal.thermal_protocol import decode_registers, encode_request
+
+
+class CountingStream:
+    """/dev/null that counts the lines written to it."""
+
+    def __init__(self):
+        self.sink = open(os.devnull, "w")
+        self.lines = 0
+
+    def write(self, text):
+        self.lines += text.count("\n")
+        return self.sink.write(text)
+
+    def flush(self):
+        pass
+
+
+def payloads(n=32, seed=0):
+    rng = np.random.default_rng(seed)
+    return [np.round(synthetic_ir_frame(rng=rng).flatten() * 10).astype(">u2").tobytes() for _ in range(n)]
+
+
+def eager_loop(frames, iterations):
+    estimator = StreamingTempEstimator()
+    times = np.empty(iterations)
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        if i % 30 == 0:     # one measurement session
+            estimator.reset()
+        request = encode_request(1, 256)
+        info(f"Request: {request}")
+        matrix = decode_registers(frames[i % len(frames)]).reshape(16, 16)
+        info(f"Debug: {len(matrix)} rows, head {matrix[0, :2]} tail {matrix[-1, -2:]}")
+        face = float(matrix[6:10, 6:10].mean())
+        accepted = estimator.update(face)
+        info(f"RAW_FACE: {face} ACCEPTED: {accepted}")
+        info(f"RAW_MIN: {matrix.min()} RAW_MEAN: {matrix.mean()}")
+        times[i] = time.perf_counter() - t0
+    return times
+
+
+def lazy_loop(frames, iterations):
+    estimator = StreamingTempEstimator()
+    times = np.empty(iterations)
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        if i % 30 == 0:     # one measurement session
+            estimator.reset()
+        request = encode_request(1, 256)
+        debug("Request: %s", request)
+        matrix = decode_registers(frames[i % len(frames)]).reshape(16, 16)
+        debug("Response: %d rows, head %s tail %s", len(matrix), matrix[0, :2], matrix[-1, -2:])
+        face = float(matrix[6:10, 6:10].mean())
+        accepted = estimator.update(face)
+        debug("RAW_FACE: %s ACCEPTED: %s", face, accepted)
+        min_temp, mean_temp = matrix.min(), matrix.mean()
+        debug("RAW_MIN: %s RAW_MEAN: %s", min_temp, mean_temp)
+        times[i] = time.perf_counter() - t0
+    return times
+
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+
+def run(label, frames, iterations, mode=None):
+    reset_root()
+    stream = CountingStream()
+    pipeline = None
+    if mode is None:
+        coloredlogs.install(level="debug", fmt=LOG_FORMAT, stream=stream, isatty=True)
+        loop = eager_loop
+    else:
+        pipeline = setup_logging(mode, stream=stream, isatty=True)
+        loop = lazy_loop
+
+    t0 = time.perf_counter()
+    times = loop(frames, iterations)
+    wall = time.perf_counter() - t0
+    if pipeline is not None:
+        pipeline.close()      # drain the queue before counting
+    reset_root()
+
+    us = times * 1e6
+    print(f"{label:<16} {iterations / wall:>10.0f} {np.percentile(us, 50):>8.1f} {np.percentile(us, 99):>8.1f} "
+          f"{stream.lines:>9} {pipeline.queue_handler.dropped if pipeline else 0:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    frames = payloads()
+    lazy_loop(frames, 500)      # warm numpy / imports, no handlers yet
+    print(f"{'setup':<16} {'iter/s':>10} {'p50 us':>8} {'p99 us':>8} {'console':>9} {'dropped':>8}")
+    run("sync/eager", frames, args.iterations)
+    for mode in ("full", "sampled", "off"):
+        run(f"queued/{mode}", frames, args.iterations, mode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Face detection time per frame on the IRT ROI at several lores stream sizes
+(module/camera/dual_stream), against detection on the 640x480 main frame.
+
+Frames come from benchmarks.emulators.FakePicamera2 through DualStreamCamera,
+so the lores path is the real one: Y plane sliced out of a strided I420
+buffer, flipped, ROI cropped, boxes mapped back to main pixels. --scene uses
+an image (e.g. a recorded kiosk frame with a face) instead of the synthetic
+one. Reported per detector and lores size:
+
+    view ms     lores crop / main crop handed to the detector
+    detect ms   detect() p50 / p95, single OpenCV thread
+    agree       frames whose largest box matches the main-stream box
+                (IoU >= 0.5, or both empty)
+
+Run from backend/:
+    python -m benchmarks.lores_detect_bench
+    python -m benchmarks.lores_detect_bench --scene face.jpg --specs haar lbp yunet
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.emulators import FakePicamera2
+from benchmarks.face_detector_bench import iou
+from module.camera.dual_stream import DualStreamCamera
+from module.face_detection.detectors import create_detector
+from utils import calculate_centered_roi
+
+MAIN_SIZE = (640, 480)
+LORES_SIZES = [None, (480, 360), (320, 240), (256, 192), (160, 120)]
+
+
+def capture(lores_size, n, scene):
+    camera = DualStreamCamera(0, MAIN_SIZE, lores_size, picam2=FakePicamera2(scene=scene, fps=0))
+    camera.start()
+    frames = [camera.capture() for _ in range(n)]
+    camera.close()
+    return frames
+
+
+def bench(detector, frames, roi):
+    view_times, times, boxes = [], [], []
+    for captured in frames:
+        t0 = time.perf_counter()
+        image, image_scale = captured.detection_view(roi)
+        t1 = time.perf_counter()
+        faces = detector.detect(image, image_scale)
+        t2 = time.perf_counter()
+        view_times.append(t1 - t0)
+        times.append(t2 - t1)
+        boxes.append(tuple(faces[0]) if len(faces) else None)
+    return np.array(view_times) * 1000, np.array(times) * 1000, boxes
+
+
+def agreement(boxes, reference):
+    same = sum(1 for a, b in zip(boxes, reference)
+               if (a is None and b is None) or (a is not None and b is not None and iou(a, b) >= 0.5))
+    return same / len(boxes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--specs", nargs="+", default=["haar", "lbp", "yunet"])
+    parser.add_argument("--scene", help="image to render frames from (upright, any size)")
+    args = parser.parse_args()
+    cv2.setNumThreads(1)
+
+    scene = None
+    if args.scene:
+        scene = cv2.imread(args.scene)
+        if scene is None:
+            parser.error(f"cannot read {args.scene}")
+        scene = cv2.flip(scene, 0)      # the camera delivers it upside down
+    roi = calculate_centered_roi(*MAIN_SIZE)
+    captures = {size: capture(size, args.frames, scene) for size in LORES_SIZES}
+
+    print(f"{args.frames} frames, main {MAIN_SIZE[0]}x{MAIN_SIZE[1]}, ROI {roi[2]}x{roi[3]}\n")
+    print(f"{'detector':<8} {'stream':<9} {'det px':>8} {'view ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'agree':>6}")
+    for spec in args.specs:
+        try:
+            detector = create_detector(spec)
+        except Exception as e:
+            print(f"{spec:<8} skipped: {e}")
+            continue
+        reference = None
+        for size in LORES_SIZES:
+            frames = captures[size]
+            bench(detector, frames[:3], roi)     # warm-up
+            view_ms, ms, boxes = bench(detector, frames, roi)
+            if reference is None:
+                reference = boxes
+            image, _ = frames[0].detection_view(roi)
+            name = "main" if size is None else f"{size[0]}x{size[1]}"
+            print(f"{spec:<8} {name:<9} {image.shape[1] * image.shape[0]:>8} {np.median(view_ms):>8.3f} "
+                  f"{np.percentile(ms, 50):>8.2f} {np.percentile(ms, 95):>8.2f} {agreement(boxes, reference):>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,494 @@
+"""
+Micro-benchmarks for the pure per-frame functions, with per-machine baselines
+and a regression gate.
+
+Every case runs on the checked-in fixtures in benchmarks/fixtures/ (516-byte
+IR responses, BP display crops, one IRT camera frame) and checks its output on
+them before timing. Each case is timed in --repeat runs, each long enough
+(--min-time) to swamp timer resolution and interleaved with the other cases'
+runs; GC is off while timing, as in timeit.
+The median and IQR of the runs are reported, and the fastest run (min) is
+what gets compared: noise on a shared machine only ever adds time.
+
+Baselines live in benchmarks/baselines/<machine>.json, one entry per profile
+("default", "pinned"). A run is compared with the baseline of the same machine
+and profile and exits with status 1 if any case is slower by more than
+--threshold and by more than its noise band (the larger relative IQR of the
+baseline and the current run); slower only within the noise is "noisy".
+
+    --profile pinned    one CPU (sched_setaffinity), cpufreq governor set to
+                        "performance" for the run when writable (root),
+                        OpenCV single-threaded. Use it for numbers you keep.
+
+Run from backend/:
+    python -m benchmarks.microbench                         # compare with this machine's baseline
+    python -m benchmarks.microbench --save-baseline         # (re)write it
+    sudo python -m benchmarks.microbench --profile pinned --cpu 3 --save-baseline
+    python -m benchmarks.microbench --filter ir_ --threshold 0.2
+    python -m benchmarks.microbench --make-fixtures         # regenerate synthetic fixtures
+    python -m benchmarks.microbench --record-ir /dev/ttyUSB1 --frames 32   # fixtures from the real sensor
+"""
+import argparse
+import contextlib
+import gc
+import glob
+import itertools
+import json
+import os
+import platform
+import re
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from module.blood_pressure.ocr_engine import engine_for
+from module.blood_pressure.ocr_pipeline import merge_config, preprocess_roi, read_roi, verify_value
+from module.ir_thermal.heatmap import ir_heatmap
+from module.ir_thermal.temp_estimator import estimate_face_temp
+from module.ir_thermal.thermal_protocol import HEADER_MARKER, encode_request, extract_temp_data, parse_response_data
+from module.streaming.frame_stream import mjpeg_part
+from utils import calculate_centered_roi
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures")
+BASELINES = os.path.join(HERE, "baselines")
+
+IR_RESPONSES = "ir_responses.bin"
+RESPONSE_SIZE = 516         # 0x1698 + 256 registers + 0x1A9C
+IRT_FRAME = "irt_frame.jpg"
+BP_CROP_PATTERN = "bp_{display}_{field}.jpg"
+
+# ----------------------------
+#  FIXTURES
+# ----------------------------
+
+def make_fixtures(directory=FIXTURES, frames=16, seed=0):
+    """Synthetic fixtures from the emulators (same byte layout / geometry as the kiosk)."""
+    from benchmarks.emulators import ThermalSensorEmulator, synthetic_bp_display, synthetic_ir_frame
+
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    sensor = ThermalSensorEmulator(latency=0.0, baudrate=10_000_000, seed=seed)
+    responses = bytearray()
+    for _ in range(frames):
+        center = (int(rng.integers(6, 10)), int(rng.integers(6, 10)))
+        sensor.frame = synthetic_ir_frame(face_temp=float(rng.normal(34.3, 0.5)), center=center, rng=rng)
+        sensor.write(encode_request(1, 256))
+        responses += sensor.read(RESPONSE_SIZE)
+    with open(os.path.join(directory, IR_RESPONSES), "wb") as f:
+        f.write(responses)
+
+    displays = [{"sys": "128", "dia": "84", "pulse": "72"},
+                {"sys": "141", "dia": "92", "pulse": "66"},
+                {"sys": "109", "dia": "71", "pulse": "103"}]
+    config = merge_config()
+    for i, values in enumerate(displays):
+        frame, _ = synthetic_bp_display(values, rng)
+        for field, (x1, x2, y1, y2) in config["rois"].items():
+            path = os.path.join(directory, BP_CROP_PATTERN.format(display=i, field=field))
+            cv2.imwrite(path, frame[y1:y2, x1:x2], [cv2.IMWRITE_JPEG_QUALITY, 92])
+
+    # IRT camera frame: background plus a face-sized blob in the centred ROI
+    irt = np.full((480, 640, 3), 95, np.uint8)
+    cv2.ellipse(irt, (320, 240), (85, 115), 0, 0, 360, (140, 160, 195), -1)
+    irt = np.clip(irt + rng.normal(0, 3, irt.shape), 0, 255).astype(np.uint8)
+    cv2.imwrite(os.path.join(directory, IRT_FRAME), irt, [cv2.IMWRITE_JPEG_QUALITY, 90])
+
+    write_manifest(directory, {"source": "emulators", "seed": seed, "ir_frames": frames,
+                               "bp_displays": displays})
+
+
+def record_ir(port, directory=FIXTURES, frames=32, baudrate=115200):
+    """Replace the IR fixture with responses read from the real sensor on `port`."""
+    import serial
+    responses = bytearray()
+    with serial.Serial(port, baudrate, timeout=1.0) as ser:
+        while len(responses) < frames * RESPONSE_SIZE:
+            ser.reset_input_buffer()
+            ser.write(encode_request(1, 256))
+            response = ser.read(RESPONSE_SIZE)
+            if len(response) == RESPONSE_SIZE and response[:2] == b"\x16\x98" and response[-2:] == b"\x1a\x9c":
+                responses += response
+            time.sleep(0.1)
+    with open(os.path.join(directory, IR_RESPONSES), "wb") as f:
+        f.write(responses)
+    write_manifest(directory, {"ir_source": f"recorded from {port}", "ir_frames": frames})
+
+
+def write_manifest(directory, updates):
+    path = os.path.join(directory, "manifest.json")
+    manifest = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    manifest.update(updates, updated=datetime.now().isoformat(timespec="seconds"))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_fixtures(directory=FIXTURES):
+    with open(os.path.join(directory, IR_RESPONSES), "rb") as f:
+        blob = f.read()
+    if not blob or len(blob) % RESPONSE_SIZE:
+        raise ValueError(f"{IR_RESPONSES}: {len(blob)} bytes is not a whole number of {RESPONSE_SIZE}-byte responses")
+    responses = [blob[i:i + RESPONSE_SIZE] for i in range(0, len(blob), RESPONSE_SIZE)]
+
+    crops = []
+    for path in sorted(glob.glob(os.path.join(directory, BP_CROP_PATTERN.format(display="*", field="*")))):
+        field = re.match(r"bp_\d+_(\w+)\.jpg", os.path.basename(path)).group(1)
+        crops.append((field, cv2.imread(path, cv2.IMREAD_COLOR)))
+    frame = cv2.imread(os.path.join(directory, IRT_FRAME), cv2.IMREAD_COLOR)
+    if not crops or frame is None:
+        raise ValueError(f"BP crops / {IRT_FRAME} missing in {directory}")
+    return {"responses": responses, "crops": crops, "frame": frame}
+
+# ----------------------------
+#  CASES
+# ----------------------------
+#
+# Each case takes the fixtures, checks the function on them and returns a
+# zero-argument callable that processes the next fixture.
+
+def _cycle(items):
+    it = itertools.cycle(items)
+    return lambda: next(it)
+
+
+def case_parse_response_data(fx):
+    matrix = parse_response_data(fx["responses"][0])
+    assert matrix.shape == (16, 16) and matrix[0, 0] == HEADER_MARKER
+    nxt = _cycle(fx["responses"])
+    return lambda: parse_response_data(nxt())
+
+
+def case_extract_temp_data(fx):
+    parsed = [parse_response_data(r) for r in fx["responses"]]
+    assert HEADER_MARKER not in extract_temp_data(parsed[0])
+    nxt = _cycle(parsed)
+    return lambda: extract_temp_data(nxt())
+
+
+def case_estimate_face_temp(fx):
+    matrices = [extract_temp_data(parse_response_data(r)) for r in fx["responses"]]
+    assert all(20.0 < estimate_face_temp(m) < 45.0 for m in matrices)
+    nxt = _cycle(matrices)
+    return lambda: estimate_face_temp(nxt())
+
+
+def case_ir_heatmap(fx):
+    x, y, w, h = calculate_centered_roi(fx["frame"].shape[1], fx["frame"].shape[0])
+    roi = fx["frame"][y:y + h, x:x + w]
+    matrices = [extract_temp_data(parse_response_data(r)) for r in fx["responses"]]
+    assert ir_heatmap(roi, matrices[0]).shape == roi.shape
+    nxt = _cycle(matrices)
+    return lambda: ir_heatmap(roi, nxt())
+
+
+def case_process_frame_ocr_pre(fx):
+    """process_frame_ocr up to the Tesseract call (CLAHE, blur, Otsu, closing, contours)."""
+    config = merge_config()
+    # the pulse ROI runs off the 480-row frame, so only sys / dia must show digits
+    assert all(preprocess_roi(crop, config)[2] for field, crop in fx["crops"] if field in ("sys", "dia"))
+    nxt = _cycle([crop for _, crop in fx["crops"]])
+    return lambda: preprocess_roi(nxt(), config)
+
+
+def case_process_frame_ocr(fx):
+    """Full process_frame_ocr (read_roi) including Tesseract; skipped where it is not installed."""
+    config = merge_config()
+    try:
+        engine_for(config)
+    except Exception:
+        return None
+    nxt = _cycle([crop for _, crop in fx["crops"]])
+    return lambda: read_roi(nxt(), config)
+
+
+def case_verify_value(fx):
+    rng = np.random.default_rng(0)
+    buffers = [[int(v) for v in rng.choice([120, 120, 120, 121, 128], size=10)] for _ in range(16)]
+    assert verify_value([120] * 7 + [121] * 3) == 120 and verify_value([1, 2, 3]) is None
+    nxt = _cycle(buffers)
+    return lambda: verify_value(nxt())
+
+
+def case_calculate_centered_roi(fx):
+    assert calculate_centered_roi(640, 480) == (96, 72, 448, 336)
+    return lambda: calculate_centered_roi(640, 480)
+
+
+def case_mjpeg_frame(fx):
+    """Per-frame /video_feed work: JPEG encode + multipart framing."""
+    frame = fx["frame"]
+
+    def run():
+        ok, buffer = cv2.imencode(".jpg", frame)
+        return mjpeg_part(buffer.tobytes())
+    assert run().startswith(b"--frame\r\n")
+    return run
+
+
+CASES = {
+    "parse_response_data": case_parse_response_data,
+    "extract_temp_data": case_extract_temp_data,
+    "estimate_face_temp": case_estimate_face_temp,
+    "ir_heatmap": case_ir_heatmap,
+    "process_frame_ocr_pre": case_process_frame_ocr_pre,
+    "process_frame_ocr": case_process_frame_ocr,
+    "verify_value": case_verify_value,
+    "calculate_centered_roi": case_calculate_centered_roi,
+    "mjpeg_frame": case_mjpeg_frame,
+}
+
+# ----------------------------
+#  TIMING
+# ----------------------------
+
+def _timed(fn, number):
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - t0
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def calibrate(fn, min_time=0.1):
+    """Calls per run so that a run takes >= min_time."""
+    fn()                                    # warm caches / lazy imports
+    number = 1
+    while True:
+        elapsed = _timed(fn, number)
+        if elapsed >= min_time:
+            return number
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.2))
+
+
+def summarize(runs, number):
+    runs = np.asarray(runs)
+    q1, median, q3 = np.percentile(runs, [25, 50, 75])
+    return {"min_us": round(float(runs.min()) * 1e6, 3), "median_us": round(float(median) * 1e6, 3),
+            "iqr_us": round(float(q3 - q1) * 1e6, 3), "number": number, "repeat": len(runs)}
+
+
+def measure(fn, repeat=9, min_time=0.1):
+    """Per-call seconds for `repeat` runs of `number` calls, `number` sized so a run takes >= min_time."""
+    number = calibrate(fn, min_time)
+    return summarize([_timed(fn, number) / number for _ in range(repeat)], number)
+
+
+def measure_all(fns, repeat=9, min_time=0.1):
+    """
+    measure() for several cases, the runs interleaved round-robin: slow phases
+    of the machine (frequency steps, a neighbour's burst) then land in the runs
+    of every case, widening their IQR, instead of shifting one case's times.
+    """
+    numbers = {name: calibrate(fn, min_time) for name, fn in fns.items()}
+    runs = {name: [] for name in fns}
+    for _ in range(repeat):
+        for name, fn in fns.items():
+            runs[name].append(_timed(fn, numbers[name]) / numbers[name])
+    return {name: summarize(runs[name], numbers[name]) for name in fns}
+
+# ----------------------------
+#  MACHINE / PROFILE
+# ----------------------------
+
+def cpu_model():
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key.strip() in ("model name", "Model"):
+                    return value.strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def machine_id():
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", f"{platform.node()}-{platform.machine()}")
+
+
+def _cpufreq(cpu, name):
+    path = f"/sys/devices/system/cpu/cpu{cpu}/cpufreq/{name}"
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+@contextlib.contextmanager
+def cpu_profile(profile, cpu=None):
+    """Run environment for `profile`; yields a dict describing it (stored with the results)."""
+    meta = {"profile": profile}
+    if profile != "pinned":
+        yield meta
+        return
+
+    if not hasattr(os, "sched_setaffinity"):
+        sys.exit("--profile pinned needs sched_setaffinity (Linux)")
+    cpus = sorted(os.sched_getaffinity(0))
+    cpu = cpus[-1] if cpu is None else cpu
+    previous_affinity = set(cpus)
+    os.sched_setaffinity(0, {cpu})
+    cv2.setNumThreads(1)
+
+    governor_path = f"/sys/devices/system/cpu/cpu{cpu}/cpufreq/scaling_governor"
+    previous_governor = _cpufreq(cpu, "scaling_governor")
+    changed = False
+    if previous_governor not in (None, "performance"):
+        try:
+            with open(governor_path, "w", encoding="utf-8") as f:
+                f.write("performance")
+            changed = True
+        except OSError as e:
+            print(f"warning: cannot set the cpu{cpu} governor to performance ({e}); "
+                  f"run as root or `cpupower -c {cpu} frequency-set -g performance`", file=sys.stderr)
+    meta.update(cpu=cpu, governor=_cpufreq(cpu, "scaling_governor"),
+                freq_khz=_cpufreq(cpu, "scaling_cur_freq"), max_khz=_cpufreq(cpu, "scaling_max_freq"))
+    try:
+        yield meta
+    finally:
+        if changed:
+            with open(governor_path, "w", encoding="utf-8") as f:
+                f.write(previous_governor)
+        os.sched_setaffinity(0, previous_affinity)
+
+# ----------------------------
+#  BASELINES / REPORT
+# ----------------------------
+
+def baseline_path(machine):
+    return os.path.join(BASELINES, f"{machine}.json")
+
+
+def load_baseline(machine, profile):
+    path = baseline_path(machine)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("profiles", {}).get(profile)
+
+
+def save_baseline(machine, profile, results, meta):
+    path = baseline_path(machine)
+    data = {"machine": machine, "profiles": {}}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    data.update(cpu_model=cpu_model(), python=platform.python_version(),
+                numpy=np.__version__, opencv=cv2.__version__)
+    data["profiles"][profile] = {"saved": datetime.now().isoformat(timespec="seconds"),
+                                 "env": meta, "results": results}
+    os.makedirs(BASELINES, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    return path
+
+
+def relative_iqr(r):
+    return r["iqr_us"] / r["median_us"] if r.get("median_us") else 0.0
+
+
+def compare(results, baseline, threshold):
+    """[(name, base_us, cur_us, noise_pct, delta, status)] on min-of-runs, regressed?"""
+    rows, regressed = [], False
+    base = (baseline or {}).get("results", {})
+    for name, r in results.items():
+        b_r = base.get(name)
+        if b_r is None:
+            rows.append((name, None, r["min_us"], 100 * relative_iqr(r), None, "new"))
+            continue
+        key = "min_us" if "min_us" in b_r else "median_us"     # baselines saved before min_us
+        cur, b = r[key], b_r[key]
+        noise = max(relative_iqr(r), relative_iqr(b_r))
+        delta = cur / b - 1
+        if delta > threshold and delta > noise:
+            status, regressed = "REGRESSED", True
+        elif delta > threshold:
+            status = "noisy"
+        elif delta < -threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append((name, b, cur, 100 * noise, delta, status))
+    return rows, regressed
+
+
+def fmt_us(us):
+    if us is None:
+        return "-"
+    return f"{us / 1000:.2f} ms" if us >= 1000 else f"{us:.2f} us"
+
+
+def print_table(rows, threshold):
+    print(f"{'case':<24} {'base min':>11} {'cur min':>11} {'noise':>6} {'delta':>8}  status (threshold {threshold:+.0%})")
+    for name, b, cur, noise_pct, delta, status in rows:
+        d = "-" if delta is None else f"{delta:+.1%}"
+        print(f"{name:<24} {fmt_us(b):>11} {fmt_us(cur):>11} {noise_pct:>5.1f}% {d:>8}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=("default", "pinned"), default="default")
+    parser.add_argument("--cpu", type=int, help="CPU for --profile pinned (default: the last one)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown vs baseline (0.10 = 10%%)")
+    parser.add_argument("--repeat", type=int, default=9)
+    parser.add_argument("--min-time", type=float, default=0.1, help="seconds per timed run")
+    parser.add_argument("--filter", help="only cases whose name contains this")
+    parser.add_argument("--machine", default=machine_id(), help="baseline name (default: hostname-arch)")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the machine's baseline")
+    parser.add_argument("--make-fixtures", action="store_true", help="regenerate the synthetic fixtures and exit")
+    parser.add_argument("--record-ir", metavar="PORT", help="record IR responses from the sensor on PORT and exit")
+    parser.add_argument("--frames", type=int, default=32, help="responses to record with --record-ir")
+    args = parser.parse_args()
+
+    if args.make_fixtures:
+        make_fixtures()
+        print(f"fixtures written to {FIXTURES}")
+        return
+    if args.record_ir:
+        record_ir(args.record_ir, frames=args.frames)
+        print(f"{args.frames} IR responses recorded to {os.path.join(FIXTURES, IR_RESPONSES)}")
+        return
+
+    fixtures = load_fixtures()
+    fns = {}
+    with cpu_profile(args.profile, args.cpu) as meta:
+        for name, make_case in CASES.items():
+            if args.filter and args.filter not in name:
+                continue
+            fn = make_case(fixtures)
+            if fn is None:
+                print(f"skipped {name} (dependency missing)", file=sys.stderr)
+                continue
+            fns[name] = fn
+        results = measure_all(fns, args.repeat, args.min_time)
+
+    baseline = load_baseline(args.machine, args.profile)
+    print(f"{args.machine} [{args.profile}] {cpu_model()}"
+          + (f", cpu{meta['cpu']} governor={meta['governor']} {meta['freq_khz']} kHz" if "cpu" in meta else ""))
+    if baseline is None:
+        print("no baseline for this machine / profile yet (--save-baseline)")
+    else:
+        print(f"baseline from {baseline['saved']}")
+    rows, regressed = compare(results, baseline, args.threshold)
+    print_table(rows, args.threshold)
+
+    if args.save_baseline:
+        print(f"\nbaseline written to {save_baseline(args.machine, args.profile, results, meta)}")
+    elif regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
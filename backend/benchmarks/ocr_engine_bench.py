@@ -0,0 +1,119 @@
+"""
+Tesseract latency per BP display ROI: the in-process C API pool
+(ocr_engine.TesseractPool) against the per-call pytesseract subprocess
+(ocr_engine.PytesseractEngine), on the binarised ROIs the live reader hands
+to OCR (synthetic displays through ROIPreprocessor).
+
+    start     engine creation + first ROI (pool: library load and Init of one
+              handle; pytesseract: version check)
+    roi       per-ROI latency p50 / p99 over --frames frames
+    frame     three ROIs one after another, as bp_ocr_reader does
+    3t        three ROIs on three threads at once (the pool grows to three
+              handles on the first frames; ctypes releases the GIL)
+    exact     share of ROIs read exactly; conf: mean character confidence
+
+An engine that cannot be set up here (no libtesseract, no tesseract binary,
+no traineddata for --lang) is reported and skipped. MHR_TESSERACT_LIB and
+TESSDATA_PREFIX point the C API at a library / model directory.
+
+Run from backend/:
+    python -m benchmarks.ocr_engine_bench
+    python -m benchmarks.ocr_engine_bench --lang eng --psm 7 --frames 100
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from benchmarks.emulators import synthetic_bp_display
+from module.blood_pressure.ocr_engine import BACKENDS, engine_settings
+from module.blood_pressure.ocr_pipeline import ROIPreprocessor, crop, merge_config
+
+
+def ocr_inputs(config, n, seed=0):
+    """[[(inverted binary ROI, truth) per field]] for `n` synthetic displays; ROIs without digits are dropped."""
+    rng = np.random.default_rng(seed)
+    preps = {name: ROIPreprocessor(config) for name in config["rois"]}
+    out = []
+    for _ in range(n):
+        values = {"sys": str(rng.integers(95, 190)), "dia": str(rng.integers(50, 110)), "pulse": str(rng.integers(50, 130))}
+        bgr, _ = synthetic_bp_display(values, rng)
+        luma = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        rois = []
+        for name, roi in config["rois"].items():
+            closing, _, found = preps[name].process(crop(luma, roi))
+            if found:
+                rois.append((cv2.bitwise_not(closing), values[name]))
+        out.append(rois)
+    return out
+
+
+def ms(values):
+    return np.percentile(values, 50) * 1000, np.percentile(values, 99) * 1000
+
+
+def bench(engine, frames, pool):
+    roi_times, frame_times, threaded_times, correct, confidences = [], [], [], 0, []
+    for rois in frames:
+        t0 = time.perf_counter()
+        for image, truth in rois:
+            t = time.perf_counter()
+            result = engine.recognize(image)
+            roi_times.append(time.perf_counter() - t)
+            correct += result.text.strip() == truth
+            confidences += result.confidences
+        frame_times.append(time.perf_counter() - t0)
+    for rois in frames:
+        t0 = time.perf_counter()
+        list(pool.map(lambda item: engine.ocr(item[0]), rois))
+        threaded_times.append(time.perf_counter() - t0)
+    n_rois = sum(len(rois) for rois in frames)
+    return {"roi": ms(roi_times), "frame": ms(frame_times), "frame3t": ms(threaded_times),
+            "exact": correct / max(1, n_rois), "conf": float(np.mean(confidences)) if confidences else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lang", help="traineddata (default: the OCR config's tess_lang)")
+    parser.add_argument("--psm", type=int, help="page segmentation mode (default: the OCR config's)")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--engines", default="capi,pytesseract")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    cv2.setNumThreads(1)
+
+    config = merge_config()
+    if args.lang:
+        config["tess_lang"] = args.lang
+    if args.psm is not None:
+        config["tess_config"] = f"--oem 3 --psm {args.psm}"
+    frames = ocr_inputs(config, args.frames)
+    print(f"{sum(len(r) for r in frames)} ROIs from {len(frames)} frames, lang {config['tess_lang']}, "
+          f"'{config['tess_config']}', whitelist {config['tess_whitelist']}\n")
+    print(f"{'engine':<12} {'start ms':>9} {'roi p50':>8} {'p99':>7} {'frame p50':>10} {'p99':>7} "
+          f"{'3t p50':>7} {'p99':>7} {'exact':>6} {'conf':>5}")
+    with ThreadPoolExecutor(3) as pool:
+        for backend in args.engines.split(","):
+            t0 = time.perf_counter()
+            try:
+                options = {"size": 3} if backend == "capi" else {}
+                engine = BACKENDS[backend](**engine_settings(config), **options)
+                engine.recognize(frames[0][0][0])
+            except Exception as e:
+                print(f"{backend:<12} unavailable: {e}")
+                continue
+            start = (time.perf_counter() - t0) * 1000
+            try:
+                r = bench(engine, frames, pool)
+            finally:
+                engine.close()
+            print(f"{backend:<12} {start:>9.1f} {r['roi'][0]:>8.1f} {r['roi'][1]:>7.1f} {r['frame'][0]:>10.1f} "
+                  f"{r['frame'][1]:>7.1f} {r['frame3t'][0]:>7.1f} {r['frame3t'][1]:>7.1f} "
+                  f"{r['exact']:>6.0%} {r['conf']:>5.1f}")
+
+
+if __name__ == "__main__":
+    main()
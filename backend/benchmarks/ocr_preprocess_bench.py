@@ -0,0 +1,93 @@
+"""
+Per-ROI OCR preprocessing: preprocess_roi (new CLAHE / kernels / images per
+call, BGR input) against ROIPreprocessor (owned buffers) on BGR, on the Y
+plane of a YUV420 capture, and on the Y plane downsampled before the blur.
+
+Reports time per ROI and the transient Python-heap allocation per frame (three
+ROIs) measured with tracemalloc, which sees every numpy / OpenCV output array.
+
+Run from backend/:
+    python -m benchmarks.ocr_preprocess_bench
+"""
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from benchmarks.emulators import synthetic_bp_display
+from module.blood_pressure.ocr_pipeline import ROIPreprocessor, crop, merge_config, preprocess_roi
+
+
+def frames(n, seed=0):
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(n):
+        values = {"sys": str(rng.integers(95, 190)), "dia": str(rng.integers(50, 110)), "pulse": str(rng.integers(50, 130))}
+        bgr, _ = synthetic_bp_display(values, rng)
+        yuv = cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420)
+        out.append((bgr, yuv[:bgr.shape[0]]))
+    return out
+
+
+def variants(config):
+    preps = {
+        "owned/bgr": {name: ROIPreprocessor(config) for name in config["rois"]},
+        "owned/y": {name: ROIPreprocessor(config) for name in config["rois"]},
+        "owned/y/0.5": {name: ROIPreprocessor(config, downsample=0.5) for name in config["rois"]},
+    }
+    return {
+        "preprocess_roi (bgr)": (0, lambda name, roi: preprocess_roi(roi, config)),
+        "ROIPreprocessor bgr": (0, lambda name, roi: preps["owned/bgr"][name].process(roi)),
+        "ROIPreprocessor Y": (1, lambda name, roi: preps["owned/y"][name].process(roi)),
+        "ROIPreprocessor Y, 0.5x": (1, lambda name, roi: preps["owned/y/0.5"][name].process(roi)),
+    }
+
+
+def run_frame(fn, plane, config):
+    for name, roi in config["rois"].items():
+        fn(name, crop(plane, roi))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    cv2.setNumThreads(1)
+    config = merge_config()
+    data = frames(args.frames)
+    n_rois = len(config["rois"])
+
+    print(f"{'variant':<26} {'us/ROI p50':>11} {'us/ROI p95':>11} {'alloc KB/frame':>15} {'speed-up':>9}")
+    baseline = None
+    for label, (plane_idx, fn) in variants(config).items():
+        # Warm up: first call of each preprocessor allocates its buffers
+        run_frame(fn, data[0][plane_idx], config)
+
+        samples = []
+        for _ in range(args.repeat):
+            for frame in data:
+                t0 = time.perf_counter()
+                run_frame(fn, frame[plane_idx], config)
+                samples.append((time.perf_counter() - t0) / n_rois * 1e6)
+
+        tracemalloc.start()
+        peaks = []
+        for frame in data:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            run_frame(fn, frame[plane_idx], config)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        tracemalloc.stop()
+
+        p50 = np.percentile(samples, 50)
+        baseline = baseline or p50
+        print(f"{label:<26} {p50:11.1f} {np.percentile(samples, 95):11.1f} "
+              f"{np.mean(peaks) / 1024:15.1f} {baseline / p50:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Overhead of the all-threads sampling profiler (sampling_profiler) on a
+kiosk-like thread mix:
+
+    ocr        ROIPreprocessor on synthetic BP display frames (CPU, releases the GIL in OpenCV)
+    thermal    register decode + face temperature loop (CPU, mostly Python)
+    serial     blocked in short sleeps, like a serial read with timeout
+    busywait   polls an empty buffer, like ArduinoController.waiting_for_completion
+
+Each configuration runs the mix for --seconds, right after an unprofiled
+baseline run, and reports each worker's throughput relative to that baseline
+and the sampler's own CPU as a share of one core. The last profile's per-thread CPU and samples show
+that cpu mode charges the busy-wait, not the blocked thread.
+
+Run from backend/:
+    python -m benchmarks.profiler_overhead_bench
+"""
+import argparse
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.emulators import synthetic_bp_display, synthetic_ir_frame
+from module.blood_pressure.ocr_pipeline import ROIPreprocessor, crop, merge_config
+from module.ir_thermal.thermal_protocol import decode_registers
+from sampling_profiler import SamplingProfiler
+
+
+def ocr_worker(stop, counter):
+    config = merge_config()
+    frame, _ = synthetic_bp_display({"sys": "128", "dia": "84", "pulse": "72"}, np.random.default_rng(0))
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    preps = {name: ROIPreprocessor(config) for name in config["rois"]}
+    while not stop.is_set():
+        for name, roi in config["rois"].items():
+            preps[name].process(crop(gray, roi))
+        counter[0] += 1
+
+
+def thermal_worker(stop, counter):
+    payload = np.round(synthetic_ir_frame(rng=np.random.default_rng(0)).flatten() * 10).astype(">u2").tobytes()
+    while not stop.is_set():
+        matrix = decode_registers(payload).reshape(16, 16)
+        sum(float(v) for v in matrix[6:10, 6:10].flat) / 16
+        counter[0] += 1
+
+
+def serial_worker(stop, counter):
+    while not stop.is_set():
+        time.sleep(0.01)
+        counter[0] += 1
+
+
+def busywait_worker(stop, counter):
+    buffer = ""
+    while not stop.is_set():
+        if "successfully" in buffer:
+            break
+        counter[0] += 1
+
+
+WORKERS = {"ocr": ocr_worker, "thermal": thermal_worker, "serial": serial_worker, "busywait": busywait_worker}
+
+
+def run_mix(seconds, profiler=None):
+    stop = threading.Event()
+    counters = {name: [0] for name in WORKERS}
+    threads = [threading.Thread(target=fn, args=(stop, counters[name]), name=name, daemon=True)
+               for name, fn in WORKERS.items()]
+    for t in threads:
+        t.start()
+    time.sleep(0.3)     # settle
+    base = {name: c[0] for name, c in counters.items()}
+    profile = None
+    if profiler is not None:
+        profile = profiler.run(seconds)
+    else:
+        time.sleep(seconds)
+    done = {name: counters[name][0] - base[name] for name in WORKERS}
+    stop.set()
+    for t in threads:
+        t.join()
+    return done, profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per configuration, interleaved with baselines")
+    args = parser.parse_args()
+
+    configs = [(mode, hz) for mode in ("wall", "cpu") for hz in (100, 250)]
+    rel = {c: {name: [] for name in WORKERS} for c in configs}
+    sampler = {c: [] for c in configs}
+    profile = None
+    for _ in range(args.repeat):
+        for config in configs:
+            baseline, _ = run_mix(args.seconds)
+            done, profile = run_mix(args.seconds, SamplingProfiler(hz=config[1], mode=config[0]))
+            for name in WORKERS:
+                rel[config][name].append(100 * done[name] / max(1, baseline[name]))
+            sampler[config].append(profile.report())
+
+    print(f"worker throughput with the profiler, relative to an unprofiled run right before "
+          f"(median of {args.repeat} x {args.seconds:.0f}s)\n")
+    print(f"{'config':<10} {'ocr':>7} {'thermal':>8} {'busywait':>9} {'eff hz':>7} {'sampler cpu':>12}")
+    for config in configs:
+        m = {name: float(np.median(v)) for name, v in rel[config].items()}
+        hz = float(np.median([r["effective_hz"] for r in sampler[config]]))
+        cpu = float(np.median([r["overhead_pct"] for r in sampler[config]]))
+        print(f"{config[0] + '@' + str(config[1]):<10} {m['ocr']:>6.1f}% {m['thermal']:>7.1f}% {m['busywait']:>8.1f}% "
+              f"{hz:>7.1f} {cpu:>11.2f}%")
+
+    print("\nper thread (last cpu@250 run):")
+    for label, stats in profile.report()["threads"].items():
+        print(f"  {label:<16} samples {stats['samples']:>5}   sampled {stats['sampled_s']:>6.3f}s   cpu {stats['cpu_s']}s")
+    print("\ntop stacks (us of CPU):")
+    for line in profile.collapsed().splitlines()[:4]:
+        print("  ..." + line[-100:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Serial port discovery and hot-reconnect (serial_discovery.SerialDiscovery)
+on pty emulators of the three USB serial devices (emulators.PtySerialDevice):
+the IR sensor, the BP monitor and the drawer Arduino. Each run publishes them
+as ttyUSBn / ttyACMn links in a temp dir, shuffling the numbers as a reboot
+would, with /dev/serial/by-id style links unless --no-by-id.
+
+    fixed       the former hard-coded ports (first ttyUSB = IR, second = BP,
+                ttyACM0 = drawer): right in how many shuffles
+    cold        first discovery, no cache: probe time and correctness
+    warm        restart with the port cache: time (no probing when keys match)
+    silent bp   BP monitor idle (sends nothing): inferred as the last USB port
+    replug      watcher running; a device is unplugged and comes back under
+                another ttyUSB number: time from replug to wait_for() returning
+
+Run from backend/:
+    python -m benchmarks.serial_discovery_bench
+    python -m benchmarks.serial_discovery_bench --no-by-id --runs 3
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.emulators import PtySerialDevice
+from serial_discovery import SerialDiscovery
+
+DEVICES = (("irt", "usb-1a86_USB_Serial-if00-port0"),
+           ("bp", "usb-FTDI_FT232R_USB_UART_A50285BI-if00-port0"),
+           ("drawer", "usb-Arduino__www.arduino.cc__0043_75735353-if00"))
+FIXED_PORTS = {"irt": "ttyUSB0", "bp": "ttyUSB1", "drawer": "ttyACM0"}
+
+
+class Bench:
+    def __init__(self, root, by_id, silent_bp=False, seed=0):
+        self.root = root
+        self.dev = os.path.join(root, "dev")
+        self.by_id_dir = os.path.join(root, "by-id") if by_id else None
+        self.cache = os.path.join(root, "serial_ports.json")
+        self.rng = random.Random(seed)
+        usb = self.rng.sample(range(4), 2)
+        self.devices = {}
+        for name, by_id_name in DEVICES:
+            alias = f"ttyACM{self.rng.randrange(2)}" if name == "drawer" else f"ttyUSB{usb.pop()}"
+            self.devices[name] = PtySerialDevice(name, os.path.join(self.dev, alias), by_id_name, self.by_id_dir,
+                                                 token_every=None if name == "bp" and silent_bp else 0.3)
+
+    def discovery(self, poll_s=0.05):
+        globs = (os.path.join(self.dev, "ttyUSB*"), os.path.join(self.dev, "ttyACM*"))
+        return SerialDiscovery(cache_path=self.cache, by_id_dir=self.by_id_dir, globs=globs, poll_s=poll_s)
+
+    def correct(self, found):
+        return all(found.get(name) and os.path.realpath(found[name]) == os.path.realpath(device.alias)
+                   for name, device in self.devices.items())
+
+    def fixed_correct(self):
+        return all(os.path.basename(self.devices[name].alias) == port for name, port in FIXED_PORTS.items())
+
+    def free_alias(self, name):
+        prefix = "ttyACM" if name == "drawer" else "ttyUSB"
+        used = set(os.listdir(self.dev))
+        return os.path.join(self.dev, next(f"{prefix}{n}" for n in range(4, 16) if f"{prefix}{n}" not in used))
+
+    def close(self):
+        for device in self.devices.values():
+            device.unplug()
+
+
+def run(by_id, seed, replugs):
+    out = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        bench = Bench(tmp, by_id, seed=seed)
+        try:
+            out["fixed"] = bench.fixed_correct()
+            t0 = time.perf_counter()
+            found = bench.discovery().discover()
+            out["cold_ms"] = (time.perf_counter() - t0) * 1000
+            out["cold"] = bench.correct(found)
+
+            t0 = time.perf_counter()
+            found = bench.discovery().discover()
+            out["warm_ms"] = (time.perf_counter() - t0) * 1000
+            out["warm"] = bench.correct(found)
+
+            ports = bench.discovery().start()
+            for name in bench.devices:
+                ports.wait_for(name, timeout=5.0)
+            out["replug_ms"], out["replug_ok"] = [], 0
+            for i in range(replugs):
+                name = ("irt", "bp", "drawer")[i % 3]
+                device = bench.devices[name]
+                device.unplug()
+                deadline = time.monotonic() + 2.0
+                while ports.port(name) and time.monotonic() < deadline:
+                    time.sleep(0.005)
+                device.plug(bench.free_alias(name) if i % 2 == 0 else None)
+                t0 = time.perf_counter()
+                path = ports.wait_for(name, timeout=5.0)
+                if path:
+                    out["replug_ms"].append((time.perf_counter() - t0) * 1000)
+                    out["replug_ok"] += os.path.realpath(path) == os.path.realpath(device.alias)
+            ports.stop()
+        finally:
+            bench.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench = Bench(tmp, by_id, silent_bp=True, seed=seed)
+        try:
+            found = bench.discovery().discover()
+            out["silent_bp"] = bench.correct(found)
+        finally:
+            bench.close()
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="port shuffles")
+    parser.add_argument("--replugs", type=int, default=6, help="unplug / replug cycles per run")
+    parser.add_argument("--no-by-id", action="store_true", help="no /dev/serial/by-id links (keys are paths)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    results = [run(not args.no_by_id, args.seed + r, args.replugs) for r in range(args.runs)]
+    n = len(results)
+    count = lambda key: sum(bool(r[key]) for r in results)
+    replug = [ms for r in results for ms in r["replug_ms"]]
+
+    print(f"{n} port shuffles, {args.replugs} replugs each, by-id links: {not args.no_by_id}\n")
+    print(f"fixed ports   right in {count('fixed')}/{n}")
+    print(f"cold          right in {count('cold')}/{n}, median {np.median([r['cold_ms'] for r in results]):.0f} ms")
+    print(f"warm (cache)  right in {count('warm')}/{n}, median {np.median([r['warm_ms'] for r in results]):.1f} ms")
+    print(f"silent bp     right in {count('silent_bp')}/{n} (inferred)")
+    print(f"replug        back in {len(replug)}/{n * args.replugs}, on the right port "
+          f"{sum(r['replug_ok'] for r in results)}; "
+          + (f"median {np.median(replug):.0f} ms, max {max(replug):.0f} ms" if replug else "never"))
+
+
+if __name__ == "__main__":
+    main()
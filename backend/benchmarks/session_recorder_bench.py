@@ -0,0 +1,64 @@
+"""
+Write overhead per frame and scan speed of `.irtrec` session files.
+
+Run from backend/:
+    python -m benchmarks.session_recorder_bench --sessions 2000 --frames 40
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.emulators import synthetic_ir_frame
+from module.ir_thermal.session_recorder import SessionRecorder, ThermalSession, list_sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--frames", type=int, default=40)
+    parser.add_argument("--dir", help="keep the generated sessions here instead of a temp dir")
+    args = parser.parse_args()
+
+    out_dir = args.dir or tempfile.mkdtemp(prefix="irtrec_")
+    rng = np.random.default_rng(0)
+    frames = [synthetic_ir_frame(rng=rng) for _ in range(64)]
+
+    # ---- write ----
+    append_times = []
+    t0 = time.perf_counter()
+    for s in range(args.sessions):
+        rec = SessionRecorder(os.path.join(out_dir, f"s{s:06d}.irtrec"), calib_offset=1.8)
+        for i in range(args.frames):
+            t = time.perf_counter()
+            rec.append(frames[i % len(frames)], (100, 80, 120, 140), 35.0, 36.8, True)
+            append_times.append(time.perf_counter() - t)
+        rec.close(36.8)
+    write_total = time.perf_counter() - t0
+    append_us = np.asarray(append_times) * 1e6
+
+    paths = list_sessions(out_dir)
+    size = sum(os.path.getsize(p) for p in paths)
+    n_frames = args.sessions * args.frames
+    print(f"write: {n_frames} frames in {write_total:.2f}s  append p50={np.percentile(append_us, 50):.1f}us "
+          f"p99={np.percentile(append_us, 99):.1f}us  {size / n_frames:.0f} B/frame on disk")
+
+    # ---- scan: per-session peak of the centre patch, as a calibration audit would ----
+    t0 = time.perf_counter()
+    peaks = []
+    for path in paths:
+        session = ThermalSession(path)
+        peaks.append(session.raw[:, 6:10, 6:10].max() * session.scale)
+    scan_total = time.perf_counter() - t0
+    print(f"scan : {len(paths)} sessions / {n_frames} frames in {scan_total:.2f}s  "
+          f"{n_frames / scan_total:,.0f} frames/s  {size / scan_total / 1e6:.0f} MB/s")
+
+    if not args.dir:
+        shutil.rmtree(out_dir)
+
+
+if __name__ == "__main__":
+    main()
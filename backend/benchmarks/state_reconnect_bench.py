@@ -0,0 +1,190 @@
+"""
+Time to a consistent UI state after a page reload / Socket.IO reconnect in
+the middle of a visit, with and without the device state store
+(device_state.DeviceStateStore).
+
+A scripted visit is replayed on virtual time through a real Flask-SocketIO
+server (test clients, in process): IRT session at 8 Hz during the BP cuff
+cycle, then the BP result and the drawer. At --reconnects random moments a
+client reconnects and must show what the server's store holds (state,
+indicator, values, result URLs of every device):
+
+    legacy    the current frontend: starts blank, rebuilds from live events only;
+              time = virtual seconds until every device was re-sent, or never
+    snapshot  fresh page load: state_snapshot on connect; time = wall ms from
+              connect to consistent
+    delta     socket reconnect after a 2 s drop with auth {state_version}:
+              state_delta with only the missed events; wall ms and bytes
+
+Run from backend/:
+    python -m benchmarks.state_reconnect_bench
+"""
+import argparse
+import copy
+import json
+import time
+
+import numpy as np
+from flask import Flask
+from flask_socketio import SocketIO
+
+from device_state import DeviceStateStore, TRACKED_EVENTS
+
+FIELDS = ("state", "indicator", "values", "results")
+
+
+def visit_timeline(seed=0):
+    """[(t, event, payload)] of one visit, IRT during the BP cycle."""
+    rng = np.random.default_rng(seed)
+    events = []
+    add = lambda t, event, payload: events.append((round(t, 3), event, payload))
+
+    for i, state in enumerate(("GPIO config", "GPIO setup", "GPIO success", "Trigger GPIO 17",
+                               "Connection..", "Connected!")):
+        add(0.2 * i, "bp_update", {"bp_state": {"state": state}, "bp_indicator": {"state": "c" if "success" in state else "m"}})
+    t = 2.0
+    for stage in ("Inflating", "Measuring", "Deflating", "Measuring", "Exhausting"):
+        add(t, "bp_update", {"bp_state": {"state": "Processing..", "msg": stage}, "bp_indicator": {"state": "m"}})
+        t += float(rng.uniform(6, 10))
+    add(t, "bp_update", {"bp_state": {"state": "Checking Result"}, "bp_indicator": {"state": "m"}})
+    add(t + 1.5, "bp_update", {"bp_state": {"state": "Result Completed"}, "bp_indicator": {"state": "c"}})
+    add(t + 1.6, "bp_result", {"systolic": 128, "diastolic": 84, "pulse": 72, "success": True,
+                               "images": {"sys": "/snapshots/bp_sys-1a2b.png"}})
+    bp_end = t + 1.6
+
+    t = 1.0
+    for state in ("Connecting", "Connected", "Camera active", "Ready"):
+        add(t, "irt_update", {"irt_state": {"state": state}, "irt_indicator": {"state": "m"}})
+        t += 0.5
+    temps = []
+    while len(temps) < 40:
+        face = rng.random() > 0.2
+        add(t, "irt_update", {"irt_state": {"state": "Meas." if face else "Find a Face"}, "irt_indicator": {"state": "m"}})
+        if face:
+            temps.append(round(36.4 + rng.normal(0, 0.15), 1))
+            add(t + 0.01, "irt_data", {"temp_max": temps[-1], "temp_min": 28.1, "temp_result": "",
+                                       "samples": len(temps), "ci_width": round(1.0 / len(temps), 3)})
+        t += 0.125
+    add(t, "irt_data", {"temp_max": temps[-1], "temp_min": 28.1, "temp_result": float(np.mean(temps)),
+                        "samples": len(temps), "ci_width": 0.02})
+    add(t + 0.05, "irt_result", {"image_url": "/snapshots/irt-3c4d.png", "heatmap_url": "/snapshots/irt_heatmap-5e6f.png"})
+    add(t + 0.1, "irt_update", {"irt_state": {"state": "Complete"}, "irt_indicator": {"state": "c"}})
+
+    add(bp_end + 10.5, "mhr_status", {"status": "1DrawerOpen"})
+    return sorted(events, key=lambda e: e[0])
+
+
+def view_of(devices):
+    return {name: {field: session.get(field) for field in FIELDS} for name, session in devices.items()}
+
+
+class ClientView:
+    """What the frontend would render, built with the server's own reducer."""
+
+    def __init__(self):
+        self.store = DeviceStateStore()
+        self.version = 0
+
+    def load_snapshot(self, snapshot):
+        self.store.devices.clear()
+        self.store.devices.update(copy.deepcopy(snapshot["devices"]))
+        self.version = snapshot["version"]
+
+    def apply_delta(self, delta):
+        for d in delta["deltas"]:
+            self.store.apply(d["event"], d["payload"])
+        self.version = delta["version"]
+
+    def live(self, event, payload):
+        version = payload.get("state_version")
+        if version is not None and version <= self.version:
+            return                  # already in the snapshot / delta
+        self.store.apply(event, {k: v for k, v in payload.items() if k not in ("state_version", "state_session")})
+        self.version = version or self.version
+
+    def view(self):
+        return view_of(self.store.devices)
+
+
+def drain(client, view, use_sync=True):
+    nbytes = 0
+    for message in client.get_received():
+        name, args = message["name"], message["args"]
+        payload = args[0] if args else {}
+        if name == "state_snapshot" and use_sync:
+            view.load_snapshot(payload)
+            nbytes += len(json.dumps(payload))
+        elif name == "state_delta" and use_sync:
+            view.apply_delta(payload)
+            nbytes += len(json.dumps(payload))
+        elif name in TRACKED_EVENTS:
+            view.live(name, payload)
+    return nbytes
+
+
+def run(timeline, reconnect_at, drop=2.0):
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode="threading")
+    store = DeviceStateStore().attach(socketio)
+
+    out = {"legacy": None, "snapshot_ms": None, "delta_ms": None, "snapshot_bytes": 0, "delta_bytes": 0}
+    legacy = legacy_view = None
+    before = socketio.test_client(app)          # connected before the drop
+    before_view = ClientView()
+    pending_delta = True
+    for t, event, payload in timeline:
+        if legacy is None and t >= reconnect_at:
+            # Page reload: blank legacy page and a snapshot-aware page
+            legacy, legacy_view = socketio.test_client(app), ClientView()
+            legacy.get_received()
+            t0 = time.perf_counter()
+            fresh = socketio.test_client(app)
+            fresh_view = ClientView()
+            out["snapshot_bytes"] = drain(fresh, fresh_view)
+            if fresh_view.view() == view_of(store.devices):
+                out["snapshot_ms"] = (time.perf_counter() - t0) * 1000
+            fresh.disconnect()
+            # Socket drop: `before` misses everything from here to reconnect_at + drop
+            drain(before, before_view)
+            before.disconnect()
+        if pending_delta and legacy is not None and t >= reconnect_at + drop:
+            pending_delta = False
+            t0 = time.perf_counter()
+            before = socketio.test_client(app, auth={"state_version": before_view.version})
+            out["delta_bytes"] = drain(before, before_view)
+            if before_view.view() == view_of(store.devices):
+                out["delta_ms"] = (time.perf_counter() - t0) * 1000
+
+        socketio.emit(event, payload)
+        if legacy is not None and out["legacy"] is None:
+            drain(legacy, legacy_view, use_sync=False)
+            if legacy_view.view() == view_of(store.devices):
+                out["legacy"] = t - reconnect_at
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reconnects", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    timeline = visit_timeline(args.seed)
+    end = timeline[-1][0]
+    rng = np.random.default_rng(args.seed)
+    results = [run(timeline, float(rng.uniform(0.5, end - 3))) for _ in range(args.reconnects)]
+
+    legacy = [r["legacy"] for r in results if r["legacy"] is not None]
+    print(f"visit of {end:.0f}s, {len(timeline)} events, {len(results)} reconnects at random moments\n")
+    print(f"legacy    consistent after {len(legacy)}/{len(results)} reconnects; "
+          + (f"median {np.median(legacy):.1f}s, max {max(legacy):.1f}s (visit time)" if legacy else "never"))
+    for path in ("snapshot", "delta"):
+        ms = [r[f"{path}_ms"] for r in results if r[f"{path}_ms"] is not None]
+        size = np.median([r[f"{path}_bytes"] for r in results])
+        print(f"{path:<9} consistent after {len(ms)}/{len(results)} reconnects; "
+              f"median {np.median(ms) if ms else float('nan'):.2f} ms, p95 {np.percentile(ms, 95) if ms else float('nan'):.2f} ms, "
+              f"{size:.0f} B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Test client for the binary IRT frame stream (module.streaming.frame_stream).
+
+Subscribes with a credit window, passes every received frame through a
+simulated throttled link (FIFO, --link-kbps) and acknowledges it when it has
+"arrived". Reports glass-to-glass latency (arrival - capture_ts) and frames
+dropped (sequence gaps: frames the server skipped for lack of credit).
+
+capture_ts is the kiosk's wall clock, so against a real kiosk run the client on
+the kiosk itself or on an NTP-synced machine.
+
+Run from backend/:
+    python -m benchmarks.stream_client --selftest       # in-process server, synthetic 30 fps camera
+    python -m benchmarks.stream_client --url http://localhost:5000 --start --credits 2
+"""
+import argparse
+import queue
+import socket
+import threading
+import time
+
+import cv2
+import numpy as np
+import socketio as sio_client
+from flask import Flask
+from flask_socketio import SocketIO
+
+from benchmarks.emulators import synthetic_bp_display
+from module.streaming.frame_stream import FRAME_EVENT, FrameStream
+
+
+class ThrottledLink:
+    """FIFO pipe of `kbps` kilobit/s between the socket and the 'screen'."""
+
+    def __init__(self, kbps, on_arrival):
+        self.bytes_per_s = kbps * 1000 / 8 if kbps else None
+        self.on_arrival = on_arrival
+        self.queue = queue.Queue()
+        self.free_at = 0.0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def put(self, payload):
+        self.queue.put((time.perf_counter(), payload))
+
+    def _run(self):
+        while True:
+            received, payload = self.queue.get()
+            if payload is None:
+                return
+            if self.bytes_per_s:
+                arrival = max(received, self.free_at) + len(payload["jpeg"]) / self.bytes_per_s
+                self.free_at = arrival
+                delay = arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.on_arrival(payload)
+
+    def close(self):
+        self.queue.put((0, None))
+        self.thread.join(timeout=5)
+
+
+def run_client(url, credits, seconds, link_kbps, start=False, ack=True):
+    client = sio_client.Client()
+    latencies, seqs, arrivals = [], [], []
+
+    def arrived(payload):
+        now = time.time()
+        latencies.append(now - payload["capture_ts"])
+        seqs.append(payload["seq"])
+        arrivals.append(now)
+        if ack and client.connected:
+            client.emit("stream_ack", {"seq": payload["seq"]})
+
+    link = ThrottledLink(link_kbps, arrived)
+    client.on(FRAME_EVENT, link.put)
+    client.connect(url, transports=["websocket"])
+    client.call("stream_subscribe", {"credits": credits})
+    if start:
+        print("stream_start:", client.call("stream_start"))
+
+    time.sleep(seconds)
+    server_stats = client.call("stream_unsubscribe")
+    client.disconnect()
+    link.close()
+    return summarize(latencies, seqs, arrivals, server_stats)
+
+
+def summarize(latencies, seqs, arrivals, server_stats):
+    if not seqs:
+        return {"frames": 0}
+    lat = np.array(latencies) * 1000
+    span = max(arrivals[-1] - arrivals[0], 1e-9)
+    expected = seqs[-1] - seqs[0] + 1
+    tail = lat[-max(1, len(lat) // 10):]
+    head = lat[:max(1, len(lat) // 10)]
+    return {
+        "frames": len(seqs),
+        "fps": round((len(seqs) - 1) / span, 1),
+        "p50_ms": round(float(np.percentile(lat, 50)), 1),
+        "p95_ms": round(float(np.percentile(lat, 95)), 1),
+        "max_ms": round(float(lat.max()), 1),
+        "drift_ms": round(float(tail.mean() - head.mean()), 1),
+        "dropped_pct": round(100 * (1 - len(set(seqs)) / expected), 1),
+        "server": server_stats,
+    }
+
+# ----------------------------
+#  SELF-TEST SERVER
+# ----------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_selftest_server(fps):
+    """Flask-SocketIO server with a FrameStream fed by a synthetic camera at `fps`."""
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode="threading", cors_allowed_origins="*")
+    stream = FrameStream(socketio).register()
+    mode = {"push": False}
+
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(30):
+        frame, _ = synthetic_bp_display({"sys": str(100 + i), "dia": "80", "pulse": "70"}, rng)
+        frames.append(cv2.imencode(".jpg", frame)[1].tobytes())
+
+    def camera():
+        period = 1.0 / fps
+        next_at = time.perf_counter()
+        i = 0
+        while True:
+            next_at += period
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+            i += 1
+            jpeg = frames[i % len(frames)]
+            meta = {"irt_state": "Meas.", "irt_data": {"temp_max": 36.6, "temp_samples": i}}
+            if mode["push"]:
+                # No flow control: every frame to everyone, like the MJPEG response
+                socketio.emit(FRAME_EVENT, {"seq": i, "capture_ts": time.time(), "sent_ts": time.time(),
+                                            **meta, "jpeg": jpeg})
+            else:
+                stream.publish(jpeg, time.time(), **meta)
+
+    port = free_port()
+    threading.Thread(target=lambda: socketio.run(app, host="127.0.0.1", port=port, allow_unsafe_werkzeug=True,
+                                                 log_output=False), daemon=True).start()
+    threading.Thread(target=camera, daemon=True).start()
+    time.sleep(1.0)
+    return f"http://127.0.0.1:{port}", mode, len(frames[0])
+
+
+def print_row(label, r):
+    if not r.get("frames"):
+        print(f"{label:<18} no frames")
+        return
+    print(f"{label:<18} {r['frames']:>6} {r['fps']:>6.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+          f"{r['max_ms']:>8.1f} {r['drift_ms']:>9.1f} {r['dropped_pct']:>8.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--selftest", action="store_true", help="run against an in-process synthetic server")
+    parser.add_argument("--start", action="store_true", help="emit stream_start (real kiosk)")
+    parser.add_argument("--credits", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=8.0)
+    parser.add_argument("--link-kbps", type=float, default=4000, help="simulated link speed, 0 = unthrottled")
+    parser.add_argument("--fps", type=float, default=30.0, help="self-test camera rate")
+    args = parser.parse_args()
+
+    header = f"{'mode':<18} {'frames':>6} {'fps':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'drift ms':>9} {'dropped':>9}"
+    if not args.selftest:
+        print(header)
+        print_row(f"credits={args.credits}", run_client(args.url, args.credits, args.seconds, args.link_kbps, args.start))
+        return
+
+    url, mode, jpeg_size = start_selftest_server(args.fps)
+    print(f"synthetic camera {args.fps:.0f} fps, ~{jpeg_size / 1024:.0f} KB/frame "
+          f"({jpeg_size * 8 * args.fps / 1000:.0f} kbit/s) over a {args.link_kbps:.0f} kbit/s link\n")
+    print(header)
+    mode["push"] = True
+    print_row("push (no credits)", run_client(url, 1, args.seconds, args.link_kbps, ack=False))
+    mode["push"] = False
+    for credits in (1, 2, 4):
+        print_row(f"credits={credits}", run_client(url, credits, args.seconds, args.link_kbps))
+
+
+if __name__ == "__main__":
+    main()
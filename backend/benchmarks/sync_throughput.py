@@ -0,0 +1,84 @@
+"""
+Push queued measurement records through the reference collector.
+
+Starts module.sync.collector on a local port, fills an outbox with `--records`
+measurements, drains it with SyncWorker and checks every record arrived once.
+Midway the collector is stopped for `--outage` seconds to exercise backoff and
+resume from the persisted cursor.
+
+Run from backend/:
+    python -m benchmarks.sync_throughput --records 100000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from module.sync.collector import make_server
+from module.sync.sync_module import Outbox, SyncWorker
+
+
+def measurement(i):
+    return {"timestamp": "2025-11-25T14:30:22", "temp": 36.5 + (i % 10) / 10, "systolic": 110 + i % 30,
+            "diastolic": 70 + i % 20, "pulse": 60 + i % 40, "indicator": "c"}
+
+
+def serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8611)
+    parser.add_argument("--outage", type=float, default=2.0)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="mhr_sync_")
+    try:
+        outbox = Outbox(os.path.join(work, "outbox.sqlite3"))
+        t0 = time.perf_counter()
+        chunk = 5000
+        for start in range(0, args.records, chunk):
+            outbox.enqueue_many("measurement", [measurement(i) for i in range(start, min(args.records, start + chunk))])
+        print(f"enqueue: {args.records} records in {time.perf_counter() - t0:.2f}s")
+
+        collector_db = os.path.join(work, "collector.sqlite3")
+        server = make_server("127.0.0.1", args.port, collector_db)
+        serve(server)
+
+        worker = SyncWorker(outbox, f"http://127.0.0.1:{args.port}/ingest", "bench-kiosk",
+                            batch_size=args.batch_size, poll_interval=0.05, base_backoff=0.1, max_backoff=1.0)
+        t0 = time.perf_counter()
+        worker.start()
+
+        outage_done = args.outage <= 0
+        while outbox.pending_count():
+            if not outage_done and worker.uploaded >= args.records // 2:
+                server.shutdown()
+                server.server_close()
+                time.sleep(args.outage)
+                server = make_server("127.0.0.1", args.port, collector_db)
+                serve(server)
+                outage_done = True
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - t0
+        worker.stop()
+
+        received = server.store.count()
+        print(f"upload : {worker.uploaded} records in {elapsed:.2f}s ({worker.uploaded / elapsed:,.0f} records/s) "
+              f"incl. {args.outage:.1f}s outage")
+        print(f"collector rows: {received} (expected {args.records}) cursor={outbox.cursor()}")
+        server.shutdown()
+        server.server_close()
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Server CPU and bytes on the wire for the two ways of showing the live IR
+heatmap:
+
+    png     ir_heatmap over the 448x336 ROI, PNG-encoded per thermal frame
+            (the former per-frame static/irt_image/heatmap_images.png)
+    matrix  encode_matrix: 16x16 uint16 payload in a binary Socket.IO event
+            (irt_matrix), rendered by the client
+
+Sizes are full Socket.IO packets (text header + binary attachment) for the
+matrix and the PNG bytes alone for the old path, so the comparison favours
+the PNG. Also checks the reference decoder round trip.
+
+Run from backend/:
+    python -m benchmarks.thermal_channel_bench
+    python -m benchmarks.thermal_channel_bench --frames 500 --hz 8
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+from socketio import packet
+
+from benchmarks.emulators import synthetic_ir_frame
+from module.ir_thermal.heatmap import ir_heatmap
+from module.streaming.thermal_stream import MATRIX_EVENT, MATRIX_SCALE, decode_matrix, encode_matrix
+
+ROI_SIZE = (448, 336)       # calculate_centered_roi on the 640x480 IRT capture
+
+
+def inputs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    w, h = ROI_SIZE
+    rois, matrices = [], []
+    for i in range(n):
+        roi = np.full((h, w, 3), 90, np.uint8)
+        cv2.ellipse(roi, (w // 2 + int(rng.integers(-20, 20)), h // 2), (80, 110), 0, 0, 360, (150, 160, 190), -1)
+        roi += rng.integers(0, 4, roi.shape, dtype=np.uint8)     # sensor noise
+        rois.append(roi)
+        matrices.append(synthetic_ir_frame(face_temp=34.0 + rng.normal(0, 0.3), rng=rng))
+    return rois, matrices
+
+
+def bench_png(rois, matrices):
+    times, sizes = [], []
+    for roi, matrix in zip(rois, matrices):
+        t0 = time.process_time()
+        heatmap = ir_heatmap(roi, matrix)
+        ok, png = cv2.imencode(".png", heatmap)
+        times.append(time.process_time() - t0)
+        sizes.append(len(png))
+    return np.array(times), np.array(sizes)
+
+
+def bench_matrix(matrices):
+    times, sizes = [], []
+    for seq, matrix in enumerate(matrices):
+        t0 = time.process_time()
+        payload = {"seq": seq, "capture_ts": time.time(), "shape": [16, 16], "scale": MATRIX_SCALE,
+                   "face_box": [150, 90, 140, 160], "roi": list(ROI_SIZE), "data": encode_matrix(matrix)}
+        encoded = packet.Packet(packet.EVENT, data=[MATRIX_EVENT, payload]).encode()
+        times.append(time.process_time() - t0)
+        sizes.append(sum(len(part) for part in (encoded if isinstance(encoded, list) else [encoded])))
+    return np.array(times), np.array(sizes)
+
+
+def check_decoder(matrices):
+    worst = 0.0
+    for matrix in matrices:
+        decoded = decode_matrix(encode_matrix(matrix), matrix.shape)
+        worst = max(worst, float(np.abs(decoded - matrix).max()))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--hz", type=float, default=8.0, help="thermal frames per second shown to the user")
+    args = parser.parse_args()
+    cv2.setNumThreads(1)
+
+    rois, matrices = inputs(args.frames)
+    bench_png(rois[:10], matrices[:10])     # warm-up
+    results = {"png": bench_png(rois, matrices), "matrix": bench_matrix(matrices)}
+
+    print(f"{args.frames} thermal frames, {args.hz:.0f} Hz to one client\n")
+    print(f"{'path':<8} {'cpu p50 ms':>10} {'cpu p95 ms':>10} {'bytes/frame':>12} {'kB/s':>9} {'cpu %':>7}")
+    for name, (times, sizes) in results.items():
+        ms = times * 1000
+        print(f"{name:<8} {np.percentile(ms, 50):>10.3f} {np.percentile(ms, 95):>10.3f} {sizes.mean():>12.0f} "
+              f"{sizes.mean() * args.hz / 1000:>9.1f} {times.mean() * args.hz * 100:>6.2f}%")
+
+    png, matrix = results["png"], results["matrix"]
+    print(f"\nmatrix vs png: {png[0].mean() / matrix[0].mean():.0f}x less CPU, "
+          f"{png[1].mean() / matrix[1].mean():.0f}x fewer bytes")
+    print(f"reference decoder max abs error: {check_decoder(matrices):.3f} degC (quantization {MATRIX_SCALE})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Effective thermal frames/s and bytes per frame against the IR protocol emulator.
+
+Compares the read_temperature access pattern (full 256-register read, then a
+fixed 0.1 s sleep) with ThermalClient full / windowed / pipelined reads at a
+few baud rates. `--work-ms` simulates the camera + detection time per frame.
+
+Run from backend/:
+    python -m benchmarks.thermal_protocol_bench
+"""
+import argparse
+import time
+
+from benchmarks.emulators import ThermalSensorEmulator
+from module.ir_thermal.thermal_protocol import ThermalClient, encode_request, decode_registers
+
+
+def legacy_loop(ser, frames, work):
+    """Wire pattern of read_temperature: full request, blocking read, 0.1 s sleep."""
+    rx = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        ser.write(encode_request(1, 256))
+        response = ser.read(256 * 2 + 4)
+        rx += len(response)
+        decode_registers(response[2:-2])
+        time.sleep(0.1)
+        time.sleep(work)
+    elapsed = time.perf_counter() - start
+    return frames / elapsed, rx / frames, {}
+
+
+def client_loop(ser, frames, work, rows, pipeline):
+    client = ThermalClient(ser, stale_after=10.0)
+    got = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        if client.read_frame(rows, pipeline=pipeline) is not None:
+            got += 1
+        time.sleep(work)
+    elapsed = time.perf_counter() - start
+    bytes_per_frame = client.stats['bytes_rx'] / max(1, client.stats['frames'])
+    client.cancel()
+    return got / elapsed, bytes_per_frame, client.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--work-ms", type=float, default=20.0)
+    parser.add_argument("--bauds", default="115200,460800,921600")
+    args = parser.parse_args()
+    work = args.work_ms / 1000.0
+    face_window = (4, 11)   # rows under a typical face plus the centre patch
+
+    print(f"{'mode':<28}{'baud':>8}{'frames/s':>10}{'bytes/frame':>13}")
+    fps, bpf, _ = legacy_loop(ThermalSensorEmulator(115200), args.frames, work)
+    print(f"{'legacy read_temperature':<28}{115200:>8}{fps:>10.1f}{bpf:>13.0f}")
+
+    for baud in [int(b) for b in args.bauds.split(",")]:
+        for name, rows, pipeline in (
+            ("full, blocking", None, False),
+            ("full, pipelined", None, True),
+            ("window, pipelined", face_window, True),
+        ):
+            fps, bpf, _ = client_loop(ThermalSensorEmulator(baud), args.frames, work, rows, pipeline)
+            print(f"{name:<28}{baud:>8}{fps:>10.1f}{bpf:>13.0f}")
+
+    noisy = ThermalSensorEmulator(115200, timeout=0.05, garbage_rate=0.2, drop_rate=0.05, seed=1)
+    fps, bpf, stats = client_loop(noisy, args.frames, work, face_window, True)
+    print(f"{'window, noisy line':<28}{115200:>8}{fps:>10.1f}{bpf:>13.0f}  "
+          f"resyncs={stats['resyncs']} errors={stats['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+End-to-end visit time with simulated devices: sequential pages vs VisitOrchestrator.
+
+Device timings (seconds, scaled by --scale) approximate a kiosk:
+  irt    open serial + camera 1.5, measure 4.0
+  bp     GPIO + serial 1.0, cuff cycle 45.0, OCR 3.0
+  save   0.01
+  drawer Arduino reset on open 2.0, slide out 3.0
+
+Run from backend/:
+    python -m benchmarks.visit_orchestrator_bench --scale 0.05
+"""
+import argparse
+import time
+
+from module.session.orchestrator import Step, VisitOrchestrator, run_sequential
+
+
+def simulated_steps(scale):
+    def sleeper(seconds, value=None):
+        def fn(*args):
+            time.sleep(seconds * scale)
+            return value
+        return fn
+
+    return [
+        Step("irt", sleeper(4.0, 36.7), warm_up=sleeper(1.5)),
+        Step("bp", sleeper(48.0, {"systolic": 120, "diastolic": 80}), warm_up=sleeper(1.0)),
+        Step("save", sleeper(0.01, "saved"), deps=("irt", "bp")),
+        Step("drawer", sleeper(3.0, "open"), deps=("save",), warm_up=sleeper(2.0)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=0.05)
+    args = parser.parse_args()
+
+    _, sequential_s = run_sequential(simulated_steps(args.scale))
+
+    orchestrator = VisitOrchestrator(simulated_steps(args.scale))
+    results, errors = orchestrator.run()
+    assert not errors, errors
+
+    scale = args.scale
+    print(f"sequential : {sequential_s / scale:6.1f} s (simulated)")
+    print(f"orchestrated: {orchestrator.total_s / scale:6.1f} s (simulated)  "
+          f"speed-up {sequential_s / orchestrator.total_s:.2f}x")
+    for name, spans in orchestrator.report()["steps"].items():
+        parts = "  ".join(f"{key} {span[0] / scale:5.1f}-{span[1] / scale:5.1f}s" for key, span in spans.items())
+        print(f"    {name:<7} {parts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Core utilisation and API latency during a simulated concurrent IRT + BP
+session, with the device work in the Flask process (threads, as before)
+and in device worker processes (device_workers, MJPEG frames through the
+shared-memory ring).
+
+    irt   DualStreamCamera on FakePicamera2 at --fps: lores ROI view, IR
+          heatmap over the ROI, JPEG encode; irt_update / irt_data events per
+          frame, the MJPEG parts consumed like a /video_feed response
+    bp    synthetic BP display frames at --fps through the three
+          ROIPreprocessors (the OCR preprocessing), a bp_update event per frame
+    api   a client thread GETs /api/state (DeviceStateStore snapshot, fed
+          by the events above) every 20 ms over HTTP on a threaded server
+
+Reported: MJPEG frames/s reaching the app process, BP frames/s, API latency
+p50 / p99 / max, and the busy share of every core (/proc/stat).
+
+Run from backend/:
+    python -m benchmarks.worker_bench
+    python -m benchmarks.worker_bench --seconds 20 --fps 15
+"""
+import argparse
+import logging
+import threading
+import time
+import urllib.request
+
+import cv2
+import numpy as np
+from flask import Flask, jsonify
+from flask_socketio import SocketIO
+from werkzeug.serving import make_server
+
+from benchmarks.emulators import FakePicamera2, synthetic_bp_display, synthetic_ir_frame
+from device_state import DeviceStateStore
+from device_workers import DeviceWorker
+from module.blood_pressure.ocr_pipeline import DEFAULT_OCR_CONFIG, ROIPreprocessor
+from module.camera.dual_stream import DualStreamCamera
+from module.ir_thermal.heatmap import ir_heatmap
+from module.streaming.frame_stream import mjpeg_part
+from utils import calculate_centered_roi
+
+MAIN_SIZE = (640, 480)
+WORKLOADS = "benchmarks.worker_bench"     # not __name__: that is __main__ under -m
+
+
+# -------- device workloads (run in a thread or in a worker process) -------- #
+def simulated_irt(socketio, seconds, fps=30.0):
+    camera = DualStreamCamera(0, MAIN_SIZE, (320, 240), picam2=FakePicamera2(fps=fps))
+    camera.start()
+    rng = np.random.default_rng(0)
+    x, y, w, h = calculate_centered_roi(*MAIN_SIZE)
+    frames = 0
+    deadline = time.monotonic() + seconds
+    try:
+        while time.monotonic() < deadline:
+            captured = camera.capture()
+            frame = captured.main
+            view, _ = captured.detection_view((x, y, w, h))
+            cv2.GaussianBlur(view, (5, 5), 0)               # detector stand-in on the lores ROI
+            matrix = synthetic_ir_frame(rng=rng)
+            frame[y:y + h, x:x + w] = ir_heatmap(frame[y:y + h, x:x + w].copy(), matrix)
+            socketio.emit("irt_update", {"irt_state": {"state": "Meas."}, "irt_indicator": {"state": "m"}})
+            socketio.emit("irt_data", {"temp_max": round(float(matrix.max()), 1), "temp_result": ""})
+            ok, buffer = cv2.imencode(".jpg", frame)
+            frames += 1
+            yield mjpeg_part(buffer.tobytes())
+    finally:
+        camera.close()
+    return frames
+
+
+def simulated_bp_ocr(socketio, seconds, fps=30.0, n_frames=20):
+    rng = np.random.default_rng(1)
+    config = DEFAULT_OCR_CONFIG
+    preps = {name: ROIPreprocessor(config) for name in config["rois"]}
+    displays = []
+    for _ in range(n_frames):
+        bgr, _ = synthetic_bp_display(rng=rng)
+        displays.append(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY))
+    frames = 0
+    start = time.monotonic()
+    while time.monotonic() < start + seconds:
+        time.sleep(max(0.0, start + frames / fps - time.monotonic()))     # camera pace
+        luma = displays[frames % n_frames]
+        for name, (x1, x2, y1, y2) in config["rois"].items():
+            preps[name].process(luma[y1:y2, x1:x2])
+        socketio.emit("bp_update", {"bp_state": {"state": "Processing..", "msg": "INF.."}, "bp_indicator": {"state": "m"}})
+        frames += 1
+    return frames
+
+
+# -------- harness -------- #
+def cpu_times():
+    """Per-core (busy, total) jiffies from /proc/stat."""
+    cores = []
+    with open("/proc/stat") as f:
+        for line in f:
+            if line.startswith("cpu") and line[3].isdigit():
+                values = [int(v) for v in line.split()[1:]]
+                idle = values[3] + values[4]
+                cores.append((sum(values) - idle, sum(values)))
+    return cores
+
+
+def api_client(url, stop, latencies, period=0.02):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        with urllib.request.urlopen(url) as response:
+            response.read()
+        latencies.append((time.perf_counter() - t0) * 1000)
+        stop.wait(max(0.0, period - (time.perf_counter() - t0)))
+
+
+def run(mode, seconds, fps):
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode="threading")
+    store = DeviceStateStore().attach(socketio)
+
+    @app.get("/api/state")
+    def api_state():
+        return jsonify(store.snapshot())
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/state"
+
+    workers = {}
+    if mode == "workers":
+        workers = {"irt": DeviceWorker("irt", WORKLOADS, socketio, streams=("simulated_irt",)).start(),
+                   "bp": DeviceWorker("bp", WORKLOADS, socketio).start()}
+        for worker in workers.values():
+            worker.wait_ready()
+        irt_stream = lambda: workers["irt"].stream("simulated_irt", socketio, seconds, fps)
+        bp_run = lambda: workers["bp"].call("simulated_bp_ocr", socketio, seconds, fps)
+    else:
+        irt_stream = lambda: simulated_irt(socketio, seconds, fps)
+        bp_run = lambda: simulated_bp_ocr(socketio, seconds, fps)
+
+    out = {"irt_frames": 0, "bp_frames": 0}
+
+    def consume_irt():
+        for _ in irt_stream():
+            out["irt_frames"] += 1
+
+    def run_bp():
+        out["bp_frames"] = bp_run()
+
+    latencies, stop = [], threading.Event()
+    threads = [threading.Thread(target=consume_irt), threading.Thread(target=run_bp)]
+    client = threading.Thread(target=api_client, args=(url, stop, latencies))
+    before, t0 = cpu_times(), time.perf_counter()
+    client.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - t0
+    after = cpu_times()
+    stop.set()
+    client.join()
+    server.shutdown()
+    for worker in workers.values():
+        worker.stop()
+
+    out["cores"] = [100.0 * (b1 - b0) / max(1, t1 - t0) for (b0, t0), (b1, t1) in zip(before, after)]
+    out["irt_fps"] = out["irt_frames"] / wall
+    out["bp_fps"] = out["bp_frames"] / wall
+    out["latency"] = np.array(latencies)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--fps", type=float, default=30.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    print(f"{len(cpu_times())} cores, {args.seconds:g}s concurrent IRT ({args.fps:g} fps camera) + BP OCR session\n")
+    print(f"{'mode':<10} {'irt fps':>8} {'bp fps':>7} {'api p50':>8} {'p99':>8} {'max':>8}   core busy %")
+    for mode in ("inprocess", "workers"):
+        r = run(mode, args.seconds, args.fps)
+        lat = r["latency"]
+        print(f"{mode:<10} {r['irt_fps']:>8.1f} {r['bp_fps']:>7.1f} {np.percentile(lat, 50):>7.1f}ms "
+              f"{np.percentile(lat, 99):>7.1f}ms {lat.max():>7.1f}ms   "
+              + " ".join(f"{c:.0f}" for c in r["cores"]))
+
+
+if __name__ == "__main__":
+    main()
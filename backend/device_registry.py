@@ -0,0 +1,160 @@
+import time, threading, importlib
+from collections import OrderedDict
+from logging import info, error
+
+# ----------------------------
+#  DEVICE PLUGIN REGISTRY
+# ----------------------------
+#
+# Each device subsystem registers its Flask routes / Socket.IO handlers at
+# startup, but its module (picamera2, RPi.GPIO, pytesseract, serial ...) is only
+# imported the first time one of its functions is used, or by warm_up().
+#
+# use_workers() moves devices into their own processes (device_workers): the
+# module is then imported in the worker, and load() returns a proxy whose
+# functions run there.
+
+IMPORT_RETRY_S = 30.0      # a failed import is retried on use after this long
+
+
+class DeviceUnavailable(RuntimeError):
+    """The device module could not be imported on this machine."""
+
+
+class DevicePlugin:
+    def __init__(self, name, module_path, register):
+        self.name = name
+        self.module_path = module_path
+        self.register = register
+
+        self.module = None
+        self.worker = None
+        self.import_error = None
+        self.import_failed_at = None
+        self.import_s = None
+        self.register_s = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.module is not None or (self.worker is not None and self.worker.ready.is_set())
+
+    def _retry_due(self, failed_at):
+        return failed_at is not None and time.monotonic() - failed_at >= IMPORT_RETRY_S
+
+    def load(self):
+        """
+        Import the device module once; later calls return it. A failure is
+        re-raised until IMPORT_RETRY_S has passed, then the import is tried
+        again (a device plugged in or a library installed since).
+        """
+        if self.worker is not None:
+            if self.worker.import_error and self._retry_due(self.worker.import_failed_at):
+                self.worker.retry_import()
+            try:
+                proxy = self.worker.proxy()
+                self.import_error = None
+                return proxy
+            except (ImportError, RuntimeError) as e:
+                self.import_error = str(e)
+                raise DeviceUnavailable(f"{self.name}: {e}")
+        if self.module is not None:
+            return self.module
+        with self._lock:
+            if self.module is None and (self.import_error is None or self._retry_due(self.import_failed_at)):
+                t0 = time.perf_counter()
+                try:
+                    self.module = importlib.import_module(self.module_path)
+                    self.import_error = None
+                except Exception as e:
+                    self.import_error = f"{type(e).__name__}: {e}"
+                    self.import_failed_at = time.monotonic()
+                    error(f"Device '{self.name}' unavailable: {self.import_error}")
+                finally:
+                    self.import_s = time.perf_counter() - t0
+                    if self.module is not None:
+                        info(f"Device '{self.name}' loaded in {self.import_s * 1000:.0f} ms")
+        if self.module is None:
+            raise DeviceUnavailable(f"{self.name}: {self.import_error}")
+        return self.module
+
+    def lazy(self, attr):
+        """Callable that resolves `module.attr` on first use."""
+        def call(*args, **kwargs):
+            return getattr(self.load(), attr)(*args, **kwargs)
+        call.__name__ = attr
+        return call
+
+    def report(self):
+        return {
+            "module": self.module_path,
+            "loaded": self.loaded,
+            "register_ms": None if self.register_s is None else round(self.register_s * 1000, 2),
+            "import_ms": None if self.import_s is None else round(self.import_s * 1000, 1),
+            "error": self.import_error,
+            "worker": None if self.worker is None else self.worker.report(),
+        }
+
+
+class DeviceRegistry:
+    def __init__(self):
+        self.devices = OrderedDict()
+        self.created_at = time.perf_counter()
+        self.ready_s = None
+
+    def device(self, name, module_path):
+        """Decorator for `register(app, socketio, plugin)` functions."""
+        def decorator(register):
+            self.devices[name] = DevicePlugin(name, module_path, register)
+            return register
+        return decorator
+
+    def __getitem__(self, name):
+        return self.devices[name]
+
+    def init_app(self, app, socketio):
+        for plugin in self.devices.values():
+            t0 = time.perf_counter()
+            plugin.register(app, socketio, plugin)
+            plugin.register_s = time.perf_counter() - t0
+        self.ready_s = time.perf_counter() - self.created_at
+
+    def use_workers(self, socketio, streams=None, names=None):
+        """
+        Run devices (`names`, default all) in worker processes. `streams` maps a
+        device to its generator functions, which are streamed through the
+        worker's shared-memory ring.
+        """
+        from device_workers import DeviceWorker
+        for name, plugin in self.devices.items():
+            if names is None or name in names:
+                plugin.worker = DeviceWorker(name, plugin.module_path, socketio,
+                                             streams=(streams or {}).get(name, ())).start()
+
+    def stop_workers(self):
+        for plugin in self.devices.values():
+            if plugin.worker is not None:
+                plugin.worker.stop()
+
+    def warm_up(self, background=True):
+        """Import every device module now, in a background thread by default."""
+        def run():
+            for plugin in self.devices.values():
+                try:
+                    plugin.load()
+                except DeviceUnavailable:
+                    pass
+            info(f"Device warm-up done: {self.report()['devices']}")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="device-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def report(self):
+        return {
+            "app_ready_ms": None if self.ready_s is None else round(self.ready_s * 1000, 1),
+            "devices": {name: plugin.report() for name, plugin in self.devices.items()},
+        }
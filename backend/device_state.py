@@ -0,0 +1,188 @@
+import time, copy, threading
+from collections import deque, OrderedDict
+from flask import request
+from logging import info, error
+
+# ----------------------------
+#  DEVICE STATE STORE (snapshot on connect)
+# ----------------------------
+#
+# Every broadcast of a tracked event (irt_update, bp_update, irt_data, ...) goes
+# through DeviceStateStore.emit, which folds the payload into the latest state
+# of its device and stamps it with a global, monotonically increasing
+# `state_version`. Per device the store keeps the current session's state,
+# indicator, latest values, result URLs and the last payload of each event
+# (stamped like the live broadcast), plus a short history of finished sessions.
+#
+#   client -> server  connect            auth {state_version: n} (optional)
+#   server -> client  state_snapshot     {version, devices}             no / too old n
+#   server -> client  state_delta        {from, version, deltas: [...]} n still in the delta log
+#   <tracked event>                      payload + state_version,      live, after that
+#                                        state_session
+#
+# The snapshot / delta is sent under the same lock that orders the live
+# broadcasts, so a client applying it and then every live event with a higher
+# state_version is consistent; events with a lower version are stale.
+
+DELTA_LOG = 512             # deltas kept for reconnecting clients
+SESSION_HISTORY = 3         # finished sessions kept per device
+
+# event -> (device, kind)
+TRACKED_EVENTS = {
+    "irt_update": ("irt", "state"),
+    "irt_data": ("irt", "values"),
+    "irt_result": ("irt", "results"),
+    "bp_update": ("bp", "state"),
+    "bp_result": ("bp", "results"),
+    "mhr_status": ("drawer", "status"),
+    "visit_update": ("visit", "visit"),
+    "res_collect_face": ("face", "status"),
+    "res_collect_face_img": ("face", "values"),
+    "res_collect_face_preview": ("face", "results"),
+}
+# states that open a new measurement session for a device
+SESSION_START = {
+    "irt": ("Connecting",),
+    "bp": ("GPIO config",),
+    "face": ("Incomplete",),
+    "visit": ("visit_started",),
+}
+
+
+def _new_session(session_id):
+    return {"session": session_id, "started": time.time(), "updated": None, "version": 0,
+            "state": None, "indicator": None, "values": {}, "results": {}, "events": {}}
+
+
+class DeviceStateStore:
+    def __init__(self, delta_log=DELTA_LOG):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.devices = OrderedDict()        # device -> current session dict
+        self.history = {}                   # device -> deque of finished sessions
+        self.deltas = deque(maxlen=delta_log)
+        self.stats = {"snapshots": 0, "delta_syncs": 0, "events": 0}
+        self._emit = None
+
+    # -------- state -------- #
+    def _session(self, device, start=False):
+        current = self.devices.get(device)
+        if current is None or (start and current["updated"] is not None):
+            if current is not None:
+                self.history.setdefault(device, deque(maxlen=SESSION_HISTORY)).append(current)
+            current = self.devices[device] = _new_session(0 if current is None else current["session"] + 1)
+        return current
+
+    def apply(self, event, payload):
+        """Fold one tracked event into the store; returns the new version. Caller holds the lock."""
+        device, kind = TRACKED_EVENTS[event]
+        payload = payload if isinstance(payload, dict) else {"data": payload}
+
+        state = indicator = None
+        if kind == "state":
+            state = payload.get(f"{device}_state")
+            indicator = (payload.get(f"{device}_indicator") or {}).get("state")
+        elif kind == "status":
+            state = {"state": payload.get("status", payload.get("data"))}
+        elif kind == "visit":
+            state = {"state": payload.get("event")}
+        label = (state or {}).get("state")
+        session = self._session(device, start=label in SESSION_START.get(device, ()))
+
+        self.version += 1
+        if state is not None:
+            session["state"] = state
+        if indicator is not None:
+            session["indicator"] = indicator
+        if kind == "values":
+            session["values"].update(payload)
+        elif kind == "visit" and "step" in payload:
+            session["values"][payload["step"]] = {k: v for k, v in payload.items() if k != "step"}
+        elif kind == "results":
+            session["results"].update(payload)
+        session["events"][event] = {**payload, "state_version": self.version, "state_session": session["session"]}
+        session["updated"] = time.time()
+        session["version"] = self.version
+
+        self.deltas.append({"version": self.version, "device": device, "session": session["session"],
+                            "event": event, "payload": payload})
+        self.stats["events"] += 1
+        return self.version
+
+    def snapshot(self):
+        with self.lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        return {"version": self.version, "devices": copy.deepcopy(dict(self.devices))}
+
+    def device(self, name, history=False):
+        with self.lock:
+            current = copy.deepcopy(self.devices.get(name))
+            if not history:
+                return current
+            return {"current": current, "history": copy.deepcopy(list(self.history.get(name, ())))}
+
+    def sync_payload(self, since=None):
+        """(event, payload) that brings a client at version `since` up to date."""
+        with self.lock:
+            return self._sync_payload(since)
+
+    def _sync_payload(self, since):
+        if since is not None:
+            try:
+                since = int(since)
+            except (TypeError, ValueError):
+                since = None
+        oldest = self.deltas[0]["version"] if self.deltas else self.version + 1
+        if since is not None and oldest - 1 <= since <= self.version:
+            self.stats["delta_syncs"] += 1
+            return "state_delta", {"from": since, "version": self.version,
+                                   "deltas": [d for d in self.deltas if d["version"] > since]}
+        self.stats["snapshots"] += 1
+        return "state_snapshot", self._snapshot()
+
+    # -------- Socket.IO -------- #
+    def emit(self, event, *args, **kwargs):
+        """socketio.emit replacement: tracked broadcasts update the store and carry state_version."""
+        targeted = kwargs.get("to") is not None or kwargs.get("room") is not None
+        if event not in TRACKED_EVENTS or targeted or not args:
+            return self._emit(event, *args, **kwargs)
+        with self.lock:
+            try:
+                version = self.apply(event, args[0])
+            except Exception as e:
+                error(f"State store failed on {event}: {e}")
+                return self._emit(event, *args, **kwargs)
+            stamp = {"state_version": version, "state_session": self.devices[TRACKED_EVENTS[event][0]]["session"]}
+            payload = {**args[0], **stamp} if isinstance(args[0], dict) else args[0]
+            # Emitting under the lock keeps live events ordered with snapshots
+            return self._emit(event, payload, *args[1:], **kwargs)
+
+    def attach(self, socketio):
+        """Route socketio.emit through the store and answer connects with a snapshot / delta."""
+        self._emit = socketio.emit
+        socketio.emit = self.emit
+
+        def on_connect(auth=None):
+            since = auth.get("state_version") if isinstance(auth, dict) else None
+            sid = request.sid
+            with self.lock:
+                event, payload = self._sync_payload(since)
+                self._emit(event, payload, to=sid)
+
+        def on_state_sync(data=None):
+            # Explicit resync, e.g. after the client detects a version gap
+            return dict(zip(("event", "payload"), self.sync_payload((data or {}).get("state_version"))))
+
+        socketio.on_event("connect", on_connect)
+        socketio.on_event("state_sync", on_state_sync)
+        info("Device state store attached (snapshot on connect)")
+        return self
+
+    def report(self):
+        with self.lock:
+            return {"version": self.version, "devices": {name: {"session": s["session"], "version": s["version"],
+                                                                "state": s["state"], "indicator": s["indicator"]}
+                                                         for name, s in self.devices.items()},
+                    "delta_log": len(self.deltas), **self.stats}
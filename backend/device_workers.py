@@ -0,0 +1,490 @@
+import os, sys, time, socket, logging, importlib, threading, itertools, subprocess
+from multiprocessing.connection import Connection, wait
+from logging import info, error
+
+from shm_ring import FrameRing
+
+# ----------------------------
+#  DEVICE WORKER PROCESSES
+# ----------------------------
+#
+# Each device subsystem (irt, bp, drawer, face) can run in its own process,
+# so camera loops, OCR and busy serial waits use the other cores instead of
+# holding the GIL of the Flask / Socket.IO process.
+#
+#   parent -> worker   ("run", job, func, args, kwargs, streaming)   socketpair, small values
+#                      ("cancel",) / ("stop",)
+#   worker -> parent   ("ready", import_error)
+#                      ("event", event, args, kwargs)   re-emitted on the app's socketio
+#                      ("log", level, message)          into the app's log pipeline
+#                      ("done", job, result) / ("error", job, "Type: message")
+#   frames             worker -> FrameRing (shared memory) -> parent, never pickled
+#
+# The worker imports the device module and calls its functions by name. The
+# app's socketio, passed as an argument, is replaced in the worker by a proxy
+# whose emit() goes through the pipe. A generator function (`streams`) runs as
+# a stream: every yielded MJPEG part - or, with a frame_sink, every frame the
+# sink gets - goes into the worker's ring, and the parent gets a generator
+# reading the ring; its return value is the worker's.
+#
+# Workers are `python -m device_workers ...` subprocesses, not
+# multiprocessing children: spawn / forkserver would re-run app.py's module
+# code in every worker, and fork would copy the app's threads' locks. A
+# supervisor thread per worker dispatches its messages; a worker that exits
+# is restarted with backoff (RESTART_BACKOFF, from the start again once it
+# had run for HEALTHY_AFTER_S) and the job it was running
+# fails with WorkerError. A call that exceeds its timeout, or a stream that
+# does not stop when cancelled, gets the worker killed and restarted.
+
+SOCKETIO_ARG = "__mhr_socketio__"
+FRAME_SINK_ARG = "__mhr_frame_sink__"
+RESTART_BACKOFF = (0.5, 1.0, 2.0, 5.0, 10.0)
+HEALTHY_AFTER_S = 60.0      # a worker up this long restarts from the first backoff step again
+READY_TIMEOUT = 30.0
+BUSY_TIMEOUT = 5.0          # s a call waits for the worker's previous job
+RING_SLOTS = 4
+RING_SLOT_BYTES = 512 * 1024
+
+
+class WorkerError(RuntimeError):
+    """The job failed in the worker, or the worker died while running it."""
+
+
+class WorkerBusy(WorkerError):
+    """The worker is still running another job."""
+
+
+# -------- worker process side -------- #
+class _PipeSocketIO:
+    """socketio stand-in inside a worker: emit() goes to the parent."""
+
+    def __init__(self, send):
+        self._send = send
+
+    def emit(self, event, *args, **kwargs):
+        self._send(("event", event, args, kwargs))
+
+    def sleep(self, seconds=0):
+        time.sleep(seconds)
+
+
+class _PipeLogHandler(logging.Handler):
+    def __init__(self, send):
+        super().__init__()
+        self._send = send
+
+    def emit(self, record):
+        try:
+            self._send(("log", record.levelno, record.getMessage()))
+        except Exception:
+            pass
+
+
+def _cancelled(conn):
+    """A cancel / stop from the parent arrived (checked between frames)."""
+    while conn.poll():
+        message = conn.recv()
+        if message[0] in ("cancel", "stop"):
+            return message[0]
+    return None
+
+
+def _pump(generator, ring, conn, sink_mode):
+    """Run a device generator, its parts into the ring; returns (return value, cancel / stop / None)."""
+    try:
+        while True:
+            part = next(generator)
+            if not sink_mode:
+                ring.write(part)
+            reason = _cancelled(conn)
+            if reason:
+                generator.close()
+                return None, reason
+    except StopIteration as done:
+        return done.value, None
+
+
+def worker_main(module_path, fd, ring_spec, log_level=logging.INFO):
+    """Entry point of a worker process (see __main__ below)."""
+    conn = Connection(fd)
+    lock = threading.Lock()
+
+    def send(message):
+        with lock:
+            conn.send(message)
+
+    root = logging.getLogger()
+    root.handlers[:] = [_PipeLogHandler(send)]
+    root.setLevel(log_level)
+    try:
+        module = importlib.import_module(module_path)
+    except Exception as e:
+        send(("ready", f"{type(e).__name__}: {e}"))
+        return
+    ring = FrameRing.attach(ring_spec)
+    socketio = _PipeSocketIO(send)
+    send(("ready", None))
+
+    def frame_sink(jpeg, capture_ts, **meta):
+        ring.write(jpeg, capture_ts, meta)
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message[0] == "stop":
+            break
+        if message[0] != "run":
+            continue            # a cancel that came after its job ended
+        _, job, func, args, kwargs, streaming = message
+        swap = {SOCKETIO_ARG: socketio, FRAME_SINK_ARG: frame_sink}
+        args = [swap.get(a, a) if isinstance(a, str) else a for a in args]
+        kwargs = {k: swap.get(v, v) if isinstance(v, str) else v for k, v in kwargs.items()}
+        reason = None
+        try:
+            result = getattr(module, func)(*args, **kwargs)
+            if streaming:
+                result, reason = _pump(result, ring, conn, kwargs.get("frame_sink") is frame_sink)
+            send(("done", job, result))
+        except Exception as e:
+            send(("error", job, f"{type(e).__name__}: {e}"))
+        if reason == "stop":
+            break
+    ring.close()
+
+
+# -------- app process side -------- #
+class _Job:
+    def __init__(self, job_id, func):
+        self.id = job_id
+        self.func = func
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Stream:
+    """
+    What DeviceWorker.stream returns: iterates the worker's frames and, on
+    close(), stops the job. Unlike a bare generator, closing it before the
+    first frame (werkzeug does so when the client drops early) still cancels
+    the job and frees the worker.
+    """
+
+    def __init__(self, worker, job, frames):
+        self._worker = worker
+        self._job = job
+        self._frames = frames
+        self._started = False
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        self._started = True
+        return next(self._frames)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._started:
+            self._frames.close()            # runs _read_stream's finally
+        else:
+            self._worker._finish(self._job)
+
+    def __del__(self):
+        self.close()
+
+
+class WorkerProxy:
+    """Stands in for the device module: attribute access gives a function running in the worker."""
+
+    def __init__(self, worker):
+        self._worker = worker
+
+    def __getattr__(self, func):
+        if func.startswith("_"):
+            raise AttributeError(func)
+        worker = self._worker
+        if func in worker.streams:
+            call = lambda *args, **kwargs: worker.stream(func, *args, **kwargs)
+        else:
+            call = lambda *args, **kwargs: worker.call(func, *args, **kwargs)
+        call.__name__ = func
+        return call
+
+
+class DeviceWorker:
+    """
+    worker = DeviceWorker("bp", "module.blood_pressure.bp_module", socketio).start()
+    worker.call("bp_controller", socketio=socketio, measure_time="1", ...)   # runs in the worker
+    for part in worker.stream("irt_detect_cam", socketio=socketio, ...): ...
+    worker.proxy().bp_controller(...)                                        # same as call()
+    """
+
+    def __init__(self, name, module_path, socketio=None, streams=(),
+                 ring_slots=RING_SLOTS, ring_slot_bytes=RING_SLOT_BYTES):
+        self.name = name
+        self.module_path = module_path
+        self.socketio = socketio
+        self.streams = set(streams)
+        self.ring = FrameRing.create(ring_slots, ring_slot_bytes)
+        self.process = None
+        self.conn = None
+        self.ready = threading.Event()
+        self.import_error = None
+        self.import_failed_at = None
+        self.restarts = 0
+        self._backoff = 0           # index into RESTART_BACKOFF
+        self.started_at = None
+        self.stats = {"jobs": 0, "failed": 0, "events": 0, "timeouts": 0}
+        self._send_lock = threading.Lock()
+        self._busy = threading.Lock()
+        self._job = None
+        self._job_ids = itertools.count(1)
+        self._stopping = False
+        self._thread = None
+        self.logger = logging.getLogger(f"worker.{name}")
+
+    # -------- lifecycle -------- #
+    def _spawn(self):
+        parent_sock, child_sock = socket.socketpair()
+        self.ready.clear()
+        spec = self.ring.spec()
+        fd = child_sock.fileno()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "device_workers", self.module_path, str(fd), spec["name"],
+             str(spec["slots"]), str(spec["slot_bytes"]), str(logging.getLogger().getEffectiveLevel())],
+            pass_fds=(fd,), cwd=os.path.dirname(os.path.abspath(__file__)))
+        child_sock.close()
+        self.conn = Connection(parent_sock.detach())
+        self.started_at = time.time()
+        self._spawned_at = time.monotonic()
+        info(f"Worker '{self.name}' started (pid {self.process.pid})")
+
+    def _send(self, message):
+        with self._send_lock:
+            self.conn.send(message)
+
+    def start(self):
+        self._spawn()
+        self._thread = threading.Thread(target=self._supervise, name=f"worker-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stopping = True
+        try:
+            self._send(("stop",))
+        except (OSError, ValueError):
+            pass
+        if self.process is not None:
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.ring.close()
+
+    def retry_import(self):
+        """Start a new worker after an import failure (its supervisor has given up)."""
+        with self._send_lock:
+            if self.import_error is None or self._stopping or (self._thread and self._thread.is_alive()):
+                return
+            info(f"Worker '{self.name}': retrying the import of {self.module_path}")
+            self.import_error = None
+            self.conn.close()
+        self.start()
+
+    def restart(self, reason):
+        """Kill the worker; the supervisor starts a new one."""
+        error(f"Worker '{self.name}' restarted: {reason}")
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+
+    def _fail_job(self, message):
+        job = self._job
+        if job is not None and not job.done.is_set():
+            job.error = message
+            job.done.set()
+
+    def _supervise(self):
+        while not self._stopping:
+            try:
+                if wait([self.conn], timeout=1.0):
+                    self._dispatch(self.conn.recv())
+                    continue
+                if self.process.poll() is None:
+                    continue
+            except (EOFError, OSError):
+                pass                    # the worker closed its end: it is exiting
+            self.process.wait()
+            if self._stopping or self.import_error is not None:
+                break                   # nothing to restart: the module does not import here
+            self.ready.clear()
+            code = self.process.returncode
+            self._fail_job(f"worker '{self.name}' died (exit code {code})")
+            if time.monotonic() - self._spawned_at >= HEALTHY_AFTER_S:
+                self._backoff = 0       # an occasional crash, not a crash loop
+            delay = RESTART_BACKOFF[min(self._backoff, len(RESTART_BACKOFF) - 1)]
+            self._backoff += 1
+            self.restarts += 1
+            error(f"Worker '{self.name}' exited with {code}; restart {self.restarts} in {delay:.1f}s")
+            time.sleep(delay)
+            if not self._stopping:
+                self.conn.close()
+                self._spawn()
+
+    def _dispatch(self, message):
+        kind = message[0]
+        if kind == "event":
+            _, event, args, kwargs = message
+            self.stats["events"] += 1
+            if self.socketio is not None:
+                self.socketio.emit(event, *args, **kwargs)
+        elif kind == "log":
+            self.logger.log(message[1], message[2])
+        elif kind == "ready":
+            self.import_error = message[1]
+            if self.import_error:
+                self.import_failed_at = time.monotonic()
+                error(f"Worker '{self.name}' cannot import {self.module_path}: {self.import_error}")
+            self.ready.set()
+        elif kind in ("done", "error"):
+            job = self._job
+            if job is None or job.id != message[1]:
+                return
+            if kind == "done":
+                job.result = message[2]
+            else:
+                job.error = message[2]
+                self.stats["failed"] += 1
+            job.done.set()
+
+    # -------- jobs -------- #
+    def wait_ready(self, timeout=READY_TIMEOUT):
+        """True once the worker has imported its module; raises if that failed."""
+        if not self.ready.wait(timeout) and not self.import_error:
+            return False
+        if self.import_error:
+            raise ImportError(self.import_error)
+        return True
+
+    def _encode(self, args, kwargs, frame_sink=None):
+        swap = lambda v: SOCKETIO_ARG if (v is self.socketio and v is not None) else v
+        args = [swap(a) for a in args]
+        kwargs = {k: swap(v) for k, v in kwargs.items()}
+        if frame_sink is not None:
+            kwargs["frame_sink"] = FRAME_SINK_ARG
+        return args, kwargs
+
+    def _submit(self, func, args, kwargs, streaming):
+        if not self._busy.acquire(timeout=BUSY_TIMEOUT):
+            raise WorkerBusy(f"worker '{self.name}' is busy with {self._job.func if self._job else '?'}")
+        try:
+            if not self.wait_ready():
+                raise WorkerError(f"worker '{self.name}' not ready")
+            job = self._job = _Job(next(self._job_ids), func)
+            self.stats["jobs"] += 1
+            try:
+                self._send(("run", job.id, func, args, kwargs, streaming))
+            except (OSError, ValueError) as e:
+                raise WorkerError(f"worker '{self.name}' unreachable: {e}")
+            return job
+        except BaseException:
+            self._busy.release()
+            raise
+
+    def _release(self):
+        self._job = None
+        self._busy.release()
+
+    def _result(self, job):
+        if job.error:
+            raise WorkerError(f"{self.name}.{job.func}: {job.error}")
+        return job.result
+
+    def call(self, func, *args, timeout=None, **kwargs):
+        """Run module function `func` in the worker and return its result."""
+        args, kwargs = self._encode(args, kwargs)
+        job = self._submit(func, args, kwargs, streaming=False)
+        try:
+            if not job.done.wait(timeout):
+                self.stats["timeouts"] += 1
+                self.restart(f"{func} exceeded {timeout}s")
+                job.done.wait()
+        finally:
+            self._release()
+        return self._result(job)
+
+    def stream(self, func, *args, **kwargs):
+        """
+        Generator over a device generator running in the worker: yields what it
+        yields (MJPEG parts), read from the shared-memory ring. With a
+        frame_sink=callable kwarg, the sink is called here with each frame
+        (jpeg, capture_ts, **meta) and the JPEGs are yielded.
+        """
+        frame_sink = kwargs.pop("frame_sink", None)
+        args, kwargs = self._encode(args, kwargs, frame_sink)
+        seq = self.ring.seq
+        job = self._submit(func, args, kwargs, streaming=True)
+        return _Stream(self, job, self._read_stream(job, seq, frame_sink))
+
+    def _read_stream(self, job, seq, frame_sink):
+        try:
+            while True:
+                frame = self.ring.read_after(seq, timeout=0.25)
+                if frame is None:
+                    if job.done.is_set() and self.ring.seq <= seq:
+                        break
+                    continue
+                seq = frame.seq
+                if frame_sink is not None:
+                    frame_sink(frame.payload, frame.ts, **frame.meta)
+                yield frame.payload
+        finally:
+            self._finish(job)
+        return self._result(job)
+
+    def _finish(self, job):
+        if not job.done.is_set():
+            # The client went away: stop the device loop, it cleans up in the worker
+            try:
+                self._send(("cancel",))
+            except (OSError, ValueError):
+                pass
+            if not job.done.wait(BUSY_TIMEOUT):
+                self.restart(f"{job.func} did not stop when cancelled")
+                job.done.wait()
+        self._release()
+
+    def proxy(self):
+        if not self.wait_ready():
+            raise WorkerError(f"worker '{self.name}' not ready")
+        return WorkerProxy(self)
+
+    def report(self):
+        process = self.process
+        return {"pid": process.pid if process else None, "alive": bool(process and process.poll() is None),
+                "restarts": self.restarts, "busy": self._job.func if self._job else None,
+                "import_error": self.import_error, "ring": self.ring.report(), **self.stats}
+
+
+def start_workers(specs, socketio=None):
+    """{name: (module_path, streams)} -> {name: DeviceWorker}, all started."""
+    return {name: DeviceWorker(name, module_path, socketio, streams).start()
+            for name, (module_path, streams) in specs.items()}
+
+
+if __name__ == "__main__":
+    # python -m device_workers <module> <fd> <ring name> <slots> <slot bytes> <log level>
+    module_path, fd, ring_name, slots, slot_bytes, level = sys.argv[1:7]
+    worker_main(module_path, int(fd), {"name": ring_name, "slots": int(slots), "slot_bytes": int(slot_bytes)},
+                int(level))
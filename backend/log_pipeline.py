@@ -0,0 +1,178 @@
+import os, queue, atexit, logging
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+
+import coloredlogs
+
+# ----------------------------
+#  ASYNC, SAMPLED LOGGING
+# ----------------------------
+#
+# Hot device loops only create a LogRecord and enqueue it; a listener thread
+# formats it (ANSI via coloredlogs) and writes the console. Messages use
+# %-style arguments, so formatting happens on the listener thread too; pass
+# values that are not mutated afterwards.
+#
+# Modes (MHR_LOG_MODE):
+#   full     every record reaches the console
+#   sampled  debug lines are rate limited per call site (default)
+#   off      warnings and errors only; debug / info calls return immediately
+#
+# Every record that passes the root level is also kept, unformatted, in a
+# bounded ring (EventRing) that can be dumped after a failed session.
+
+LOG_FORMAT = "%(asctime)s - %(hostname)s:%(username)s:%(programname)s - %(levelname)s: %(message)s"
+LOG_MODES = ("full", "sampled", "off")
+QUEUE_SIZE = 10000
+RING_SIZE = 2000
+
+
+class LazyQueueHandler(QueueHandler):
+    """Enqueue records unformatted; drop (and count) them if the listener falls behind."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class CallSiteSampler(logging.Filter):
+    """
+    Limits records at or below `level` per call site (file:line): 1 in `every`,
+    then at most `per_second` on average with bursts of `burst`. A call can
+    override both with extra={"log_every": n, "log_per_second": r}. The next
+    record let through says how many were suppressed.
+    """
+
+    def __init__(self, level=logging.DEBUG, per_second=1.0, every=1, burst=3):
+        super().__init__()
+        self.level = level
+        self.per_second = per_second
+        self.every = every
+        self.burst = burst
+        self.sites = {}         # (path, line) -> [tokens, last, seen, suppressed]
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+        key = (record.pathname, record.lineno)
+        site = self.sites.get(key)
+        if site is None:
+            site = self.sites[key] = [self.burst, record.created, 0, 0]
+        site[2] += 1
+
+        every = getattr(record, "log_every", self.every)
+        if every > 1 and site[2] % every:
+            site[3] += 1
+            return False
+        rate = getattr(record, "log_per_second", self.per_second)
+        site[0] = min(self.burst, site[0] + (record.created - site[1]) * rate)
+        site[1] = record.created
+        if site[0] < 1:
+            site[3] += 1
+            return False
+        site[0] -= 1
+
+        if site[3]:
+            record.msg = f"{record.msg} (+{site[3]} suppressed)"
+            site[3] = 0
+        return True
+
+
+class EventRing(logging.Handler):
+    """The last `size` records, kept unformatted until dump()."""
+
+    def __init__(self, size=RING_SIZE):
+        super().__init__(logging.DEBUG)
+        self.records = deque(maxlen=size)
+
+    def handle(self, record):
+        # deque.append is atomic: no handler lock, no formatting
+        self.records.append(record)
+        return True
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def dump(self, limit=None, level=logging.DEBUG, name=None):
+        records = [r for r in list(self.records)
+                   if r.levelno >= level and (name is None or r.name.startswith(name))]
+        if limit:
+            records = records[-limit:]
+        events = []
+        for r in records:
+            try:
+                message = r.getMessage()
+            except Exception as e:
+                message = f"{r.msg!r} % {r.args!r} ({e})"
+            events.append({
+                "ts": round(r.created, 3),
+                "level": r.levelname,
+                "logger": r.name,
+                "where": f"{r.module}:{r.lineno}",
+                "thread": r.threadName,
+                "message": message,
+            })
+        return events
+
+
+class LogPipeline:
+    def __init__(self, mode, queue_handler, listener, ring):
+        self.mode = mode
+        self.queue_handler = queue_handler
+        self.listener = listener
+        self.ring = ring
+
+    def report(self):
+        return {"mode": self.mode, "queued": self.queue_handler.queue.qsize(),
+                "dropped": self.queue_handler.dropped, "ring": len(self.ring.records)}
+
+    def close(self):
+        """Flush the queue and detach from the root logger."""
+        root = logging.getLogger()
+        for handler in (self.queue_handler, self.ring):
+            root.removeHandler(handler)
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+
+def setup_logging(mode=None, fmt=LOG_FORMAT, **coloredlogs_kwargs):
+    """Route the root logger through a queue to a coloredlogs console handler."""
+    mode = mode or os.environ.get("MHR_LOG_MODE", "sampled")
+    if mode not in LOG_MODES:
+        raise ValueError(f"Unknown log mode {mode!r}, expected one of {LOG_MODES}")
+
+    # coloredlogs builds the console handler (ANSI, hostname / program fields) on a
+    # private logger; the handler is then moved to the listener thread
+    sink = logging.getLogger("mhr.console")
+    sink.propagate = False
+    coloredlogs.install(level="debug", fmt=fmt, logger=sink, **coloredlogs_kwargs)
+    console = list(sink.handlers)
+    for handler in console:
+        sink.removeHandler(handler)
+
+    queue_handler = LazyQueueHandler(queue.Queue(QUEUE_SIZE))
+    if mode == "sampled":
+        queue_handler.addFilter(CallSiteSampler())
+    listener = QueueListener(queue_handler.queue, *console, respect_handler_level=True)
+    listener.start()
+    ring = EventRing()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.addHandler(ring)
+    root.setLevel(logging.WARNING if mode == "off" else logging.DEBUG)
+
+    pipeline = LogPipeline(mode, queue_handler, listener, ring)
+    atexit.register(pipeline.close)
+    return pipeline
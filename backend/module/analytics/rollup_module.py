@@ -0,0 +1,271 @@
+import csv, threading
+import numpy as np
+
+from logging import info, error
+
+# ----------------------------
+#  MEASUREMENT ROLLUPS
+# ----------------------------
+#
+# Every measurement is folded into three bucket families: per day, per user and
+# per (user, day). Each bucket keeps count / sum / min / max and a fixed-bin
+# histogram per metric in NumPy arrays, so mean, percentiles and threshold
+# exceedance come out in O(bins) per bucket, independent of the row count.
+
+METRICS = ("temp", "systolic", "diastolic", "pulse")
+
+# (low, high, bin width) per metric; values outside are clamped into the edge bins
+HIST_RANGES = {
+    "temp": (30.0, 45.0, 0.1),
+    "systolic": (40.0, 260.0, 1.0),
+    "diastolic": (20.0, 180.0, 1.0),
+    "pulse": (20.0, 240.0, 1.0),
+}
+
+ANONYMOUS = "_"
+
+
+class RollupTable:
+    """
+    Buckets of one family (e.g. per day), grown by doubling. Histograms cost
+    ~2.5 KB per bucket, so fine-grained families can be kept without them
+    (no percentiles / exceedance there).
+    """
+
+    def __init__(self, capacity=64, with_hist=True):
+        self.index = {}
+        self.keys = []
+        m = len(METRICS)
+        self.count = np.zeros((capacity, m), dtype=np.int64)
+        self.sum = np.zeros((capacity, m), dtype=np.float64)
+        self.min = np.full((capacity, m), np.inf)
+        self.max = np.full((capacity, m), -np.inf)
+        self.hist = {
+            name: np.zeros((capacity, _bins(name)), dtype=np.int32) for name in METRICS
+        } if with_hist else None
+
+    def row(self, key):
+        idx = self.index.get(key)
+        if idx is not None:
+            return idx
+        idx = len(self.keys)
+        if idx == len(self.count):
+            self._grow()
+        self.index[key] = idx
+        self.keys.append(key)
+        return idx
+
+    def _grow(self):
+        n = len(self.count)
+        self.count = np.concatenate([self.count, np.zeros_like(self.count)])
+        self.sum = np.concatenate([self.sum, np.zeros_like(self.sum)])
+        self.min = np.concatenate([self.min, np.full_like(self.min, np.inf)])
+        self.max = np.concatenate([self.max, np.full_like(self.max, -np.inf)])
+        for name in (self.hist or ()):
+            self.hist[name] = np.concatenate([self.hist[name], np.zeros_like(self.hist[name])])
+        info(f"Rollup table grown to {2 * n} buckets")
+
+    def add(self, rows, values):
+        """
+        Fold measurements into buckets. `rows` is an (N,) bucket index array and
+        `values` an (N, len(METRICS)) float array with NaN for missing metrics.
+        """
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        for m, name in enumerate(METRICS):
+            mask = present[:, m]
+            if not mask.any():
+                continue
+            r, v = rows[mask], filled[mask, m]
+            np.add.at(self.count[:, m], r, 1)
+            np.add.at(self.sum[:, m], r, v)
+            np.minimum.at(self.min[:, m], r, v)
+            np.maximum.at(self.max[:, m], r, v)
+            if self.hist is not None:
+                np.add.at(self.hist[name], (r, _bin_index(name, v)), 1)
+
+    def add_one(self, row, values):
+        """Scalar fast path of add() for a single live measurement."""
+        for m, name in enumerate(METRICS):
+            v = values[m]
+            if v != v:      # NaN
+                continue
+            self.count[row, m] += 1
+            self.sum[row, m] += v
+            if v < self.min[row, m]:
+                self.min[row, m] = v
+            if v > self.max[row, m]:
+                self.max[row, m] = v
+            if self.hist is not None:
+                self.hist[name][row, _bin_scalar(name, v)] += 1
+
+    def stats(self, key, percentiles=(50, 90, 95), metrics=METRICS):
+        idx = self.index.get(key)
+        if idx is None:
+            return None
+        out = {}
+        for name in metrics:
+            m = METRICS.index(name)
+            n = int(self.count[idx, m])
+            if n == 0:
+                out[name] = {"count": 0}
+                continue
+            out[name] = {
+                "count": n,
+                "mean": round(self.sum[idx, m] / n, 2),
+                "min": float(self.min[idx, m]),
+                "max": float(self.max[idx, m]),
+            }
+            if self.hist is not None:
+                out[name].update({f"p{p}": _hist_percentile(name, self.hist[name][idx], p) for p in percentiles})
+        return out
+
+    def exceedance_all(self, metric, threshold):
+        """Readings of `metric` strictly above `threshold` (bin resolution), for every bucket."""
+        low, _, width = HIST_RANGES[metric]
+        first = max(0, int(np.floor((threshold - low) / width + 1e-9)) + 1)
+        return self.hist[metric][:len(self.keys), first:].sum(axis=1)
+
+    def exceedance(self, key, metric, threshold):
+        idx = self.index.get(key)
+        if idx is None:
+            return 0
+        low, _, width = HIST_RANGES[metric]
+        first = max(0, int(np.floor((threshold - low) / width + 1e-9)) + 1)
+        return int(self.hist[metric][idx, first:].sum())
+
+
+def _bins(name):
+    low, high, width = HIST_RANGES[name]
+    return int(round((high - low) / width)) + 1
+
+
+_BINS = {name: _bins(name) for name in METRICS}
+
+
+def _bin_index(name, values):
+    low, _, width = HIST_RANGES[name]
+    idx = np.floor((np.asarray(values) - low) / width + 1e-9).astype(np.int64)
+    return np.clip(idx, 0, _bins(name) - 1)
+
+
+def _bin_scalar(name, value):
+    low, _, width = HIST_RANGES[name]
+    return min(max(int((value - low) / width + 1e-9), 0), _BINS[name] - 1)
+
+
+def _hist_percentile(name, hist, p):
+    low, _, width = HIST_RANGES[name]
+    cum = np.cumsum(hist)
+    target = p / 100.0 * cum[-1]
+    b = int(np.searchsorted(cum, target, side="left"))
+    return round(low + b * width, 2)
+
+
+class MeasurementRollups:
+    """Per-day, per-user and per-(user, day) rollups of value.csv."""
+
+    def __init__(self):
+        self.by_day = RollupTable()
+        self.by_user = RollupTable()
+        self.by_user_day = RollupTable(with_hist=False)
+        self.user_days = {}
+        self.rows = 0
+        self._lock = threading.Lock()
+
+    def add_many(self, records):
+        """records: iterable of (timestamp_iso, user_id, temp, systolic, diastolic, pulse)."""
+        records = list(records)
+        if not records:
+            return
+        values = np.array([[_to_float(v) for v in r[2:6]] for r in records], dtype=np.float64)
+        with self._lock:
+            day_rows, user_rows, user_day_rows = [], [], []
+            for ts, user, *_ in records:
+                day = (ts or "")[:10]
+                user = user or ANONYMOUS
+                day_rows.append(self.by_day.row(day))
+                user_rows.append(self.by_user.row(user))
+                user_day_rows.append(self.by_user_day.row((user, day)))
+                self.user_days.setdefault(user, set()).add(day)
+            self.by_day.add(np.asarray(day_rows), values)
+            self.by_user.add(np.asarray(user_rows), values)
+            self.by_user_day.add(np.asarray(user_day_rows), values)
+            self.rows += len(records)
+
+    def add(self, timestamp, user_id, temp, systolic, diastolic, pulse):
+        values = [_to_float(v) for v in (temp, systolic, diastolic, pulse)]
+        day = (timestamp or "")[:10]
+        user = user_id or ANONYMOUS
+        with self._lock:
+            self.by_day.add_one(self.by_day.row(day), values)
+            self.by_user.add_one(self.by_user.row(user), values)
+            self.by_user_day.add_one(self.by_user_day.row((user, day)), values)
+            self.user_days.setdefault(user, set()).add(day)
+            self.rows += 1
+
+    def summary(self, user=None, day=None):
+        with self._lock:
+            if user and day:
+                return self.by_user_day.stats((user, day))
+            if user:
+                return self.by_user.stats(user)
+            if day:
+                return self.by_day.stats(day)
+            return None
+
+    def trend(self, user, metric):
+        """Per-day count / mean / min / max of one metric for a user."""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric}")
+        with self._lock:
+            series = []
+            for day in sorted(self.user_days.get(user, ())):
+                stats = self.by_user_day.stats((user, day), metrics=(metric,))[metric]
+                if stats["count"]:
+                    series.append({"day": day, **stats})
+            return series
+
+    def exceedance(self, metric, threshold, by="day", user=None):
+        """Readings above `threshold` per day or per user bucket, or for one user."""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric}")
+        with self._lock:
+            if user:
+                return {user: self.by_user.exceedance(user, metric, threshold)}
+            table = self.by_user if by == "user" else self.by_day
+            counts = table.exceedance_all(metric, threshold)
+            return dict(zip(table.keys, counts.tolist()))
+
+    def load_csv(self, path, chunk=50_000):
+        """Rebuild from value.csv (timestamp, temp, systolic, diastolic, pulse, indicator[, user_id])."""
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                batch = []
+                for row in reader:
+                    if len(row) < 5:
+                        continue
+                    user = row[6] if len(row) > 6 else ""
+                    batch.append((row[0], user, row[1], row[2], row[3], row[4]))
+                    if len(batch) >= chunk:
+                        self.add_many(batch)
+                        batch = []
+                self.add_many(batch)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            error(f"Failed to build measurement rollups from {path}: {e}")
+        info(f"Measurement rollups ready: {self.rows} rows, {len(self.by_day.keys)} days, "
+             f"{len(self.by_user.keys)} users")
+        return self
+
+
+def _to_float(value):
+    if value is None or value == "":
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
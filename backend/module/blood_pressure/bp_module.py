@@ -1,22 +1,29 @@
-from logging import info, error
+from logging import info, error, debug
 from flask_socketio import SocketIO
 from typing import Dict, Any, Tuple
 
 import serial #type:ignore
-import RPi.GPIO as GPIO 
 
-import pytesseract as tess
 import cv2, time, os
 import numpy as np
-from collections import Counter
 from picamera2 import Picamera2, CameraConfiguration #type:ignore
 
 from utils import clear_and_ensure_folder
-
-tess.pytesseract.tesseract_cmd = r'/usr/bin/tesseract'
+from module.blood_pressure.gpio_service import get_gpio_service, HIGH, RELAY_PRESS
+from module.snapshots.snapshot_module import save_snapshot, save_snapshots
+from module.blood_pressure.ocr_engine import engine_for
+from module.blood_pressure.ocr_pipeline import (
+    DEFAULT_OCR_CONFIG, ROIPreprocessor, load_ocr_config, read_roi, scale_config, push_reading, verify_value
+)
+from module.blood_pressure.display_localizer import DisplayLocalizer
 
 bp_emp_data = {"systolic": 0, "diastolic": 0}
 
+ROI_COLORS = {"sys": (0, 255, 0), "dia": (255, 0, 255), "pulse": (255, 255, 0)}
+CAPTURE_SIZE = (640, 480)
+RELOCALIZE_AFTER = 15       # frames without any digit before the display is searched again
+THUMB_WIDTH = 160
+
 def initialize_serial(usb_port):
     try:
         connection = serial.Serial(
@@ -30,35 +37,6 @@ def initialize_serial(usb_port):
         error(f"Failed to initialize serial connection on {usb_port}: {e}")
         raise
 
-def save_image(region, filename):
-    cv2.imwrite(filename, region)
-def ensure_gpio_bcm():
-    """
-    Ensure GPIO is in BCM mode.
-    Handles weird states like mode == -1 from the RPi lib.
-    """
-    mode = GPIO.getmode()
-
-    # Some libs return -1 for "no mode / unknown"
-    if mode not in (GPIO.BCM, GPIO.BOARD, None):
-        # Bad/unknown mode → reset
-        info(f"GPIO.getmode() returned unexpected value {mode}, calling GPIO.cleanup()")
-        try:
-            GPIO.cleanup()
-        except Exception as e:
-            error(f"GPIO.cleanup() in ensure_gpio_bcm failed: {e}")
-        mode = None
-
-    if mode is None:
-        # Fresh start → choose BCM for this project
-        GPIO.setmode(GPIO.BCM)
-    elif mode == GPIO.BOARD:
-        # Another module previously set BOARD → reset & switch to BCM
-        info("GPIO mode is BOARD, switching to BCM via cleanup()")
-        GPIO.cleanup()
-        GPIO.setmode(GPIO.BCM)
-    # if mode == GPIO.BCM: nothing to do
-
 def bp_gpio_setup(socketio, RELAY_1, RELAY_2):
     try:
         info("Starting BP GPIO Configuration")
@@ -67,23 +45,17 @@ def bp_gpio_setup(socketio, RELAY_1, RELAY_2):
             'bp_indicator': {'state': 'm'}
         })
 
-        # ---- Normalize GPIO mode and set BCM ----
-        ensure_gpio_bcm()
+        # ---- Pin ownership and BCM mode live in the GPIO service ----
+        gpio = get_gpio_service()
 
         socketio.emit('bp_update', {
             'bp_state': {'state': 'GPIO setup'},
             'bp_indicator': {'state': 'm'}
         })
 
-        # ---- Set up GPIO pins ----
-        GPIO.setup(RELAY_1, GPIO.OUT)
-        GPIO.setup(RELAY_2, GPIO.OUT)
-
         # Assume active-low relay → HIGH = off
-        GPIO.output(RELAY_1, GPIO.HIGH)
-        GPIO.output(RELAY_2, GPIO.HIGH)
-
-        time.sleep(1)
+        gpio.setup_output(RELAY_1, HIGH)
+        gpio.setup_output(RELAY_2, HIGH)
 
         info("BP GPIO Configuration Completed!")
         socketio.emit('bp_update', {
@@ -101,49 +73,40 @@ def bp_gpio_setup(socketio, RELAY_1, RELAY_2):
         })
         raise
 
-def bp_gpio_clear(RELAY_1=None, RELAY_2=None, cleanup=True):
+def bp_gpio_clear(RELAY_1=None, RELAY_2=None):
+    """Let queued relay pulses finish, then switch the relays off and release the pins."""
     try:
-        mode = GPIO.getmode()
-        # If no mode / invalid mode, there's nothing meaningful to do
-        if mode is None or mode == -1:
-            info("bp_gpio_clear: GPIO mode is None/-1, skipping outputs and cleanup")
-            return
-
-        # Safely switch relays off if pins and mode exist
-        if RELAY_1 is not None:
-            GPIO.output(RELAY_1, GPIO.HIGH)
-        if RELAY_2 is not None:
-            GPIO.output(RELAY_2, GPIO.HIGH)
-
-        if cleanup:
-            GPIO.cleanup()  # resets mode to None
+        pins = [pin for pin in (RELAY_1, RELAY_2) if pin is not None]
+        get_gpio_service().release(pins)
         info("BP GPIO cleanup completed.")
     except Exception as e:
         error(f"GPIO cleanup error: {e}")
 
-
-        
 def relay_control(socketio, relay, RELAY_1=17, RELAY_2=18):
+    """Queue a HIGH-LOW-HIGH press on the relay; returns immediately."""
     relay_pin = RELAY_1 if relay == 1 else RELAY_2
     try:
-        GPIO.output(relay_pin, GPIO.HIGH)
-        time.sleep(0.5)
-        GPIO.output(relay_pin, GPIO.LOW)
-        time.sleep(0.5)
-        GPIO.output(relay_pin, GPIO.HIGH)
+        handle = get_gpio_service().pulse(relay_pin, RELAY_PRESS)
         socketio.emit('bp_update', {
                 'bp_state': {'state': f'Trigger GPIO {relay_pin}'},
                 'bp_indicator': {'state': 'm'}
         })
-        
+        return handle
     except Exception as e:
         info(f"Error controlling relay {relay}: {e}")
 
-def receive_state(serial_port, BUFFER_SIZE=5):
-    if serial_port.in_waiting >= BUFFER_SIZE:
-        hex_data = serial_port.read(BUFFER_SIZE)
-        return ''.join(chr(b) if 32 <= b <= 126 else '.' for b in hex_data)
-    return ""
+def receive_state(serial_port, BUFFER_SIZE=5, pending=None):
+    """
+    Block on the serial port (up to its timeout) for the next state token.
+    Bytes of an incomplete token are kept in `pending` for the next call.
+    """
+    pending = bytearray() if pending is None else pending
+    pending += serial_port.read(BUFFER_SIZE - len(pending))
+    if len(pending) < BUFFER_SIZE:
+        return ""
+    hex_data = bytes(pending)
+    pending.clear()
+    return ''.join(chr(b) if 32 <= b <= 126 else '.' for b in hex_data)
 
 def bp_process_state(socketio, state, bp_states, state_size=6):
     required_states = ["INF..", "DEF..", "EXH.."]
@@ -195,23 +158,23 @@ def bp_control(socketio, usb_port):
             relay_control(socketio, 1)
             
             bp_states = []
+            pending = bytearray()
             while True:
                 try:
-                    bp_stage = receive_state(ser)
+                    # Waits on serial I/O only; relay pulses run on the GPIO timer thread
+                    bp_stage = receive_state(ser, pending=pending)
                     if bp_stage:
-                        info(f"Received Stage: {bp_stage}")
+                        debug("Received Stage: %s", bp_stage)
                         socketio.emit('bp_update', {
                             'bp_state': {'state': 'Processing..', 'msg': bp_stage},
                             'bp_indicator': {'state': 'm'}
                         })
-                        info(f"Debug BP Stage: {bp_stage}")
                         # socketio.emit('bp_state', {'msg_state': f'Measurement State {bp_stage}'})
                         in_process, ocr_triggered = bp_process_state(socketio, bp_stage, bp_states)
                         if not in_process:
                             break
                 except Exception as e:
                     error(f"Error processing state: {e}")
-                time.sleep(0.5)
     except Exception as e:
         info(f"Error during BP control: {e}")
     finally:
@@ -221,51 +184,78 @@ def bp_control(socketio, usb_port):
             info(f"Error closing serial port: {e}")
     return ocr_triggered
 
-def process_frame_ocr(roi, contour_area_threshold):
-    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(6, 6))
-    gray_clahe = clahe.apply(gray)
-    blurred = cv2.GaussianBlur(gray_clahe, (15, 15), 0)
-    _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
-    closing = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, np.ones((3, 3), np.uint8), iterations=1)
-
-    contours, _ = cv2.findContours(closing, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    detected_text = ""
-    for contour in contours:
-        if cv2.contourArea(contour) > contour_area_threshold:
-            inverted_roi = cv2.bitwise_not(closing)
-            text = tess.image_to_string(inverted_roi, config="--oem 3 --psm 8", lang="ssd")
-            detected_text = text.strip()
-    return detected_text, closing, gray_clahe
-
-def ocr_function(frame, roi_coordinates, color, buffer, contour_area_threshold=1600):
-    x1, x2, y1, y2 = roi_coordinates
-    roi = frame[y1:y2, x1:x2]
-    cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-    detected_text, closing, clahe = process_frame_ocr(roi, contour_area_threshold)
-    if detected_text.isdigit():
-        buffer.append(int(detected_text))
-        if len(buffer) > 10:
-            buffer.pop(0)
-    return buffer, detected_text, closing, clahe
-
-def verify_value(buffer):
-    if buffer:
-        most_common, count = Counter(buffer).most_common(1)[0]
-        if count >= 7:
-            return most_common
-    return None
+def process_frame_ocr(roi, contour_area_threshold, config=None):
+    config = dict(config or DEFAULT_OCR_CONFIG, contour_area_threshold=contour_area_threshold)
+    return read_roi(roi, config)
+
+def ocr_function(roi, preprocessor, buffer, ocr):
+    detected_text, closing, clahe = preprocessor.read(roi, ocr)
+    return push_reading(buffer, detected_text), detected_text, closing, clahe
+
+def save_bp_snapshots(frame, closing_sys, closing_dia, closing_pulse, clahe_sys, clahe_dia, clahe_pulse):
+    """Store the result frame and OCR intermediates as content-addressed snapshots."""
+    try:
+        images = save_snapshots({
+            'bp': frame,
+            'bp_closing_sys': closing_sys,
+            'bp_closing_dia': closing_dia,
+            'bp_closing_pulse': closing_pulse,
+            'bp_clahe_sys': clahe_sys,
+            'bp_clahe_dia': clahe_dia,
+            'bp_clahe_pulse': clahe_pulse,
+        })
+        images['bp_thumb'] = save_snapshot(frame, 'bp', thumb_widths=(THUMB_WIDTH,)) + f"?w={THUMB_WIDTH}"
+        return images
+    except Exception as e:
+        error(f"Failed to save BP snapshots: {e}")
+        return {}
+
+def annotate_frame(yuv, texts, rois, localizer=None):
+    """Colour result frame with the OCR regions and readings drawn on it, built only for snapshots."""
+    frame = cv2.flip(cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR_I420), -1)
+    if localizer is not None and localizer.locked:
+        localizer.draw(frame, ROI_COLORS)
+    else:
+        for name, (x1, x2, y1, y2) in rois.items():
+            cv2.rectangle(frame, (x1, y1), (x2, y2), ROI_COLORS[name], 2)
+    for (name, text), y in zip(texts.items(), (210, 270, 330)):
+        cv2.putText(frame, f"{name}: {text}", (70, y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, ROI_COLORS[name], 2)
+    return frame
 
 def bp_ocr_reader(measure_time, ocr_cam):
 
     # rm_ocr_path = os.path.join(os.getcwd(), 'static', 'blood_pressure')
     # clear_and_ensure_folder(rm_ocr_path)
 
-    buffer_sys, buffer_dia , buffer_pulse= [], [], []
+    buffers = {"sys": [], "dia": [], "pulse": []}
+    texts, closings, clahes = {}, {}, {}
+    final_sys, final_dia, images = None, None, {}
     start_time = time.time()
 
+    # Tuned offline by `python -m module.blood_pressure.ocr_tune`, defaults otherwise
+    ocr_config = load_ocr_config()
+    rois = ocr_config["rois"]
+
+    # Panel found once per session; without a reference yet the fixed ROIs are used
+    localizer = DisplayLocalizer.load()
+    misses = 0
+
+    # One preprocessor per ROI and one Y buffer: the OCR path allocates nothing per frame
+    width, height = CAPTURE_SIZE
+    luma = np.empty((height, width), dtype=np.uint8)
+    fixed_prep = {name: ROIPreprocessor(ocr_config) for name in rois}
+    canonical_prep = {name: ROIPreprocessor(scale_config(ocr_config, localizer.scale))
+                      for name in localizer.fields} if localizer else None
+    # Tesseract is set up once per process, not per call; a missing engine fails here, before the camera starts
+    try:
+        ocr_engine = engine_for(ocr_config)
+    except Exception as e:
+        error(f"No OCR engine available: {e}")
+        return {**bp_emp_data, "images": {}}
+
     picam2 = Picamera2(camera_num=ocr_cam)
-    config = picam2.create_preview_configuration(main={'format': 'RGB888', 'size': (640, 480)})
+    # YUV420: the Y plane is the grayscale image OCR needs, no colour conversion per frame
+    config = picam2.create_preview_configuration(main={'format': 'YUV420', 'size': CAPTURE_SIZE})
     picam2.configure(config)
     info("PiCamera Configuation!")
     picam2.start()
@@ -273,44 +263,52 @@ def bp_ocr_reader(measure_time, ocr_cam):
 
     try:
         while True:
-            frame = picam2.capture_array()
-            frame = cv2.flip(frame, -1)
-
-            buffer_sys, text_sys, closing_sys, clahe_sys = ocr_function(frame, (210, 450, 110, 270), (0, 255, 0), buffer_sys)
-            buffer_dia, text_dia, closing_dia, clahe_dia = ocr_function(frame, (230, 450, 270, 440), (255, 0, 255), buffer_dia)
-            buffer_pulse, text_pulse, closing_pulse, clahe_pulse = ocr_function(frame, (230, 400, 440, 540), (255, 255, 0), buffer_pulse)
-            # buffer_sys, text_sys, closing_sys, clahe_sys = ocr_function(frame, (200, 460, 20, 185), (0, 255, 0), buffer_sys)
-            # buffer_dia, text_dia, closing_dia, clahe_dia = ocr_function(frame, (200, 460, 180, 360), (255, 0, 255), buffer_dia)
-            
-            final_sys = verify_value(buffer_sys)
-            final_dia = verify_value(buffer_dia)
-            final_pulse = verify_value(buffer_pulse)
+            yuv = picam2.capture_array()
+            cv2.flip(yuv[:height, :width], -1, dst=luma)
+
+            if localizer is not None and not localizer.locked:
+                if localizer.localize(luma):
+                    info(f"BP display located: {localizer.stats}")
+
+            if localizer is not None and localizer.locked:
+                regions, preps = localizer.crop_fields(localizer.canonical(luma)), canonical_prep
+            else:
+                regions = {name: luma[y1:y2, x1:x2] for name, (x1, x2, y1, y2) in rois.items()}
+                preps = fixed_prep
+
+            for name, roi in regions.items():
+                buffers[name], texts[name], closings[name], clahes[name] = ocr_function(roi, preps[name], buffers[name], ocr_engine.ocr)
+
+            if localizer is not None and localizer.locked:
+                # Nothing readable for a while: the monitor may have moved again
+                misses = 0 if (texts["sys"] or texts["dia"]) else misses + 1
+                if misses >= RELOCALIZE_AFTER:
+                    localizer.reset()
+                    misses = 0
 
-            cv2.putText(frame, f"sys: {text_sys}", (70, 210), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            cv2.putText(frame, f"dia: {text_dia}", (70, 270), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 255), 2)
-            cv2.putText(frame, f"pulse: {text_pulse}", (70, 270), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 255), 2)
+            final_sys = verify_value(buffers["sys"])
+            final_dia = verify_value(buffers["dia"])
+            final_pulse = verify_value(buffers["pulse"])
 
             if final_sys and final_dia:
                 info("OCR Data:", {"systolic": final_sys, "diastolic": final_dia, "pulse": final_pulse})
-                save_image(frame, os.path.join(os.getcwd(), f'static/bp_image/bp_images_{measure_time}.png'))
-                save_image(closing_sys, os.path.join(os.getcwd(), f'static/bp_image/bp_images_closing_sys_{measure_time}.png'))
-                save_image(closing_dia, os.path.join(os.getcwd(), f'static/bp_image/bp_images_closing_dia_{measure_time}.png'))
-                save_image(clahe_sys, os.path.join(os.getcwd(), f'static/bp_image/bp_images_clahe_sys_{measure_time}.png'))
-                save_image(clahe_dia, os.path.join(os.getcwd(), f'static/bp_image/bp_images_clahe_dia_{measure_time}.png'))
-                save_image(closing_pulse, os.path.join(os.getcwd(), f'static/bp_image/bp_images_closing_pulse_{measure_time}.png'))
-                save_image(clahe_pulse, os.path.join(os.getcwd(), f'static/bp_image/bp_images_closing_pulse_{measure_time}.png'))
+                if localizer is None:
+                    # The fixed ROIs just read a verified value: keep this panel as the reference
+                    try:
+                        DisplayLocalizer.calibrate(luma, rois)
+                    except Exception as e:
+                        error(f"BP display reference not saved: {e}")
+                images = save_bp_snapshots(annotate_frame(yuv, texts, rois, localizer),
+                                           closings["sys"], closings["dia"], closings["pulse"],
+                                           clahes["sys"], clahes["dia"], clahes["pulse"])
                 break
             
             if time.time() - start_time > 30:
                 info("OCR Detection Timeout - Error reading OCR.")
-                save_image(frame, os.path.join(os.getcwd(), f'static/bp_image/bp_images_{measure_time}.png'))
-                save_image(closing_sys, os.path.join(os.getcwd(), f'static/bp_image/bp_images_closing_sys_{measure_time}.png'))
-                save_image(closing_dia, os.path.join(os.getcwd(), f'static/bp_image/bp_images_closing_dia_{measure_time}.png'))
-                save_image(clahe_sys, os.path.join(os.getcwd(), f'static/bp_image/bp_images_clahe_sys_{measure_time}.png'))
-                save_image(clahe_dia, os.path.join(os.getcwd(), f'static/bp_image/bp_images_clahe_dia_{measure_time}.png'))
-                save_image(closing_pulse, os.path.join(os.getcwd(), f'static/bp_image/bp_images_closing_pulse_{measure_time}.png'))
-                save_image(clahe_pulse, os.path.join(os.getcwd(), f'static/bp_image/bp_images_closing_pulse_{measure_time}.png'))
-                return bp_emp_data
+                images = save_bp_snapshots(annotate_frame(yuv, texts, rois, localizer),
+                                           closings["sys"], closings["dia"], closings["pulse"],
+                                           clahes["sys"], clahes["dia"], clahes["pulse"])
+                return {**bp_emp_data, "images": images}
 
         picam2.close()
     except Exception as e:
@@ -318,7 +316,7 @@ def bp_ocr_reader(measure_time, ocr_cam):
     finally:
         picam2.close()
 
-    return {"systolic": final_sys, "diastolic": final_dia}
+    return {"systolic": final_sys, "diastolic": final_dia, "images": images}
 
 def bp_process_acceptable(socketio, ocr_triggered, measure_time, ocr_cam):
     bp_msg = 'Incompleted'
@@ -346,6 +344,8 @@ def bp_process_acceptable(socketio, ocr_triggered, measure_time, ocr_cam):
                 'bp_state': {'state': 'Result Failed!'},
                 'bp_indicator': {'state': 'e'}
             })
+            # Keep the snapshot URLs so a failed reading can still be reviewed
+            return {**bp_emp_data, "images": bp_data.get("images", {})}, bp_msg
     else:
         error("BLOOD PRESSURE STATUS: CANNOT DETECT.")
         socketio.emit('bp_update', {
@@ -367,6 +367,7 @@ def bp_controller(socketio: SocketIO, measure_time, ocr_cam, usb_port):
         "pulse": 0,
         "msg": "Incompleted",
         "success": False,
+        "images": {},
     }
 
     try:
@@ -385,7 +386,7 @@ def bp_controller(socketio: SocketIO, measure_time, ocr_cam, usb_port):
     finally:
         # Always attempt to clean up GPIO so next call starts clean
         try:
-            bp_gpio_clear(RELAY_1, RELAY_2, cleanup=True)
+            bp_gpio_clear(RELAY_1, RELAY_2)
         except Exception as e:
             error(f"GPIO cleanup error during bp_controller: {e}")
 
@@ -0,0 +1,196 @@
+import os, json, time
+import cv2
+import numpy as np
+
+from logging import info, error
+
+# ----------------------------
+#  BP DISPLAY LOCALIZER
+# ----------------------------
+#
+# The reference is a grayscale crop of the LCD panel taken from a frame where
+# the fixed ROIs were known to read correctly. Once per session the panel is
+# found in the live frame by coarse-to-fine ECC alignment (dense, edge-driven
+# template matching; the segment digits are too repetitive for keypoint
+# matching), which ends in a full homography. Every later frame is warped into
+# a small canonical image of the panel, and the systolic / diastolic / pulse
+# fields are cropped from fixed coordinates there.
+#
+#   H : reference panel px -> frame px
+#   M : frame px -> canonical px  (= S . H^-1, S scales panel px to canonical px)
+
+REFERENCE_IMAGE = os.path.join("static", "information", "bp_display_reference.png")
+REFERENCE_META = os.path.join("static", "information", "bp_display_reference.json")
+
+CANONICAL_SCALE = 0.5       # canonical image resolution relative to the camera frame
+PANEL_MARGIN = 40           # px of context kept around the ROIs for alignment
+
+# (scale, motion model) from coarse to fine; each level starts from the previous estimate
+ECC_LEVELS = (
+    (1 / 16, cv2.MOTION_TRANSLATION),
+    (1 / 8, cv2.MOTION_EUCLIDEAN),
+    (1 / 4, cv2.MOTION_AFFINE),
+    (1 / 2, cv2.MOTION_HOMOGRAPHY),
+)
+ECC_CRITERIA = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 50, 1e-4)
+
+
+def _abs(path):
+    return path if os.path.isabs(path) else os.path.join(os.getcwd(), path)
+
+
+def panel_box_for(rois, frame_shape, margin=PANEL_MARGIN):
+    """Bounding box (x1, x2, y1, y2) of all ROIs plus `margin`, clipped to the frame."""
+    h, w = frame_shape[:2]
+    xs = [v for r in rois.values() for v in r[:2]]
+    ys = [v for r in rois.values() for v in r[2:]]
+    return (max(0, min(xs) - margin), min(w, max(xs) + margin),
+            max(0, min(ys) - margin), min(h, max(ys) + margin))
+
+
+class DisplayLocalizer:
+    def __init__(self, reference_gray, panel_box, rois, scale=CANONICAL_SCALE,
+                 levels=ECC_LEVELS, min_correlation=0.6):
+        x1, x2, y1, y2 = panel_box
+        self.panel_box = tuple(int(v) for v in panel_box)
+        self.rois = {name: tuple(int(v) for v in roi) for name, roi in rois.items()}
+        self.scale = scale
+        self.levels = levels
+        self.min_correlation = min_correlation
+
+        self.panel_size = (x2 - x1, y2 - y1)
+        self.canonical_size = (int(round((x2 - x1) * scale)), int(round((y2 - y1) * scale)))
+
+        # Field rectangles in canonical px, clipped to the panel
+        cw, ch = self.canonical_size
+        self.fields = {}
+        for name, (rx1, rx2, ry1, ry2) in self.rois.items():
+            fx1, fx2 = [int(round(np.clip(v - x1, 0, x2 - x1) * scale)) for v in (rx1, rx2)]
+            fy1, fy2 = [int(round(np.clip(v - y1, 0, y2 - y1) * scale)) for v in (ry1, ry2)]
+            self.fields[name] = (min(fx1, cw), min(fx2, cw), min(fy1, ch), min(fy2, ch))
+
+        self.templates = [cv2.resize(reference_gray, None, fx=f, fy=f, interpolation=cv2.INTER_AREA)
+                          for f, _ in levels]
+        if min(self.templates[0].shape) < 8:
+            raise ValueError(f"BP display reference too small: {reference_gray.shape}")
+
+        self.H = None
+        self.M = None
+        self._canonical = None
+        self.stats = {"attempts": 0, "locks": 0, "correlation": None, "last_ms": None}
+
+    # ---- reference ----
+
+    @classmethod
+    def calibrate(cls, frame, rois, margin=PANEL_MARGIN, save=True, **kwargs):
+        """Reference from a frame where `rois` (x1, x2, y1, y2) are known to be right."""
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        x1, x2, y1, y2 = panel_box = panel_box_for(rois, gray.shape, margin)
+        reference = np.ascontiguousarray(gray[y1:y2, x1:x2])
+        localizer = cls(reference, panel_box, rois, **kwargs)
+        if save:
+            os.makedirs(os.path.dirname(_abs(REFERENCE_IMAGE)), exist_ok=True)
+            cv2.imwrite(_abs(REFERENCE_IMAGE), reference)
+            with open(_abs(REFERENCE_META), "w", encoding="utf-8") as f:
+                json.dump({"panel_box": panel_box, "rois": rois, "scale": localizer.scale}, f, indent=2)
+            info(f"BP display reference saved, panel {panel_box}")
+        return localizer
+
+    @classmethod
+    def load(cls, **kwargs):
+        """Localizer from the saved reference, or None if there is none yet."""
+        if not (os.path.exists(_abs(REFERENCE_IMAGE)) and os.path.exists(_abs(REFERENCE_META))):
+            return None
+        try:
+            with open(_abs(REFERENCE_META), encoding="utf-8") as f:
+                meta = json.load(f)
+            reference = cv2.imread(_abs(REFERENCE_IMAGE), cv2.IMREAD_GRAYSCALE)
+            kwargs.setdefault("scale", meta.get("scale", CANONICAL_SCALE))
+            return cls(reference, meta["panel_box"], meta["rois"], **kwargs)
+        except Exception as e:
+            error(f"Failed to load BP display reference: {e}")
+            return None
+
+    # ---- localization ----
+
+    def localize(self, gray, initial=None):
+        """
+        Estimate the panel homography in `gray`, starting from `initial` (default:
+        the panel where it was at calibration). Returns True if the panel was found.
+        """
+        t0 = time.perf_counter()
+        self.stats["attempts"] += 1
+        H, correlation = self._align(gray, initial)
+        self.stats["last_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        self.stats["correlation"] = None if correlation is None else round(correlation, 3)
+        if H is None:
+            return False
+
+        S = np.diag([self.scale, self.scale, 1.0])
+        self.H = H
+        self.M = S @ np.linalg.inv(H)
+        self.stats["locks"] += 1
+        return True
+
+    def _align(self, gray, initial=None):
+        x1, _, y1, _ = self.panel_box
+        H = np.array([[1, 0, x1], [0, 1, y1], [0, 0, 1]], dtype=np.float64) if initial is None else initial
+        correlation = None
+        for template, (f, motion) in zip(self.templates, self.levels):
+            small = cv2.resize(gray, None, fx=f, fy=f, interpolation=cv2.INTER_AREA)
+            S = np.diag([f, f, 1.0])
+            warp = (S @ H @ np.linalg.inv(S)).astype(np.float32)
+            if motion != cv2.MOTION_HOMOGRAPHY:
+                warp = warp[:2]
+            try:
+                correlation, warp = cv2.findTransformECC(template, small, warp, motion, ECC_CRITERIA, None, 3)
+            except cv2.error:
+                return None, correlation    # did not converge
+            if motion != cv2.MOTION_HOMOGRAPHY:
+                warp = np.vstack([warp, (0, 0, 1)])
+            H = np.linalg.inv(S) @ warp @ S
+
+        if correlation < self.min_correlation or not self._plausible(H):
+            return None, correlation
+        return H, correlation
+
+    def _plausible(self, H):
+        """Reject degenerate fits: the panel must stay convex and roughly its size."""
+        w, h = self.panel_size
+        corners = cv2.perspectiveTransform(np.float32([[[0, 0]], [[w, 0]], [[w, h]], [[0, h]]]), H)
+        area = cv2.contourArea(corners)
+        return cv2.isContourConvex(corners) and 0.5 < area / float(w * h) < 2.0
+
+    @property
+    def locked(self):
+        return self.M is not None
+
+    def reset(self):
+        self.H = self.M = None
+
+    # ---- per frame ----
+
+    def canonical(self, frame):
+        """Warp `frame` (BGR or Y plane) into the canonical panel image (reused buffer, valid until the next call)."""
+        cw, ch = self.canonical_size
+        shape = (ch, cw) + frame.shape[2:]
+        if self._canonical is None or self._canonical.shape != shape:
+            self._canonical = np.empty(shape, dtype=frame.dtype)
+        return cv2.warpPerspective(frame, self.M, self.canonical_size, dst=self._canonical,
+                                   flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+    def crop_fields(self, canonical):
+        return {name: canonical[y1:y2, x1:x2] for name, (x1, x2, y1, y2) in self.fields.items()}
+
+    def field_quads(self):
+        """Field rectangles projected back into frame px (for drawing / evaluation)."""
+        inv = np.linalg.inv(self.M)
+        quads = {}
+        for name, (x1, x2, y1, y2) in self.fields.items():
+            rect = np.float32([[[x1, y1]], [[x2, y1]], [[x2, y2]], [[x1, y2]]])
+            quads[name] = cv2.perspectiveTransform(rect, inv).reshape(4, 2)
+        return quads
+
+    def draw(self, frame, colors):
+        for name, quad in self.field_quads().items():
+            cv2.polylines(frame, [np.int32(np.round(quad))], True, colors.get(name, (0, 255, 0)), 2)
@@ -0,0 +1,227 @@
+import time, heapq, itertools, threading
+from collections import deque
+from logging import info, error
+
+HIGH = 1
+LOW = 0
+
+# Active-low relay "button press": idle HIGH, LOW for 0.5 s, back to HIGH
+RELAY_PRESS = [(HIGH, 0.5), (LOW, 0.5), (HIGH, 0.0)]
+
+# ----------------------------
+#  GPIO BACKENDS
+# ----------------------------
+
+class RPiGPIOBackend:
+    """RPi.GPIO in BCM mode. The mode is normalized once, when the backend is created."""
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
+
+        mode = GPIO.getmode()
+        # Some libs return -1 for "no mode / unknown"; BOARD means another module got there first
+        if mode not in (GPIO.BCM, None):
+            info(f"GPIO.getmode() returned {mode}, resetting to BCM")
+            try:
+                GPIO.cleanup()
+            except Exception as e:
+                error(f"GPIO.cleanup() while switching to BCM failed: {e}")
+            mode = None
+        if mode is None:
+            GPIO.setmode(GPIO.BCM)
+
+    def setup_output(self, pin, initial):
+        self.GPIO.setup(pin, self.GPIO.OUT, initial=initial)
+
+    def output(self, pin, level):
+        self.GPIO.output(pin, level)
+
+    def release(self, pins):
+        # Only our own pins; a global cleanup() would reset every other user of GPIO
+        self.GPIO.cleanup(list(pins))
+
+
+class MemoryGPIOBackend:
+    """In-memory pins that record (perf_counter, pin, level) for every change."""
+
+    def __init__(self):
+        self.levels = {}
+        self.events = []
+        self._lock = threading.Lock()
+
+    def setup_output(self, pin, initial):
+        self.output(pin, initial)
+
+    def output(self, pin, level):
+        with self._lock:
+            self.levels[pin] = level
+            self.events.append((time.perf_counter(), pin, level))
+
+    def release(self, pins):
+        for pin in pins:
+            self.levels.pop(pin, None)
+
+# ----------------------------
+#  PULSE SCHEDULER
+# ----------------------------
+
+class PulseHandle:
+    def __init__(self, service, pin, steps):
+        self.service = service
+        self.pin = pin
+        self.steps = list(steps)
+        self.step = 0
+        self.started_at = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+    def cancel(self):
+        self.service.cancel(self)
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+class GPIOService:
+    """
+    Owns the output pins and drives timed pulse sequences from one timer thread.
+
+    A pulse is a list of (level, hold_seconds) steps. Pulses on the same pin run
+    one after another in submission order; pulses on different pins overlap.
+    Callers never sleep: pulse() returns a handle that can be waited on or cancelled.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.idle_levels = {}
+        self._queues = {}
+        self._timeline = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def setup_output(self, pin, idle_level=HIGH):
+        """Configure a pin once; later calls only restore its idle level."""
+        with self._cond:
+            if pin not in self.idle_levels:
+                self.backend.setup_output(pin, idle_level)
+                self.idle_levels[pin] = idle_level
+                self._queues[pin] = deque()
+            elif not self._queues[pin]:
+                self.backend.output(pin, idle_level)
+
+    def set(self, pin, level):
+        with self._cond:
+            self.backend.output(pin, level)
+
+    def pulse(self, pin, steps):
+        handle = PulseHandle(self, pin, steps)
+        with self._cond:
+            queue = self._queues[pin]
+            queue.append(handle)
+            if len(queue) == 1:
+                self._start(handle, time.perf_counter())
+            self._ensure_thread()
+            self._cond.notify_all()
+        return handle
+
+    def cancel(self, handle):
+        with self._cond:
+            if handle.done.is_set():
+                return
+            handle.cancelled = True
+            queue = self._queues[handle.pin]
+            running = queue and queue[0] is handle
+            queue.remove(handle)
+            if running:
+                self.backend.output(handle.pin, self.idle_levels[handle.pin])
+                if queue:
+                    self._start(queue[0], time.perf_counter())
+            handle.done.set()
+            self._cond.notify_all()
+
+    def cancel_all(self, pin=None):
+        with self._cond:
+            handles = [h for p, q in self._queues.items() if pin in (None, p) for h in q]
+        for handle in handles:
+            handle.cancel()
+
+    def wait_idle(self, pins=None, timeout=None):
+        """Block until queued pulses on `pins` (all pins by default) are finished."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._cond:
+            while any(self._queues[p] for p in (pins or self._queues) if p in self._queues):
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def release(self, pins, wait_timeout=5.0):
+        """Let queued pulses finish, drive pins to idle and hand them back to the backend."""
+        pins = [p for p in pins if p in self.idle_levels]
+        if not self.wait_idle(pins, wait_timeout):
+            error(f"GPIO pulses still queued on {pins} after {wait_timeout}s, cancelling")
+            for pin in pins:
+                self.cancel_all(pin)
+        with self._cond:
+            for pin in pins:
+                self.backend.output(pin, self.idle_levels.pop(pin))
+                self._queues.pop(pin, None)
+            self.backend.release(pins)
+
+    # ---- timer thread ----
+
+    def _start(self, handle, now):
+        handle.started_at = now
+        heapq.heappush(self._timeline, (now, next(self._seq), handle))
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="gpio-pulses", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        with self._cond:
+            while True:
+                if not self._timeline:
+                    self._cond.wait()
+                    continue
+                due, _, handle = self._timeline[0]
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._timeline)
+                if handle.cancelled:
+                    continue
+
+                if handle.step < len(handle.steps):
+                    level, hold = handle.steps[handle.step]
+                    self.backend.output(handle.pin, level)
+                    handle.step += 1
+                    # Schedule from the planned time, not from now, so holds do not drift
+                    heapq.heappush(self._timeline, (due + hold, next(self._seq), handle))
+                    continue
+
+                queue = self._queues.get(handle.pin)
+                if queue and queue[0] is handle:
+                    queue.popleft()
+                    if queue:
+                        self._start(queue[0], due)
+                handle.done.set()
+                self._cond.notify_all()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_gpio_service(backend_factory=RPiGPIOBackend):
+    """Process-wide GPIO service; the backend is created on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = GPIOService(backend_factory())
+        return _service
@@ -0,0 +1,369 @@
+import os, shlex, atexit, threading, ctypes, ctypes.util
+import numpy as np
+
+from logging import info, error
+
+# ----------------------------
+#  TESSERACT OCR ENGINES
+# ----------------------------
+#
+# pytesseract writes every ROI to a temp PNG, starts /usr/bin/tesseract, which
+# loads the traineddata again, and parses its stdout: most of a call is process
+# and model start-up, and the BP reader makes up to three calls per frame.
+#
+#   capi         libtesseract (the library the tesseract binary ships with)
+#                through its C API with ctypes. A pool of TessBaseAPI handles,
+#                each initialised once with the language, OEM, PSM and digit
+#                whitelist; recognition takes the numpy buffer as is. A handle
+#                is not thread-safe, so every call checks one out of the pool
+#                (one handle per concurrent caller). ctypes releases the GIL
+#                during the call, so handles in different threads run in
+#                parallel.
+#   pytesseract  the old subprocess path, used when libtesseract cannot be
+#                loaded or initialised.
+#
+# engine_for(config) keeps one engine per (backend, language, tess_config,
+# whitelist); config["tess_engine"] picks the backend ("auto" tries capi
+# first). Both engines offer ocr(image, config) -> text, the `ocr=` callable of
+# ocr_pipeline, and recognize(image) -> OcrResult with per-character
+# confidences.
+
+TESSERACT_CMD = "/usr/bin/tesseract"
+LIBRARY_ENV = "MHR_TESSERACT_LIB"
+LIBRARY_NAMES = ("libtesseract.so.5", "libtesseract.so.4", "libtesseract.so")
+
+DEFAULT_OEM = 3             # OEM_DEFAULT
+DEFAULT_PSM = 3             # PSM_AUTO, as the tesseract CLI
+DEFAULT_PPI = 70            # what tesseract assumes for images without a resolution
+RIL_SYMBOL = 4
+
+
+class OcrUnavailable(RuntimeError):
+    pass
+
+
+class OcrResult:
+    def __init__(self, text, chars):
+        self.text = text
+        self.chars = chars          # [(character, confidence 0..100)]
+
+    @property
+    def confidences(self):
+        return [conf for _, conf in self.chars]
+
+    @property
+    def confidence(self):
+        """Lowest character confidence (0 without characters)."""
+        return min(self.confidences, default=0.0)
+
+
+def parse_tess_config(tess_config):
+    """'--oem 3 --psm 8 -c key=value' -> (oem, psm, {variable: value}, tessdata dir or None)."""
+    oem, psm, variables, datapath = DEFAULT_OEM, DEFAULT_PSM, {}, None
+    args = shlex.split(tess_config or "")
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        value = args[i + 1] if i + 1 < len(args) else None
+        if arg == "--oem":
+            oem, i = int(value), i + 1
+        elif arg == "--psm":
+            psm, i = int(value), i + 1
+        elif arg == "--tessdata-dir":
+            datapath, i = value, i + 1
+        elif arg == "-c" and value and "=" in value:
+            name, _, val = value.partition("=")
+            variables[name], i = val, i + 1
+        elif arg.startswith("-c") and "=" in arg[2:]:
+            name, _, val = arg[2:].partition("=")
+            variables[name] = val
+        i += 1
+    return oem, psm, variables, datapath
+
+
+def engine_settings(config):
+    """The config fields an engine is built from (and keyed by)."""
+    oem, psm, variables, datapath = parse_tess_config(config.get("tess_config"))
+    if config.get("tess_whitelist"):
+        variables["tessedit_char_whitelist"] = config["tess_whitelist"]
+    return {"lang": config.get("tess_lang", "eng"), "oem": oem, "psm": psm,
+            "variables": variables, "datapath": datapath}
+
+
+def _as_image(image):
+    """uint8 gray / RGB(A) array with contiguous rows."""
+    image = np.asarray(image)
+    if image.dtype != np.uint8:
+        image = image.astype(np.uint8)
+    # Rows may be padded (an ROI view of a frame), pixels within a row may not
+    packed_rows = image.strides[-1] == 1 and (image.ndim == 2 or image.strides[1] == image.shape[2])
+    if not packed_rows or image.strides[0] < 0:
+        image = np.ascontiguousarray(image)
+    return image
+
+
+# ----------------------------
+#  libtesseract C API (ctypes)
+# ----------------------------
+
+_library = None
+_library_lock = threading.Lock()
+
+
+def load_library(path=None):
+    """libtesseract with the C API signatures used here, loaded once."""
+    global _library
+    with _library_lock:
+        if _library is not None and path is None:
+            return _library
+        candidates = [path or os.environ.get(LIBRARY_ENV), ctypes.util.find_library("tesseract"), *LIBRARY_NAMES]
+        errors = []
+        for candidate in filter(None, candidates):
+            try:
+                lib = ctypes.CDLL(candidate)
+                break
+            except OSError as e:
+                errors.append(str(e))
+        else:
+            raise OcrUnavailable(f"libtesseract not found ({'; '.join(errors) or 'no candidates'})")
+
+        p, c_int, c_float, c_char_p = ctypes.c_void_p, ctypes.c_int, ctypes.c_float, ctypes.c_char_p
+        signatures = {
+            "TessVersion": (c_char_p, []),
+            "TessBaseAPICreate": (p, []),
+            "TessBaseAPIDelete": (None, [p]),
+            "TessBaseAPIInit2": (c_int, [p, c_char_p, c_char_p, c_int]),
+            "TessBaseAPIEnd": (None, [p]),
+            "TessBaseAPISetVariable": (c_int, [p, c_char_p, c_char_p]),
+            "TessBaseAPISetPageSegMode": (None, [p, c_int]),
+            "TessBaseAPISetImage": (None, [p, p, c_int, c_int, c_int, c_int]),
+            "TessBaseAPISetSourceResolution": (None, [p, c_int]),
+            "TessBaseAPIRecognize": (c_int, [p, p]),
+            "TessBaseAPIGetUTF8Text": (p, [p]),
+            "TessBaseAPIClear": (None, [p]),
+            "TessBaseAPIGetIterator": (p, [p]),
+            "TessResultIteratorDelete": (None, [p]),
+            "TessResultIteratorNext": (c_int, [p, c_int]),
+            "TessResultIteratorGetUTF8Text": (p, [p, c_int]),
+            "TessResultIteratorConfidence": (c_float, [p, c_int]),
+            "TessDeleteText": (None, [p]),
+        }
+        for name, (restype, argtypes) in signatures.items():
+            func = getattr(lib, name)
+            func.restype, func.argtypes = restype, argtypes
+        if path is None:
+            _library = lib
+        return lib
+
+
+def _take_text(lib, pointer):
+    """UTF-8 string returned by the C API, freed afterwards."""
+    if not pointer:
+        return ""
+    try:
+        return ctypes.string_at(pointer).decode("utf-8", "replace")
+    finally:
+        lib.TessDeleteText(pointer)
+
+
+class TesseractHandle:
+    """One TessBaseAPI, initialised once; not thread-safe (TesseractPool hands it to one caller at a time)."""
+
+    def __init__(self, lib, lang, oem=DEFAULT_OEM, psm=DEFAULT_PSM, variables=None, datapath=None):
+        self.lib = lib
+        self.api = lib.TessBaseAPICreate()
+        datapath = datapath.encode() if datapath else None
+        if lib.TessBaseAPIInit2(self.api, datapath, lang.encode(), oem) != 0:
+            lib.TessBaseAPIDelete(self.api)
+            self.api = None
+            raise OcrUnavailable(f"Tesseract could not load language {lang!r} (TESSDATA_PREFIX / tessdata-dir)")
+        lib.TessBaseAPISetPageSegMode(self.api, psm)
+        for name, value in (variables or {}).items():
+            if not lib.TessBaseAPISetVariable(self.api, name.encode(), str(value).encode()):
+                error(f"Tesseract variable {name} not set")
+
+    def recognize(self, image):
+        lib, api = self.lib, self.api
+        image = _as_image(image)
+        height, width = image.shape[:2]
+        depth = 1 if image.ndim == 2 else image.shape[2]
+        lib.TessBaseAPISetImage(api, image.ctypes.data, width, height, depth, image.strides[0])
+        lib.TessBaseAPISetSourceResolution(api, DEFAULT_PPI)
+        try:
+            if lib.TessBaseAPIRecognize(api, None) != 0:
+                return OcrResult("", [])
+            text = _take_text(lib, lib.TessBaseAPIGetUTF8Text(api))
+            chars = []
+            iterator = lib.TessBaseAPIGetIterator(api)
+            if iterator:
+                try:
+                    while True:
+                        char = _take_text(lib, lib.TessResultIteratorGetUTF8Text(iterator, RIL_SYMBOL))
+                        if char:
+                            chars.append((char, float(lib.TessResultIteratorConfidence(iterator, RIL_SYMBOL))))
+                        if not lib.TessResultIteratorNext(iterator, RIL_SYMBOL):
+                            break
+                finally:
+                    lib.TessResultIteratorDelete(iterator)
+            return OcrResult(text, chars)
+        finally:
+            lib.TessBaseAPIClear(api)
+
+    def close(self):
+        if self.api:
+            self.lib.TessBaseAPIEnd(self.api)
+            self.lib.TessBaseAPIDelete(self.api)
+            self.api = None
+
+
+class TesseractPool:
+    """
+    pool = TesseractPool(lang="ssd", psm=8, variables={"tessedit_char_whitelist": "0123456789"})
+    pool.ocr(roi, config)           # text, like pytesseract.image_to_string
+    pool.recognize(roi).chars       # [("1", 96.2), ("2", 91.0), ...]
+
+    Handles are created on demand up to `size` (default: CPU count) and kept
+    for the life of the process; callers beyond `size` wait for a free one.
+    """
+    backend = "capi"
+
+    def __init__(self, lang="eng", oem=DEFAULT_OEM, psm=DEFAULT_PSM, variables=None, datapath=None,
+                 size=None, library=None):
+        self.lib = load_library(library)
+        self.settings = {"lang": lang, "oem": oem, "psm": psm, "variables": dict(variables or {}),
+                         "datapath": datapath}
+        self.size = size or os.cpu_count() or 1
+        self.version = self.lib.TessVersion().decode()
+        self._idle = []
+        self._handles = []
+        self._cond = threading.Condition()
+        self.stats = {"calls": 0, "waits": 0}
+        # Fail here, not on the first frame, when the language cannot be loaded
+        self._release(self._acquire())
+        self.stats["calls"] = 0
+
+    def _acquire(self):
+        with self._cond:
+            while not self._idle and len(self._handles) >= self.size:
+                self.stats["waits"] += 1
+                self._cond.wait()
+            self.stats["calls"] += 1
+            if self._idle:
+                return self._idle.pop()
+            handle = TesseractHandle(self.lib, **self.settings)
+            self._handles.append(handle)
+            return handle
+
+    def _release(self, handle):
+        with self._cond:
+            self._idle.append(handle)
+            self._cond.notify()
+
+    def recognize(self, image):
+        handle = self._acquire()
+        try:
+            return handle.recognize(image)
+        finally:
+            self._release(handle)
+
+    def ocr(self, image, config=None):
+        return self.recognize(image).text
+
+    def close(self):
+        with self._cond:
+            for handle in self._handles:
+                handle.close()
+            self._handles, self._idle = [], []
+
+    def report(self):
+        return {"backend": self.backend, "version": self.version, "size": self.size,
+                "handles": len(self._handles), **self.settings, **self.stats}
+
+
+# ----------------------------
+#  pytesseract fallback
+# ----------------------------
+
+class PytesseractEngine:
+    """The per-call subprocess path; word confidences are given to each of the word's characters."""
+    backend = "pytesseract"
+
+    def __init__(self, lang="eng", oem=DEFAULT_OEM, psm=DEFAULT_PSM, variables=None, datapath=None):
+        import pytesseract
+        if os.path.exists(TESSERACT_CMD):
+            pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+        self.version = str(pytesseract.get_tesseract_version())     # raises without the binary
+        self.tess = pytesseract
+        self.lang = lang
+        args = [f"--oem {oem}", f"--psm {psm}"] + [f"-c {name}={value}" for name, value in (variables or {}).items()]
+        if datapath:
+            args.append(f"--tessdata-dir {shlex.quote(datapath)}")
+        self.config = " ".join(args)
+        self.stats = {"calls": 0}
+
+    def recognize(self, image):
+        self.stats["calls"] += 1
+        data = self.tess.image_to_data(image, lang=self.lang, config=self.config, output_type=self.tess.Output.DICT)
+        words = [(word, float(conf)) for word, conf in zip(data["text"], data["conf"]) if word.strip()]
+        return OcrResult(" ".join(word for word, _ in words), [(char, conf) for word, conf in words for char in word])
+
+    def ocr(self, image, config=None):
+        self.stats["calls"] += 1
+        return self.tess.image_to_string(image, lang=self.lang, config=self.config)
+
+    def close(self):
+        pass
+
+    def report(self):
+        return {"backend": self.backend, "version": self.version, "lang": self.lang, "config": self.config,
+                **self.stats}
+
+
+BACKENDS = {
+    "capi": TesseractPool,
+    "pytesseract": PytesseractEngine,
+}
+
+
+def create_engine(config, backend=None):
+    backend = backend or config.get("tess_engine", "auto")
+    settings = engine_settings(config)
+    if backend != "auto":
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown OCR engine {backend!r}, expected one of {sorted(BACKENDS)} or 'auto'")
+        return BACKENDS[backend](**settings)
+    try:
+        return TesseractPool(**settings)
+    except (OcrUnavailable, AttributeError) as e:
+        error(f"Tesseract C API unavailable ({e}), using pytesseract")
+        return PytesseractEngine(**settings)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def engine_for(config, backend=None):
+    """The engine for `config`'s Tesseract settings, created once per process."""
+    backend = backend or config.get("tess_engine", "auto")
+    settings = engine_settings(config)
+    key = (backend, settings["lang"], settings["oem"], settings["psm"],
+           tuple(sorted(settings["variables"].items())), settings["datapath"])
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(config, backend)
+            info(f"OCR engine: {engine.report()}")
+            _engines[key] = engine
+        return engine
+
+
+def close_engines():
+    """End every Tesseract handle (registered at exit: libtesseract reports live handles as leaks)."""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.close()
+        _engines.clear()
+
+
+atexit.register(close_engines)
@@ -0,0 +1,215 @@
+import os, json, copy
+from collections import Counter
+import cv2
+import numpy as np
+
+from logging import info, error
+
+from module.blood_pressure.ocr_engine import engine_for
+
+# ----------------------------
+#  BP DISPLAY OCR PIPELINE
+# ----------------------------
+#
+# Pure image -> text steps of the BP reader, shared by the live reader
+# (bp_module) and the offline tuner (ocr_tune). Every knob lives in one config
+# dict so a tuned configuration can be written to OCR_CONFIG_PATH and picked up
+# by the next cuff cycle.
+
+OCR_CONFIG_PATH = os.path.join("static", "information", "bp_ocr_config.json")
+FIELDS = ("sys", "dia", "pulse")
+
+DEFAULT_OCR_CONFIG = {
+    "clip_limit": 2.0,
+    "tile_grid": 6,
+    "blur_ksize": 15,
+    "close_ksize": 3,
+    "downsample": 1.0,          # shrink factor applied before CLAHE / blur
+    "contour_area_threshold": 1600,
+    "tess_config": "--oem 3 --psm 8",
+    "tess_lang": "ssd",
+    "tess_whitelist": "0123456789",
+    "tess_engine": "auto",      # capi (in-process libtesseract), pytesseract, or auto
+    # x1, x2, y1, y2 on the flipped 640x480 frame
+    "rois": {
+        "sys": (210, 450, 110, 270),
+        "dia": (230, 450, 270, 440),
+        "pulse": (230, 400, 440, 540),
+    },
+}
+
+
+def merge_config(overrides=None):
+    """DEFAULT_OCR_CONFIG updated with `overrides` (rois merged per field)."""
+    config = copy.deepcopy(DEFAULT_OCR_CONFIG)
+    for key, value in (overrides or {}).items():
+        if key == "rois":
+            config["rois"].update({name: tuple(roi) for name, roi in value.items()})
+        elif key in config:
+            config[key] = value
+    return config
+
+
+def load_ocr_config(path=OCR_CONFIG_PATH):
+    """Tuned config from `path`, or the defaults if there is none / it is unreadable."""
+    path = os.path.join(os.getcwd(), path) if not os.path.isabs(path) else path
+    if not os.path.exists(path):
+        return merge_config()
+    try:
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+        info(f"Loaded BP OCR config from {path}")
+        return merge_config(saved.get("config", saved))
+    except Exception as e:
+        error(f"Failed to load BP OCR config {path}, using defaults: {e}")
+        return merge_config()
+
+
+def save_ocr_config(config, path=OCR_CONFIG_PATH, metrics=None):
+    path = os.path.join(os.getcwd(), path) if not os.path.isabs(path) else path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"config": config, "metrics": metrics or {}}, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def preprocess_roi(roi, config):
+    """BGR or gray ROI -> (binary closing, CLAHE gray, has_large_contour)."""
+    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+    tile = int(config["tile_grid"])
+    clahe = cv2.createCLAHE(clipLimit=float(config["clip_limit"]), tileGridSize=(tile, tile))
+    gray_clahe = clahe.apply(gray)
+    k = int(config["blur_ksize"]) | 1   # GaussianBlur needs an odd kernel
+    blurred = cv2.GaussianBlur(gray_clahe, (k, k), 0)
+    _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    c = int(config["close_ksize"])
+    closing = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, np.ones((c, c), np.uint8), iterations=1)
+
+    contours, _ = cv2.findContours(closing, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    threshold = config["contour_area_threshold"]
+    found = any(cv2.contourArea(contour) > threshold for contour in contours)
+    return closing, gray_clahe, found
+
+
+def tesseract_ocr(image, config):
+    """Text of one ROI through the process-wide engine for `config` (ocr_engine.engine_for)."""
+    return engine_for(config).ocr(image, config)
+
+
+def read_roi(roi, config, ocr=tesseract_ocr):
+    """Same result as the original process_frame_ocr, with a single OCR call per ROI."""
+    closing, gray_clahe, found = preprocess_roi(roi, config)
+    detected_text = ""
+    if found:
+        detected_text = ocr(cv2.bitwise_not(closing), config).strip()
+    return detected_text, closing, gray_clahe
+
+
+def crop(frame, roi_coordinates):
+    x1, x2, y1, y2 = roi_coordinates
+    return frame[y1:y2, x1:x2]
+
+
+def read_display(frame, config, ocr=tesseract_ocr):
+    """Text of every field in `config['rois']` for one (already flipped) frame."""
+    return {name: ROIPreprocessor(config).read(crop(frame, roi), ocr)[0] for name, roi in config["rois"].items()}
+
+
+def scale_config(config, scale):
+    """Config for images resampled by `scale` (kernel sizes and areas follow the pixels)."""
+    if scale == 1:
+        return config
+    return dict(
+        config,
+        blur_ksize=max(1, int(round(config["blur_ksize"] * scale))) | 1,
+        contour_area_threshold=config["contour_area_threshold"] * scale * scale,
+    )
+
+
+class ROIPreprocessor:
+    """
+    preprocess_roi for one ROI of a fixed size, without per-frame allocations:
+    the CLAHE instance, kernels and every intermediate image are created once and
+    reused (results are valid until the next call). Takes the Y plane of a YUV
+    capture as is; BGR input is converted into an owned buffer. With
+    `downsample` < 1 the ROI is shrunk before CLAHE and blur, and the kernel
+    size / contour area follow (scale_config).
+    """
+
+    def __init__(self, config, downsample=None):
+        self.downsample = config.get("downsample", 1.0) if downsample is None else downsample
+        self.config = scale_config(config, self.downsample)
+        tile = int(self.config["tile_grid"])
+        self.clahe = cv2.createCLAHE(clipLimit=float(self.config["clip_limit"]), tileGridSize=(tile, tile))
+        k = int(self.config["blur_ksize"]) | 1
+        self.ksize = (k, k)
+        c = int(self.config["close_ksize"])
+        self.kernel = np.ones((c, c), np.uint8)
+        self.area_threshold = self.config["contour_area_threshold"]
+        self.shape = None
+
+    def _allocate(self, shape):
+        h, w = shape[:2]
+        self.shape = shape
+        self.gray = np.empty((h, w), np.uint8) if len(shape) == 3 else None
+        if self.downsample != 1:
+            self.size = (max(1, int(round(w * self.downsample))), max(1, int(round(h * self.downsample))))
+            self.small = np.empty(self.size[::-1], np.uint8)
+        else:
+            self.size, self.small = (w, h), None
+        out = self.size[::-1]
+        self.equalized = np.empty(out, np.uint8)
+        self.blurred = np.empty(out, np.uint8)
+        self.thresh = np.empty(out, np.uint8)
+        self.closing = np.empty(out, np.uint8)
+        self.inverted = np.empty(out, np.uint8)
+
+    def process(self, roi):
+        """ROI -> (binary closing, CLAHE gray, has_large_contour), all in owned buffers."""
+        if roi.shape != self.shape:
+            self._allocate(roi.shape)
+        gray = roi
+        if self.gray is not None:
+            gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        if self.small is not None:
+            gray = cv2.resize(gray, self.size, dst=self.small, interpolation=cv2.INTER_AREA)
+        self.clahe.apply(gray, dst=self.equalized)
+        cv2.GaussianBlur(self.equalized, self.ksize, 0, dst=self.blurred)
+        cv2.threshold(self.blurred, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU, dst=self.thresh)
+        cv2.morphologyEx(self.thresh, cv2.MORPH_CLOSE, self.kernel, dst=self.closing, iterations=1)
+
+        contours, _ = cv2.findContours(self.closing, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        found = any(cv2.contourArea(contour) > self.area_threshold for contour in contours)
+        return self.closing, self.equalized, found
+
+    def read(self, roi, ocr=tesseract_ocr):
+        """Same result as read_roi; OCR runs on the inverted buffer only when a digit-sized contour exists."""
+        closing, equalized, found = self.process(roi)
+        detected_text = ""
+        if found:
+            cv2.bitwise_not(closing, dst=self.inverted)
+            detected_text = ocr(self.inverted, self.config).strip()
+        return detected_text, closing, equalized
+
+# ----------------------------
+#  READING VOTE
+# ----------------------------
+
+def push_reading(buffer, detected_text):
+    """Keep the last 10 numeric OCR results of a field."""
+    if detected_text.isdigit():
+        buffer.append(int(detected_text))
+        if len(buffer) > 10:
+            buffer.pop(0)
+    return buffer
+
+
+def verify_value(buffer):
+    """The value read at least 7 times in the buffer, else None."""
+    if buffer:
+        most_common, count = Counter(buffer).most_common(1)[0]
+        if count >= 7:
+            return most_common
+    return None
@@ -0,0 +1,218 @@
+"""
+Offline evaluation and grid search for the BP display OCR.
+
+Runs the live OCR pipeline (ocr_pipeline.read_display) over archived display
+frames with ground-truth labels, spread over a multiprocessing pool, and writes
+the most accurate configuration to the file bp_module loads before each cycle.
+
+Dataset: a directory of frames plus labels.csv with columns
+    file,sys,dia,pulse          (an empty cell is not scored)
+
+Run from backend/:
+    python -m module.blood_pressure.ocr_tune path/to/frames
+    python -m module.blood_pressure.ocr_tune path/to/frames --grid grid.json --workers 4
+    python -m module.blood_pressure.ocr_tune path/to/frames --eval-only     # current config only
+
+grid.json maps config keys to candidate lists, e.g.
+    {"clip_limit": [1.5, 2.0, 3.0], "blur_ksize": [9, 15], "roi_pad": [-10, 0, 10]}
+`roi_pad` grows (or shrinks) every ROI by that many pixels on each side.
+"""
+import argparse, csv, itertools, json, os, sys, time
+import multiprocessing as mp
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from module.blood_pressure.ocr_engine import create_engine
+from module.blood_pressure.ocr_pipeline import (
+    FIELDS, OCR_CONFIG_PATH, load_ocr_config, merge_config, read_display, save_ocr_config
+)
+
+DEFAULT_GRID = {
+    "clip_limit": [1.5, 2.0, 3.0],
+    "blur_ksize": [9, 15, 21],
+    "contour_area_threshold": [800, 1600, 2400],
+    "roi_pad": [-10, 0, 10],
+    "downsample": [1.0, 0.5],
+}
+
+# ----------------------------
+#  DATASET / GRID
+# ----------------------------
+
+def load_dataset(directory, labels="labels.csv"):
+    """[(path, {field: int})] for every labelled frame that exists on disk."""
+    samples = []
+    with open(os.path.join(directory, labels), newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            path = os.path.join(directory, row["file"])
+            truth = {name: int(row[name]) for name in FIELDS if (row.get(name) or "").strip()}
+            if os.path.exists(path) and truth:
+                samples.append((path, truth))
+    return samples
+
+
+def pad_rois(rois, pad, frame_shape):
+    """Grow every ROI by `pad` pixels on each side, clipped to the frame."""
+    h, w = frame_shape[:2]
+    return {name: (max(0, x1 - pad), min(w, x2 + pad), max(0, y1 - pad), min(h, y2 + pad))
+            for name, (x1, x2, y1, y2) in rois.items()}
+
+
+def expand_grid(base, grid, frame_shape):
+    """Cartesian product of `grid` applied on top of the `base` config (ROIs clipped to `frame_shape`)."""
+    keys = sorted(grid)
+    configs = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        params = dict(zip(keys, values))
+        pad = params.pop("roi_pad", 0)
+        config = merge_config({**base, **params})
+        if pad:
+            config["rois"] = pad_rois(config["rois"], pad, frame_shape)
+        configs.append((dict(zip(keys, values)), config))
+    return configs
+
+# ----------------------------
+#  WORKERS
+# ----------------------------
+
+_samples = None
+_configs = None
+_flip = False
+
+
+def _init_worker(samples, configs, flip):
+    global _samples, _configs, _flip
+    _samples, _configs, _flip = samples, configs, flip
+    cv2.setNumThreads(1)    # one OCR per core; OpenCV's own threads would only contend
+
+
+@lru_cache(maxsize=8)
+def _load_frame(path):
+    frame = cv2.imread(path, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError(f"Cannot read image {path}")
+    return cv2.flip(frame, -1) if _flip else frame
+
+
+def _evaluate(task):
+    sample_idx, config_idx = task
+    path, truth = _samples[sample_idx]
+    config = _configs[config_idx]
+    frame = _load_frame(path)
+
+    t0 = time.perf_counter()
+    texts = read_display(frame, config)
+    latency = time.perf_counter() - t0
+
+    correct = {name: texts.get(name, "") == str(value) for name, value in truth.items()}
+    return config_idx, correct, latency
+
+# ----------------------------
+#  REPORT
+# ----------------------------
+
+def summarize(results, n_configs):
+    per_config = [{"correct": {n: 0 for n in FIELDS}, "scored": {n: 0 for n in FIELDS},
+                   "frames_ok": 0, "latency": []} for _ in range(n_configs)]
+    for config_idx, correct, latency in results:
+        entry = per_config[config_idx]
+        entry["latency"].append(latency)
+        entry["frames_ok"] += all(correct.values())
+        for name, ok in correct.items():
+            entry["scored"][name] += 1
+            entry["correct"][name] += ok
+
+    metrics = []
+    for entry in per_config:
+        latency = np.array(entry["latency"] or [np.nan])
+        frames = len(entry["latency"])
+        metrics.append({
+            "frames": frames,
+            "accuracy": round(entry["frames_ok"] / frames, 4) if frames else 0.0,
+            **{f"acc_{n}": round(entry["correct"][n] / entry["scored"][n], 4) if entry["scored"][n] else None
+               for n in FIELDS},
+            "p50_ms": round(float(np.percentile(latency, 50)) * 1000, 1),
+            "p95_ms": round(float(np.percentile(latency, 95)) * 1000, 1),
+            "p99_ms": round(float(np.percentile(latency, 99)) * 1000, 1),
+            # Single-core rate; the pool multiplies it by the worker count
+            "frames_per_s": round(float(frames / latency.sum()), 2) if frames else 0.0,
+        })
+    return metrics
+
+
+def print_table(configs, metrics, top):
+    order = sorted(range(len(configs)), key=lambda i: (-metrics[i]["accuracy"], metrics[i]["p50_ms"]))
+    header = f"{'#':>3}  {'acc':>6} {'sys':>6} {'dia':>6} {'pulse':>6} {'p50':>7} {'p95':>7} {'p99':>7} {'fps':>7}  params"
+    print(header)
+    print("-" * len(header))
+    fmt = lambda v: "   -  " if v is None else f"{v:6.3f}"
+    for rank, i in enumerate(order[:top], 1):
+        m = metrics[i]
+        print(f"{rank:>3}  {m['accuracy']:6.3f} {fmt(m['acc_sys'])} {fmt(m['acc_dia'])} {fmt(m['acc_pulse'])} "
+              f"{m['p50_ms']:7.1f} {m['p95_ms']:7.1f} {m['p99_ms']:7.1f} {m['frames_per_s']:7.1f}  "
+              f"{json.dumps(configs[i][0])}")
+    return order[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="directory with frames and labels.csv")
+    parser.add_argument("--labels", default="labels.csv")
+    parser.add_argument("--grid", help="JSON file with the parameter grid (default: built-in grid)")
+    parser.add_argument("--eval-only", action="store_true", help="evaluate the current config, no search")
+    parser.add_argument("--flip", action="store_true", help="frames are raw captures, flip them like the live reader")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=0, help="tasks per dispatch (default: auto)")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--out", default=OCR_CONFIG_PATH, help="where to write the best config")
+    parser.add_argument("--dry-run", action="store_true", help="do not write the best config")
+    args = parser.parse_args()
+
+    base = load_ocr_config()
+    try:
+        # Checked with a throwaway engine: the workers build their own after the fork
+        create_engine(base).close()
+    except Exception as e:
+        sys.exit(f"Tesseract is required for OCR evaluation: {e}")
+
+    samples = load_dataset(args.directory, args.labels)
+    if not samples:
+        sys.exit(f"No labelled frames found in {args.directory}")
+
+    if args.eval_only:
+        configs = [({}, base)]
+    else:
+        grid = DEFAULT_GRID
+        if args.grid:
+            with open(args.grid, encoding="utf-8") as f:
+                grid = json.load(f)
+        frame = cv2.imread(samples[0][0], cv2.IMREAD_COLOR)
+        if frame is None:
+            sys.exit(f"Cannot read image {samples[0][0]}")
+        configs = expand_grid(base, grid, frame.shape)
+
+    # Sample-major order: consecutive tasks reuse the worker's decoded frame
+    tasks = [(s, c) for s in range(len(samples)) for c in range(len(configs))]
+    chunksize = args.chunksize or max(1, len(tasks) // (args.workers * 8))
+    print(f"{len(samples)} frames x {len(configs)} configs = {len(tasks)} OCR runs "
+          f"on {args.workers} workers (chunksize {chunksize})")
+
+    t0 = time.perf_counter()
+    with mp.Pool(args.workers, initializer=_init_worker,
+                 initargs=(samples, [c for _, c in configs], args.flip)) as pool:
+        results = list(pool.imap_unordered(_evaluate, tasks, chunksize=chunksize))
+    wall = time.perf_counter() - t0
+    print(f"done in {wall:.1f}s, {len(tasks) / wall:.1f} frames/s overall\n")
+
+    metrics = summarize(results, len(configs))
+    best = print_table(configs, metrics, args.top)
+
+    if not args.dry_run and not args.eval_only:
+        path = save_ocr_config(configs[best][1], args.out, metrics={**metrics[best], "params": configs[best][0]})
+        print(f"\nbest config written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import time
+import cv2
+import numpy as np
+
+from logging import info
+
+# ----------------------------
+#  ACTIVITY GOVERNOR (idle mode for camera loops)
+# ----------------------------
+#
+# With nobody at the kiosk, a camera loop only needs to notice that someone
+# arrives. Each frame's luma (the lores Y plane, or the main frame) is
+# downsampled to `motion_size`, blurred and diffed against the previous one;
+# the share of pixels that changed by more than `motion_threshold` levels is
+# the motion score.
+#
+#   active  every frame: detection, drawing, JPEG encoding (the loop as before)
+#   idle    no motion and no face for `idle_after_s`: frames are taken at
+#           `idle_fps`, detection is skipped and the last JPEG is sent again
+#           (re-encoded every `refresh_s` so slow light changes still show)
+#
+# Motion wakes the loop on the frame it is seen in, so detection runs on that
+# very frame and the rate is back to full speed from there on. A face found
+# in active mode counts as activity, so someone standing still stays active.
+
+DEFAULT_IDLE_FPS = 2.0
+
+DEFAULT_GOVERNOR_CONFIG = {
+    "idle_fps": DEFAULT_IDLE_FPS,
+    "idle_after_s": 5.0,
+    "motion_size": (64, 48),
+    "motion_threshold": 12,         # luma levels
+    "motion_fraction": 0.01,        # changed pixels that count as motion
+    "refresh_s": 10.0,
+}
+
+
+class ActivityGovernor:
+    """
+    governor = ActivityGovernor({"idle_fps": 2})
+    while True:
+        governor.throttle()                         # sleeps only while idle
+        captured = camera.capture()
+        if governor.observe(luma):                  # True: run detection
+            faces = detector.detect(...)
+            governor.activity(len(faces) > 0)
+        elif governor.reuse_jpeg():                 # idle and nothing changed
+            send(last_jpeg); continue
+    """
+
+    def __init__(self, config=None, clock=time.monotonic):
+        self.config = {**DEFAULT_GOVERNOR_CONFIG, **(config or {})}
+        self.clock = clock
+        self.idle = False
+        self.motion = 0.0
+        self.stats = {"frames": 0, "idle_frames": 0, "reused": 0, "wakes": 0, "sleeps": 0}
+        self._previous = None
+        self._last_activity = clock()
+        self._last_encode = None
+        self._next_frame = 0.0
+
+    def _small(self, image):
+        small = cv2.resize(image, tuple(self.config["motion_size"]), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        # Sensor noise would otherwise count as motion at low light
+        return cv2.blur(small, (3, 3))
+
+    def motion_score(self, image):
+        """Share of changed pixels against the previous frame (1.0 on the first)."""
+        small = self._small(image)
+        previous, self._previous = self._previous, small
+        if previous is None:
+            return 1.0
+        changed = cv2.absdiff(small, previous) > self.config["motion_threshold"]
+        return float(np.count_nonzero(changed)) / changed.size
+
+    def observe(self, image, now=None):
+        """Motion check of one frame; returns True when the loop should run detection."""
+        now = self.clock() if now is None else now
+        self.stats["frames"] += 1
+        self.motion = self.motion_score(image)
+        if self.motion >= self.config["motion_fraction"]:
+            self._last_activity = now
+            if self.idle:
+                self.idle = False
+                self.stats["wakes"] += 1
+                info(f"Camera active (motion {self.motion:.3f})")
+        elif not self.idle and now - self._last_activity > self.config["idle_after_s"]:
+            self.idle = True
+            self.stats["sleeps"] += 1
+            self._next_frame = now
+            info(f"Camera idle at {self.config['idle_fps']:g} fps")
+        if self.idle:
+            self.stats["idle_frames"] += 1
+        else:
+            self._last_encode = now         # active frames are always encoded
+        return not self.idle
+
+    def activity(self, found=True, now=None):
+        """Report a detected face (or other activity) so the loop stays active."""
+        if found:
+            self._last_activity = self.clock() if now is None else now
+
+    def reuse_jpeg(self, now=None):
+        """Idle and no refresh due: the previous JPEG can be sent again (else it is re-encoded now)."""
+        now = self.clock() if now is None else now
+        if self.idle and self._last_encode is not None and now - self._last_encode < self.config["refresh_s"]:
+            self.stats["reused"] += 1
+            return True
+        self._last_encode = now
+        return False
+
+    def throttle(self):
+        """Sleep until the next idle frame is due; no-op while active. Returns the seconds slept."""
+        if not self.idle or not self.config["idle_fps"]:
+            return 0.0
+        now = self.clock()
+        delay = self._next_frame - now
+        if delay > 0:
+            time.sleep(delay)
+        self._next_frame = max(self._next_frame, now) + 1.0 / self.config["idle_fps"]
+        return max(0.0, delay)
+
+    def report(self):
+        return {"idle": self.idle, "motion": round(self.motion, 4), **self.stats}
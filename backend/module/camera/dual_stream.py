@@ -0,0 +1,140 @@
+import time
+import cv2
+
+from logging import info, error
+
+# ----------------------------
+#  DUAL-RESOLUTION CAPTURE (Picamera2 main + lores)
+# ----------------------------
+#
+# The ISP scales a second, low-resolution YUV420 "lores" stream out of every
+# frame at no CPU cost. Face detection and presence checks run on its luma
+# plane (already grayscale, a quarter of the pixels at 320x240); drawing,
+# thermal registration, crops and the JPEG encoder use the main RGB888 stream.
+# Boxes found on the lores image are returned in main-stream pixels
+# (FaceDetector.detect(image, image_scale)). That takes one scale for x and y,
+# so the lores stream must have the main stream's aspect ratio.
+#
+# lores_size=None configures the main stream only; detection then runs on the
+# main frame as before.
+
+DEFAULT_MAIN_SIZE = (640, 480)
+DEFAULT_LORES_SIZE = (320, 240)
+
+
+def parse_size(text, default=DEFAULT_LORES_SIZE):
+    """'320x240' -> (320, 240); '', '0', 'off' -> None (main stream only)."""
+    if text is None:
+        return default
+    text = str(text).strip().lower()
+    if text in ("", "0", "off", "none"):
+        return None
+    w, _, h = text.partition("x")
+    return int(w), int(h)
+
+
+class DualFrame:
+    """One capture: `main` BGR frame, `luma` lores Y plane (or None), capture time."""
+
+    def __init__(self, main, luma, capture_ts, image_scale):
+        self.main = main
+        self.luma = luma
+        self.capture_ts = capture_ts
+        self.image_scale = image_scale
+
+    def detection_view(self, roi):
+        """
+        (image, image_scale) to run a face detector on for the main-stream
+        rectangle `roi` = (x, y, w, h): the matching lores luma crop when there
+        is a lores stream, else the main crop.
+        """
+        x, y, w, h = roi
+        if self.luma is None:
+            return self.main[y:y + h, x:x + w], 1.0
+        s = self.image_scale
+        lx, ly = int(round(x * s)), int(round(y * s))
+        lw, lh = int(round(w * s)), int(round(h * s))
+        return self.luma[ly:ly + lh, lx:lx + lw], s
+
+
+class DualStreamCamera:
+    """
+    camera = DualStreamCamera(camera_num=0)
+    camera.start()                      # camera.main_size: the size granted
+    captured = camera.capture()         # DualFrame, main flipped like the IRT loop always did
+    camera.close()
+
+    `picam2` can be passed in (a Picamera2 or benchmarks.emulators.FakePicamera2);
+    otherwise one is created for `camera_num` on start().
+    """
+
+    def __init__(self, camera_num=0, main_size=DEFAULT_MAIN_SIZE, lores_size=DEFAULT_LORES_SIZE,
+                 picam2=None, vflip=True):
+        self.camera_num = camera_num
+        self.main_size = tuple(main_size)
+        self.lores_size = tuple(lores_size) if lores_size else None
+        self.picam2 = picam2
+        self.vflip = vflip
+        self.image_scale = 1.0
+        self.started = False
+
+    def start(self):
+        if self.picam2 is None:
+            from picamera2 import Picamera2
+            self.picam2 = Picamera2(camera_num=self.camera_num)
+
+        streams = {"main": {"format": "RGB888", "size": self.main_size}}
+        if self.lores_size is not None:
+            if self.lores_size[0] > self.main_size[0] or self.lores_size[1] > self.main_size[1]:
+                raise ValueError(f"lores {self.lores_size} larger than main {self.main_size}")
+            streams["lores"] = {"format": "YUV420", "size": self.lores_size}
+        config = self.picam2.create_preview_configuration(**streams)
+        if self.lores_size is not None:
+            # The ISP may need other lores alignments; take what it grants
+            self.picam2.align_configuration(config)
+        self.picam2.configure(config)
+        # Sizes as granted; ROIs are computed on main_size
+        self.main_size = tuple(config["main"]["size"])
+        if self.lores_size is not None:
+            self.lores_size = tuple(config["lores"]["size"])
+            (mw, mh), (lw, lh) = self.main_size, self.lores_size
+            if abs(lh * mw / lw - mh) > 1:
+                raise ValueError(f"lores {self.lores_size} has another aspect ratio than main {self.main_size}")
+            self.image_scale = lw / mw
+        self.picam2.start()
+        self.started = True
+        info(f"Camera {self.camera_num}: main {self.main_size}, lores {self.lores_size}")
+
+    def capture(self):
+        if self.lores_size is None:
+            main = self.picam2.capture_array()
+            capture_ts = time.time()
+            luma = None
+        else:
+            # Both arrays come from the same request, i.e. the same sensor frame
+            request = self.picam2.capture_request()
+            capture_ts = time.time()
+            try:
+                main = request.make_array("main")
+                yuv = request.make_array("lores")
+            finally:
+                request.release()
+            w, h = self.lores_size
+            luma = yuv[:h, :w]
+            if self.vflip:
+                luma = cv2.flip(luma, 0)
+        if self.vflip:
+            # Same as the former flip(-1) followed by flip(1)
+            main = cv2.flip(main, 0)
+        return DualFrame(main, luma, capture_ts, self.image_scale)
+
+    def close(self):
+        if self.picam2 is None:
+            return
+        try:
+            if self.started:
+                self.picam2.stop()
+            self.picam2.close()
+        except Exception as e:
+            error(f"Error closing camera {self.camera_num}: {e}")
+        self.started = False
@@ -97,9 +97,19 @@ class ArduinoController:
     def monitor_keyboard(self):
         pass
 
-        
-def drawer_controller(port, baudrate, d_status, d_number):
-    arduino =ArduinoController(port, baudrate)
+
+# Controllers opened ahead of a command by open_controller(), per port
+_opened = {}
+
+def open_controller(port, baudrate):
+    """Open the Arduino now (pays the 2 s reset) for the next drawer_controller call on `port`."""
+    _opened[port] = ArduinoController(port, baudrate)
+    return port
+
+def drawer_controller(port, baudrate, d_status, d_number, arduino=None):
+    # Reuse an already opened controller (skips the 2 s Arduino reset on open)
+    if arduino is None:
+        arduino = _opened.pop(port, None) or ArduinoController(port, baudrate)
     # if arduino.check_distance() and d_status == 0:
     if  d_status == 0:
         arduino.move_drawer_out(d_number)
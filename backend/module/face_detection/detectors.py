@@ -0,0 +1,256 @@
+import os, json, copy, threading
+import cv2
+import numpy as np
+
+from logging import info, error
+
+# ----------------------------
+#  PLUGGABLE FACE DETECTORS
+# ----------------------------
+#
+# Every backend takes a BGR image and returns an int array of (x, y, w, h)
+# boxes in that image's pixels, largest first:
+#
+#   haar   Viola-Jones Haar cascade (the original IRT detector)
+#   lbp    LBP cascade: same API, integer features, several times faster
+#   yunet  OpenCV FaceDetectorYN (YuNet ONNX), CPU
+#   ssd    res10 300x300 SSD (Caffe) through cv2.dnn, CPU
+#
+# `scale` < 1 runs the detector on a downscaled copy and maps the boxes back.
+# detect(image, image_scale=s) takes a frame that is already a downscaled copy
+# of the full-resolution one (the camera's lores stream) and also returns boxes
+# in full-resolution pixels.
+# Models are loaded once per detector; detector_for(pipeline) keeps one
+# detector per pipeline ("irt" presence detection, "enrol" enrolment crops),
+# configured in DETECTOR_CONFIG_PATH.
+
+MODELS_DIR = os.path.join("static", "models")
+DETECTOR_CONFIG_PATH = os.path.join("static", "information", "face_detectors.json")
+
+MODEL_FILES = {
+    "haar": "haarcascade_frontalface_default.xml",
+    "lbp": "lbpcascade_frontalface_improved.xml",
+    "yunet": "face_detection_yunet_2023mar.onnx",
+    "ssd_config": "deploy.prototxt",
+    "ssd": "res10_300x300_ssd_iter_140000.caffemodel",
+}
+MODEL_SOURCES = {
+    "lbp": "https://raw.githubusercontent.com/opencv/opencv/4.x/data/lbpcascades/lbpcascade_frontalface_improved.xml",
+    "yunet": "https://github.com/opencv/opencv_zoo/raw/main/models/face_detection_yunet/face_detection_yunet_2023mar.onnx",
+    "ssd_config": "https://raw.githubusercontent.com/opencv/opencv/4.x/samples/dnn/face_detector/deploy.prototxt",
+    "ssd": "https://raw.githubusercontent.com/opencv/opencv_3rdparty/dnn_samples_face_detector_20170830/res10_300x300_ssd_iter_140000.caffemodel",
+}
+
+DEFAULT_DETECTOR_CONFIG = {
+    # Same parameters irt_detect_cam used with its hardcoded cascade
+    "irt": {"backend": "haar", "scale_factor": 1.1, "min_neighbors": 10, "min_size": 60},
+    "enrol": {"backend": "haar", "scale_factor": 1.1, "min_neighbors": 6, "min_size": 80},
+}
+
+
+def model_path(key, models_dir=MODELS_DIR):
+    """Path of a model file: static/models first, then the places OpenCV / this repo ship it."""
+    name = MODEL_FILES[key]
+    candidates = [name if os.path.isabs(name) else os.path.join(os.getcwd(), models_dir, name)]
+    if key in ("haar", "lbp"):
+        sub = "haarcascades" if key == "haar" else "lbpcascades"
+        data = getattr(cv2, "data", None)
+        if data is not None:
+            candidates.append(os.path.join(data.haarcascades, name))
+            candidates.append(os.path.join(os.path.dirname(os.path.dirname(data.haarcascades)), sub, name))
+    if key == "haar":
+        candidates.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ir_thermal", name))
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    source = MODEL_SOURCES.get(key)
+    raise FileNotFoundError(f"{name} not found in {models_dir}" + (f" (download: {source})" if source else ""))
+
+
+def _largest_first(boxes):
+    boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+    if len(boxes) > 1:
+        boxes = boxes[np.argsort(-(boxes[:, 2] * boxes[:, 3]), kind="stable")]
+    return boxes
+
+
+class FaceDetector:
+    backend = None
+
+    def __init__(self, scale=1.0):
+        self.scale = float(scale)
+        # detect() may be called from several threads (one detector per pipeline
+        # is shared); backends keep scratch buffers / model input sizes
+        self.lock = threading.Lock()
+
+    def _prepare(self, image):
+        if self.scale == 1.0:
+            return image
+        return cv2.resize(image, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def _detect(self, image, scale):
+        raise NotImplementedError
+
+    def detect(self, image, image_scale=1.0):
+        """
+        BGR or gray image -> (N, 4) int32 boxes (x, y, w, h), largest first, in
+        the pixels of the full-resolution frame `image` was downscaled from by
+        `image_scale`.
+        """
+        scale = self.scale * image_scale
+        with self.lock:
+            boxes = self._detect(self._prepare(image), scale)
+        if scale != 1.0 and len(boxes):
+            boxes = np.round(np.asarray(boxes, dtype=np.float32) / scale)
+        return _largest_first(boxes)
+
+    def describe(self):
+        return {"backend": self.backend, "scale": self.scale}
+
+
+class CascadeDetector(FaceDetector):
+    """Haar or LBP cascade (cv2.CascadeClassifier)."""
+
+    def __init__(self, backend="haar", path=None, scale_factor=1.1, min_neighbors=10, min_size=60, scale=1.0):
+        super().__init__(scale)
+        self.backend = backend
+        if not hasattr(cv2, "CascadeClassifier"):
+            # OpenCV 5 moved the cascade classifier to opencv-contrib
+            raise RuntimeError(f"OpenCV {cv2.__version__} has no CascadeClassifier (install opencv-contrib)")
+        self.path = path or model_path(backend)
+        self.cascade = cv2.CascadeClassifier(self.path)
+        if self.cascade.empty():
+            raise ValueError(f"Cannot load cascade {self.path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size        # full-resolution px
+        self._gray = None
+
+    def _detect(self, image, scale):
+        gray = image
+        if image.ndim == 3:
+            if self._gray is None or self._gray.shape != image.shape[:2]:
+                self._gray = np.empty(image.shape[:2], np.uint8)
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        size = max(8, int(round(self.min_size * scale)))
+        return self.cascade.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                             minNeighbors=self.min_neighbors, minSize=(size, size))
+
+
+class YuNetDetector(FaceDetector):
+    backend = "yunet"
+
+    def __init__(self, path=None, score_threshold=0.7, nms_threshold=0.3, top_k=50, scale=1.0):
+        super().__init__(scale)
+        self.path = path or model_path("yunet")
+        self.detector = cv2.FaceDetectorYN.create(self.path, "", (320, 320), score_threshold, nms_threshold, top_k)
+        self._size = None
+
+    def _detect(self, image, scale):
+        h, w = image.shape[:2]
+        if self._size != (w, h):
+            self.detector.setInputSize((w, h))
+            self._size = (w, h)
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        _, faces = self.detector.detect(image)
+        if faces is None:
+            return ()
+        return faces[:, :4]
+
+
+class SSDDetector(FaceDetector):
+    backend = "ssd"
+    MEAN = (104.0, 177.0, 123.0)
+
+    def __init__(self, config=None, weights=None, confidence=0.6, input_size=300, scale=1.0):
+        super().__init__(scale)
+        self.net = cv2.dnn.readNetFromCaffe(config or model_path("ssd_config"), weights or model_path("ssd"))
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.confidence = confidence
+        self.input_size = (input_size, input_size)
+
+    def _detect(self, image, scale):
+        h, w = image.shape[:2]
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        self.net.setInput(cv2.dnn.blobFromImage(image, 1.0, self.input_size, self.MEAN))
+        out = self.net.forward()[0, 0]
+        keep = out[out[:, 2] >= self.confidence]
+        boxes = []
+        for x1, y1, x2, y2 in keep[:, 3:7] * np.array([w, h, w, h], dtype=np.float32):
+            x1, y1 = max(0.0, x1), max(0.0, y1)
+            x2, y2 = min(float(w), x2), min(float(h), y2)
+            if x2 > x1 and y2 > y1:
+                boxes.append((x1, y1, x2 - x1, y2 - y1))
+        return boxes
+
+
+BACKENDS = {
+    "haar": lambda **kw: CascadeDetector("haar", **kw),
+    "lbp": lambda **kw: CascadeDetector("lbp", **kw),
+    "yunet": YuNetDetector,
+    "ssd": SSDDetector,
+}
+
+
+def parse_spec(spec):
+    """'lbp' / 'haar@0.5' / {"backend": "yunet", ...} -> params dict."""
+    if isinstance(spec, dict):
+        return dict(spec)
+    backend, _, scale = str(spec).partition("@")
+    params = {"backend": backend}
+    if scale:
+        params["scale"] = float(scale)
+    return params
+
+
+def create_detector(spec):
+    params = parse_spec(spec)
+    backend = params.pop("backend", "haar")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown face detector backend {backend!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend](**params)
+
+
+def load_detector_config(path=DETECTOR_CONFIG_PATH):
+    """DEFAULT_DETECTOR_CONFIG updated per pipeline from `path` (if present)."""
+    config = copy.deepcopy(DEFAULT_DETECTOR_CONFIG)
+    path = path if os.path.isabs(path) else os.path.join(os.getcwd(), path)
+    if os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                for pipeline, spec in json.load(f).items():
+                    config[pipeline] = parse_spec(spec)
+        except Exception as e:
+            error(f"Failed to load face detector config {path}, using defaults: {e}")
+    return config
+
+
+_detectors = {}
+_detectors_lock = threading.Lock()
+
+
+def detector_for(pipeline):
+    """
+    The detector configured for `pipeline`, created once. If its backend cannot
+    be loaded (missing model), falls back to the pipeline's default.
+    """
+    with _detectors_lock:
+        detector = _detectors.get(pipeline)
+        if detector is not None:
+            return detector
+        config = load_detector_config()
+        spec = config.get(pipeline, DEFAULT_DETECTOR_CONFIG["irt"])
+        try:
+            detector = create_detector(spec)
+        except Exception as e:
+            fallback = DEFAULT_DETECTOR_CONFIG.get(pipeline, DEFAULT_DETECTOR_CONFIG["irt"])
+            if parse_spec(spec) == fallback:
+                raise
+            error(f"Face detector {spec} for '{pipeline}' unavailable ({e}), using {fallback['backend']}")
+            detector = create_detector(fallback)
+        info(f"Face detector for '{pipeline}': {detector.describe()}")
+        _detectors[pipeline] = detector
+        return detector
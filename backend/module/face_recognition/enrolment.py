@@ -0,0 +1,228 @@
+import time, heapq
+import cv2
+import numpy as np
+
+from flask_socketio import SocketIO
+from logging import info, error
+from utils import calculate_centered_roi
+from module.camera.dual_stream import DualStreamCamera, DEFAULT_LORES_SIZE
+from module.face_detection.detectors import detector_for
+from module.face_recognition.face_store import FaceStore, create_embedder
+from module.snapshots.snapshot_module import save_snapshot
+from module.streaming.frame_stream import mjpeg_part
+
+# ----------------------------
+#  FACE ENROLMENT (in memory, quality-selected)
+# ----------------------------
+#
+# Every detected face crop is scored in memory: sharpness (variance of the
+# Laplacian on a size-normalized crop), pose (left/right symmetry of the face
+# as a frontalness proxy, plus box aspect) and size. Crops that pass the gates
+# compete for K slots in a bounded min-heap; a crop that is a near duplicate
+# of a kept one (same pose, same moment) only replaces it if it scores higher,
+# so the K crops stay diverse. Enrolment ends as soon as K crops scoring at
+# least `good_score` are kept - no cooldown timer - and the crops are embedded
+# straight from memory into the FaceStore.
+
+QUALITY_SIZE = (96, 96)         # crops are scored at this size
+THUMB_SIZE = (24, 24)           # near-duplicate check
+PREVIEW_SIZE = (140, 180)
+
+DEFAULT_ENROL_CONFIG = {
+    "k": 5,
+    "good_score": 0.6,
+    "min_sharpness": 40.0,      # Laplacian variance at QUALITY_SIZE
+    "sharpness_ref": 250.0,     # sharpness that scores 1.0
+    "min_pose": 0.35,
+    "min_face_px": 80,
+    "size_ref": 0.45,           # face width / ROI width that scores 1.0
+    "aspect": (0.6, 1.3),
+    "max_similarity": 0.995,    # thumbnail correlation above which crops are duplicates
+    "timeout_s": 20.0,
+}
+
+
+def crop_quality(gray_face, box, roi_width, config=DEFAULT_ENROL_CONFIG):
+    """
+    Scores of one face crop (gray, cropped to `box`). Returns a dict with
+    sharpness, pose, size, score (0..1 weighted) and ok (passes the gates).
+    """
+    x, y, w, h = box
+    face = cv2.resize(gray_face, QUALITY_SIZE, interpolation=cv2.INTER_AREA)
+    sharpness = float(cv2.Laplacian(face, cv2.CV_32F).var())
+
+    half = QUALITY_SIZE[0] // 2
+    left = face[:, :half].astype(np.float32).ravel()
+    right = face[:, -half:][:, ::-1].astype(np.float32).ravel()
+    left -= left.mean()
+    right -= right.mean()
+    denom = float(np.linalg.norm(left) * np.linalg.norm(right))
+    symmetry = max(0.0, float(left @ right) / denom) if denom else 0.0
+    aspect = w / float(h)
+    lo, hi = config["aspect"]
+    pose = symmetry if lo <= aspect <= hi else 0.0
+
+    size = w / float(roi_width)
+    score = (0.5 * min(1.0, sharpness / config["sharpness_ref"])
+             + 0.3 * pose
+             + 0.2 * min(1.0, size / config["size_ref"]))
+    ok = sharpness >= config["min_sharpness"] and pose >= config["min_pose"] and w >= config["min_face_px"]
+    return {"sharpness": round(sharpness, 1), "pose": round(pose, 3), "size": round(size, 3),
+            "score": round(score, 4), "ok": ok}
+
+
+def _thumbnail(gray_face):
+    thumb = cv2.resize(gray_face, THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+    thumb -= thumb.mean()
+    return thumb / max(float(np.linalg.norm(thumb)), 1e-6)
+
+
+class CropSelector:
+    """
+    Bounded top-K of face crops by quality.
+
+    selector.offer(crop_bgr, gray_face, box, roi_width) -> quality dict
+    selector.done() once K crops with score >= good_score are kept
+    selector.crops() best first
+    """
+
+    def __init__(self, config=None):
+        self.config = {**DEFAULT_ENROL_CONFIG, **(config or {})}
+        self.k = int(self.config["k"])
+        self.heap = []              # (score, seq, crop, thumbnail, quality), min score first
+        self.seq = 0
+        self.stats = {"offered": 0, "rejected": 0, "duplicates": 0, "replaced": 0}
+
+    def __len__(self):
+        return len(self.heap)
+
+    def offer(self, crop, gray_face, box, roi_width):
+        self.stats["offered"] += 1
+        quality = crop_quality(gray_face, box, roi_width, self.config)
+        if not quality["ok"]:
+            self.stats["rejected"] += 1
+            return quality
+        self.seq += 1
+        entry = (quality["score"], self.seq, crop.copy(), _thumbnail(gray_face), quality)
+
+        # Near duplicate of a kept crop: keep the better of the two
+        for i, kept in enumerate(self.heap):
+            if float(kept[3] @ entry[3]) > self.config["max_similarity"]:
+                self.stats["duplicates"] += 1
+                if entry[0] > kept[0]:
+                    self.heap[i] = entry
+                    heapq.heapify(self.heap)
+                    self.stats["replaced"] += 1
+                return quality
+
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry[0] > self.heap[0][0]:
+            heapq.heapreplace(self.heap, entry)
+            self.stats["replaced"] += 1
+        return quality
+
+    def good(self):
+        return sum(1 for entry in self.heap if entry[0] >= self.config["good_score"])
+
+    def done(self):
+        return len(self.heap) == self.k and self.good() == self.k
+
+    def crops(self):
+        return [entry[2] for entry in sorted(self.heap, reverse=True)]
+
+    def qualities(self):
+        return [entry[4] for entry in sorted(self.heap, reverse=True)]
+
+
+def enrol_crops(person_id, crops, embedder=None, store=None):
+    """Embed in-memory crops and store them for `person_id`. Returns the embeddings."""
+    store = store if store is not None else FaceStore()
+    embedder = embedder or create_embedder(store=store)
+    embeddings = embedder.embed(crops)
+    store.add(person_id, embeddings, model=embedder.name)
+    return embeddings
+
+
+def stream_face_enrolment(socketio: SocketIO, face_cam: int = 0, person_name: str = '',
+                          k: int = DEFAULT_ENROL_CONFIG["k"], lores_size=DEFAULT_LORES_SIZE, config=None):
+    """
+    Enrolment generator (MJPEG frames) for /face_collect_feed. Emits
+    res_collect_face {'data': 'Incomplete' | 'Completed' | 'Failed', ...},
+    res_collect_face_img {'count', 'k', 'person_id'} per kept crop and
+    res_collect_face_preview {'image_url', 'person_id'} at the end.
+    """
+    selector = CropSelector({**(config or {}), "k": k})
+    screen_width, screen_height = 640, 480
+    camera = DualStreamCamera(face_cam, (screen_width, screen_height), lores_size)
+
+    socketio.emit('res_collect_face', {'data': 'Incomplete', 'k': selector.k})
+    try:
+        detector = detector_for("enrol")
+        # Before the capture: the store's model must load, or nothing could be added to it
+        store = FaceStore()
+        embedder = create_embedder(store=store)
+        camera.start()
+    except Exception as e:
+        error(f"Face enrolment unavailable: {e}")
+        socketio.emit('res_collect_face', {'data': 'Failed', 'error': str(e)})
+        camera.close()
+        return
+
+    roi = calculate_centered_roi(*camera.main_size)
+    roi_x, roi_y, roi_width, roi_height = roi
+    started = time.perf_counter()
+    kept = 0
+    try:
+        while True:
+            captured = camera.capture()
+            frame = captured.main
+            roi_frame = frame[roi_y:roi_y + roi_height, roi_x:roi_x + roi_width]
+
+            faces = detector.detect(*captured.detection_view(roi))
+            roi_color = (0, 255, 0) if len(faces) else (0, 0, 255)
+            for box in faces[:1]:
+                x, y, w, h = (int(v) for v in box)
+                x, y = max(0, x), max(0, y)
+                if w <= 0 or h <= 0:
+                    continue
+                crop = roi_frame[y:y + h, x:x + w]
+                quality = selector.offer(crop, cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), (x, y, w, h), roi_width)
+                color = (0, 255, 0) if quality["ok"] else (0, 165, 255)
+                cv2.rectangle(roi_frame, (x, y), (x + w, y + h), color, 2)
+
+            if len(selector) != kept:
+                kept = len(selector)
+                socketio.emit('res_collect_face_img', {'count': kept, 'k': selector.k, 'person_id': person_name})
+
+            elapsed = time.perf_counter() - started
+            timed_out = elapsed > selector.config["timeout_s"]
+            if selector.done() or (timed_out and len(selector)):
+                crops = selector.crops()
+                enrol_crops(person_name, crops, embedder, store)
+                duration = time.perf_counter() - started
+                info(f"Enrolled {person_name}: {len(crops)} crops in {duration:.2f}s, "
+                     f"scores {[q['score'] for q in selector.qualities()]}, {selector.stats}")
+                preview = cv2.resize(crops[0], PREVIEW_SIZE)
+                socketio.emit('res_collect_face_preview', {
+                    'image_url': save_snapshot(preview, 'face_enrol'),
+                    'person_id': person_name,
+                })
+                socketio.emit('res_collect_face', {'data': 'Completed', 'crops': len(crops),
+                                                   'duration_s': round(duration, 2)})
+                return
+            if timed_out:
+                socketio.emit('res_collect_face', {'data': 'Failed', 'error': 'no usable face'})
+                return
+
+            cv2.rectangle(frame, (roi_x, roi_y), (roi_x + roi_width, roi_y + roi_height), roi_color, 2)
+            cv2.putText(frame, f"Image Captured: {len(selector)}/{selector.k}", (roi_x, roi_y + roi_height + 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            ret, buffer = cv2.imencode('.jpg', frame)
+            if ret:
+                yield mjpeg_part(buffer.tobytes())
+    except Exception as e:
+        error(f"Unexpected error in stream_face_enrolment: {e}")
+        socketio.emit('res_collect_face', {'data': 'Failed', 'error': str(e)})
+    finally:
+        camera.close()
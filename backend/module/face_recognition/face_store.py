@@ -0,0 +1,165 @@
+import os, io, threading
+import cv2
+import numpy as np
+
+from logging import info, error
+from module.face_detection.detectors import MODELS_DIR
+
+# ----------------------------
+#  FACE EMBEDDINGS + STORE
+# ----------------------------
+#
+# Embedders turn in-memory BGR face crops into L2-normalized float32 vectors:
+#
+#   sface     OpenCV FaceRecognizerSF (SFace ONNX, 128-d), CPU, no extra deps
+#   facenet   DeepFace Facenet (the former face_verify path), if deepface is installed
+#
+# FaceStore keeps one row per enrolled crop in FACE_STORE_PATH (.npz: ids,
+# embeddings, model name), written atomically. faceprints.csv stays the id
+# list written by /api/register_information.
+
+FACE_STORE_PATH = os.path.join("static", "information", "faceprints.npz")
+
+SFACE_MODEL = "face_recognition_sface_2021dec.onnx"
+SFACE_SOURCE = "https://github.com/opencv/opencv_zoo/raw/main/models/face_recognition_sface/face_recognition_sface_2021dec.onnx"
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class SFaceEmbedder:
+    name = "sface"
+    threshold = 0.363           # cosine, from the SFace model card
+    input_size = (112, 112)
+
+    def __init__(self, path=None):
+        path = path or os.path.join(os.getcwd(), MODELS_DIR, SFACE_MODEL)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{SFACE_MODEL} not found in {MODELS_DIR} (download: {SFACE_SOURCE})")
+        self.recognizer = cv2.FaceRecognizerSF.create(path, "")
+
+    def embed(self, crops):
+        out = []
+        for crop in crops:
+            face = cv2.resize(crop, self.input_size, interpolation=cv2.INTER_AREA)
+            out.append(self.recognizer.feature(face).flatten())
+        return _normalize(out)
+
+
+class FacenetEmbedder:
+    name = "facenet"
+    threshold = 0.8             # as in the former verify_face
+
+    def __init__(self):
+        from deepface import DeepFace
+        self.deepface = DeepFace
+
+    def embed(self, crops):
+        out = []
+        for crop in crops:
+            rep = self.deepface.represent(img_path=crop, model_name="Facenet",
+                                          detector_backend="skip", enforce_detection=False)
+            out.append(rep[0]["embedding"])
+        return _normalize(out)
+
+
+EMBEDDERS = {"sface": SFaceEmbedder, "facenet": FacenetEmbedder}
+
+
+def create_embedder(name=None, store=None):
+    """
+    The named embedder; else the one `store`'s embeddings were made with (a
+    store only compares vectors of one model); else the first one that loads
+    on this machine.
+    """
+    if name is None and store is not None and len(store) and store.model:
+        name = store.model
+        if name not in EMBEDDERS:
+            raise RuntimeError(f"Face store {store.path} holds embeddings of unknown model {name!r}")
+    if name is not None:
+        return EMBEDDERS[name]()
+    errors = []
+    for candidate in EMBEDDERS.values():
+        try:
+            return candidate()
+        except Exception as e:
+            errors.append(f"{candidate.name}: {e}")
+    raise RuntimeError("No face embedder available (" + "; ".join(errors) + ")")
+
+
+class FaceStore:
+    """
+    store = FaceStore()
+    store.add(person_id, embeddings, model="sface")
+    ok, person_id, similarity = store.verify(embedding, threshold)
+    """
+
+    def __init__(self, path=FACE_STORE_PATH):
+        self.path = path if os.path.isabs(path) else os.path.join(os.getcwd(), path)
+        self.lock = threading.Lock()
+        self.ids = np.zeros(0, dtype="U64")
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        self.model = None
+        self.load()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                self.ids = data["ids"]
+                self.embeddings = data["embeddings"]
+                self.model = str(data["model"])
+        except Exception as e:
+            error(f"Failed to load face store {self.path}: {e}")
+
+    def _save(self):
+        buf = io.BytesIO()
+        np.savez(buf, ids=self.ids, embeddings=self.embeddings, model=np.array(self.model or ""))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(buf.getvalue())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def add(self, person_id, embeddings, model):
+        """Replace `person_id`'s rows with `embeddings` (normalized)."""
+        embeddings = _normalize(embeddings)
+        with self.lock:
+            if len(self.ids) and self.model != model:
+                raise ValueError(f"Face store holds {self.model} embeddings, got {model}")
+            keep = self.ids != person_id
+            rows = self.embeddings[keep] if len(self.ids) else np.zeros((0, embeddings.shape[1]), np.float32)
+            self.ids = np.concatenate([self.ids[keep], np.full(len(embeddings), person_id, dtype="U64")])
+            self.embeddings = np.vstack([rows, embeddings])
+            self.model = model
+            self._save()
+        info(f"Face store: {len(embeddings)} embeddings for {person_id} ({len(self.ids)} total)")
+
+    def remove(self, person_id):
+        with self.lock:
+            keep = self.ids != person_id
+            if keep.all():
+                return False
+            self.ids, self.embeddings = self.ids[keep], self.embeddings[keep]
+            self._save()
+            return True
+
+    def verify(self, embedding, threshold):
+        """(match, person_id, similarity) of the most similar enrolled crop."""
+        with self.lock:
+            if not len(self.ids):
+                return False, None, 0.0
+            similarities = self.embeddings @ _normalize(embedding).ravel()
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            person_id = str(self.ids[best])
+        return similarity >= threshold, person_id if similarity >= threshold else None, similarity
@@ -1,30 +1,38 @@
-import os, sys, time, serial, cv2
+import time, serial, cv2
 import numpy as np
-import matplotlib.pyplot as plt 
 
 from flask_socketio import SocketIO 
-from picamera2 import Picamera2  
 
-from logging import info, error
-from utils import clear_and_ensure_folder, calculate_centered_roi
-
-np.set_printoptions(threshold=sys.maxsize)
+from logging import info, error, debug
+from utils import calculate_centered_roi
+from module.ir_thermal.temp_estimator import StreamingTempEstimator, CALIB_OFFSET, estimate_face_temp, calibrate_to_body
+from module.ir_thermal.thermal_protocol import ThermalClient, face_rows, parse_response_data, extract_temp_data
+from module.ir_thermal.session_recorder import PendingSession
+from module.snapshots.snapshot_module import save_snapshot
+from module.face_detection.detectors import detector_for
+from module.camera.dual_stream import DualStreamCamera, DEFAULT_LORES_SIZE
+from module.camera.activity import ActivityGovernor, DEFAULT_IDLE_FPS
+from module.ir_thermal.heatmap import ir_heatmap
+from module.streaming.frame_stream import mjpeg_part
+from module.streaming.thermal_stream import ThermalMatrixStream, DEFAULT_MATRIX_HZ
+
+THUMB_WIDTH = 160
 
 # ----------------------------
 #  SERIAL & PROTOCOL HELPERS
 # ----------------------------
 
-def initialize_serial(usb_port):
+def initialize_serial(usb_port, baudrate=115200):
     try:
         connection = serial.Serial(
             port=usb_port,
-            baudrate=115200,
+            baudrate=baudrate,
             parity=serial.PARITY_NONE,
             stopbits=serial.STOPBITS_ONE,
             bytesize=serial.EIGHTBITS,
             timeout=1
         )
-        info(f"Serial connection initialized on {usb_port}")
+        info(f"Serial connection initialized on {usb_port} @ {baudrate}")
         return connection
     except serial.SerialException as e:
         error(f"Failed to initialize serial connection on {usb_port}: {e}")
@@ -49,56 +57,14 @@ def build_request(start_address, num_registers):
 
     request.append(0x98)  # END_BYTE
 
-    # info(f"Request: {request.hex()}")  # Log as a hex string for readability
-    info(f"Request: {request}")  # Log as a hex string for readability
+    # Lazy: formatted on the log thread, and only when the sampler lets it through
+    debug("Request: %s", request)
     return request
 
-def parse_response_data(data):
-    data_bytes = list(data)
-
-    # EXTRACT START BYTES
-    start_msb = data_bytes[0]
-    start_lsb = data_bytes[1]
-    start_value = (start_msb << 8) | start_lsb
-
-    temp_data = []
-    index = 2
-    while index < len(data_bytes) - 2:
-        temp_msb = data_bytes[index]
-        temp_lsb = data_bytes[index + 1]
-        temperature = (temp_msb << 8) | temp_lsb
-        temp_data.append(round(temperature * 0.1, 2))
-        index += 2
-
-    # EXTRACT END BYTES
-    end_msb = data_bytes[-2]
-    end_lsb = data_bytes[-1]
-    end_value = (end_msb << 8) | end_lsb
-
-    response_list = [start_value] + temp_data + [end_value]
-
-    if len(response_list) > 256:
-        response_list = response_list[:256]  # Truncate if there's excess data
-
-    response_matrix = np.array(response_list).reshape(16, 16)
-    return response_matrix
-
 # ----------------------------
 #  IR TEMPERATURE CONTROL
 # ----------------------------
 
-def extract_temp_data(data):
-    flattened_data = np.array(data).flatten()
-
-    index_5784 = np.where(flattened_data == 5784.0)[0][0]
-    values = [data[0][1], data[1][0], data[1][1]]
-    mean_value = round(sum(values) / len(values), 1)
-
-    flattened_data[index_5784] = mean_value
-
-    temperature_matrix = flattened_data.reshape((16, 16))
-    return temperature_matrix
-
 def get_center_frame(frame, roi_size=350):
     # CALCULATE ROI
     height, width, _ = frame.shape
@@ -112,95 +78,6 @@ def get_center_frame(frame, roi_size=350):
 def save_image(region, filename):
     cv2.imwrite(filename, region)
 
-def ir_heatmap(frame, data, alpha=0.6, show_text=True, show_grid=True):
-    """
-    Render a 16x16 IR temperature matrix as a heatmap over a frame.
-
-    Parameters
-    ----------
-    frame : np.ndarray
-        BGR image (e.g. ROI from camera).
-    data : array-like
-        16x16 temperature matrix (float).
-    alpha : float
-        Weight of heatmap vs original frame (0..1).
-    show_text : bool
-        If True, draw temperature values in each cell.
-    show_grid : bool
-        If True, draw grid lines for 16x16 cells.
-    """
-
-    # --- Ensure numpy float32 array ---
-    data_arr = np.array(data, dtype=np.float32)
-
-    # --- Normalize to 0–255 for applyColorMap ---
-    min_v = float(np.min(data_arr))
-    max_v = float(np.max(data_arr))
-
-    if max_v - min_v < 1e-6:
-        # Avoid divide-by-zero if all values are (almost) equal
-        norm = np.zeros_like(data_arr, dtype=np.uint8)
-    else:
-        norm = ((data_arr - min_v) / (max_v - min_v) * 255.0).astype(np.uint8)
-
-    # --- Resize to frame size using nearest neighbor (so each sensor cell becomes a block) ---
-    h, w = frame.shape[:2]
-    heat_resized = cv2.resize(norm, (w, h), interpolation=cv2.INTER_NEAREST)
-
-    # --- Apply JET colormap directly in OpenCV ---
-    heat_color = cv2.applyColorMap(heat_resized, cv2.COLORMAP_JET)
-
-    # --- Blend with original frame ---
-    alpha = float(alpha)
-    alpha = max(0.0, min(1.0, alpha))
-    blended = cv2.addWeighted(heat_color, alpha, frame, 1.0 - alpha, 0)
-
-    # --- Optional: draw temperature text + grid ---
-    grid_h, grid_w = data_arr.shape  # should be 16 x 16
-    cell_w = w / grid_w
-    cell_h = h / grid_h
-
-    font = cv2.FONT_HERSHEY_SIMPLEX
-    font_scale = 0.35
-    font_thickness = 1
-    text_color = (255, 255, 255)
-
-    if show_grid:
-        # Vertical lines
-        for j in range(1, grid_w):
-            x = int(j * cell_w)
-            cv2.line(blended, (x, 0), (x, h), (255, 255, 255), 1, lineType=cv2.LINE_AA)
-        # Horizontal lines
-        for i in range(1, grid_h):
-            y = int(i * cell_h)
-            cv2.line(blended, (0, y), (w, y), (255, 255, 255), 1, lineType=cv2.LINE_AA)
-
-    if show_text:
-        for i in range(grid_h):
-            for j in range(grid_w):
-                temp_value = f"{data_arr[i, j]:.1f}"
-
-                # Center of the cell
-                x_center = int(j * cell_w + cell_w / 2)
-                y_center = int(i * cell_h + cell_h / 2)
-
-                # Slight offset so text looks centered
-                x_text = x_center - 12
-                y_text = y_center + 4
-
-                cv2.putText(
-                    blended,
-                    temp_value,
-                    (x_text, y_text),
-                    font,
-                    font_scale,
-                    text_color,
-                    font_thickness,
-                    cv2.LINE_AA
-                )
-
-    return blended
-
 def read_temperature(serial_port):
     # start_address = 0
     # num_registers = 259
@@ -219,7 +96,8 @@ def read_temperature(serial_port):
 
         if response is not None:
             try:
-                info(f"Debug: {len(response)} >= 4 {len(response) >= 4}, {response[0]} == 22 {response[0] == 22}, {response[1]} == 152 {response[1] == 152}, {response[-2]} == 26 {response[-2] == 26}, {response[-1]} == 156 {response[-1] == 156}")
+                debug("Response: %d bytes, head %s tail %s (expect 22 152 .. 26 156)",
+                      len(response), response[:2].hex(), response[-2:].hex())
 
                 if len(response) >= 4 and response[0] == 22 and response[1] == 152 and response[-2] == 26 and response[-1] == 156:
                     response = parse_response_data(response)
@@ -229,53 +107,68 @@ def read_temperature(serial_port):
                 
                 return temp_matrix, response
             except Exception as parse_error:
-                print(f"Error while parsing response data: {parse_error}")
+                error(f"Error while parsing response data: {parse_error}")
         else:
-            print("Error: No response received from the serial port.")
+            error("No response received from the serial port.")
         time.sleep(0.1)
 
     except serial.SerialException as e:
-        print(f"Serial communication error: {e}")
+        error(f"Serial communication error: {e}")
     except Exception as e:
-        print(f"Unexpected error in temperature reading thread: {e}")
-
-def estimate_face_temp(temp_matrix: np.ndarray) -> float:
-    h, w = temp_matrix.shape  # should be 16x16
-    i0, i1 = h // 2 - 2, h // 2 + 2
-    j0, j1 = w // 2 - 2, w // 2 + 2
+        error(f"Unexpected error in temperature reading thread: {e}")
 
-    center_patch = temp_matrix[i0:i1, j0:j1]
-    flat = center_patch.flatten()
-    flat_sorted = np.sort(flat)[::-1]
-    top_n = flat_sorted[:5]  # average of 5 hottest pixels
-    return float(np.mean(top_n))
-
-def calibrate_to_body(raw_face_temp: float, CALIB_OFFSET=1.8) -> float:
-    return round(raw_face_temp + CALIB_OFFSET, 1)
 # ----------------------------
 #  MAIN DETECTOR / STREAM FUNCTION
 # ----------------------------
 
-def irt_detect_cam(socketio: SocketIO, face_cam: int, usb_port: str, temp_offset: float = 1.5):
+def irt_detect_cam(socketio: SocketIO, face_cam: int, usb_port: str, temp_offset: float = 1.5,
+                   min_samples: int = 5, max_samples: int = 30, ci_tolerance: float = 0.15,
+                   baudrate: int = 115200, frame_sink=None, matrix_hz: float = DEFAULT_MATRIX_HZ,
+                   lores_size=DEFAULT_LORES_SIZE, idle_fps: float = DEFAULT_IDLE_FPS):
     """
     Main generator for:
-      - capturing frames via Picamera2
+      - capturing frames via Picamera2 (main + lores streams)
       - detecting face in ROI
       - reading IR matrix
       - emitting irt_data & irt_state via Socket.IO
       - streaming MJPEG frames (yield)
+
+    IR frames are read through ThermalClient: only the matrix rows under the
+    detected face are requested, pipelined with the camera loop.
+
+    Faces are detected on the camera's `lores_size` luma stream and mapped back
+    to the main frame (DualStreamCamera); None detects on the main frame.
+
+    The session ends once the temperature estimate's confidence interval is
+    narrower than `ci_tolerance` (between `min_samples` and `max_samples` readings).
+
+    `frame_sink(jpeg, capture_ts, irt_state=..., irt_data=...)` additionally gets
+    every encoded frame with the status values that belong to it (FrameStream.publish).
+
+    Raw IR matrices go out as `irt_matrix` events at up to `matrix_hz` (0 = off)
+    for client-side heatmaps; ir_heatmap only renders the final snapshot.
+
+    With nobody in view the loop drops to `idle_fps` (ActivityGovernor): no
+    detection, the last JPEG is sent again; motion brings it back to full
+    rate on the frame it shows up in. 0 = always full rate.
     """
 
     time.sleep(1)
     ser = None
-    picam2 = None
+    thermal = None
+    recorder = None
+    camera = None
+    matrix_stream = ThermalMatrixStream(socketio, rate_hz=matrix_hz)
 
-    temp_data = {
-        "temp_data_collect": []
-    }
+    estimator = StreamingTempEstimator(
+        min_samples=min_samples,
+        max_samples=max_samples,
+        ci_tolerance=ci_tolerance
+    )
 
     try:
-        ser = initialize_serial(usb_port)
+        ser = initialize_serial(usb_port, baudrate)
+        thermal = ThermalClient(ser)
         socketio.emit('irt_update', {
             'irt_state': {'state': 'Connecting'},
             'irt_indicator': {'state': 'm'}
@@ -298,7 +191,7 @@ def irt_detect_cam(socketio: SocketIO, face_cam: int, usb_port: str, temp_offset
         time.sleep(0.5)
 
         screen_width, screen_height = 640, 480
-        picam2 = Picamera2(camera_num=face_cam)
+        camera = DualStreamCamera(face_cam, (screen_width, screen_height), lores_size)
 
         socketio.emit('irt_update', {
                 'irt_state': {'state': 'Camera active'},
@@ -307,11 +200,7 @@ def irt_detect_cam(socketio: SocketIO, face_cam: int, usb_port: str, temp_offset
         time.sleep(0.5)
 
         try:
-            config = picam2.create_preview_configuration(
-                main={'format': 'RGB888', "size": (screen_width, screen_height)}
-            )
-            picam2.configure(config)
-            picam2.start()
+            camera.start()
         except Exception as cam_err:
             error(f"Error starting camera: {cam_err}")
             socketio.emit('irt_update', {
@@ -319,25 +208,27 @@ def irt_detect_cam(socketio: SocketIO, face_cam: int, usb_port: str, temp_offset
                 'irt_indicator': {'state': 'e'}
             })
 
-            if picam2 is not None:
-                picam2.stop()
-                picam2.close()
+            camera.close()
             return
 
-        roi_x, roi_y, roi_width, roi_height = calculate_centered_roi(screen_width, screen_height)
+        roi_x, roi_y, roi_width, roi_height = calculate_centered_roi(*camera.main_size)
 
-        haarcascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-        face_cascade = cv2.CascadeClassifier(haarcascade_path)
-
-        if face_cascade.empty():
-            error("Error loading Haar cascade.")
+        try:
+            face_detector = detector_for("irt")
+        except Exception as det_err:
+            error(f"Error loading face detector: {det_err}")
             socketio.emit('irt_update', {
                 'irt_state': {'state': 'face e.'},
                 'irt_indicator': {'state': 'e'}
             })
             return
 
-        last_heatmap = None
+        last_matrix = None
+        irt_data = {}
+        governor = ActivityGovernor({"idle_fps": idle_fps}) if idle_fps else None
+        last_frame_bytes = None
+        irt_state, emitted_state = 'Find a Face', None
+        recorder = PendingSession(calib_offset=CALIB_OFFSET, temp_offset=temp_offset)     # file on the first accepted reading
         socketio.emit('irt_update', {
                 'irt_state': {'state': 'Ready'},
                 'irt_indicator': {'state': 'm'}
@@ -345,9 +236,24 @@ def irt_detect_cam(socketio: SocketIO, face_cam: int, usb_port: str, temp_offset
         info("IRT ready for measurement.")
 
         while True:
-            frame = picam2.capture_array()
-            frame = cv2.flip(frame, -1)
-            frame = cv2.flip(frame, 1)
+            if governor is not None:
+                governor.throttle()
+            captured = camera.capture()
+            frame, capture_ts = captured.main, captured.capture_ts
+
+            if governor is not None and not governor.observe(
+                    captured.luma if captured.luma is not None else frame):
+                # Idle: nobody there, no detection; resend the unchanged picture
+                if last_frame_bytes is None or not governor.reuse_jpeg():
+                    cv2.rectangle(frame, (roi_x, roi_y), (roi_x + roi_width, roi_y + roi_height), (255, 255, 255), 2)
+                    ret, buffer = cv2.imencode('.jpg', frame)
+                    if not ret:
+                        continue
+                    last_frame_bytes = buffer.tobytes()
+                if frame_sink is not None:
+                    frame_sink(last_frame_bytes, capture_ts, irt_state=irt_state, irt_data=irt_data)
+                yield mjpeg_part(last_frame_bytes)
+                continue
 
             cv2.rectangle(frame, (roi_x, roi_y),
                           (roi_x + roi_width, roi_y + roi_height),
@@ -356,28 +262,27 @@ def irt_detect_cam(socketio: SocketIO, face_cam: int, usb_port: str, temp_offset
             # BUG FIX: crop by roi_width, roi_height (was roi_height twice)
             roi_frame = frame[roi_y:roi_y + roi_height, roi_x:roi_x + roi_width]
 
-            faces = face_cascade.detectMultiScale(
-                roi_frame,
-                scaleFactor=1.1,
-                minNeighbors=10,
-                minSize=(60, 60)
-            )
+            # Detect on the lores luma; boxes come back in main ROI pixels
+            faces = face_detector.detect(*captured.detection_view((roi_x, roi_y, roi_width, roi_height)))
 
-            if len(faces) == 0:
-                socketio.emit('irt_update', {
-                        'irt_state': {'state': 'Find a Face'},
-                        'irt_indicator': {'state': 'm'}
-                })
-            else:
+            irt_state = 'Find a Face' if len(faces) == 0 else 'Meas.'
+            if governor is not None:
+                governor.activity(len(faces) > 0)
+            if irt_state != emitted_state:
+                # Only on change, not every frame
+                emitted_state = irt_state
                 socketio.emit('irt_update', {
-                        'irt_state': {'state': 'Meas.'},
+                        'irt_state': {'state': irt_state},
                         'irt_indicator': {'state': 'm'}
                 })
 
+            if len(faces) > 0:
+
                 for (x, y, w, h) in faces:
                     cv2.rectangle(roi_frame, (x, y), (x + w, y + h), (0, 0, 255), 2)
 
-                temp_matrix, raw_response = read_temperature(ser)
+                face_box = faces[0]     # largest first
+                temp_matrix = thermal.read_frame(face_rows(face_box, roi_height))
 
                 if temp_matrix is not None:
                     # 1) estimate forehead temp from IR matrix
@@ -390,41 +295,44 @@ def irt_detect_cam(socketio: SocketIO, face_cam: int, usb_port: str, temp_offset
                     temp_data_min = round(float(np.min(temp_matrix)), 1)
                     temp_data_mean = round(float(np.mean(temp_matrix)), 1)
 
-                    temp_data["temp_data_collect"].append(temp_data_max)
-                    print("RAW_FACE:", raw_face_temp, "CALIB:", temp_data_max)
-                    print("RAW_MIN:", temp_data_min, "RAW_MEAN:", temp_data_mean)
+                    accepted = estimator.update(temp_data_max)
+                    recorder.append(temp_matrix, face_box, raw_face_temp, temp_data_max, accepted)
+                    debug("RAW_FACE: %s CALIB: %s ACCEPTED: %s RAW_MIN: %s RAW_MEAN: %s",
+                          raw_face_temp, temp_data_max, accepted, temp_data_min, temp_data_mean)
 
-                    socketio.emit('irt_data', {
+                    irt_data = {
                         'temp_max': temp_data_max,
                         'temp_min': temp_data_min,
-                        'temp_result': ''
-                    })
+                        'temp_result': '',
+                        **estimator.progress()
+                    }
+                    socketio.emit('irt_data', irt_data)
 
-                    last_heatmap = ir_heatmap(roi_frame, temp_matrix)
-                    save_image(
-                        last_heatmap,
-                        os.path.join(os.getcwd(), 'static', 'irt_image', 'heatmap_images.png')
-                    )
+                    matrix_stream.publish(temp_matrix, capture_ts, face_box, (roi_width, roi_height))
+                    last_matrix, last_roi = temp_matrix, roi_frame
 
-            if len(temp_data["temp_data_collect"]) == 15:
-                temp_data_result = round(
-                    sum(temp_data["temp_data_collect"]) / len(temp_data["temp_data_collect"]), 1
-                )
+            if estimator.count > 0 and estimator.is_done():
+                temp_data_result = estimator.result()
 
                 socketio.emit('irt_data', {
                     'temp_max': temp_data_max,
                     'temp_min': temp_data_min,
-                    'temp_result': temp_data_result
+                    'temp_result': temp_data_result,
+                    **estimator.progress()
                 })
 
                 info(f"Final Temperature Data: {temp_data_result}")
-                if last_heatmap is not None:
-                    save_image(
-                        frame,
-                        os.path.join(os.getcwd(), 'static', 'irt_image', 'irt_images.png')
-                    )
-                    image_rel_path = '/static/irt_image/irt_images.png'
-                    socketio.emit('irt_result', {'image_url': image_rel_path})
+                recorder.close(temp_data_result)
+                if last_matrix is not None:
+                    # Rendered once, for the archived result only
+                    last_heatmap = ir_heatmap(last_roi, last_matrix)
+                    image_url = save_snapshot(frame, 'irt', thumb_widths=(THUMB_WIDTH,))
+                    heatmap_url = save_snapshot(last_heatmap, 'irt_heatmap', thumb_widths=(THUMB_WIDTH,))
+                    socketio.emit('irt_result', {
+                        'image_url': image_url,
+                        'heatmap_url': heatmap_url,
+                        'thumb_url': f"{image_url}?w={THUMB_WIDTH}"
+                    })
 
                 socketio.emit('irt_update', {
                         'irt_state': {'state': 'Complete'},
@@ -432,10 +340,10 @@ def irt_detect_cam(socketio: SocketIO, face_cam: int, usb_port: str, temp_offset
                 })
 
                 if ser is not None and ser.is_open:
+                    thermal.close()
                     ser.close()
-                if picam2 is not None:
-                    picam2.stop()
-                    picam2.close()
+                if camera is not None:
+                    camera.close()
 
                 info("Serial port and camera closed.")
                 return temp_data_result
@@ -444,9 +352,10 @@ def irt_detect_cam(socketio: SocketIO, face_cam: int, usb_port: str, temp_offset
             if not ret:
                 continue
 
-            frame_bytes = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+            frame_bytes = last_frame_bytes = buffer.tobytes()
+            if frame_sink is not None:
+                frame_sink(frame_bytes, capture_ts, irt_state=irt_state, irt_data=irt_data)
+            yield mjpeg_part(frame_bytes)
 
     except serial.SerialException as e:
         error(f"Serial communication error: {e}")
@@ -467,16 +376,20 @@ def irt_detect_cam(socketio: SocketIO, face_cam: int, usb_port: str, temp_offset
                 'irt_indicator': {'state': 'e'}
             })
     finally:
+        if recorder is not None:
+            recorder.close()
+
         try:
             if ser is not None and ser.is_open:
+                if thermal is not None:
+                    thermal.close()
                 ser.close()
         except Exception:
             pass
 
         try:
-            if picam2 is not None:
-                picam2.stop()
-                picam2.close()
+            if camera is not None:
+                camera.close()
         except Exception:
             pass
 
@@ -0,0 +1,246 @@
+import os, glob, math, struct, time, uuid
+from collections import deque
+import numpy as np
+
+from logging import info, error
+
+# ----------------------------
+#  RAW THERMAL SESSION RECORDING
+# ----------------------------
+#
+# One append-only file per IRT session:
+#
+#   header (64 bytes, little-endian)
+#     magic "IRTREC01" | version u2 | rows u2 | cols u2 | record_size u2
+#     scale f4 | start_time f8 | calib_offset f4 | temp_offset f4 |
+#     result_temp f4 | n_records u4
+#     reserved
+#   records (RECORD_DTYPE.itemsize bytes each)
+#     timestamp f8 | frame u4 | face x,y,w,h i2 | flags u2 |
+#     raw_face_temp f4 | calibrated_temp f4 | matrix rows*cols u2 (degC / scale)
+#
+# The record layout is fixed, so a file can be np.memmap'ed from HEADER_SIZE and
+# sliced without parsing. result_temp / n_records are patched in on close; a file
+# from a crashed session is still readable (record count comes from its size).
+#
+# Sessions are opened lazily (PendingSession): readings before the first one
+# the estimator accepts are held in memory and only written once there is one,
+# so /video_feed opens with nobody in front of the camera leave no file. Files
+# live outside static/ (served publicly) and are pruned by count and age.
+
+MAGIC = b"IRTREC01"
+VERSION = 1
+HEADER_SIZE = 64
+HEADER_STRUCT = struct.Struct("<8sHHHHfdfffI")
+GRID = (16, 16)
+TEMP_SCALE = 0.1            # same resolution as the sensor registers
+SESSION_EXT = ".irtrec"
+
+FLAG_ACCEPTED = 0x1         # reading kept by the temperature estimator
+
+RECORD_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("frame", "<u4"),
+    ("face", "<i2", (4,)),
+    ("flags", "<u2"),
+    ("raw_face_temp", "<f4"),
+    ("calibrated_temp", "<f4"),
+    ("matrix", "<u2", GRID),
+])
+
+SESSION_DIR = os.path.join("data", "irt_sessions")
+LEGACY_SESSION_DIR = os.path.join("static", "irt_sessions")
+MAX_SESSIONS = 200
+MAX_AGE_S = 30 * 24 * 3600
+PENDING_FRAMES = 64         # readings kept before the first accepted one
+
+
+class SessionRecorder:
+    """Append every decoded thermal matrix of one session to a `.irtrec` file."""
+
+    def __init__(self, path, calib_offset=0.0, temp_offset=0.0, start_time=None):
+        self.path = path
+        self.start_time = time.time() if start_time is None else start_time
+        self.calib_offset = calib_offset
+        self.temp_offset = temp_offset
+        self.n_records = 0
+
+        # Reused for every frame: one record and one scratch matrix
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+        self._scaled = np.empty(GRID, dtype=np.float32)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "xb")
+        self._file.write(self._header(math.nan))
+
+    @classmethod
+    def open_session(cls, session_dir=SESSION_DIR, **kwargs):
+        _move_legacy_sessions(session_dir)
+        try:
+            prune_sessions(session_dir)
+        except Exception as e:
+            error(f"IRT session pruning failed: {e}")
+        name = time.strftime("%Y%m%d_%H%M%S") + f"_{uuid.uuid4().hex[:8]}" + SESSION_EXT
+        return cls(os.path.join(os.getcwd(), session_dir, name), **kwargs)
+
+    def _header(self, result_temp):
+        packed = HEADER_STRUCT.pack(
+            MAGIC, VERSION, GRID[0], GRID[1], RECORD_DTYPE.itemsize, TEMP_SCALE,
+            self.start_time, self.calib_offset, self.temp_offset, result_temp, self.n_records
+        )
+        return packed.ljust(HEADER_SIZE, b"\0")
+
+    def append(self, temp_matrix, face_box=None, raw_face_temp=math.nan,
+               calibrated_temp=math.nan, accepted=False, timestamp=None):
+        rec = self._record[0]
+        rec["timestamp"] = time.time() if timestamp is None else timestamp
+        rec["frame"] = self.n_records
+        rec["face"] = face_box if face_box is not None else (-1, -1, -1, -1)
+        rec["flags"] = FLAG_ACCEPTED if accepted else 0
+        rec["raw_face_temp"] = raw_face_temp
+        rec["calibrated_temp"] = calibrated_temp
+
+        np.divide(temp_matrix, TEMP_SCALE, out=self._scaled)
+        np.clip(self._scaled, 0, 65535, out=self._scaled)
+        np.rint(self._scaled, out=self._scaled)
+        rec["matrix"] = self._scaled
+
+        self._file.write(self._record.tobytes())
+        self.n_records += 1
+
+    def close(self, result_temp=None):
+        if self._file is None:
+            return
+        try:
+            self._file.seek(0)
+            self._file.write(self._header(math.nan if result_temp is None else float(result_temp)))
+            info(f"IRT session recorded: {self.path} ({self.n_records} frames)")
+        except Exception as e:
+            error(f"Failed to finalize IRT session file {self.path}: {e}")
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class PendingSession:
+    """
+    SessionRecorder that opens its file on the first accepted reading; the
+    readings before it (up to `backlog`) are written first. Same append / close.
+    """
+
+    def __init__(self, session_dir=SESSION_DIR, backlog=PENDING_FRAMES, **kwargs):
+        self.session_dir = session_dir
+        self.kwargs = kwargs
+        self.start_time = time.time()
+        self.pending = deque(maxlen=backlog)
+        self.recorder = None
+
+    @property
+    def path(self):
+        return self.recorder.path if self.recorder is not None else None
+
+    def append(self, temp_matrix, face_box=None, raw_face_temp=math.nan,
+               calibrated_temp=math.nan, accepted=False, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.recorder is None:
+            if not accepted:
+                self.pending.append((np.array(temp_matrix, copy=True), face_box, raw_face_temp,
+                                     calibrated_temp, False, timestamp))
+                return
+            self.recorder = SessionRecorder.open_session(self.session_dir, start_time=self.start_time,
+                                                         **self.kwargs)
+            while self.pending:
+                self.recorder.append(*self.pending.popleft())
+        self.recorder.append(temp_matrix, face_box, raw_face_temp, calibrated_temp, accepted, timestamp)
+
+    def close(self, result_temp=None):
+        self.pending.clear()
+        if self.recorder is not None:
+            self.recorder.close(result_temp)
+
+
+class ThermalSession:
+    """Read-only, memory-mapped view of a `.irtrec` file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        (magic, version, rows, cols, record_size, scale, start_time,
+         calib_offset, temp_offset, result_temp, n_records) = HEADER_STRUCT.unpack_from(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an IRT session file")
+        if version != VERSION or (rows, cols) != GRID or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"{path}: unsupported layout v{version} {rows}x{cols}/{record_size}")
+
+        self.scale = scale
+        self.start_time = start_time
+        self.calib_offset = round(calib_offset, 3)
+        self.temp_offset = round(temp_offset, 3)
+        self.result_temp = None if math.isnan(result_temp) else round(result_temp, 2)
+
+        # Trust the file size over n_records so interrupted sessions stay readable
+        count = (os.path.getsize(path) - HEADER_SIZE) // record_size
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE,
+                                 shape=(count,)) if count else np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def raw(self):
+        """(N, 16, 16) uint16 view of the matrices, in units of `scale` degC."""
+        return self.records["matrix"]
+
+    def matrices(self, start=None, stop=None):
+        """(N, 16, 16) float32 matrices in degC for records[start:stop]."""
+        return self.raw[start:stop].astype(np.float32) * np.float32(self.scale)
+
+    @property
+    def timestamps(self):
+        return self.records["timestamp"]
+
+    @property
+    def faces(self):
+        return self.records["face"]
+
+
+def list_sessions(session_dir=SESSION_DIR):
+    return sorted(glob.glob(os.path.join(session_dir, "*" + SESSION_EXT)))
+
+
+def prune_sessions(session_dir=SESSION_DIR, max_count=MAX_SESSIONS, max_age_s=MAX_AGE_S):
+    """Retention: drop sessions older than max_age_s, then all but the newest max_count."""
+    folder = os.path.join(os.getcwd(), session_dir)
+    if not os.path.isdir(folder):
+        return 0
+    sessions = sorted(((entry.stat().st_mtime, entry.path) for entry in os.scandir(folder)
+                       if entry.name.endswith(SESSION_EXT)), reverse=True)
+    now = time.time()
+    removed = 0
+    for index, (mtime, path) in enumerate(sessions):
+        if index < max_count and now - mtime <= max_age_s:
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    if removed:
+        info(f"Pruned {removed} old IRT sessions")
+    return removed
+
+
+def _move_legacy_sessions(session_dir):
+    """Recordings made before they moved out of static/ go to `session_dir`."""
+    legacy = os.path.join(os.getcwd(), LEGACY_SESSION_DIR)
+    if session_dir != SESSION_DIR or not os.path.isdir(legacy):
+        return
+    folder = os.path.join(os.getcwd(), session_dir)
+    os.makedirs(folder, exist_ok=True)
+    for path in glob.glob(os.path.join(legacy, "*" + SESSION_EXT)):
+        os.replace(path, os.path.join(folder, os.path.basename(path)))
+    try:
+        os.rmdir(legacy)
+    except OSError:
+        pass
@@ -0,0 +1,155 @@
+import math
+import numpy as np
+from collections import Counter
+
+CALIB_OFFSET = 1.8         # degC from forehead skin to body-equivalent temperature
+
+# ----------------------------
+#  STREAMING TEMPERATURE ESTIMATOR
+# ----------------------------
+
+class StreamingTempEstimator:
+    """
+    Running estimate of the calibrated body temperature for one IRT session.
+
+    - Welford running mean / variance over accepted readings
+    - MAD (median absolute deviation) outlier rejection against the accepted set
+    - stops once the confidence interval half-width is below `ci_tolerance`,
+      bounded by `min_samples` / `max_samples`
+    """
+
+    def __init__(self, min_samples=5, max_samples=30, ci_tolerance=0.15,
+                 confidence_z=1.96, mad_k=3.5, mad_floor=0.1):
+        if not (1 <= min_samples <= max_samples):
+            raise ValueError(f"min_samples must be in 1..max_samples. Got {min_samples}/{max_samples}.")
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.ci_tolerance = ci_tolerance
+        self.confidence_z = confidence_z
+        self.mad_k = mad_k
+        self.mad_floor = mad_floor
+        self.reset()
+
+    def reset(self):
+        self.readings = []      # every reading seen this session
+        self.values = []        # readings currently accepted as inliers
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    @property
+    def observed(self):
+        """Readings seen so far, accepted or rejected."""
+        return len(self.readings)
+
+    @property
+    def rejected(self):
+        return self.observed - self.count
+
+    @property
+    def variance(self):
+        if self.count < 2:
+            return 0.0
+        return self._m2 / (self.count - 1)
+
+    @property
+    def ci_half_width(self):
+        """Half-width of the confidence interval of the mean (inf until 2 samples)."""
+        if self.count < 2:
+            return math.inf
+        return self._t_quantile(self.count - 1) * math.sqrt(self.variance / self.count)
+
+    def _t_quantile(self, dof):
+        # Widen the normal quantile for small samples (Cornish-Fisher approximation of Student-t)
+        z = self.confidence_z
+        return z + (z ** 3 + z) / (4 * dof) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * dof ** 2)
+
+    def _robust_bounds(self):
+        # Median / MAD over every reading, so a bad start cannot anchor the estimate
+        arr = np.asarray(self.readings, dtype=np.float64)
+        median = float(np.median(arr))
+        mad = float(np.median(np.abs(arr - median)))
+        scale = max(1.4826 * mad, self.mad_floor)
+        return median - self.mad_k * scale, median + self.mad_k * scale
+
+    def _add(self, value):
+        self.values.append(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def _remove(self, value):
+        # Inverse Welford step
+        self.values.remove(value)
+        self.count -= 1
+        if self.count == 0:
+            self.mean, self._m2 = 0.0, 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self._m2 = max(0.0, self._m2 - delta * (value - self.mean))
+
+    def update(self, value):
+        """Add one calibrated reading. Returns True if it was accepted."""
+        value = float(value)
+        self.readings.append(value)
+
+        # Need a few readings before a median is meaningful
+        if self.observed < 3:
+            self._add(value)
+            return True
+
+        low, high = self._robust_bounds()
+        accepted = low <= value <= high
+
+        # The bounds move as readings arrive: evict accepted values that no
+        # longer fit and re-admit earlier rejects that now do
+        wanted = Counter(v for v in self.readings if low <= v <= high)
+        current = Counter(self.values)
+        for v in (current - wanted).elements():
+            self._remove(v)
+        for v in (wanted - current).elements():
+            self._add(v)
+        return accepted
+
+    def is_done(self):
+        if self.observed >= self.max_samples:
+            return True
+        if self.count < self.min_samples:
+            return False
+        return self.ci_half_width <= self.ci_tolerance
+
+    def result(self):
+        if self.count == 0:
+            return None
+        return round(self.mean, 1)
+
+    def progress(self):
+        """Current estimate and CI, in the shape emitted with `irt_data`."""
+        ci = self.ci_half_width
+        return {
+            'temp_estimate': round(self.mean, 2) if self.count else None,
+            'temp_ci': None if math.isinf(ci) else round(ci, 3),
+            'temp_samples': self.count,
+        }
+
+
+# ----------------------------
+#  PER-FRAME FACE TEMPERATURE
+# ----------------------------
+
+def estimate_face_temp(temp_matrix: np.ndarray) -> float:
+    h, w = temp_matrix.shape  # should be 16x16
+    i0, i1 = h // 2 - 2, h // 2 + 2
+    j0, j1 = w // 2 - 2, w // 2 + 2
+
+    center_patch = temp_matrix[i0:i1, j0:j1]
+    flat = center_patch.flatten()
+    flat_sorted = np.sort(flat)[::-1]
+    top_n = flat_sorted[:5]  # average of 5 hottest pixels
+    return float(np.mean(top_n))
+
+
+def calibrate_to_body(raw_face_temp: float, calib_offset=CALIB_OFFSET) -> float:
+    return round(raw_face_temp + calib_offset, 1)
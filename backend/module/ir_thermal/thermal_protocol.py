@@ -0,0 +1,250 @@
+import math, time
+import numpy as np
+
+from logging import info, error
+
+# ----------------------------
+#  THERMAL SERIAL PROTOCOL CLIENT
+# ----------------------------
+#
+# Request : 0x11 | start MSB LSB | count MSB LSB | 0x98
+# Response: 0x16 0x98 | count x (MSB LSB, 0.1 degC) | 0x1A 0x9C
+#
+# With the full read used by read_temperature (start=1, count=256) flat index k
+# of the 16x16 matrix holds register k; cell 0 carries the 0x1698 header and is
+# patched by extract_temp_data. The windowed reads below keep the same layout.
+
+GRID_SIZE = 16
+NUM_CELLS = GRID_SIZE * GRID_SIZE
+RESP_HEAD = b'\x16\x98'
+RESP_TAIL = b'\x1a\x9c'
+HEADER_MARKER = 5784.0
+
+# Rows averaged by estimate_face_temp; always part of a windowed read
+CENTER_ROWS = (GRID_SIZE // 2 - 2, GRID_SIZE // 2 + 1)
+
+
+def encode_request(start_address, num_registers):
+    """Same packet as build_request, without the per-packet log line."""
+    return bytes((
+        0x11,
+        (start_address >> 8) & 0xFF, start_address & 0xFF,
+        (num_registers >> 8) & 0xFF, num_registers & 0xFF,
+        0x98,
+    ))
+
+
+def rows_to_registers(row_start, row_end):
+    """Register window (start_address, num_registers) covering matrix rows row_start..row_end."""
+    row_start = max(0, min(GRID_SIZE - 1, row_start))
+    row_end = max(row_start, min(GRID_SIZE - 1, row_end))
+    start_address = max(1, row_start * GRID_SIZE)
+    end_address = (row_end + 1) * GRID_SIZE - 1
+    return start_address, end_address - start_address + 1
+
+
+def face_rows(face_box, roi_height, margin=1):
+    """
+    Matrix rows covering a face box (x, y, w, h) given in ROI pixels, merged with
+    the centre rows used by estimate_face_temp.
+    """
+    _, y, _, h = face_box
+    row_start = int(y / roi_height * GRID_SIZE) - margin
+    row_end = int(math.ceil((y + h) / roi_height * GRID_SIZE)) - 1 + margin
+    return (max(0, min(row_start, CENTER_ROWS[0])),
+            min(GRID_SIZE - 1, max(row_end, CENTER_ROWS[1])))
+
+
+def decode_registers(payload):
+    """Big-endian 16-bit register payload -> temperatures in degC."""
+    raw = np.frombuffer(payload, dtype='>u2')
+    return np.round(raw * 0.1, 2)
+
+
+def parse_response_data(data):
+    """Raw 516-byte response -> 16x16 matrix of degC; cell 0 holds the raw 0x1698 header value."""
+    data_bytes = list(data)
+
+    # EXTRACT START BYTES
+    start_msb = data_bytes[0]
+    start_lsb = data_bytes[1]
+    start_value = (start_msb << 8) | start_lsb
+
+    temp_data = []
+    index = 2
+    while index < len(data_bytes) - 2:
+        temp_msb = data_bytes[index]
+        temp_lsb = data_bytes[index + 1]
+        temperature = (temp_msb << 8) | temp_lsb
+        temp_data.append(round(temperature * 0.1, 2))
+        index += 2
+
+    # EXTRACT END BYTES
+    end_msb = data_bytes[-2]
+    end_lsb = data_bytes[-1]
+    end_value = (end_msb << 8) | end_lsb
+
+    response_list = [start_value] + temp_data + [end_value]
+
+    if len(response_list) > 256:
+        response_list = response_list[:256]  # Truncate if there's excess data
+
+    response_matrix = np.array(response_list).reshape(16, 16)
+    return response_matrix
+
+
+def extract_temp_data(data):
+    """Replace the 0x1698 header value in a parse_response_data matrix by the mean of its neighbours."""
+    flattened_data = np.array(data).flatten()
+
+    index_5784 = np.where(flattened_data == 5784.0)[0][0]
+    values = [data[0][1], data[1][0], data[1][1]]
+    mean_value = round(sum(values) / len(values), 1)
+
+    flattened_data[index_5784] = mean_value
+
+    temperature_matrix = flattened_data.reshape((16, 16))
+    return temperature_matrix
+
+
+class ThermalClient:
+    """
+    Windowed, pipelined reader for the IR array.
+
+    read_frame(rows) returns the frame for the request already on the wire and
+    immediately queues the next one, so the sensor and the serial line work
+    while the caller parses, detects faces and encodes JPEGs. Rows outside the
+    window keep the values of the last full frame; a full frame is re-read every
+    `full_frame_every` frames.
+    """
+
+    def __init__(self, serial_port, full_frame_every=10, stale_after=0.5, max_resync=4):
+        self.ser = serial_port
+        self.full_frame_every = full_frame_every
+        self.stale_after = stale_after
+        self.max_resync = max_resync
+
+        self.matrix = np.zeros(NUM_CELLS, dtype=np.float64)
+        self.has_full_frame = False
+        self.frames_since_full = 0
+
+        self._pending = None   # (start_address, num_registers, sent_at)
+        self._rx = b''
+
+        self.stats = {'frames': 0, 'bytes_rx': 0, 'bytes_tx': 0, 'resyncs': 0, 'errors': 0}
+
+    # ---- wire ----
+
+    def _send(self, start_address, num_registers):
+        packet = encode_request(start_address, num_registers)
+        self.ser.write(packet)
+        self.stats['bytes_tx'] += len(packet)
+        self._pending = (start_address, num_registers, time.monotonic())
+
+    def _read_exact(self, buf, size):
+        if len(buf) < size:
+            chunk = self.ser.read(size - len(buf))
+            if chunk:
+                self.stats['bytes_rx'] += len(chunk)
+                buf += chunk
+        return buf
+
+    def _read_response(self, num_registers):
+        """
+        Read one framed response. Garbage before the header is skipped, and a
+        frame with a bad trailer is resynced from the next header candidate.
+        Returns the register payload, or None on timeout / repeated bad framing.
+        """
+        expected = num_registers * 2 + 4
+        buf = self._read_exact(self._rx, expected)
+        self._rx = b''
+
+        for _ in range(self.max_resync + 1):
+            idx = buf.find(RESP_HEAD)
+            if idx < 0:
+                # Keep a trailing 0x16, it may be the first half of the header
+                buf = buf[-1:] if buf.endswith(RESP_HEAD[:1]) else b''
+                self.stats['resyncs'] += 1
+                buf = self._read_exact(buf, expected)
+                if len(buf) < 2:
+                    break
+                continue
+            if idx > 0:
+                buf = buf[idx:]
+                self.stats['resyncs'] += 1
+
+            buf = self._read_exact(buf, expected)
+            if len(buf) < expected:
+                break    # serial timeout, partial frame
+
+            if buf[expected - 2:expected] == RESP_TAIL:
+                self._rx = buf[expected:]
+                return buf[2:expected - 2]
+
+            # False header inside the stream, look for the next one
+            buf = buf[1:]
+            self.stats['resyncs'] += 1
+
+        self.stats['errors'] += 1
+        self._rx = b''
+        self.ser.reset_input_buffer()
+        return None
+
+    # ---- frames ----
+
+    def _window(self, rows):
+        if rows is None or not self.has_full_frame or self.frames_since_full >= self.full_frame_every:
+            return 1, NUM_CELLS
+        return rows_to_registers(*rows)
+
+    def _apply(self, start_address, payload):
+        temps = decode_registers(payload)
+        end = min(NUM_CELLS, start_address + len(temps))
+        self.matrix[start_address:end] = temps[:end - start_address]
+
+        if start_address == 1 and len(temps) >= NUM_CELLS - 1:
+            self.has_full_frame = True
+            self.frames_since_full = 0
+        else:
+            self.frames_since_full += 1
+
+        # Cell 0 never holds a register value; same patch as extract_temp_data
+        self.matrix[0] = round((self.matrix[1] + self.matrix[GRID_SIZE] + self.matrix[GRID_SIZE + 1]) / 3, 1)
+
+    def cancel(self):
+        """Drop any in-flight request (e.g. the face left the frame)."""
+        if self._pending is not None:
+            self._read_response(self._pending[1])
+            self._pending = None
+
+    def read_frame(self, rows=None, pipeline=True):
+        """
+        Return the latest 16x16 matrix, refreshing at least `rows` (row_start, row_end).
+        With `pipeline`, the request for the next frame is sent before this one is parsed.
+        """
+        if self._pending is not None and time.monotonic() - self._pending[2] > self.stale_after:
+            self.cancel()
+        if self._pending is None:
+            self._send(*self._window(rows))
+
+        start_address, num_registers, _ = self._pending
+        payload = self._read_response(num_registers)
+        self._pending = None
+
+        if pipeline:
+            self._send(*self._window(rows))
+
+        if payload is None:
+            return None
+        self._apply(start_address, payload)
+        self.stats['frames'] += 1
+        if not self.has_full_frame:
+            return None
+        return self.matrix.reshape(GRID_SIZE, GRID_SIZE).copy()
+
+    def close(self):
+        try:
+            self.cancel()
+        except Exception as e:
+            error(f"ThermalClient cancel failed: {e}")
+        info(f"ThermalClient stats: {self.stats}")
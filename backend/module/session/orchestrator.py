@@ -0,0 +1,133 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from logging import info, error
+
+# ----------------------------
+#  VISIT ORCHESTRATOR
+# ----------------------------
+
+class Step:
+    """
+    One node of a visit.
+
+    run(results) receives the results of finished steps (by name) and returns
+    this step's result. warm_up(), if given, is started when the visit starts
+    so devices are open by the time the step's dependencies are done.
+    """
+
+    def __init__(self, name, run, deps=(), warm_up=None, optional=False):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.warm_up = warm_up
+        self.optional = optional
+
+
+class VisitOrchestrator:
+    """Run a dependency graph of steps, independent steps concurrently."""
+
+    def __init__(self, steps, max_workers=None, on_event=None):
+        self.steps = {step.name: step for step in steps}
+        for step in steps:
+            missing = [d for d in step.deps if d not in self.steps]
+            if missing:
+                raise ValueError(f"Step '{step.name}' depends on unknown steps {missing}")
+        self._check_acyclic()
+        self.max_workers = max_workers or len(self.steps) * 2
+        self.on_event = on_event or (lambda event, payload: None)
+
+        self.results = {}
+        self.errors = {}
+        self.timings = {}
+
+    def _check_acyclic(self):
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "active":
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            state[name] = "active"
+            for dep in self.steps[name].deps:
+                visit(dep, path + [name])
+            state[name] = "done"
+
+        for name in self.steps:
+            visit(name, [])
+
+    def _timed(self, name, key, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.timings.setdefault(name, {})[key] = (t0 - self._t0, time.perf_counter() - self._t0)
+
+    def _run_step(self, step, warm_future):
+        if warm_future is not None:
+            warm_future.result()    # re-raises a failed warm-up as a step failure
+        self.on_event("step_started", {"step": step.name})
+        return self._timed(step.name, "run", step.run, dict(self.results))
+
+    def run(self):
+        """Run every step; returns (results, errors). A failed step skips its dependents."""
+        self._t0 = time.perf_counter()
+        pending = dict(self.steps)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="visit") as pool:
+            warm = {
+                name: pool.submit(self._timed, name, "warm_up", step.warm_up)
+                for name, step in self.steps.items() if step.warm_up is not None
+            }
+
+            while pending or running:
+                for name, step in list(pending.items()):
+                    failed = [d for d in step.deps if d in self.errors]
+                    if failed:
+                        self.errors[name] = f"skipped: dependency {failed[0]} failed"
+                        del pending[name]
+                        self.on_event("step_skipped", {"step": name, "error": self.errors[name]})
+                    elif all(d in self.results for d in step.deps):
+                        running[pool.submit(self._run_step, step, warm.get(name))] = name
+                        del pending[name]
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                        self.on_event("step_done", {"step": name, "result": self.results[name]})
+                    except Exception as e:
+                        error(f"Visit step '{name}' failed: {e}")
+                        if self.steps[name].optional:
+                            self.results[name] = None
+                        else:
+                            self.errors[name] = str(e)
+                        self.on_event("step_failed", {"step": name, "error": str(e)})
+
+        self.total_s = time.perf_counter() - self._t0
+        info(f"Visit finished in {self.total_s:.1f}s: {sorted(self.results)} ok, {sorted(self.errors)} failed")
+        return self.results, self.errors
+
+    def report(self):
+        return {
+            "total_s": round(self.total_s, 3),
+            "steps": {
+                name: {key: [round(t, 3) for t in span] for key, span in spans.items()}
+                for name, spans in self.timings.items()
+            },
+        }
+
+
+def run_sequential(steps):
+    """Reference flow: warm up and run every step in order, as the kiosk pages do today."""
+    t0 = time.perf_counter()
+    results = {}
+    for step in steps:
+        if step.warm_up is not None:
+            step.warm_up()
+        results[step.name] = step.run(dict(results))
+    return results, time.perf_counter() - t0
@@ -0,0 +1,147 @@
+import os, re, time, hashlib, threading
+import cv2
+
+from flask import abort, send_file
+from logging import info, error
+
+# ----------------------------
+#  CONTENT-ADDRESSED RESULT SNAPSHOTS
+# ----------------------------
+#
+# Result images are written once as <kind>-<sha256[:20]>.png (plus optional
+# <kind>-<digest>_w<width>.jpg thumbnails) and never change afterwards, so the
+# /snapshots route can serve them with a strong ETag and `immutable` caching.
+
+SNAPSHOT_DIR = os.path.join("static", "snapshots")
+SNAPSHOT_ROUTE = "/snapshots"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+DIGEST_LEN = 20
+
+MAX_SNAPSHOTS = 500
+MAX_AGE_S = 30 * 24 * 3600
+PRUNE_INTERVAL_S = 60
+
+_NAME_RE = re.compile(r"^([a-z0-9_]+)-([0-9a-f]{%d})(?:_w(\d+))?\.(png|jpg)$" % DIGEST_LEN)
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def snapshot_url(name, width=None):
+    return f"{SNAPSHOT_ROUTE}/{name}" + (f"?w={width}" if width else "")
+
+
+def save_snapshot(image, kind, thumb_widths=(), snapshot_dir=SNAPSHOT_DIR):
+    """
+    Store `image` (BGR / gray ndarray) under its content hash. Returns the URL;
+    identical images map to the same file and are written only once.
+    """
+    ok, png = cv2.imencode(".png", image)
+    if not ok:
+        raise ValueError(f"Could not encode {kind} snapshot")
+    data = png.tobytes()
+    digest = hashlib.sha256(data).hexdigest()[:DIGEST_LEN]
+    name = f"{kind}-{digest}.png"
+
+    folder = os.path.join(os.getcwd(), snapshot_dir)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, name)
+    if os.path.exists(path):
+        os.utime(path)                  # pruning goes by mtime: a re-saved image is recent again
+    else:
+        _write_atomic(path, data)
+
+    for width in thumb_widths:
+        thumb_path = os.path.join(folder, f"{kind}-{digest}_w{width}.jpg")
+        if os.path.exists(thumb_path):
+            os.utime(thumb_path)
+            continue
+        h, w = image.shape[:2]
+        if w > width:
+            thumb = cv2.resize(image, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+        else:
+            thumb = image
+        ok, jpg = cv2.imencode(".jpg", thumb, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        if ok:
+            _write_atomic(thumb_path, jpg.tobytes())
+
+    maybe_prune(snapshot_dir)
+    return snapshot_url(name)
+
+
+def save_snapshots(images, thumb_widths=()):
+    """save_snapshot for a {kind: image} dict; returns {kind: url}."""
+    return {kind: save_snapshot(img, kind, thumb_widths) for kind, img in images.items() if img is not None}
+
+
+def prune_snapshots(snapshot_dir=SNAPSHOT_DIR, max_count=MAX_SNAPSHOTS, max_age_s=MAX_AGE_S):
+    """Retention: drop snapshots older than max_age_s, then all but the newest max_count."""
+    folder = os.path.join(os.getcwd(), snapshot_dir)
+    if not os.path.isdir(folder):
+        return 0
+
+    originals = []
+    files = {}                          # (kind, digest) -> original and thumbnail paths
+    for entry in os.scandir(folder):
+        m = _NAME_RE.match(entry.name)
+        if not m:
+            continue
+        files.setdefault((m.group(1), m.group(2)), []).append(entry.path)
+        if m.group(3) is None:
+            originals.append((entry.stat().st_mtime, m.group(1), m.group(2)))
+    originals.sort(reverse=True)
+
+    now = time.time()
+    removed = 0
+    for index, (mtime, kind, digest) in enumerate(originals):
+        if index < max_count and now - mtime <= max_age_s:
+            continue
+        for path in files[(kind, digest)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        removed += 1
+    if removed:
+        info(f"Pruned {removed} old snapshots")
+    return removed
+
+
+def maybe_prune(snapshot_dir=SNAPSHOT_DIR):
+    global _last_prune
+    if time.monotonic() - _last_prune < PRUNE_INTERVAL_S or not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        _last_prune = time.monotonic()
+        prune_snapshots(snapshot_dir)
+    except Exception as e:
+        error(f"Snapshot pruning failed: {e}")
+    finally:
+        _prune_lock.release()
+
+
+def snapshot_response(name, width=None, snapshot_dir=SNAPSHOT_DIR):
+    """Serve a snapshot (or its `width` thumbnail) with strong ETag and immutable caching."""
+    m = _NAME_RE.match(name)
+    if not m or m.group(3) is not None:
+        abort(404)
+    kind, digest = m.group(1), m.group(2)
+    if width and not str(width).isdigit():
+        abort(400)
+
+    if width:
+        name = f"{kind}-{digest}_w{int(width)}.jpg"
+    path = os.path.join(os.getcwd(), snapshot_dir, name)
+    if not os.path.isfile(path):
+        abort(404)
+
+    etag = digest if not width else f"{digest}-w{int(width)}"
+    resp = send_file(path, etag=etag, conditional=True, max_age=31536000)
+    resp.headers["Cache-Control"] = CACHE_CONTROL
+    return resp
@@ -0,0 +1,132 @@
+import time, threading
+from flask import request
+from logging import info, error
+
+# ----------------------------
+#  BINARY FRAME STREAM (Socket.IO)
+# ----------------------------
+#
+# Alternative to the MJPEG /video_feed: encoded frames go out as binary
+# Socket.IO events on the app's socketio server, carrying the status values
+# that belong to them.
+#
+#   client -> server  stream_subscribe   {credits}     start receiving
+#   server -> client  stream_frame       {seq, capture_ts, sent_ts, <meta>, jpeg: <binary>}
+#   client -> server  stream_ack         {seq}         gives one credit back
+#   client -> server  stream_unsubscribe               ack returns the client's stats
+#
+# Flow control is credit based: a client never has more than `credits` frames
+# unacknowledged. A frame published while a client has no credit is skipped for
+# that client (counted as dropped), so a slow link gets fewer, fresh frames
+# instead of a backlog in the TCP buffers.
+
+FRAME_EVENT = "stream_frame"
+DEFAULT_CREDITS = 2
+MAX_CREDITS = 8
+ACK_TIMEOUT = 2.0           # s before an unacknowledged frame's credit is returned
+
+
+def mjpeg_part(jpeg):
+    """One part of the multipart/x-mixed-replace (boundary=frame) /video_feed response."""
+    return b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n'
+
+
+class StreamSubscriber:
+    def __init__(self, sid, credits):
+        self.sid = sid
+        self.window = credits
+        self.credits = credits
+        self.in_flight = {}         # seq -> perf_counter at send
+        self.rtt_ms = None          # EWMA of send -> ack
+        self.stats = {"sent": 0, "dropped": 0, "acked": 0, "expired": 0, "bytes": 0}
+
+    def expire(self, now, timeout):
+        for seq, sent in list(self.in_flight.items()):
+            if now - sent > timeout:
+                del self.in_flight[seq]
+                self.credits = min(self.window, self.credits + 1)
+                self.stats["expired"] += 1
+
+    def report(self):
+        return {**self.stats, "credits": self.credits, "window": self.window,
+                "rtt_ms": None if self.rtt_ms is None else round(self.rtt_ms, 1)}
+
+
+class FrameStream:
+    def __init__(self, socketio, event=FRAME_EVENT, ack_timeout=ACK_TIMEOUT):
+        self.socketio = socketio
+        self.event = event
+        self.ack_timeout = ack_timeout
+        self.subscribers = {}
+        self.seq = 0
+        self._lock = threading.Lock()
+
+    def register(self):
+        """Socket.IO handlers for subscribe / ack / unsubscribe / disconnect."""
+        self.socketio.on_event("stream_subscribe", lambda data=None: self.subscribe(request.sid, (data or {}).get("credits")))
+        self.socketio.on_event("stream_ack", lambda data=None: self.ack(request.sid, (data or {}).get("seq")))
+        self.socketio.on_event("stream_unsubscribe", lambda data=None: self.unsubscribe(request.sid))
+        self.socketio.on_event("disconnect", lambda *args: self.unsubscribe(request.sid))
+        return self
+
+    def subscribe(self, sid, credits=None):
+        credits = max(1, min(MAX_CREDITS, int(credits or DEFAULT_CREDITS)))
+        with self._lock:
+            self.subscribers[sid] = StreamSubscriber(sid, credits)
+        info(f"Frame stream subscriber {sid} (credits={credits})")
+        return {"ok": True, "credits": credits, "event": self.event}
+
+    def unsubscribe(self, sid):
+        with self._lock:
+            sub = self.subscribers.pop(sid, None)
+        return sub.report() if sub is not None else None
+
+    def ack(self, sid, seq):
+        now = time.perf_counter()
+        with self._lock:
+            sub = self.subscribers.get(sid)
+            if sub is None:
+                return
+            sent = sub.in_flight.pop(seq, None)
+            if sent is None:
+                return      # unknown or already expired: no credit, or credits would inflate
+            sub.credits = min(sub.window, sub.credits + 1)
+            sub.stats["acked"] += 1
+            rtt = (now - sent) * 1000
+            sub.rtt_ms = rtt if sub.rtt_ms is None else 0.8 * sub.rtt_ms + 0.2 * rtt
+
+    @property
+    def wants_frame(self):
+        """True if any subscriber could take a frame now (lets the producer skip encoding)."""
+        return any(sub.credits > 0 for sub in self.subscribers.values())
+
+    def publish(self, jpeg, capture_ts, **meta):
+        """Send one encoded frame to every subscriber with a credit left. Returns its seq."""
+        now = time.perf_counter()
+        targets = []
+        with self._lock:
+            self.seq += 1
+            seq = self.seq
+            for sub in self.subscribers.values():
+                sub.expire(now, self.ack_timeout)
+                if sub.credits <= 0:
+                    sub.stats["dropped"] += 1
+                    continue
+                sub.credits -= 1
+                sub.in_flight[seq] = now
+                sub.stats["sent"] += 1
+                sub.stats["bytes"] += len(jpeg)
+                targets.append(sub.sid)
+
+        if targets:
+            payload = {"seq": seq, "capture_ts": capture_ts, "sent_ts": time.time(), **meta, "jpeg": jpeg}
+            for sid in targets:
+                try:
+                    self.socketio.emit(self.event, payload, to=sid)
+                except Exception as e:
+                    error(f"Frame stream emit to {sid} failed: {e}")
+        return seq
+
+    def report(self):
+        with self._lock:
+            return {"seq": self.seq, "subscribers": {sid: sub.report() for sid, sub in self.subscribers.items()}}
@@ -0,0 +1,97 @@
+import time
+import numpy as np
+
+from logging import error
+
+# ----------------------------
+#  THERMAL MATRIX CHANNEL (Socket.IO)
+# ----------------------------
+#
+# Raw IR matrices for client-side heatmap rendering, instead of a server-rendered
+# PNG per frame. Broadcast at most `rate_hz` times per second:
+#
+#   server -> client  irt_matrix  {seq, capture_ts, shape: [16, 16], scale: 0.1,
+#                                  face_box: [x, y, w, h] | null, roi: [w, h],
+#                                  data: <binary>}
+#
+# `data` is the matrix in row-major order as little-endian uint16, quantized to
+# `scale` degC (the sensor's own 0.1 degC resolution): 512 bytes for 16x16.
+# `face_box` is in ROI pixels; `roi` is the ROI size, so a cell (i, j) covers
+# x in [j, j+1) * roi_w / 16 and y in [i, i+1) * roi_h / 16.
+#
+# Reference decoder (browser, socket.io-client delivers `data` as an ArrayBuffer):
+#
+#   socket.on("irt_matrix", (m) => {
+#     const raw = new Uint16Array(m.data)             // little-endian on every browser platform
+#     const temps = Float32Array.from(raw, (v) => v * m.scale)
+#     // temps[i * m.shape[1] + j] is cell (i, j) in degC
+#   })
+
+MATRIX_EVENT = "irt_matrix"
+MATRIX_SCALE = 0.1          # degC per count
+DEFAULT_MATRIX_HZ = 8.0
+
+
+def encode_matrix(temp_matrix, scale=MATRIX_SCALE):
+    """degC matrix -> little-endian uint16 bytes in `scale` steps (clipped to 0..6553.5 degC)."""
+    counts = np.rint(np.asarray(temp_matrix, dtype=np.float64) / scale)
+    return np.clip(counts, 0, 0xFFFF).astype("<u2").tobytes()
+
+
+def decode_matrix(data, shape, scale=MATRIX_SCALE):
+    """Reference decoder: bytes from encode_matrix -> float32 degC matrix of `shape`."""
+    return (np.frombuffer(data, dtype="<u2").astype(np.float32) * np.float32(scale)).reshape(shape)
+
+
+class ThermalMatrixStream:
+    def __init__(self, socketio, rate_hz=DEFAULT_MATRIX_HZ, event=MATRIX_EVENT, scale=MATRIX_SCALE):
+        self.socketio = socketio
+        self.min_interval = 1.0 / rate_hz if rate_hz else None
+        self.event = event
+        self.scale = scale
+        self.seq = 0
+        self.last_sent = None
+        self.stats = {"sent": 0, "skipped": 0, "bytes": 0}
+
+    @property
+    def enabled(self):
+        return self.min_interval is not None
+
+    def due(self, now=None):
+        """True if a matrix published now would be sent (lets the caller skip work)."""
+        if not self.enabled:
+            return False
+        now = time.perf_counter() if now is None else now
+        return self.last_sent is None or now - self.last_sent >= self.min_interval
+
+    def publish(self, temp_matrix, capture_ts, face_box=None, roi_size=None):
+        """Broadcast one matrix if the rate allows. Returns its seq, or None if skipped."""
+        now = time.perf_counter()
+        if not self.due(now):
+            self.stats["skipped"] += 1
+            return None
+        self.last_sent = now
+        self.seq += 1
+
+        data = encode_matrix(temp_matrix, self.scale)
+        payload = {
+            "seq": self.seq,
+            "capture_ts": capture_ts,
+            "shape": list(np.shape(temp_matrix)),
+            "scale": self.scale,
+            "face_box": None if face_box is None else [int(v) for v in face_box],
+            "roi": None if roi_size is None else [int(v) for v in roi_size],
+            "data": data,
+        }
+        try:
+            self.socketio.emit(self.event, payload)
+        except Exception as e:
+            error(f"Thermal matrix emit failed: {e}")
+            return None
+        self.stats["sent"] += 1
+        self.stats["bytes"] += len(data)
+        return self.seq
+
+    def report(self):
+        return {**self.stats, "seq": self.seq,
+                "rate_hz": None if not self.enabled else round(1.0 / self.min_interval, 2)}
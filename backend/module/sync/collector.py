@@ -0,0 +1,118 @@
+"""
+Reference collector for kiosk measurement sync.
+
+Accepts the gzipped batches sent by SyncWorker and stores every record once,
+keyed by its `<kiosk_id>:<seq>` id, so retried batches are harmless.
+
+Run from backend/:
+    python -m module.sync.collector --port 8600 --db collector.sqlite3
+then start the kiosk backend with MHR_SYNC_URL=http://<host>:8600/ingest
+"""
+import argparse, gzip, json, logging, sqlite3, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from logging import info
+
+
+class CollectorStore:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            " id TEXT PRIMARY KEY,"
+            " kiosk_id TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " created_at TEXT NOT NULL,"
+            " data TEXT NOT NULL)"
+        )
+
+    def insert_batch(self, kiosk_id, records):
+        rows = [
+            (r["id"], kiosk_id, r["kind"], r["created_at"], json.dumps(r["data"], separators=(",", ":")))
+            for r in records
+        ]
+        with self._lock:
+            before = self._db.total_changes
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO records (id, kiosk_id, kind, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._db.execute("COMMIT")
+            inserted = self._db.total_changes - before
+        return inserted, len(rows) - inserted
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+
+def make_handler(store):
+    class CollectorHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._reply(200, {"status": "ok", "records": store.count()})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/ingest":
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                batch = json.loads(body)
+                accepted, duplicates = store.insert_batch(batch["kiosk_id"], batch["records"])
+            except (ValueError, KeyError, OSError) as e:
+                self._reply(400, {"error": str(e)})
+                return
+            self._reply(200, {"batch_id": batch.get("batch_id"), "accepted": accepted, "duplicates": duplicates})
+
+        def log_message(self, format, *args):
+            pass
+
+    return CollectorHandler
+
+
+def make_server(host="0.0.0.0", port=8600, db_path="collector.sqlite3"):
+    store = CollectorStore(db_path)
+    server = ThreadingHTTPServer((host, port), make_handler(store))
+    server.store = store
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--db", default="collector.sqlite3")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    server = make_server(args.host, args.port, args.db)
+    info(f"Collector listening on http://{args.host}:{args.port}/ingest")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
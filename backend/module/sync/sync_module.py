@@ -0,0 +1,237 @@
+import os, json, gzip, time, random, sqlite3, hashlib, threading
+import urllib.request
+
+from logging import info, error
+
+# ----------------------------
+#  DURABLE OUTBOX
+# ----------------------------
+
+class Outbox:
+    """
+    SQLite-backed queue of records waiting to be shipped to the collector.
+
+    Rows are deleted once acknowledged; the highest acknowledged sequence number
+    is kept in `meta` so the worker resumes from there after a restart. At most
+    `max_pending` rows are kept: when the kiosk stays offline longer than that,
+    the oldest records are dropped (and logged) instead of filling the disk.
+    """
+
+    def __init__(self, path, max_pending=200_000):
+        self.path = path
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " kind TEXT NOT NULL,"
+            " created_at TEXT NOT NULL,"
+            " payload TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def enqueue(self, kind, payload, created_at=None):
+        return self.enqueue_many(kind, [payload], created_at)[-1]
+
+    def enqueue_many(self, kind, payloads, created_at=None):
+        created_at = created_at or time.strftime("%Y-%m-%dT%H:%M:%S")
+        with self._lock:
+            cur = self._db.cursor()
+            cur.execute("BEGIN")
+            seqs = []
+            for payload in payloads:
+                cur.execute(
+                    "INSERT INTO outbox (kind, created_at, payload) VALUES (?, ?, ?)",
+                    (kind, created_at, json.dumps(payload, separators=(",", ":")))
+                )
+                seqs.append(cur.lastrowid)
+            cur.execute("COMMIT")
+            self._enforce_bound()
+        return seqs
+
+    def _enforce_bound(self):
+        pending = self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        overflow = pending - self.max_pending
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM outbox WHERE seq IN (SELECT seq FROM outbox ORDER BY seq LIMIT ?)",
+                (overflow,)
+            )
+            error(f"Sync outbox full, dropped {overflow} oldest records")
+
+    def cursor(self):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'acked_seq'").fetchone()
+        return int(row[0]) if row else 0
+
+    def peek_batch(self, limit, after=None):
+        after = self.cursor() if after is None else after
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, kind, created_at, payload FROM outbox WHERE seq > ? ORDER BY seq LIMIT ?",
+                (after, limit)
+            ).fetchall()
+        return rows
+
+    def ack(self, upto_seq):
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT INTO meta (key, value) VALUES ('acked_seq', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (str(upto_seq),)
+            )
+            self._db.execute("DELETE FROM outbox WHERE seq <= ?", (upto_seq,))
+            self._db.execute("COMMIT")
+
+    def pending_count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+# ----------------------------
+#  UPLOAD WORKER
+# ----------------------------
+
+def encode_batch(kiosk_id, rows):
+    """Gzipped JSON body and batch id for outbox rows. The id only depends on the rows."""
+    first_seq, last_seq = rows[0][0], rows[-1][0]
+    batch_id = hashlib.sha1(f"{kiosk_id}:{first_seq}:{last_seq}".encode()).hexdigest()
+    records = [
+        {"id": f"{kiosk_id}:{seq}", "kind": kind, "created_at": created_at, "data": json.loads(payload)}
+        for seq, kind, created_at, payload in rows
+    ]
+    body = json.dumps({"kiosk_id": kiosk_id, "batch_id": batch_id, "records": records},
+                      separators=(",", ":")).encode("utf-8")
+    return gzip.compress(body, compresslevel=6), batch_id
+
+
+class SyncWorker(threading.Thread):
+    """
+    Ship outbox records to `collector_url` in gzipped batches.
+
+    Every record carries a stable id (`<kiosk_id>:<seq>`), so a batch that was
+    stored but not acknowledged can be resent safely. Failed uploads back off
+    exponentially (with jitter) up to `max_backoff` seconds.
+    """
+
+    def __init__(self, outbox, collector_url, kiosk_id, batch_size=500, poll_interval=2.0,
+                 base_backoff=1.0, max_backoff=300.0, timeout=10.0):
+        super().__init__(name="sync-worker", daemon=True)
+        self.outbox = outbox
+        self.collector_url = collector_url
+        self.kiosk_id = kiosk_id
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.failures = 0
+        self.uploaded = 0
+        self._stop_event = threading.Event()
+        self._wake = threading.Event()
+
+    def notify(self):
+        """Wake the worker early, e.g. right after a new record was queued."""
+        self._wake.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def backoff_delay(self):
+        delay = min(self.max_backoff, self.base_backoff * (2 ** min(self.failures - 1, 16)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def upload(self, rows):
+        body, batch_id = encode_batch(self.kiosk_id, rows)
+        req = urllib.request.Request(
+            self.collector_url,
+            data=body,
+            method="POST",
+            headers={
+                "Content-Type": "application/json",
+                "Content-Encoding": "gzip",
+                "Idempotency-Key": batch_id,
+            },
+        )
+        # urlopen raises HTTPError on any non-2xx answer
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return json.loads(resp.read() or b"{}")
+
+    def sync_once(self):
+        """Upload one batch. Returns the number of records acknowledged."""
+        rows = self.outbox.peek_batch(self.batch_size)
+        if not rows:
+            return 0
+        self.upload(rows)
+        self.outbox.ack(rows[-1][0])
+        self.uploaded += len(rows)
+        return len(rows)
+
+    def run(self):
+        info(f"Sync worker started -> {self.collector_url}")
+        while not self._stop_event.is_set():
+            try:
+                sent = self.sync_once()
+                self.failures = 0
+                if sent == self.batch_size:
+                    continue    # more backlog, keep going
+                delay = self.poll_interval
+            except Exception as e:
+                self.failures += 1
+                delay = self.backoff_delay()
+                if self.failures == 1 or self.failures % 10 == 0:
+                    error(f"Sync upload failed ({self.failures}x), retrying in {delay:.1f}s: {e}")
+            self._wake.wait(delay)
+            self._wake.clear()
+        info("Sync worker stopped.")
+
+# ----------------------------
+#  APP WIRING
+# ----------------------------
+
+# Not under static/: Flask serves that folder to anyone on the network
+SYNC_DB = os.path.join("data", "sync", "outbox.sqlite3")
+LEGACY_SYNC_DB = os.path.join("static", "sync", "outbox.sqlite3")
+
+
+def _move_legacy_outbox(db_path):
+    """Carry a queue from the old static/ location over (database, WAL and shared-memory files)."""
+    if db_path != SYNC_DB or os.path.exists(db_path) or not os.path.exists(LEGACY_SYNC_DB):
+        return
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(LEGACY_SYNC_DB + suffix):
+            os.replace(LEGACY_SYNC_DB + suffix, db_path + suffix)
+    info(f"Moved the sync outbox from {LEGACY_SYNC_DB} to {db_path}")
+
+
+def start_sync(collector_url=None, kiosk_id=None, db_path=SYNC_DB, start_worker=True, **kwargs):
+    """
+    Open the outbox and, when a collector URL is configured (argument or
+    MHR_SYNC_URL) and `start_worker`, start the upload worker. Returns
+    (outbox, worker or None).
+    """
+    _move_legacy_outbox(db_path)
+    outbox = Outbox(db_path)
+    collector_url = collector_url or os.environ.get("MHR_SYNC_URL")
+    kiosk_id = kiosk_id or os.environ.get("MHR_KIOSK_ID") or os.uname().nodename
+
+    worker = None
+    if collector_url and not start_worker:
+        info("Sync worker not started in this process (reloader watcher).")
+    elif collector_url:
+        worker = SyncWorker(outbox, collector_url, kiosk_id, **kwargs)
+        worker.start()
+    else:
+        info("MHR_SYNC_URL not set, measurements are queued locally only.")
+    return outbox, worker
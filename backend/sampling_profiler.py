@@ -0,0 +1,260 @@
+import os, sys, time, threading
+from collections import Counter, defaultdict
+
+# ----------------------------
+#  SAMPLING PROFILER (all threads)
+# ----------------------------
+#
+# A sampler thread reads sys._current_frames() `hz` times per second and records
+# the Python stack of every other thread. Nothing is installed in the profiled
+# threads (no sys.setprofile / settrace), so they run at full speed; the cost is
+# the sampler's own CPU time, which is measured and capped: when it goes over
+# `overhead_budget` of one core, the interval is stretched.
+#
+# Every sample is weighted in microseconds. mode="cpu" (default on Linux)
+# charges the stack with the CPU time its thread used since the previous tick
+# (per-thread CPU clocks), so threads blocked in serial reads, sleeps or socket
+# waits weigh nothing and the profile shows where CPU is burnt. mode="wall"
+# charges every thread the wall-clock interval.
+#
+# Threads are labelled "<subsystem>/<thread name>"; the subsystem comes from the
+# innermost function in SUBSYSTEM_FUNCTIONS, else the innermost file in
+# SUBSYSTEM_FILES.
+#
+# Only this process is sampled: device code running in worker processes
+# (device_workers) shows up as the proxy threads waiting on it.
+
+MAX_HZ = 250
+MAX_SECONDS = 120
+MAX_DEPTH = 64
+NAMES_REFRESH = 1.0         # s between threading.enumerate() calls
+
+# (function name or qualified name, subsystem), matched anywhere in the stack
+SUBSYSTEM_FUNCTIONS = (
+    ("irt_detect_cam", "irt"),
+    ("read_temperature", "irt"),
+    ("bp_ocr_reader", "bp-ocr"),
+    ("bp_controller", "bp"),
+    ("waiting_for_completion", "drawer"),
+    ("drawer_controller", "drawer"),
+    ("VisitOrchestrator.run", "visit"),
+    ("run_irt_headless", "visit"),
+)
+# (path fragment, subsystem) when no function matched
+SUBSYSTEM_FILES = (
+    ("/module/sync/", "sync"),
+    ("/module/blood_pressure/gpio_service", "bp-gpio"),
+    ("log_pipeline", "logging"),
+    ("/logging/handlers", "logging"),
+    ("/engineio/", "socketio"),
+    ("/socketio/", "socketio"),
+    ("/simple_websocket/", "socketio"),
+    ("/werkzeug/", "http"),
+)
+
+
+def subsystem_of(stack):
+    """Subsystem label for a stack of (filename, function, firstlineno), outermost first."""
+    for _, function, _ in reversed(stack):
+        short = function.rpartition(".")[2]
+        for name, subsystem in SUBSYSTEM_FUNCTIONS:
+            if function == name or short == name:
+                return subsystem
+    for filename, _, _ in reversed(stack):
+        path = filename.replace("\\", "/")
+        for fragment, subsystem in SUBSYSTEM_FILES:
+            if fragment in path:
+                return subsystem
+    return "other"
+
+
+def _thread_cpu_clock(ident):
+    try:
+        return time.pthread_getcpuclockid(ident)
+    except (AttributeError, OSError, OverflowError):
+        return None
+
+
+class Profile:
+    def __init__(self, mode, hz):
+        self.mode = mode
+        self.hz = hz
+        self.stacks = Counter()     # (thread label, stack) -> weight in us
+        self.samples = Counter()    # thread label -> samples with a non-zero weight
+        self.thread_cpu = {}        # thread label -> CPU s during the run (if known)
+        self.ticks = 0
+        self.started = None
+        self.wall = 0.0
+        self.sampler_cpu = 0.0
+        self.interval = 1.0 / hz
+
+    def report(self):
+        per_thread = defaultdict(int)
+        for (label, _), us in self.stacks.items():
+            per_thread[label] += us
+        return {
+            "mode": self.mode,
+            "seconds": round(self.wall, 3),
+            "ticks": self.ticks,
+            "requested_hz": self.hz,
+            "effective_hz": round(self.ticks / self.wall, 1) if self.wall else 0.0,
+            "sampler_cpu_s": round(self.sampler_cpu, 4),
+            # share of one core used by the sampler thread
+            "overhead_pct": round(100 * self.sampler_cpu / self.wall, 3) if self.wall else 0.0,
+            "threads": {label: {"samples": self.samples.get(label, 0),
+                                "sampled_s": round(per_thread.get(label, 0) / 1e6, 3),
+                                "cpu_s": None if label not in self.thread_cpu else round(self.thread_cpu[label], 3)}
+                        for label in sorted(set(per_thread) | set(self.thread_cpu))},
+        }
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed stacks: 'thread;outer;...;inner microseconds' per line."""
+        lines = []
+        for (label, stack), n in self.stacks.most_common():
+            frames = ";".join(f"{function} ({os.path.basename(filename)}:{line})" for filename, function, line in stack)
+            lines.append(f"{label};{frames} {n}" if frames else f"{label} {n}")
+        return "".join(line + "\n" for line in lines)
+
+    def speedscope(self, name="mhr-backend"):
+        """speedscope.app file format, one sampled profile per thread."""
+        frame_index, frames = {}, []
+        by_thread = defaultdict(list)
+        for (label, stack), n in self.stacks.items():
+            indices = []
+            for filename, function, line in stack:
+                key = (filename, function, line)
+                if key not in frame_index:
+                    frame_index[key] = len(frames)
+                    frames.append({"name": function, "file": filename, "line": line})
+                indices.append(frame_index[key])
+            by_thread[label].append((indices, n))
+
+        profiles = []
+        for label in sorted(by_thread):
+            samples = [indices for indices, _ in by_thread[label]]
+            weights = [us / 1e6 for _, us in by_thread[label]]
+            profiles.append({
+                "type": "sampled", "name": label, "unit": "seconds",
+                "startValue": 0, "endValue": round(sum(weights), 6),
+                "samples": samples, "weights": weights,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "sampling_profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+class SamplingProfiler:
+    """
+    profiler = SamplingProfiler(hz=100)
+    profile = profiler.run(10)         # blocks the calling thread, which is the sampler
+    profile.collapsed() / profile.speedscope() / profile.report()
+    """
+
+    def __init__(self, hz=100, mode=None, max_depth=MAX_DEPTH, overhead_budget=0.02):
+        self.hz = max(1, min(MAX_HZ, int(hz)))
+        cpu_clocks = hasattr(time, "pthread_getcpuclockid")
+        self.mode = mode or ("cpu" if cpu_clocks else "wall")
+        if self.mode not in ("cpu", "wall"):
+            raise ValueError(f"Unknown profiler mode {self.mode!r}")
+        if self.mode == "cpu" and not cpu_clocks:
+            raise ValueError("cpu mode needs per-thread CPU clocks (Linux)")
+        self.max_depth = max_depth
+        self.overhead_budget = overhead_budget
+        self._codes = {}            # code object -> (filename, qualified function name, firstlineno)
+
+    def _stack(self, frame):
+        stack = []
+        codes = self._codes
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            entry = codes.get(code)
+            if entry is None:
+                entry = codes[code] = (code.co_filename, getattr(code, "co_qualname", code.co_name),
+                                       code.co_firstlineno)
+            stack.append(entry)
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def run(self, seconds):
+        seconds = max(0.1, min(MAX_SECONDS, float(seconds)))
+        profile = Profile(self.mode, self.hz)
+        me = threading.get_ident()
+        names, names_at = {}, -NAMES_REFRESH
+        clocks, cpu_start, cpu_last = {}, {}, {}
+        labels = {}                 # ident -> label of the latest sample
+
+        profile.started = time.time()
+        start = time.perf_counter()
+        end = start + seconds
+        next_tick = last_tick = start
+        sampler_cpu = 0.0
+        while True:
+            now = time.perf_counter()
+            if now >= end:
+                break
+            t0 = time.thread_time()
+            wall_us = int((now - last_tick) * 1e6)
+            last_tick = now
+
+            if now - names_at >= NAMES_REFRESH:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                names_at = now
+
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in clocks:
+                    clocks[ident] = _thread_cpu_clock(ident)
+                clock = clocks[ident]
+                cpu = None
+                if clock is not None:
+                    try:
+                        cpu = time.clock_gettime(clock)
+                    except OSError:
+                        pass
+                if ident not in cpu_start:
+                    # first sight: no interval to charge yet
+                    cpu_start[ident] = cpu_last[ident] = cpu
+                    labels[ident] = f"{subsystem_of(self._stack(frame))}/{names.get(ident, ident)}"
+                    continue
+
+                if self.mode == "cpu":
+                    weight = 0 if cpu is None or cpu_last[ident] is None else int((cpu - cpu_last[ident]) * 1e6)
+                else:
+                    weight = wall_us
+                if cpu is not None:
+                    cpu_last[ident] = cpu
+                if weight <= 0:
+                    continue
+                stack = self._stack(frame)
+                label = labels[ident] = f"{subsystem_of(stack)}/{names.get(ident, ident)}"
+                profile.stacks[(label, stack)] += weight
+                profile.samples[label] += 1
+            profile.ticks += 1
+
+            sampler_cpu += time.thread_time() - t0
+            # Stretch the interval if the sampler uses more than its share of a core
+            elapsed = time.perf_counter() - start
+            if elapsed > 0.2 and sampler_cpu / elapsed > self.overhead_budget:
+                profile.interval = min(1.0, profile.interval * 1.25)
+            next_tick += profile.interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.perf_counter()
+
+        profile.wall = time.perf_counter() - start
+        profile.sampler_cpu = sampler_cpu
+        for ident, first in cpu_start.items():
+            if first is None or cpu_last.get(ident) is None:
+                continue
+            label = labels[ident]
+            profile.thread_cpu[label] = profile.thread_cpu.get(label, 0.0) + cpu_last[ident] - first
+        return profile
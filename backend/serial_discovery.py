@@ -0,0 +1,358 @@
+import os, re, glob, json, time, threading
+from concurrent.futures import ThreadPoolExecutor
+import serial
+
+from logging import info, error, debug
+from module.ir_thermal.thermal_protocol import encode_request, RESP_HEAD, RESP_TAIL
+
+# ----------------------------
+#  SERIAL DEVICE DISCOVERY
+# ----------------------------
+#
+# ttyUSB numbers swap after reboots and replugs, so ports are found by what
+# answers on them. Every candidate port is probed concurrently; each port tries
+# the signatures in turn:
+#
+#   irt     115200 baud, active: a 1-register read (encode_request) must come
+#           back framed 0x16 0x98 ... 0x1A 0x9C
+#   bp      9600 baud, passive: the monitor's 5-byte state tokens (OFF.., INF.. ...)
+#   drawer  115200 baud: the Arduino's banner after the open-reset, else the
+#           reply to CHECK_DISTANCE
+#
+# A silent BP monitor (idle, nothing to hear) is inferred when it is the only
+# device missing and exactly one USB serial port is left unidentified.
+#
+# Ports in use are never probed: those handed out by resolve() (a session may
+# be running on them, even on a fallback path) and those any process holds
+# open (/proc/*/fd, which covers device worker processes). A probe writes to
+# the port and reads bytes away from whoever else is reading it.
+#
+# The mapping is cached in PORT_CACHE_PATH under a stable key: the
+# /dev/serial/by-id link when there is one, else the USB serial number, else
+# the path. A watcher polls the port list every `poll_s`; a port that
+# disappears marks its device offline, and a port that appears again under a
+# cached key is remapped without probing (unknown ports are probed), so a
+# replugged device is back within one poll.
+
+PORT_CACHE_PATH = os.path.join("data", "serial_ports.json")     # not under static/ (served publicly)
+BY_ID_DIR = "/dev/serial/by-id"
+PORT_GLOBS = ("/dev/ttyUSB*", "/dev/ttyACM*")
+POLL_S = 0.2
+REPLUG_WINDOW_S = 10.0      # resolve() waits for a device only this long after it went offline
+
+# state tokens sent by the BP monitor (see bp_module.bp_process_state)
+BP_STATE_TOKENS = (b"OFF..", b"ON ..", b"CHK..", b"WAI..", b"FIT..", b"INF..", b"DEF..", b"EXH..")
+DRAWER_BANNER = re.compile(rb"drawer|ready|arduino|successfully|object detected", re.I)
+
+
+def probe_irt(ser, timeout):
+    ser.reset_input_buffer()
+    ser.write(encode_request(1, 1))
+    expected = len(RESP_HEAD) + 2 + len(RESP_TAIL)
+    deadline = time.monotonic() + timeout
+    data = b""
+    while len(data) < expected and time.monotonic() < deadline:
+        data += ser.read(expected - len(data))
+    return data.startswith(RESP_HEAD) and data.endswith(RESP_TAIL)
+
+
+def probe_bp(ser, timeout):
+    deadline = time.monotonic() + timeout
+    data = b""
+    while time.monotonic() < deadline:
+        data = (data + ser.read(max(1, ser.in_waiting)))[-64:]
+        if any(token in data for token in BP_STATE_TOKENS):
+            return True
+    return False
+
+
+def probe_drawer(ser, timeout):
+    deadline = time.monotonic() + timeout
+    data = b""
+    asked = False
+    while time.monotonic() < deadline:
+        data = (data + ser.read(max(1, ser.in_waiting)))[-256:]
+        if DRAWER_BANNER.search(data):
+            return True
+        if not asked and time.monotonic() > deadline - timeout / 2:
+            # No banner (board was not reset by the open): ask the distance sensor, moves nothing
+            ser.write(b"CHECK_DISTANCE\n")
+            asked = True
+    return False
+
+
+def open_ports():
+    """Real paths of the tty devices any process has open (those /proc lets us see)."""
+    held = set()
+    for fd_dir in glob.glob("/proc/[0-9]*/fd"):
+        try:
+            names = os.listdir(fd_dir)
+        except OSError:
+            continue
+        for fd in names:
+            try:
+                target = os.readlink(os.path.join(fd_dir, fd))
+            except OSError:
+                continue
+            if target.startswith(("/dev/tty", "/dev/pts/")):
+                held.add(target)
+    return held
+
+
+class Signature:
+    def __init__(self, name, baudrate, probe, timeout, prefer=()):
+        self.name = name
+        self.baudrate = baudrate
+        self.probe = probe
+        self.timeout = timeout
+        self.prefer = prefer        # port path fragments tried with this signature first
+
+
+DEFAULT_SIGNATURES = (
+    Signature("irt", 115200, probe_irt, 0.5, prefer=("ttyUSB", "usb-")),
+    Signature("drawer", 115200, probe_drawer, 2.5, prefer=("ttyACM", "Arduino")),
+    Signature("bp", 9600, probe_bp, 1.5, prefer=("ttyUSB", "usb-")),
+)
+
+
+class SerialDiscovery:
+    """
+    ports = SerialDiscovery().start()       # discover + watch (background)
+    ports.port("irt")                       # current path or None
+    ports.wait_for("irt", timeout=1.0)      # blocks until the device is (back) online
+    ports.resolve("irt")                    # port for a new session (short wait during a replug)
+    """
+
+    def __init__(self, signatures=DEFAULT_SIGNATURES, cache_path=PORT_CACHE_PATH, by_id_dir=BY_ID_DIR,
+                 globs=PORT_GLOBS, poll_s=POLL_S, defaults=None):
+        self.signatures = {s.name: s for s in signatures}
+        self.cache_path = cache_path if os.path.isabs(cache_path) else os.path.join(os.getcwd(), cache_path)
+        self.by_id_dir = by_id_dir
+        self.globs = globs
+        self.poll_s = poll_s
+        self.defaults = defaults or {}      # name -> fallback path when never found
+        self.cond = threading.Condition()
+        self.keys = {}                      # name -> stable key (cached)
+        self.online = {}                    # name -> current path
+        self.inferred = set()
+        self.events = []                    # (monotonic, name, "online" | "offline", path)
+        self._offline_at = {}               # name -> monotonic time it went offline
+        self.handed_out = {}                # name -> path last given to a session by resolve()
+        self.listeners = []
+        self._present = {}
+        self._serial_numbers = {}           # tty path -> usb-sn key (or None)
+        self._discover_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._load()
+
+    # -------- ports -------- #
+    def scan(self):
+        """{path: stable key} of the serial ports present now; by-id links win over ttyUSBn."""
+        ports = {}                          # realpath -> path to open
+        for pattern in self.globs:
+            for path in glob.glob(pattern):
+                ports.setdefault(os.path.realpath(path), path)
+        if self.by_id_dir and os.path.isdir(self.by_id_dir):
+            for name in sorted(os.listdir(self.by_id_dir)):
+                link = os.path.join(self.by_id_dir, name)
+                real = os.path.realpath(link)
+                if os.path.exists(real):
+                    ports[real] = link
+        present = {}
+        for path in ports.values():
+            key = path
+            if not path.startswith(self.by_id_dir or "\0"):
+                key = self._serial_numbers.get(path) or path
+            present[path] = key
+        return present
+
+    def _refresh_serial_numbers(self, paths):
+        """USB serial numbers as keys for ports without a by-id link (sysfs, only for new ports)."""
+        if not all(p in self._serial_numbers for p in paths):
+            try:
+                from serial.tools import list_ports
+                for port in list_ports.comports():
+                    if port.serial_number:
+                        self._serial_numbers[port.device] = f"usb-sn:{port.vid:04x}:{port.pid:04x}:{port.serial_number}"
+            except Exception as e:
+                debug("list_ports: %s", e)
+            for p in paths:
+                self._serial_numbers.setdefault(p, None)
+
+    def _probe_port(self, path, wanted):
+        order = sorted(wanted, key=lambda n: not any(p in path for p in self.signatures[n].prefer))
+        for name in order:
+            sig = self.signatures[name]
+            try:
+                with serial.Serial(path, sig.baudrate, timeout=0.05) as ser:
+                    if sig.probe(ser, sig.timeout):
+                        return name
+            except (serial.SerialException, OSError) as e:
+                debug("probe %s on %s: %s", name, path, e)
+                return None
+        return None
+
+    def discover(self, names=None):
+        """Probe the unassigned ports concurrently for the missing devices; returns {name: path}."""
+        with self._discover_lock:
+            return self._discover(names)
+
+    def _discover(self, names):
+        t0 = time.perf_counter()
+        present = self.scan()
+        self._refresh_serial_numbers([p for p in present if p == present[p]])
+        present = self.scan()
+        with self.cond:
+            wanted = [n for n in (names or self.signatures) if n not in self.online]
+            taken = set(self.online.values())
+            in_use = {os.path.realpath(p) for p in self.handed_out.values()}
+        # Cached keys first: no probing needed
+        for name in list(wanted):
+            for path, key in present.items():
+                if self.keys.get(name) == key and path not in taken:
+                    self._set_online(name, path, key)
+                    wanted.remove(name)
+                    taken.add(path)
+                    break
+        if wanted:
+            in_use |= open_ports()
+        free = [p for p in present if p not in taken and os.path.realpath(p) not in in_use]
+        if wanted and free:
+            with ThreadPoolExecutor(max_workers=len(free)) as pool:
+                found = dict(zip(free, pool.map(lambda p: self._probe_port(p, wanted), free)))
+            for path, name in found.items():
+                if name and name in wanted:
+                    self._set_online(name, path, present[path])
+                    wanted.remove(name)
+            left = [p for p, name in found.items() if not name and "ACM" not in os.path.realpath(p)]
+            if wanted == ["bp"] and len(left) == 1:
+                self._set_online("bp", left[0], present[left[0]], inferred=True)
+                wanted = []
+        self._present = present
+        info(f"Serial discovery in {(time.perf_counter() - t0) * 1000:.0f} ms: {self.online}"
+             + (f", missing {wanted}" if wanted else ""))
+        return dict(self.online)
+
+    # -------- state -------- #
+    def _set_online(self, name, path, key, inferred=False):
+        with self.cond:
+            self.online[name] = path
+            self.keys[name] = key
+            (self.inferred.add if inferred else self.inferred.discard)(name)
+            self.events.append((time.monotonic(), name, "online", path))
+            self.cond.notify_all()
+        self._save()
+        info(f"Serial device '{name}' on {path}" + (" (inferred)" if inferred else ""))
+        for listener in self.listeners:
+            listener(name, path)
+
+    def _set_offline(self, name):
+        with self.cond:
+            path = self.online.pop(name, None)
+            self._offline_at[name] = time.monotonic()
+            self.events.append((self._offline_at[name], name, "offline", path))
+            self.cond.notify_all()
+        info(f"Serial device '{name}' unplugged from {path}")
+        for listener in self.listeners:
+            listener(name, None)
+
+    def port(self, name):
+        with self.cond:
+            return self.online.get(name, self.defaults.get(name))
+
+    def wait_for(self, name, timeout=1.0):
+        """Path of `name` once online, or None after `timeout` s."""
+        with self.cond:
+            self.cond.wait_for(lambda: name in self.online, timeout)
+            return self.online.get(name)
+
+    @property
+    def watching(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def resolve(self, name, wait=0.5):
+        """
+        Port to open for `name` now. Waits up to `wait` s only while the watcher
+        runs and the device went offline within REPLUG_WINDOW_S (it is probably
+        being replugged); otherwise returns port() at once.
+        """
+        with self.cond:
+            went_offline = self._offline_at.get(name)
+            if (name not in self.online and self.watching and went_offline is not None
+                    and time.monotonic() - went_offline < REPLUG_WINDOW_S):
+                self.cond.wait_for(lambda: name in self.online, wait)
+            path = self.online.get(name, self.defaults.get(name))
+            if path is not None:
+                self.handed_out[name] = path
+            return path
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                self.keys = {name: entry["key"] for name, entry in json.load(f).items()}
+        except Exception as e:
+            error(f"Failed to load serial port cache {self.cache_path}: {e}")
+
+    def _save(self):
+        with self.cond:
+            data = {name: {"key": key, "port": self.online.get(name), "inferred": name in self.inferred}
+                    for name, key in self.keys.items()}
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp = self.cache_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            error(f"Failed to save serial port cache: {e}")
+
+    # -------- hotplug watcher -------- #
+    def poll(self):
+        present = self.scan()
+        if present == self._present:
+            return
+        with self.cond:
+            gone = [name for name, path in self.online.items() if path not in present]
+            # A session cannot still be using a port that no longer exists
+            self.handed_out = {name: path for name, path in self.handed_out.items() if os.path.exists(path)}
+        for name in gone:
+            self._set_offline(name)
+        with self.cond:
+            missing = [n for n in self.signatures if n not in self.online]
+        appeared = set(present) - set(self._present)
+        self._present = present
+        if missing and (appeared or gone):
+            self.discover(missing)
+
+    def _watch(self, discover):
+        if discover:
+            try:
+                self.discover()
+            except Exception as e:
+                error(f"Serial discovery: {e}")
+        while not self._stop.wait(self.poll_s):
+            try:
+                self.poll()
+            except Exception as e:
+                error(f"Serial watcher: {e}")
+
+    def start(self, discover=True):
+        """Watch for hotplug in a daemon thread, after a first discovery (in that thread)."""
+        self._present = self.scan() if not discover else {}
+        self._thread = threading.Thread(target=self._watch, args=(discover,), name="serial-discovery", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def report(self):
+        with self.cond:
+            return {"online": dict(self.online), "keys": dict(self.keys), "inferred": sorted(self.inferred),
+                    "handed_out": dict(self.handed_out),
+                    "present": sorted(self._present), "poll_s": self.poll_s}
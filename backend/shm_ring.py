@@ -0,0 +1,167 @@
+import sys, json, time
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+# ----------------------------
+#  SHARED-MEMORY FRAME RING (one writer, any number of readers)
+# ----------------------------
+#
+# `slots` fixed-size slots in one multiprocessing.shared_memory block, so a
+# frame (JPEG bytes or a raw numpy image) crosses processes as one memcpy
+# into the block and one out of it, never pickled. Layout:
+#
+#   header   int64[2 + 3 * slots]   written seq, slots, then per slot:
+#                                   seq, payload bytes, meta bytes
+#   ts       float64[slots]         capture time per slot
+#   slots    slots * slot_bytes     meta (small JSON, optional) + payload
+#
+# The writer marks a slot busy (seq -1), copies, then publishes its seq and
+# finally the ring's written seq. A reader copies the slot out and checks the
+# slot seq again afterwards (seqlock); a frame overwritten meanwhile is read
+# again from the newest slot. Readers that fall behind skip to the newest
+# frame: live video wants the latest picture, not a backlog.
+
+HEADER_FIELDS = 2
+SLOT_FIELDS = 3
+
+
+class RingFrame:
+    def __init__(self, seq, payload, ts, meta):
+        self.seq = seq
+        self.payload = payload      # bytes, or ndarray from read_array
+        self.ts = ts
+        self.meta = meta
+
+
+class FrameRing:
+    """
+    ring = FrameRing.create(slots=4, slot_bytes=512 * 1024)     # owner
+    spec = ring.spec()                                          # to the other process
+    ring = FrameRing.attach(spec)
+    seq = ring.write(jpeg, ts, meta={"irt_state": "Meas."})
+    frame = ring.read_after(seq - 1, timeout=0.5)               # RingFrame or None
+    """
+
+    def __init__(self, shm, slots, slot_bytes, owner):
+        self.shm = shm
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = owner
+        n_header = HEADER_FIELDS + SLOT_FIELDS * slots
+        self.header = np.ndarray((n_header,), np.int64, shm.buf, 0)
+        self.ts = np.ndarray((slots,), np.float64, shm.buf, n_header * 8)
+        self.data_offset = n_header * 8 + slots * 8
+        self.stats = {"written": 0, "read": 0, "skipped": 0, "retries": 0}
+
+    @staticmethod
+    def size(slots, slot_bytes):
+        return (HEADER_FIELDS + SLOT_FIELDS * slots) * 8 + slots * 8 + slots * slot_bytes
+
+    @classmethod
+    def create(cls, slots=4, slot_bytes=512 * 1024, name=None):
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls.size(slots, slot_bytes))
+        ring = cls(shm, slots, slot_bytes, owner=True)
+        ring.header[:] = 0
+        ring.header[1] = slots
+        return ring
+
+    @classmethod
+    def attach(cls, spec):
+        shm = shared_memory.SharedMemory(name=spec["name"])
+        if sys.version_info < (3, 13):
+            # Not ours to unlink: keep this process's resource tracker from doing it at exit
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, spec["slots"], spec["slot_bytes"], owner=False)
+
+    def spec(self):
+        return {"name": self.shm.name, "slots": self.slots, "slot_bytes": self.slot_bytes}
+
+    def _slot(self, index):
+        start = self.data_offset + index * self.slot_bytes
+        return self.shm.buf[start:start + self.slot_bytes]
+
+    @property
+    def seq(self):
+        """Seq of the newest complete frame (0 = none yet)."""
+        return int(self.header[0])
+
+    # -------- writer -------- #
+    def write(self, payload, ts=None, meta=None):
+        """Copy `payload` (bytes-like or contiguous ndarray) into the next slot; returns its seq."""
+        data = memoryview(payload).cast("B") if not isinstance(payload, np.ndarray) else \
+            memoryview(np.ascontiguousarray(payload)).cast("B")
+        meta_bytes = json.dumps(meta, separators=(",", ":")).encode() if meta else b""
+        total = len(meta_bytes) + len(data)
+        if total > self.slot_bytes:
+            raise ValueError(f"frame of {total} bytes does not fit a {self.slot_bytes} byte slot")
+        seq = self.seq + 1
+        index = seq % self.slots
+        base = HEADER_FIELDS + SLOT_FIELDS * index
+        self.header[base] = -1                      # busy
+        slot = self._slot(index)
+        slot[:len(meta_bytes)] = meta_bytes
+        slot[len(meta_bytes):total] = data
+        self.ts[index] = time.time() if ts is None else ts
+        self.header[base + 1] = len(data)
+        self.header[base + 2] = len(meta_bytes)
+        self.header[base] = seq
+        self.header[0] = seq
+        self.stats["written"] += 1
+        return seq
+
+    # -------- readers -------- #
+    def read_latest(self, copy=bytes):
+        """Newest frame (RingFrame) or None; `copy` turns the slot memoryview into the payload."""
+        for _ in range(self.slots + 1):
+            seq = self.seq
+            if seq == 0:
+                return None
+            index = seq % self.slots
+            base = HEADER_FIELDS + SLOT_FIELDS * index
+            if self.header[base] != seq:
+                self.stats["retries"] += 1
+                continue
+            n_payload, n_meta = int(self.header[base + 1]), int(self.header[base + 2])
+            ts = float(self.ts[index])
+            slot = self._slot(index)
+            meta = bytes(slot[:n_meta])
+            payload = copy(slot[n_meta:n_meta + n_payload])
+            if self.header[base] != seq:            # overwritten while copying
+                self.stats["retries"] += 1
+                continue
+            self.stats["read"] += 1
+            return RingFrame(seq, payload, ts, json.loads(meta) if meta else {})
+        return None
+
+    def read_after(self, seq, timeout=0.5, poll_s=0.002, copy=bytes):
+        """First frame newer than `seq` (the newest one if several), waiting up to `timeout`."""
+        deadline = time.monotonic() + timeout
+        while self.seq <= seq:
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_s)
+        frame = self.read_latest(copy)
+        if frame is not None and frame.seq > seq + 1:
+            self.stats["skipped"] += frame.seq - seq - 1
+        return frame
+
+    def read_array(self, seq, shape, dtype=np.uint8, timeout=0.5):
+        """read_after for raw images: the payload comes back as an ndarray of `shape`."""
+        return self.read_after(seq, timeout, copy=lambda view: np.frombuffer(view, dtype).reshape(shape).copy())
+
+    def close(self):
+        # numpy views hold exports of shm.buf; drop them before closing
+        self.header = self.ts = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def report(self):
+        return {"name": self.shm.name, "slots": self.slots, "slot_bytes": self.slot_bytes,
+                "seq": self.seq if self.header is not None else None, **self.stats}